@@ -48,6 +48,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'pdfeditor.metrics.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'pdf_project.urls'
@@ -130,6 +131,75 @@ STATICFILES_DIRS = [
 
 # PDF Cleanup Settings
 PDF_CLEANUP_HOURS = 24  # Automatically delete files older than 24 hoursate după 24h
+PDF_RETENTION_HOURS = {}  # Per kind: 'upload', 'result', 'job', 'batch' (missing = PDF_CLEANUP_HOURS)
+PDF_STORAGE_QUOTA_BYTES = None  # Above this, least recently used files are deleted (None = no quota)
+PDF_CLEANUP_INTERVAL = 3600  # Seconds between runs of cleanup_old_pdfs --daemon
+
+# Background job queue (python manage.py run_pdf_jobs)
+PDF_JOBS_DB = os.path.join(BASE_DIR, 'pdf_jobs.sqlite3')
+PDF_JOB_WORKERS = 2  # Jobs processed in parallel
+PDF_JOB_TIMEOUT = 600  # Seconds before a running job is killed
+PDF_JOB_EVENTS_SECONDS = 25  # An events stream ends after this long; the client reconnects
+PDF_VIEW_JOBS = True  # Tool views queue their work for run_pdf_jobs; False runs it in the request
+
+# Cross-document full-text search (SQLite FTS5)
+PDF_SEARCH_DB = os.path.join(BASE_DIR, 'pdf_search.sqlite3')
+
+# Uploads
+PDF_MAX_UPLOAD_SIZE = 500 * 1024 * 1024  # Bytes, enforced while chunks stream in
+PDF_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Suggested chunk size for resumable uploads
+
+# Per-document caches (OCR pages, analysis, renders), keyed by content hash
+PDF_CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+
+# Working copies of documents being edited (None = MEDIA_ROOT/edits)
+PDF_EDIT_SESSION_DIR = None
+
+# Server-side page previews (thumbnails and tiles)
+PDF_RENDER_WORKERS = None  # Render processes (None = up to 4)
+PDF_RENDER_CACHE_BYTES = 256 * 1024 * 1024  # Rendered images kept on disk (LRU)
+PDF_RENDER_PRERENDER_PAGES = 3  # Pages rendered right after upload
+PDF_RENDER_TIMEOUT = 30  # Seconds a preview request waits for its render (then 503 + Retry-After)
+
+# AI rephrase (Ollama)
+OLLAMA_STATUS_TTL = 30  # Seconds the health check and model list are cached
+OLLAMA_MAX_IN_FLIGHT = 4  # Concurrent requests when rephrasing many paragraphs
+OLLAMA_CACHE_DB = os.path.join(BASE_DIR, 'rephrase_cache.sqlite3')  # Memoized rephrase results
+OLLAMA_CACHE_MAX_ENTRIES = 10000
+OLLAMA_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Compression
+PDF_COMPRESS_WORKERS = None  # Image recompression processes (None = one per CPU core)
+
+# Split
+PDF_SPLIT_WORKERS = None  # Parts written in parallel (None = one per CPU core)
+
+# Merge
+PDF_MERGE_CHUNK_SIZE = 20  # Inputs appended between incremental saves (bounds merge memory)
+PDF_MERGE_WORKERS = 1  # Processes merging groups of inputs in parallel (1 = in-process)
+PDF_MERGE_DEDUPE = True  # Deduplicate shared fonts/images in the final save (garbage=4)
+
+# Batch mode (python manage.py batch_pdfs, /batch/)
+PDF_BATCH_WORKERS = None  # Documents processed in parallel (None = one per CPU core)
+
+# OCR
+PDF_OCR_DPI = 300
+PDF_OCR_WORKERS = None  # None = one process per CPU core
+
+# Benchmarks (python manage.py benchmark_pdfs)
+PDF_BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+
+# Operation metrics (/metrics, Prometheus format) and request profiling
+PDF_METRICS_DB = os.path.join(BASE_DIR, 'metrics.sqlite3')
+PDF_METRICS_ENABLED = True  # Record operation timings (benchmark runs never do)
+PDF_PROFILE_DIR = None  # Directory for request profiles (None = profiling off)
+PDF_PROFILE_SAMPLE_RATE = 0.01  # Fraction of requests profiled
+PDF_PROFILER = 'cprofile'  # 'cprofile' (.prof) or 'pyinstrument' (.html)
+
+# Downloads: 'django' (Range requests, sendfile through the WSGI server),
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache mod_xsendfile)
+PDF_DOWNLOAD_BACKEND = 'django'
+PDF_X_ACCEL_PREFIX = '/protected/media/'  # nginx internal location mapped to MEDIA_ROOT
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -1,3 +1,22 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Document, Pipeline, ProcessedResult
+
+
+@admin.register(Document)
+class DocumentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'status', 'page_count', 'size', 'uploaded_at')
+    list_filter = ('status',)
+    search_fields = ('name', 'sha256', 'owner')
+
+
+@admin.register(ProcessedResult)
+class ProcessedResultAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'owner', 'status', 'document', 'created_at')
+    list_filter = ('kind', 'status')
+
+
+@admin.register(Pipeline)
+class PipelineAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'updated_at')
+    search_fields = ('name', 'owner')
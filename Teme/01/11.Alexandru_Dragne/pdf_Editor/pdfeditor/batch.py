@@ -0,0 +1,185 @@
+"""
+Batch Module - apply one chain of operations to many PDFs.
+
+Each document is handled by a worker process that opens it once, runs the
+whole chain in memory (see pdf_processor.process_document) and saves it
+once. A failing document is reported in the results instead of stopping
+the batch. The outputs can then be streamed back as a single ZIP archive
+together with a results.json summary.
+"""
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from django.conf import settings
+
+from .pdf_processor import validate_operations, process_document
+from .zip_stream import stream_zip
+
+
+def collect_pdf_paths(sources: Iterable[str]) -> List[str]:
+    """
+    Expand a list of files and directories into PDF paths.
+
+    Directories are searched recursively; the result keeps the order of
+    `sources` and is sorted within each directory.
+
+    Raises:
+        ValueError: If a source does not exist or no PDF is found
+    """
+    pdf_paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                pdf_paths.extend(
+                    os.path.join(root, name) for name in sorted(files)
+                    if name.lower().endswith('.pdf')
+                )
+        elif os.path.isfile(source):
+            pdf_paths.append(source)
+        else:
+            raise ValueError(f"File or directory not found: {source}")
+
+    if not pdf_paths:
+        raise ValueError("No PDF files found")
+    return pdf_paths
+
+
+def _output_names(file_names: List[str]) -> List[str]:
+    """Unique output base names (the same file name twice gets a suffix)."""
+    names = []
+    seen = {}
+    for file_name in file_names:
+        base = os.path.splitext(os.path.basename(file_name))[0]
+        count = seen.get(base, 0)
+        seen[base] = count + 1
+        names.append(base if count == 0 else f"{base}_{count + 1}")
+    return names
+
+
+def _process_one(pdf_path, operations, output_dir, output_name):
+    """Worker: process one document and report success or the error."""
+    try:
+        result = process_document(pdf_path, operations, output_dir, output_name, workers=1)
+        return {'source': pdf_path, 'name': output_name, 'success': True, 'error': None, **result}
+    except Exception as e:
+        return {'source': pdf_path, 'name': output_name, 'success': False, 'error': str(e), 'output_paths': []}
+
+
+def run_batch(pdf_paths: List[str], operations: List[Dict[str, Any]],
+              output_dir: Optional[str] = None, workers: Optional[int] = None,
+              names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Run a chain of operations over many PDFs in a process pool.
+
+    Args:
+        pdf_paths: Source PDF paths
+        operations: Chain of steps (see pdf_processor.validate_operations)
+        output_dir: Where to write the results (default: a new
+                    media/processed/batch_<timestamp>_<id> directory)
+        workers: Number of worker processes (default: settings.PDF_BATCH_WORKERS
+                 or the CPU count)
+        names: Original file names used for the outputs (default: the
+               source file names)
+
+    Returns:
+        Dict with 'output_dir', 'results' (one dict per document, in input
+        order), 'succeeded' and 'failed'
+
+    Raises:
+        ValueError: If the chain is invalid or there are no documents
+    """
+    operations = validate_operations(operations)
+    if not pdf_paths:
+        raise ValueError("No PDF files given")
+
+    if output_dir is None:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_dir = os.path.join(
+            settings.MEDIA_ROOT, 'processed', f"batch_{timestamp}_{uuid.uuid4().hex[:8]}"
+        )
+    os.makedirs(output_dir, exist_ok=True)
+
+    names = _output_names(names or pdf_paths)
+    workers = workers or getattr(settings, 'PDF_BATCH_WORKERS', None) or os.cpu_count() or 1
+    workers = min(workers, len(pdf_paths))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                _process_one,
+                pdf_paths, [operations] * len(pdf_paths), [output_dir] * len(pdf_paths), names,
+                chunksize=max(1, len(pdf_paths) // (workers * 4))
+            ))
+    else:
+        results = [
+            _process_one(path, operations, output_dir, name)
+            for path, name in zip(pdf_paths, names)
+        ]
+
+    # Imported here: worker processes import this module before Django is set up
+    from .retention import register_file
+
+    register_file(output_dir, 'batch')
+    succeeded = sum(1 for result in results if result['success'])
+    return {
+        'output_dir': output_dir,
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded
+    }
+
+
+def batch_summary(batch: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary of a batch without server paths (written as results.json)."""
+    output_dir = batch['output_dir']
+    return {
+        'succeeded': batch['succeeded'],
+        'failed': batch['failed'],
+        'documents': [
+            {
+                'name': result['name'],
+                'success': result['success'],
+                'error': result['error'],
+                'outputs': [os.path.relpath(path, output_dir) for path in result['output_paths']],
+                'original_size': result.get('original_size'),
+                'output_size': result.get('output_size')
+            }
+            for result in batch['results']
+        ]
+    }
+
+
+def _iter_archive(outputs: Iterable, summary: Dict[str, Any]) -> Iterator[bytes]:
+    def entries():
+        yield from outputs
+        yield 'results.json', json.dumps(summary, indent=2).encode('utf-8')
+
+    return stream_zip(entries())
+
+
+def iter_batch_archive(batch: Dict[str, Any]) -> Iterator[bytes]:
+    """Stream all outputs of a batch plus results.json as one ZIP archive."""
+    output_dir = batch['output_dir']
+    outputs = (
+        (os.path.relpath(path, output_dir), path)
+        for result in batch['results'] for path in result['output_paths']
+    )
+    return _iter_archive(outputs, batch_summary(batch))
+
+
+def iter_batch_job_archive(result: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Stream the archive of a finished 'batch' job from its stored result.
+
+    The result holds the output paths plus the batch_summary (see
+    jobs._run_batch); the summary lists the same outputs, in the same
+    order, relative to the batch directory.
+    """
+    summary = {key: value for key, value in result.items() if key != 'output_paths'}
+    names = [name for document in summary['documents'] for name in document['outputs']]
+    return _iter_archive(zip(names, result['output_paths']), summary)
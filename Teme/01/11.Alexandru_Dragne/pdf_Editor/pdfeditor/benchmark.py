@@ -0,0 +1,355 @@
+"""
+Benchmark Module - throughput and memory measurements for pdf_processor.
+
+Synthetic PDFs (text-only, image-heavy and scanned, at several page
+counts) are generated once into a work directory. Every operation then
+runs in its own child process, so each measurement starts cold (no
+text index, no render cache) and its peak RSS is its own.
+
+Results are keyed '<operation>/<kind>/<pages>' and can be saved as a
+baseline JSON; compare_to_baseline reports every metric that got worse
+by more than a threshold (see `python manage.py benchmark_pdfs`).
+"""
+import io
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import fitz  # PyMuPDF
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not measured
+    resource = None
+
+from .pdf_processor import (
+    split_pdf, merge_pdfs, compress_pdf, add_watermark, rotate_pages,
+    add_page_numbers, find_and_replace_text, extract_text_from_pdf, get_cache_dir
+)
+
+
+DOCUMENT_KINDS = ('text', 'images', 'scanned')
+DEFAULT_SIZES = (10, 100, 1000)
+
+# Differences below these are noise, whatever the relative change
+MIN_DIFFERENCE = {
+    'seconds': 0.05,
+    'peak_rss_bytes': 8 * 1024 * 1024,
+    'output_bytes': 4096,
+}
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit. Sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. "
+)
+
+
+def get_default_baseline_path() -> str:
+    return str(getattr(
+        settings, 'PDF_BENCHMARK_BASELINE',
+        os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+    ))
+
+
+# ==========================================
+# Synthetic documents
+# ==========================================
+
+def _noise_images(count: int, size=(640, 480)) -> List[bytes]:
+    from PIL import Image
+
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        Image.effect_noise(size, 40 + i * 5).convert('RGB').save(buffer, 'PNG')
+        images.append(buffer.getvalue())
+    return images
+
+
+def _scanned_pages(count: int) -> List[bytes]:
+    """Grayscale page images without a text layer, like a scanner's output."""
+    images = []
+    for i in range(count):
+        with fitz.open() as doc:
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(72, 72, 523, 770), f"Scan {i + 1}. " + LOREM * 12, fontsize=11)
+            images.append(page.get_pixmap(dpi=100, colorspace=fitz.csGRAY).tobytes('png'))
+    return images
+
+
+def make_document(kind: str, pages: int, path: str) -> str:
+    """
+    Write a synthetic PDF.
+
+    Args:
+        kind: 'text' (paragraphs only), 'images' (text plus a photo-like
+              image per page) or 'scanned' (one full-page image per page)
+        pages: Page count
+        path: Output path
+
+    Returns:
+        str: path
+    """
+    if kind not in DOCUMENT_KINDS:
+        raise ValueError(f"Unknown document kind: {kind}")
+
+    # Small pools of images: realistic per-page content without
+    # generating (and storing) a distinct image for every page
+    pool = _noise_images(8) if kind == 'images' else _scanned_pages(4) if kind == 'scanned' else []
+
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if kind == 'scanned':
+            page.insert_image(page.rect, stream=pool[i % len(pool)])
+            continue
+        page.insert_text((72, 60), f"Benchmark page {i + 1}", fontsize=14)
+        if kind == 'images':
+            page.insert_image(fitz.Rect(72, 80, 523, 420), stream=pool[i % len(pool)])
+            page.insert_textbox(fitz.Rect(72, 440, 523, 770), LOREM * 4, fontsize=10)
+        else:
+            page.insert_textbox(fitz.Rect(72, 80, 523, 770), LOREM * 10, fontsize=10)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    doc.save(tmp_path, garbage=3, deflate=True)
+    doc.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+# ==========================================
+# Operations
+# ==========================================
+# Each runner takes the input path and returns the output size in bytes.
+
+def _size(paths) -> int:
+    if isinstance(paths, str):
+        paths = [paths]
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def _bench_split(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        half = max(1, len(doc) // 2)
+        ranges = [(1, half), (half + 1, len(doc))] if len(doc) > 1 else [(1, 1)]
+    return _size(split_pdf(pdf_path, ranges))
+
+
+def _bench_merge(pdf_path):
+    return _size(merge_pdfs([pdf_path, pdf_path], output_name='benchmark_merged'))
+
+
+def _bench_compress(pdf_path):
+    return _size(compress_pdf(pdf_path, 'medium', output_name='benchmark_compressed')[0])
+
+
+def _bench_watermark(pdf_path):
+    return _size(add_watermark(pdf_path, 'text', 'BENCHMARK', {'position': 'center'}))
+
+
+def _bench_rotate(pdf_path):
+    return _size(rotate_pages(pdf_path, 90))
+
+
+def _bench_page_numbers(pdf_path):
+    return _size(add_page_numbers(pdf_path, {'format': 'of_total'}))
+
+
+def _bench_find_replace(pdf_path):
+    return _size(find_and_replace_text(pdf_path, 'dolor', 'pain')[0])
+
+
+def _bench_extract_text(pdf_path):
+    return len(extract_text_from_pdf(pdf_path).encode('utf-8'))
+
+
+OPERATIONS: Dict[str, Callable[[str], int]] = {
+    'split_pdf': _bench_split,
+    'merge_pdfs': _bench_merge,
+    'compress_pdf': _bench_compress,
+    'add_watermark': _bench_watermark,
+    'rotate_pages': _bench_rotate,
+    'add_page_numbers': _bench_page_numbers,
+    'find_and_replace_text': _bench_find_replace,
+    'extract_text_from_pdf': _bench_extract_text,
+}
+
+
+# ==========================================
+# Measurements
+# ==========================================
+
+def _peak_rss_bytes() -> Optional[int]:
+    """Peak RSS of this process and of the worker processes it waited for (None if unknown)."""
+    if resource is None:
+        return None
+    unit = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is in KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * unit
+
+
+def _measure_main(conn, operation, pdf_path, media_root, cache_dir):
+    """Child process: run one operation with empty caches and report."""
+    try:
+        settings.MEDIA_ROOT = media_root
+        settings.PDF_CACHE_DIR = cache_dir
+        # Synthetic runs are not recorded in the server's operation metrics
+        settings.PDF_METRICS_ENABLED = False
+
+        start = time.perf_counter()
+        output_bytes = OPERATIONS[operation](pdf_path)
+        seconds = time.perf_counter() - start
+
+        conn.send({
+            'seconds': round(seconds, 4),
+            'peak_rss_bytes': _peak_rss_bytes(),
+            'output_bytes': output_bytes
+        })
+    except Exception as e:
+        conn.send({'error': str(e)})
+    finally:
+        conn.close()
+
+
+def measure(operation: str, pdf_path: str, work_dir: str) -> Dict[str, Any]:
+    """
+    Run one operation on one document in a fresh child process.
+
+    Outputs and caches go to a scratch directory that is deleted afterwards.
+
+    Returns:
+        Dict with 'seconds', 'peak_rss_bytes' and 'output_bytes', or 'error'
+    """
+    scratch = os.path.join(work_dir, 'run')
+    shutil.rmtree(scratch, ignore_errors=True)
+    media_root = os.path.join(scratch, 'media')
+    os.makedirs(media_root)
+
+    ctx = multiprocessing.get_context()
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    # Not a daemon: split and compress start their own process pools
+    process = ctx.Process(
+        target=_measure_main,
+        args=(child_conn, operation, pdf_path, media_root, os.path.join(scratch, 'cache'))
+    )
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = {'error': 'Benchmark process died'}
+    process.join()
+    if process.exitcode and 'error' not in result:
+        result = {'error': f"Benchmark process exited with code {process.exitcode}"}
+
+    # media/processed is next to media/uploads (see split_pdf)
+    shutil.rmtree(scratch, ignore_errors=True)
+    shutil.rmtree(os.path.join(work_dir, 'media', 'processed'), ignore_errors=True)
+    return result
+
+
+def run_benchmark(sizes: Iterable[int] = DEFAULT_SIZES,
+                  kinds: Iterable[str] = DOCUMENT_KINDS,
+                  operations: Optional[Iterable[str]] = None,
+                  repeat: int = 1,
+                  work_dir: Optional[str] = None,
+                  progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Measure every operation on every synthetic document.
+
+    Args:
+        sizes: Page counts
+        kinds: Document kinds (see make_document)
+        operations: Names from OPERATIONS (default: all)
+        repeat: Runs per measurement; the fastest is kept, with the
+                highest peak RSS of all runs
+        work_dir: Directory for the generated documents (reused between runs)
+        progress: Called with (key, result) after each measurement
+
+    Returns:
+        Dict with 'created_at', 'python', 'pymupdf' and 'results'
+        ({'<operation>/<kind>/<pages>': result})
+    """
+    operations = list(operations or OPERATIONS)
+    for operation in operations:
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation}")
+
+    work_dir = work_dir or get_cache_dir('benchmark')
+    # Under media/uploads so split_pdf writes next to it, in media/processed
+    documents_dir = os.path.join(work_dir, 'media', 'uploads')
+
+    results = {}
+    for kind in kinds:
+        for pages in sizes:
+            pdf_path = os.path.join(documents_dir, f"{kind}_{pages}.pdf")
+            if not os.path.exists(pdf_path):
+                make_document(kind, pages, pdf_path)
+
+            for operation in operations:
+                runs = [measure(operation, pdf_path, work_dir) for _ in range(max(1, repeat))]
+                failed = [run for run in runs if 'error' in run]
+                if failed:
+                    result = failed[0]
+                else:
+                    result = min(runs, key=lambda run: run['seconds'])
+                    peaks = [run['peak_rss_bytes'] for run in runs if run['peak_rss_bytes'] is not None]
+                    result['peak_rss_bytes'] = max(peaks) if peaks else None
+                result['input_bytes'] = os.path.getsize(pdf_path)
+
+                key = f"{operation}/{kind}/{pages}"
+                results[key] = result
+                if progress:
+                    progress(key, result)
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'pymupdf': fitz.VersionBind,
+        'results': results
+    }
+
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any],
+                        threshold: float = 0.25) -> List[Dict[str, Any]]:
+    """
+    List the metrics that regressed compared to a baseline.
+
+    A metric regresses when it grew by more than `threshold` (0.25 = 25%)
+    and by more than MIN_DIFFERENCE. Measurements missing from either side
+    are skipped; an operation that now fails is always a regression.
+
+    Returns:
+        List of dicts with 'key', 'metric', 'baseline', 'current' and 'change'
+    """
+    regressions = []
+    for key, result in current['results'].items():
+        before = baseline.get('results', {}).get(key)
+        if not before or 'error' in before:
+            continue
+        if 'error' in result:
+            regressions.append({'key': key, 'metric': 'error', 'baseline': None,
+                                'current': result['error'], 'change': None})
+            continue
+
+        for metric, min_difference in MIN_DIFFERENCE.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + threshold) and new - old > min_difference:
+                regressions.append({
+                    'key': key,
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'change': round(new / old - 1, 4)
+                })
+    return regressions
@@ -0,0 +1,253 @@
+"""
+Chunked Upload Module - resumable streaming uploads for large PDFs.
+
+A client first creates an upload (file name + total size), then sends the
+file as raw request bodies, each starting at the current offset. Chunks
+are written straight to a partial file inside the PDF store and hashed as
+they arrive, so nothing is buffered in memory or in Django's temporary
+upload files. After a dropped connection the client asks for the current
+offset and continues from there. When the last byte arrives, the file is
+committed to the content-addressed store like a regular upload.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from .pdf_store import get_store_root, commit_upload
+
+
+PDF_MAGIC = b'%PDF-'
+READ_SIZE = 64 * 1024
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# upload_id -> (hashlib object, offset) for uploads served by this process.
+# If a chunk lands on another worker the hash is rebuilt from the partial file.
+_hashers: Dict[str, Tuple[Any, int]] = {}
+
+
+class UploadError(ValueError):
+    """Invalid chunk or upload request; carries an HTTP status code."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def get_max_upload_size() -> int:
+    return int(getattr(settings, 'PDF_MAX_UPLOAD_SIZE', 500 * 1024 * 1024))
+
+
+def _upload_dir() -> str:
+    path = os.path.join(get_store_root(), 'tmp')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(upload_id: str) -> Tuple[str, str]:
+    if not _UPLOAD_ID_RE.match(upload_id or ''):
+        raise UploadError('Invalid upload id', status=404)
+    base = os.path.join(_upload_dir(), upload_id)
+    return f"{base}.part", f"{base}.json"
+
+
+def is_pdf_header(data: bytes) -> bool:
+    """Check the %PDF- magic bytes at the start of a file."""
+    return data[:len(PDF_MAGIC)] == PDF_MAGIC
+
+
+def create_upload(filename: str, size: int, owner: str = '') -> Dict[str, Any]:
+    """
+    Start a new resumable upload.
+
+    Args:
+        filename: Original file name (must end in .pdf)
+        size: Total size in bytes announced by the client
+        owner: Session key of the uploader
+
+    Returns:
+        Dict with upload metadata (upload_id, offset, size, chunk_size)
+
+    Raises:
+        UploadError: If the name or size is not acceptable
+    """
+    if not filename or not filename.lower().endswith('.pdf'):
+        raise UploadError('Only PDF files are accepted.')
+    if size < len(PDF_MAGIC):
+        raise UploadError('File is too small to be a PDF.')
+    if size > get_max_upload_size():
+        raise UploadError(
+            f'File too large: {size} bytes (max {get_max_upload_size()} bytes).', status=413
+        )
+
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = _paths(upload_id)
+    open(part_path, 'wb').close()
+
+    meta = {
+        'upload_id': upload_id,
+        'filename': os.path.basename(filename),
+        'size': size,
+        'owner': owner,
+        'created_at': time.time()
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    _hashers[upload_id] = (hashlib.sha256(), 0)
+    return {**meta, 'offset': 0, 'chunk_size': int(getattr(settings, 'PDF_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))}
+
+
+def get_upload(upload_id: str, owner: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Return upload metadata including the current offset (bytes on disk).
+
+    Raises:
+        UploadError: If the upload does not exist or belongs to someone else
+    """
+    part_path, meta_path = _paths(upload_id)
+    if not os.path.exists(meta_path):
+        raise UploadError('Upload not found', status=404)
+
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if owner is not None and meta['owner'] != owner:
+        raise UploadError('Upload not found', status=404)
+
+    meta['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return meta
+
+
+def _get_hasher(upload_id: str, part_path: str, offset: int):
+    """Return a sha256 object covering the first `offset` bytes of the upload."""
+    hasher, hashed = _hashers.get(upload_id, (None, -1))
+    if hasher is not None and hashed == offset:
+        return hasher
+
+    # Resumed on a different process (or after a restart): rehash the prefix once
+    hasher = hashlib.sha256()
+    with open(part_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher
+
+
+def append_chunk(upload_id: str, offset: int, stream, owner: Optional[str] = None,
+                 length: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Append a chunk read from `stream` at `offset`.
+
+    The stream is consumed in small blocks and written directly to the
+    partial file; the upload must start with the PDF magic bytes (checked
+    as soon as they arrive, even when they span several reads or chunks),
+    and it may never grow past its announced size.
+
+    Args:
+        upload_id: Id returned by create_upload
+        offset: Byte offset the client believes the chunk starts at
+        stream: File-like object with .read(n) (e.g. the Django request)
+        owner: Session key of the uploader
+        length: Declared chunk length (Content-Length), checked before reading
+
+    Returns:
+        Dict with upload metadata; includes 'complete', and once complete
+        'sha256' and 'path' of the stored blob plus 'ref_id'
+
+    Raises:
+        UploadError: On offset mismatch (409), oversize (413) or bad content
+    """
+    meta = get_upload(upload_id, owner)
+    part_path, meta_path = _paths(upload_id)
+
+    if offset != meta['offset']:
+        raise UploadError(f"Offset mismatch: server has {meta['offset']} bytes", status=409)
+    if length is not None and offset + length > meta['size']:
+        raise UploadError('Chunk exceeds the announced file size.', status=413)
+
+    hasher = _get_hasher(upload_id, part_path, offset)
+    written = offset
+
+    # Start of the file received so far, until it covers the magic bytes
+    if offset >= len(PDF_MAGIC):
+        header = PDF_MAGIC  # Checked when the start of the file arrived
+    else:
+        with open(part_path, 'rb') as f:
+            header = f.read(offset)
+
+    with open(part_path, 'ab') as f:
+        try:
+            while True:
+                data = stream.read(READ_SIZE)
+                if not data:
+                    break
+                if len(header) < len(PDF_MAGIC):
+                    header += data[:len(PDF_MAGIC) - len(header)]
+                    if not PDF_MAGIC.startswith(header):
+                        raise UploadError('File is not a PDF (missing %PDF header).', status=415)
+                if written + len(data) > meta['size']:
+                    raise UploadError('Chunk exceeds the announced file size.', status=413)
+                f.write(data)
+                hasher.update(data)
+                written += len(data)
+        except Exception:
+            # Drop the partial chunk so the client can retry from `offset`
+            f.truncate(offset)
+            _hashers.pop(upload_id, None)
+            raise
+
+    _hashers[upload_id] = (hasher, written)
+    meta['offset'] = written
+    meta['complete'] = written == meta['size']
+
+    if meta['complete']:
+        sha256 = hasher.hexdigest()
+        meta['sha256'] = sha256
+        meta['ref_id'], meta['path'], _ = commit_upload(part_path, sha256)
+        for path in (part_path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        _hashers.pop(upload_id, None)
+
+    return meta
+
+
+def abort_upload(upload_id: str, owner: Optional[str] = None):
+    """Discard an unfinished upload."""
+    get_upload(upload_id, owner)
+    for path in _paths(upload_id):
+        if os.path.exists(path):
+            os.remove(path)
+    _hashers.pop(upload_id, None)
+
+
+def expire_stale_uploads(max_age_seconds: float) -> Tuple[int, int]:
+    """
+    Delete unfinished uploads not touched for max_age_seconds.
+
+    Returns:
+        Tuple (deleted_uploads: int, freed_bytes: int)
+    """
+    upload_dir = _upload_dir()
+    threshold = time.time() - max_age_seconds
+    deleted = freed = 0
+
+    for entry in os.listdir(upload_dir):
+        if not entry.endswith('.part'):
+            continue
+        part_path = os.path.join(upload_dir, entry)
+        if os.path.getmtime(part_path) >= threshold:
+            continue
+        freed += os.path.getsize(part_path)
+        os.remove(part_path)
+        meta_path = part_path[:-len('.part')] + '.json'
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        _hashers.pop(entry[:-len('.part')], None)
+        deleted += 1
+    return deleted, freed
@@ -0,0 +1,377 @@
+"""
+Edit Session Module - repeated edits on a working copy with undo/redo.
+
+Find & replace and rephrase used to write a complete new PDF (garbage=4)
+for every edit. An edit session keeps a working copy of the upload under
+PDF_EDIT_SESSION_DIR/<session_id>/ (default MEDIA_ROOT/edits) and applies
+each edit with a PyMuPDF incremental save, which only appends the changed
+objects to the file, so an edit costs about as much as what it changes.
+
+Every edit is recorded in a journal (journal.json) with the file size
+before and after it. Because increments are only appended, the file cut
+at an earlier size is exactly the document at that point:
+
+    undo - move the last increment to redo_<n>.bin and truncate the file
+    redo - append the saved increment again
+
+Nothing is re-run. The document is garbage-collected and compacted only
+when it is exported for download.
+"""
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import fitz  # PyMuPDF
+from django.conf import settings
+
+from .page_ranges import PageSet
+from .pdf_processor import replace_text_on_pages, rephrase_on_page
+from .retention import register_file
+
+
+_SESSION_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+COPY_SIZE = 1024 * 1024
+
+
+class EditSessionError(ValueError):
+    """Unknown session, or an undo/redo with nothing to undo/redo."""
+
+
+def get_sessions_root() -> str:
+    path = getattr(settings, 'PDF_EDIT_SESSION_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'edits')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(session_id: str) -> Tuple[str, str, str]:
+    """Session directory, working copy and journal paths."""
+    if not _SESSION_ID_RE.match(session_id or ''):
+        raise EditSessionError('Edit session not found')
+    directory = os.path.join(get_sessions_root(), session_id)
+    return directory, os.path.join(directory, 'working.pdf'), os.path.join(directory, 'journal.json')
+
+
+def _redo_path(session_id: str, index: int) -> str:
+    return os.path.join(_paths(session_id)[0], f"redo_{index}.bin")
+
+
+def _write_journal(journal_path: str, journal: Dict[str, Any]):
+    tmp_path = f"{journal_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f)
+    os.replace(tmp_path, journal_path)
+
+
+def _current_size(journal: Dict[str, Any]) -> int:
+    """Size of the working copy at the journal position."""
+    position = journal['position']
+    return journal['edits'][position - 1]['size_after'] if position else journal['base_size']
+
+
+def _public(journal: Dict[str, Any], working_path: str) -> Dict[str, Any]:
+    return {
+        **journal,
+        'working_path': working_path,
+        'can_undo': journal['position'] > 0,
+        'can_redo': journal['position'] < len(journal['edits'])
+    }
+
+
+def create_session(source_path: str, name: str, sha256: Optional[str] = None, owner: str = '') -> Dict[str, Any]:
+    """
+    Start an edit session on a copy of source_path.
+
+    A file that PyMuPDF cannot save incrementally (e.g. it had to be
+    repaired when opened) is rewritten once as the working copy.
+
+    Args:
+        source_path: Uploaded PDF absolute path (never modified)
+        name: Original file name (used for the exported file)
+        sha256: Document hash; its text index narrows find & replace
+        owner: Session key of the user
+
+    Returns:
+        Session dict (see get_session)
+    """
+    if not os.path.exists(source_path):
+        raise ValueError(f"PDF file not found: {source_path}")
+
+    session_id = uuid.uuid4().hex
+    directory, working_path, journal_path = _paths(session_id)
+    os.makedirs(directory)
+    shutil.copyfile(source_path, working_path)
+
+    with fitz.open(working_path) as doc:
+        rewrite = not doc.can_save_incrementally()
+        if rewrite:
+            doc.save(f"{working_path}.tmp")
+    if rewrite:
+        os.replace(f"{working_path}.tmp", working_path)
+
+    now = time.time()
+    journal = {
+        'session_id': session_id,
+        'owner': owner,
+        'source_path': source_path,
+        'sha256': sha256,
+        'name': name,
+        'base_size': os.path.getsize(working_path),
+        'position': 0,
+        'revision': 0,
+        'edits': [],
+        'export': None,
+        'created_at': now,
+        'updated_at': now
+    }
+    _write_journal(journal_path, journal)
+    return _public(journal, working_path)
+
+
+def _load(session_id: str, owner: Optional[str] = None) -> Tuple[Dict[str, Any], str, str]:
+    _, working_path, journal_path = _paths(session_id)
+    try:
+        with open(journal_path, encoding='utf-8') as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        raise EditSessionError('Edit session not found')
+    if owner is not None and journal['owner'] != owner:
+        raise EditSessionError('Edit session not found')
+
+    # An edit interrupted while saving leaves a partial increment at the
+    # end of the file; cutting it off restores the journaled state
+    expected = _current_size(journal)
+    if os.path.getsize(working_path) != expected:
+        with open(working_path, 'r+b') as f:
+            f.truncate(expected)
+    return journal, working_path, journal_path
+
+
+def get_session(session_id: str, owner: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Return the journal of a session plus 'working_path', 'can_undo' and
+    'can_redo'.
+
+    Raises:
+        EditSessionError: If the session does not exist or belongs to someone else
+    """
+    journal, working_path, _ = _load(session_id, owner)
+    return _public(journal, working_path)
+
+
+# ==========================================
+# Edit operations
+# ==========================================
+# Each operation edits the open working copy in place and returns
+# (result dict, changed page indices); the caller saves incrementally.
+
+def _changed_pages(journal: Dict[str, Any]) -> set:
+    """Pages modified by the applied edits (their indexed text is stale)."""
+    return {page for edit in journal['edits'][:journal['position']] for page in edit['pages']}
+
+
+def _edit_find_replace(doc, journal, search_text, replace_text, case_sensitive=True, page_range=None):
+    from .text_index import get_text_index
+
+    try:
+        pages = PageSet.parse(page_range, len(doc))
+    except ValueError as e:
+        raise ValueError(f"Invalid page range: {str(e)}")
+
+    # The source's text index rules out untouched pages without a match;
+    # pages changed earlier in the session are searched directly
+    changed = PageSet.from_pages(_changed_pages(journal), len(doc))
+    index = get_text_index(journal['source_path'], journal['sha256'])
+    candidates = PageSet.from_pages(index.candidate_pages(search_text, pages - changed)) | (pages & changed)
+
+    count, warnings, changed_pages = replace_text_on_pages(
+        doc, candidates, search_text, replace_text, case_sensitive
+    )
+    return {'replacement_count': count, 'warnings': warnings}, changed_pages
+
+
+def _edit_rephrase(doc, journal, page_number, bounding_box, replace_text):
+    warnings = rephrase_on_page(doc, int(page_number), bounding_box, replace_text)
+    return {'replacement_count': 1, 'warnings': warnings}, [int(page_number)]
+
+
+EDIT_OPERATIONS = {
+    'find_replace': _edit_find_replace,
+    'rephrase': _edit_rephrase,
+}
+
+
+def apply_edit(session_id: str, operation: str, params: Dict[str, Any],
+               owner: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Apply an edit to the working copy and save it incrementally.
+
+    Edits that were undone are discarded (as in any editor). An edit that
+    changes nothing is not recorded.
+
+    Args:
+        session_id: Session id
+        operation: 'find_replace' or 'rephrase'
+        params: Keyword arguments of the operation
+        owner: Session key of the user
+
+    Returns:
+        Dict with 'replacement_count', 'warnings' and 'recorded'
+    """
+    if operation not in EDIT_OPERATIONS:
+        raise ValueError(f"Unknown edit operation: {operation}")
+
+    journal, working_path, journal_path = _load(session_id, owner)
+    size_before = _current_size(journal)
+
+    with fitz.open(working_path) as doc:
+        result, pages = EDIT_OPERATIONS[operation](doc, journal, **params)
+        if pages:
+            # Appends only the changed objects (compressed) to the file
+            doc.save(working_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, deflate=True)
+
+    if not pages:
+        return {**result, 'recorded': False}
+
+    for index in range(journal['position'], len(journal['edits'])):
+        redo_path = _redo_path(session_id, index)
+        if os.path.exists(redo_path):
+            os.remove(redo_path)
+
+    journal['edits'] = journal['edits'][:journal['position']]
+    journal['edits'].append({
+        'operation': operation,
+        'params': params,
+        'result': result,
+        'pages': sorted(pages),
+        'size_before': size_before,
+        'size_after': os.path.getsize(working_path),
+        'created_at': time.time()
+    })
+    journal['position'] += 1
+    journal['revision'] += 1
+    journal['updated_at'] = time.time()
+    _write_journal(journal_path, journal)
+    return {**result, 'recorded': True}
+
+
+def undo(session_id: str, owner: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Revert the last applied edit by cutting its increment off the file.
+
+    Returns:
+        Session dict (see get_session)
+    """
+    journal, working_path, journal_path = _load(session_id, owner)
+    if journal['position'] == 0:
+        raise EditSessionError('Nothing to undo')
+
+    index = journal['position'] - 1
+    edit = journal['edits'][index]
+    with open(working_path, 'r+b') as f:
+        f.seek(edit['size_before'])
+        with open(_redo_path(session_id, index), 'wb') as out:
+            shutil.copyfileobj(f, out, COPY_SIZE)
+        f.truncate(edit['size_before'])
+
+    journal['position'] = index
+    journal['revision'] += 1
+    journal['updated_at'] = time.time()
+    _write_journal(journal_path, journal)
+    return _public(journal, working_path)
+
+
+def redo(session_id: str, owner: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Re-apply the next undone edit by appending its saved increment.
+
+    Returns:
+        Session dict (see get_session)
+    """
+    journal, working_path, journal_path = _load(session_id, owner)
+    index = journal['position']
+    if index >= len(journal['edits']):
+        raise EditSessionError('Nothing to redo')
+
+    redo_path = _redo_path(session_id, index)
+    with open(working_path, 'ab') as f, open(redo_path, 'rb') as increment:
+        shutil.copyfileobj(increment, f, COPY_SIZE)
+    os.remove(redo_path)
+
+    journal['position'] = index + 1
+    journal['revision'] += 1
+    journal['updated_at'] = time.time()
+    _write_journal(journal_path, journal)
+    return _public(journal, working_path)
+
+
+def export_session(session_id: str, owner: Optional[str] = None) -> str:
+    """
+    Write the current state as a compacted PDF (garbage=4, deflate).
+
+    The export is reused until the session changes again.
+
+    Returns:
+        str: Path of the exported PDF in MEDIA_ROOT/processed
+    """
+    journal, working_path, journal_path = _load(session_id, owner)
+    export = journal.get('export')
+    if export and export['revision'] == journal['revision'] and os.path.exists(export['path']):
+        return export['path']
+
+    output_dir = os.path.join(settings.MEDIA_ROOT, 'processed')
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"edited_{session_id}.pdf")
+
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    with fitz.open(working_path) as doc:
+        doc.save(tmp_path, garbage=4, deflate=True, clean=True)
+    os.replace(tmp_path, output_path)
+    register_file(output_path, 'result')
+
+    journal['export'] = {'path': output_path, 'revision': journal['revision']}
+    _write_journal(journal_path, journal)
+    return output_path
+
+
+def delete_session(session_id: str, owner: Optional[str] = None):
+    """Delete a session's working copy, journal and export."""
+    try:
+        journal, _, _ = _load(session_id, owner)
+    except EditSessionError:
+        return
+    export = journal.get('export')
+    if export and os.path.exists(export['path']):
+        os.remove(export['path'])
+    shutil.rmtree(_paths(session_id)[0], ignore_errors=True)
+
+
+def expire_sessions(max_age_seconds: float) -> Tuple[int, int]:
+    """
+    Delete sessions not modified for max_age_seconds.
+
+    Returns:
+        Tuple (deleted_sessions: int, freed_bytes: int)
+    """
+    root = get_sessions_root()
+    threshold = time.time() - max_age_seconds
+    deleted = freed = 0
+
+    for session_id in os.listdir(root):
+        if not _SESSION_ID_RE.match(session_id):
+            continue
+        directory, _, journal_path = _paths(session_id)
+        try:
+            if os.path.getmtime(journal_path) >= threshold:
+                continue
+        except FileNotFoundError:
+            pass
+        for dirpath, _, files in os.walk(directory):
+            freed += sum(os.path.getsize(os.path.join(dirpath, filename)) for filename in files)
+        delete_session(session_id)
+        shutil.rmtree(directory, ignore_errors=True)
+        deleted += 1
+    return deleted, freed
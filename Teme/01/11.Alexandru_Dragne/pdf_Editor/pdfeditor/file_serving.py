@@ -0,0 +1,236 @@
+"""
+File Serving Module - downloads without shuttling bytes through Python.
+
+serve_file() answers conditional requests (ETag / Last-Modified) itself
+and hands the transfer to a backend (settings.PDF_DOWNLOAD_BACKEND):
+
+    django            - served by the app. Single byte ranges are answered
+                        with 206 (PDF.js loads large files in ranges); the
+                        response is a real file object, so WSGI servers with
+                        a sendfile-capable wsgi.file_wrapper (gunicorn) copy
+                        it with os.sendfile instead of reading it in Python
+    x-accel-redirect  - nginx sends the file (internal location
+                        settings.PDF_X_ACCEL_PREFIX, mapped to MEDIA_ROOT)
+    x-sendfile        - Apache mod_xsendfile / lighttpd send the file
+
+A dotted path to a callable with the same signature as the built-in
+backends can be used as well. Front proxies answer Range requests
+themselves.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+from django.utils._os import safe_join
+from django.utils.module_loading import import_string
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FileRange:
+    """A file limited to [start, stop), positioned at start."""
+
+    def __init__(self, file, start, stop):
+        file.seek(start)
+        self._file = file
+        self._remaining = stop - start
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # gunicorn's sendfile starts at the current offset and sends Content-Length bytes
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header.
+
+    Args:
+        header: Value of the Range header
+        size: File size in bytes
+
+    Returns:
+        Tuple (start, stop), half-open, or None to send the whole file
+        (malformed or multi-range headers are ignored, as RFC 9110 allows)
+
+    Raises:
+        ValueError: If the range starts past the end of the file
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        stop = min(int(last) + 1, size) if last else size
+    else:
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError('Empty suffix range')
+        start, stop = max(size - suffix, 0), size
+
+    if start >= size:
+        raise ValueError(f'Range starts past the end of the file ({size} bytes)')
+    return start, stop
+
+
+def _range_applies(request, etag, last_modified):
+    """If-Range: honour the Range header only if the file is unchanged."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and int(last_modified) <= if_range_date
+
+
+# ==========================================
+# Backends
+# ==========================================
+
+def serve_with_django(request, path, stat, etag):
+    """Send the file (or one byte range of it) from the app."""
+    size = stat.st_size
+    start, stop = 0, size
+
+    header = request.headers.get('Range')
+    if header and request.method == 'GET' and _range_applies(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, stop = byte_range
+
+    response = FileResponse(_FileRange(open(path, 'rb'), start, stop))
+    response['Content-Length'] = str(stop - start)
+    if (start, stop) != (0, size):
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    return response
+
+
+def serve_with_x_accel_redirect(request, path, stat, etag):
+    """Let nginx send a file below MEDIA_ROOT (other files are sent by the app)."""
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    real_path = os.path.abspath(path)
+    if os.path.commonpath([real_path, media_root]) != media_root:
+        return serve_with_django(request, path, stat, etag)
+
+    prefix = getattr(settings, 'PDF_X_ACCEL_PREFIX', '/protected/media/').rstrip('/')
+    relative = os.path.relpath(real_path, media_root).replace(os.sep, '/')
+    response = HttpResponse()
+    response['X-Accel-Redirect'] = f"{prefix}/{quote(relative)}"
+    return response
+
+
+def serve_with_x_sendfile(request, path, stat, etag):
+    """Let Apache (mod_xsendfile) or lighttpd send the file."""
+    response = HttpResponse()
+    response['X-Sendfile'] = os.path.abspath(path)
+    return response
+
+
+BACKENDS = {
+    'django': serve_with_django,
+    'x-accel-redirect': serve_with_x_accel_redirect,
+    'x-sendfile': serve_with_x_sendfile,
+}
+
+
+def get_backend():
+    name = getattr(settings, 'PDF_DOWNLOAD_BACKEND', 'django')
+    return BACKENDS.get(name) or import_string(name)
+
+
+# ==========================================
+# Entry point
+# ==========================================
+
+def serve_file(request, path, filename=None, as_attachment=True, content_type=None,
+               cache_control='private, no-cache'):
+    """
+    Send a file through the configured backend.
+
+    The ETag is built from the size and modification time, so files that
+    change in place (edit working copies) get a new one. Conditional
+    requests are answered with 304 without touching the file contents.
+
+    Args:
+        path: File to send
+        filename: Download name (default: the file's name)
+        as_attachment: Content-Disposition attachment (download) or inline
+        content_type: Default: guessed from the file name
+        cache_control: Cache-Control header; the default lets browsers
+                       keep the file but revalidate it with the ETag
+
+    Returns:
+        HttpResponse
+
+    Raises:
+        Http404: If the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+
+    etag = quote_etag(f"{stat.st_size:x}-{stat.st_mtime_ns:x}")
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = get_backend()(request, path, stat, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if cache_control:
+        response['Cache-Control'] = cache_control
+
+    if response.status_code in (200, 206):
+        if content_type is None:
+            content_type = mimetypes.guess_type(filename or path)[0] or 'application/octet-stream'
+        response['Content-Type'] = content_type
+        disposition = content_disposition_header(as_attachment, filename or os.path.basename(path))
+        if disposition:
+            response['Content-Disposition'] = disposition
+    return response
+
+
+def serve_media(request, path):
+    """
+    Development server view for MEDIA_URL (replaces django.views.static.serve).
+
+    Unlike static.serve it answers Range requests, so PDF.js previews of
+    large uploads start before the whole file is downloaded.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+    return serve_file(request, full_path, as_attachment=False)
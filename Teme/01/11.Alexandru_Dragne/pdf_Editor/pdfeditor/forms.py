@@ -57,6 +57,14 @@ class SplitPDFForm(forms.Form):
         })
     )
     
+    as_zip = forms.BooleanField(
+        required=False,
+        initial=False,
+        label="Descarcă direct ca ZIP",
+        help_text="Părțile se generează direct în arhivă, fără fișiere intermediare",
+        widget=forms.CheckboxInput(attrs={'class': 'form-checkbox'})
+    )
+    
     def clean_ranges(self):
         """Parse și validează ranges."""
         ranges_str = self.cleaned_data['ranges']
@@ -324,6 +332,17 @@ class PageNumbersForm(forms.Form):
         help_text='First page to add numbers to (default: 1)',
         widget=forms.NumberInput(attrs={'class': 'form-input'})
     )
+    
+    pages = forms.CharField(
+        required=False,
+        max_length=200,
+        label='Pages (Optional)',
+        help_text='Only number these pages, e.g. odd, 2-, 1-10&even or -3--1',
+        widget=forms.TextInput(attrs={
+            'class': 'form-input',
+            'placeholder': 'e.g., odd or 3-10 (empty = all)'
+        })
+    )
 
 
 class RephraseForm(forms.Form):
@@ -390,3 +409,42 @@ class RephraseForm(forms.Form):
             # Default fallback
             self.fields['model'].choices = [('', 'Default Model')]
 
+
+
+class PipelineForm(forms.Form):
+    """Form for running (and saving) a chain of tools on one PDF."""
+    
+    steps = forms.CharField(
+        widget=forms.HiddenInput(),
+        help_text='JSON list of steps, built by the pipeline editor'
+    )
+    
+    pipeline_name = forms.CharField(
+        required=False,
+        max_length=100,
+        label='Save as (optional)',
+        help_text='Name under which to keep this pipeline for later',
+        widget=forms.TextInput(attrs={
+            'class': 'form-input',
+            'placeholder': 'e.g., Invoices - stamp & compress'
+        })
+    )
+    
+    def clean_steps(self):
+        """Validate the steps with the same rules as the pipeline runner."""
+        import json
+        from .pdf_processor import validate_operations
+        
+        try:
+            steps = validate_operations(json.loads(self.cleaned_data['steps']))
+        except ValueError as e:
+            raise forms.ValidationError(f'Invalid pipeline: {str(e)}')
+        
+        for step in steps:
+            if step['operation'] == 'watermark' and step['watermark_type'] != 'text':
+                raise forms.ValidationError('Only text watermarks can be used in pipelines.')
+            if step['operation'] == 'split':
+                # Steps are stored as JSON (Pipeline.steps, job params)
+                step['ranges'] = [list(r) for r in step['ranges']]
+        
+        return steps
@@ -0,0 +1,464 @@
+"""
+Job Queue Module - background execution for pdf_processor operations.
+
+Views enqueue an operation and return a job id immediately; the
+`run_pdf_jobs` management command claims queued jobs from a small SQLite
+database and runs each one in its own worker process, with bounded
+concurrency and a per-job timeout. Status and progress are read back from
+the same database, so web workers never touch PyMuPDF for long jobs.
+"""
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+
+from .pdf_processor import (
+    split_pdf, merge_pdfs, compress_pdf, add_watermark, rotate_pages,
+    add_page_numbers, find_and_replace_text, extract_text_from_pdf,
+    ocr_pdf_to_text, rephrase_with_coordinates, rephrase_document, run_pipeline
+)
+
+
+# Job states
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL DEFAULT '',
+    operation TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner);
+"""
+
+
+def get_jobs_db_path() -> str:
+    """Return the SQLite file backing the queue (settings.PDF_JOBS_DB)."""
+    return str(getattr(
+        settings, 'PDF_JOBS_DB',
+        os.path.join(settings.BASE_DIR, 'pdf_jobs.sqlite3')
+    ))
+
+
+def _connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Open the queue database, creating the schema on first use."""
+    db_path = db_path or get_jobs_db_path()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+# ==========================================
+# Operation adapters
+# ==========================================
+# Each adapter receives the job params as keyword arguments and returns a
+# JSON-serializable dict. Outputs that are files are reported under
+# 'output_path' (single file) or 'output_paths' (several files).
+
+def _run_split(pdf_path, ranges, output_name=None):
+    return {'output_paths': split_pdf(pdf_path, [tuple(r) for r in ranges], output_name=output_name)}
+
+
+def _run_merge(pdf_paths, output_name=None):
+    return {'output_path': merge_pdfs(pdf_paths, output_name)}
+
+
+def _run_compress(pdf_path, quality='medium', progress=None):
+    output_path, original_size, compressed_size, ratio, image_stats = compress_pdf(
+        pdf_path, quality=quality, progress=progress
+    )
+    return {
+        'output_path': output_path,
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'compression_ratio': ratio,
+        'image_stats': image_stats
+    }
+
+
+def _run_watermark(pdf_path, watermark_type, watermark_content, options=None, temp_image=False):
+    # temp_image: the image was uploaded for this job only (see watermark_view)
+    try:
+        return {'output_path': add_watermark(pdf_path, watermark_type, watermark_content, options)}
+    finally:
+        if temp_image and os.path.exists(watermark_content):
+            os.remove(watermark_content)
+
+
+def _run_rotate(pdf_path, rotation_angle, page_range=None):
+    return {'output_path': rotate_pages(pdf_path, int(rotation_angle), page_range)}
+
+
+def _run_page_numbers(pdf_path, options=None):
+    return {'output_path': add_page_numbers(pdf_path, options)}
+
+
+def _run_find_replace(pdf_path, search_text, replace_text, case_sensitive=True, page_range=None, sha256=None):
+    output_path, count, warnings = find_and_replace_text(
+        pdf_path, search_text, replace_text, case_sensitive, page_range, sha256=sha256
+    )
+    return {'output_path': output_path, 'replacement_count': count, 'warnings': warnings}
+
+
+def _run_rephrase(pdf_path, page_number, bounding_box, text, style='formal', model=None):
+    from .ollama_service import rephrase_text
+
+    rephrased, success, error = rephrase_text(text=text, style=style, model=model)
+    if not success:
+        raise Exception(f"AI Error: {error}")
+
+    output_path, count, warnings = rephrase_with_coordinates(
+        pdf_path=pdf_path,
+        page_number=int(page_number),
+        bounding_box=bounding_box,
+        replace_text=rephrased,
+        original_text=text
+    )
+    return {
+        'output_path': output_path,
+        'replacement_count': count,
+        'warnings': warnings,
+        'original_text': text,
+        'rephrased_text': rephrased
+    }
+
+
+def _run_rephrase_document(pdf_path, style='formal', model=None, page_range=None, sha256=None):
+    return rephrase_document(pdf_path, style=style, model=model, page_range=page_range, sha256=sha256)
+
+
+def _run_extract_text(pdf_path, sha256=None):
+    return {'text': extract_text_from_pdf(pdf_path, sha256=sha256)}
+
+
+def _run_ocr(pdf_path, dpi=None, sha256=None, progress=None):
+    return {'text': ocr_pdf_to_text(pdf_path, dpi=dpi, progress=progress, sha256=sha256)}
+
+
+def _run_pipeline(pdf_path, steps, output_name=None):
+    return run_pipeline(pdf_path, steps, output_name)
+
+
+def _run_batch(pdf_paths, operations, names=None):
+    from .batch import run_batch, batch_summary
+
+    batch = run_batch(pdf_paths, operations, names=names)
+    return {
+        'output_paths': [path for result in batch['results'] for path in result['output_paths']],
+        **batch_summary(batch)
+    }
+
+
+OPERATIONS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    'split': _run_split,
+    'merge': _run_merge,
+    'compress': _run_compress,
+    'watermark': _run_watermark,
+    'rotate': _run_rotate,
+    'page_numbers': _run_page_numbers,
+    'find_replace': _run_find_replace,
+    'rephrase': _run_rephrase,
+    'rephrase_document': _run_rephrase_document,
+    'extract_text': _run_extract_text,
+    'ocr': _run_ocr,
+    'pipeline': _run_pipeline,
+    'batch': _run_batch,
+}
+
+# Operations that take a progress(fraction, message) callback
+PROGRESS_OPERATIONS = {'compress', 'ocr'}
+
+
+# ==========================================
+# Queue API (used by views)
+# ==========================================
+
+def submit_job(operation: str, params: Dict[str, Any], owner: str = '') -> str:
+    """
+    Enqueue an operation and return its job id immediately.
+
+    Args:
+        operation: Key from OPERATIONS (e.g. 'compress')
+        params: Keyword arguments for the operation (must be JSON-serializable)
+        owner: Session key of the user who submitted the job
+
+    Returns:
+        str: The new job id
+
+    Raises:
+        ValueError: If the operation is unknown
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+
+    job_id = str(uuid.uuid4())
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, owner, operation, params, status, message, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, owner or '', operation, json.dumps(params), STATUS_QUEUED, 'Queued', time.time())
+        )
+    finally:
+        conn.close()
+    return job_id
+
+
+def get_job(job_id: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return the job as a dict, or None if missing (or owned by someone else)."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+    job = _row_to_job(row)
+    if owner is not None and job['owner'] != owner:
+        return None
+    return job
+
+
+def list_jobs(owner: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Return the most recent jobs submitted by owner."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?",
+            (owner, limit)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [_row_to_job(row) for row in rows]
+
+
+def update_progress(job_id: str, progress: int, message: str = '', db_path: Optional[str] = None):
+    """Record progress (0-100) for a running job."""
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "UPDATE jobs SET progress = ?, message = ? WHERE id = ?",
+            (max(0, min(100, int(progress))), message, job_id)
+        )
+    finally:
+        conn.close()
+
+
+# ==========================================
+# Worker side
+# ==========================================
+
+def _progress_reporter(job_id: str, db_path: Optional[str]) -> Callable[[float, str], None]:
+    """
+    Progress callback for an operation, mapped to 10-99%.
+
+    The row is only written when the percentage changes, so a long
+    document costs at most ~90 writes.
+    """
+    last = None
+
+    def report(fraction: float, message: str = ''):
+        nonlocal last
+        progress = 10 + int(89 * max(0.0, min(1.0, fraction)))
+        if progress != last:
+            last = progress
+            update_progress(job_id, progress, message, db_path)
+
+    return report
+
+
+def _claim_next_job(conn: sqlite3.Connection) -> Optional[str]:
+    """Atomically move the oldest queued job to running and return its id."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+            (STATUS_QUEUED,)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = ?, message = ?, started_at = ? WHERE id = ?",
+            (STATUS_RUNNING, 'Starting', time.time(), row['id'])
+        )
+        conn.execute("COMMIT")
+        return row['id']
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _finish_job(conn, job_id, status, result=None, error=None, message=''):
+    conn.execute(
+        "UPDATE jobs SET status = ?, progress = ?, message = ?, result = ?, error = ?, finished_at = ? "
+        "WHERE id = ? AND status = ?",
+        (status, 100 if status == STATUS_DONE else 0, message,
+         json.dumps(result) if result is not None else None,
+         error, time.time(), job_id, STATUS_RUNNING)
+    )
+
+
+def execute_job(job_id: str, db_path: Optional[str] = None):
+    """
+    Run a single claimed job to completion and store its result.
+
+    Called inside a worker process; never raises, failures are recorded
+    on the job row instead.
+    """
+    from .retention import register_file
+
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        job = _row_to_job(row)
+        update_progress(job_id, 10, 'Processing', db_path)
+
+        params = dict(job['params'])
+        if job['operation'] in PROGRESS_OPERATIONS:
+            params['progress'] = _progress_reporter(job_id, db_path)
+
+        try:
+            result = OPERATIONS[job['operation']](**params)
+            # Batch outputs are inside a directory run_batch has registered
+            if job['operation'] != 'batch':
+                for path in result.get('output_paths') or [result.get('output_path')]:
+                    register_file(path, 'job')
+            _finish_job(conn, job_id, STATUS_DONE, result=result, message='Completed')
+        except Exception as e:
+            _finish_job(conn, job_id, STATUS_FAILED, error=str(e), message='Failed')
+    finally:
+        conn.close()
+
+
+def _job_process_main(job_id: str, db_path: str):
+    """Entry point of a worker process."""
+    import django
+    from django.apps import apps
+
+    # Own process group, so a timeout also kills the job's pool processes
+    if hasattr(os, 'setsid'):
+        os.setsid()
+    if not apps.ready:
+        django.setup()
+    execute_job(job_id, db_path)
+
+
+def _kill_job_process(process):
+    """Kill a worker process together with the processes it started."""
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            # Not yet in its own group (killed before setsid) or already gone
+            process.terminate()
+    else:
+        process.terminate()
+    process.join()
+
+
+class JobRunner:
+    """
+    Polls the queue and runs jobs in separate processes.
+
+    Each job gets its own process (and process group) so that a job
+    exceeding `timeout` can be killed, with any pool processes it started,
+    without affecting the others; at most `concurrency` jobs run at the
+    same time.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, timeout: Optional[int] = None,
+                 poll_interval: float = 1.0, db_path: Optional[str] = None):
+        self.concurrency = concurrency or getattr(settings, 'PDF_JOB_WORKERS', 2)
+        self.timeout = timeout or getattr(settings, 'PDF_JOB_TIMEOUT', 600)
+        self.poll_interval = poll_interval
+        self.db_path = db_path or get_jobs_db_path()
+        self.active = {}  # job_id -> (process, started_at)
+
+    def _reap(self, conn):
+        """Collect finished processes and kill the ones past the timeout."""
+        now = time.time()
+        for job_id, (process, started_at) in list(self.active.items()):
+            if not process.is_alive():
+                process.join()
+                if process.exitcode != 0:
+                    _finish_job(conn, job_id, STATUS_FAILED,
+                                error=f"Worker exited with code {process.exitcode}", message='Failed')
+                del self.active[job_id]
+            elif now - started_at > self.timeout:
+                _kill_job_process(process)
+                _finish_job(conn, job_id, STATUS_FAILED,
+                            error=f"Job timed out after {self.timeout}s", message='Timed out')
+                del self.active[job_id]
+
+    def _start(self, job_id):
+        ctx = multiprocessing.get_context()
+        # Not a daemon: OCR, compression and batch jobs start their own process pools
+        process = ctx.Process(target=_job_process_main, args=(job_id, self.db_path))
+        process.start()
+        self.active[job_id] = (process, time.time())
+
+    def run(self, once: bool = False):
+        """
+        Process jobs until interrupted.
+
+        Args:
+            once: Stop as soon as the queue is empty and no job is running
+        """
+        conn = _connect(self.db_path)
+        try:
+            while True:
+                self._reap(conn)
+
+                while len(self.active) < self.concurrency:
+                    job_id = _claim_next_job(conn)
+                    if job_id is None:
+                        break
+                    self._start(job_id)
+
+                if once and not self.active:
+                    return
+                time.sleep(self.poll_interval if not once else 0.05)
+        finally:
+            # Interrupted: stop children and put their jobs back in the queue
+            for job_id, (process, _) in self.active.items():
+                _kill_job_process(process)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, progress = 0, message = ? WHERE id = ? AND status = ?",
+                    (STATUS_QUEUED, 'Requeued', job_id, STATUS_RUNNING)
+                )
+            self.active = {}
+            conn.close()
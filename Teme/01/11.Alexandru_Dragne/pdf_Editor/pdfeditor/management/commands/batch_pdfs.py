@@ -0,0 +1,86 @@
+"""
+Management command care aplică același lanț de operații pe mai multe PDF-uri.
+
+Exemplu:
+    python manage.py batch_pdfs facturi/ --output facturi.zip \
+        --operations '[{"operation": "watermark", "watermark_content": "PLĂTIT"},
+                       {"operation": "page_numbers"}, {"operation": "compress"}]'
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pdfeditor.batch import collect_pdf_paths, run_batch, iter_batch_archive
+
+
+class Command(BaseCommand):
+    help = 'Aplică un lanț de operații (rotate, watermark, page_numbers, compress, split) pe mai multe PDF-uri'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sources',
+            nargs='+',
+            help='Fișiere PDF și/sau directoare cu PDF-uri'
+        )
+        parser.add_argument(
+            '--operations',
+            required=True,
+            help='Lista de operații ca JSON sau calea către un fișier .json'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Arhiva ZIP cu rezultatele (opțional)'
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=None,
+            help='Directorul pentru PDF-urile procesate (default: media/processed/batch_...)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Numărul de procese (default: din settings.PDF_BATCH_WORKERS sau numărul de CPU-uri)'
+        )
+
+    def handle(self, *args, **options):
+        raw_operations = options['operations']
+        try:
+            if os.path.isfile(raw_operations):
+                with open(raw_operations, encoding='utf-8') as f:
+                    operations = json.load(f)
+            else:
+                operations = json.loads(raw_operations)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Operații invalide: {e}')
+
+        try:
+            pdf_paths = collect_pdf_paths(options['sources'])
+            self.stdout.write(f'Se procesează {len(pdf_paths)} PDF-uri...')
+            batch = run_batch(
+                pdf_paths,
+                operations,
+                output_dir=options['output_dir'],
+                workers=options['workers']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for result in batch['results']:
+            if not result['success']:
+                self.stdout.write(self.style.ERROR(f"  ✗ {result['source']}: {result['error']}"))
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in iter_batch_archive(batch):
+                    f.write(chunk)
+            self.stdout.write(f"Arhivă: {options['output']}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✓ Batch terminat: {batch['succeeded']} reușite, {batch['failed']} eșuate "
+                f"(rezultate în {batch['output_dir']})"
+            )
+        )
@@ -0,0 +1,137 @@
+"""
+Management command care măsoară operațiile din pdf_processor pe PDF-uri sintetice.
+
+Exemple:
+    python manage.py benchmark_pdfs --save-baseline
+    python manage.py benchmark_pdfs --sizes 10,100 --operations compress_pdf,split_pdf
+    python manage.py benchmark_pdfs --threshold 0.5 --output rezultate.json
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pdfeditor.benchmark import (
+    DEFAULT_SIZES, DOCUMENT_KINDS, OPERATIONS,
+    run_benchmark, compare_to_baseline, get_default_baseline_path
+)
+
+
+def _csv(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Măsoară timpul, memoria (peak RSS) și mărimea rezultatului pentru fiecare operație PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default=','.join(str(size) for size in DEFAULT_SIZES),
+            help='Numărul de pagini al documentelor, separat prin virgulă (default: 10,100,1000)'
+        )
+        parser.add_argument(
+            '--kinds',
+            default=','.join(DOCUMENT_KINDS),
+            help='Tipurile de documente: text, images, scanned (default: toate)'
+        )
+        parser.add_argument(
+            '--operations',
+            default=','.join(OPERATIONS),
+            help='Operațiile măsurate, separate prin virgulă (default: toate)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help='De câte ori se rulează fiecare măsurătoare (se păstrează cea mai rapidă)'
+        )
+        parser.add_argument(
+            '--baseline',
+            default=None,
+            help='Fișierul JSON de referință (default: din settings.PDF_BENCHMARK_BASELINE)'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Salvează rezultatele ca referință în loc să le compare'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Regresia permisă, relativ (default: 0.25 = 25%%)'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Scrie rezultatele complete într-un fișier JSON'
+        )
+        parser.add_argument(
+            '--work-dir',
+            default=None,
+            help='Directorul pentru documentele generate (default: PDF_CACHE_DIR/benchmark)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in _csv(options['sizes'])]
+        except ValueError:
+            raise CommandError(f"Dimensiuni invalide: {options['sizes']}")
+
+        def progress(key, result):
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f"  ✗ {key}: {result['error']}"))
+            else:
+                # No peak RSS without the resource module (Windows)
+                peak = result['peak_rss_bytes']
+                rss = f"{peak / 1024 / 1024:>8.1f}" if peak is not None else f"{'n/a':>8}"
+                self.stdout.write(
+                    f"  {key:<40} {result['seconds']:>9.3f}s "
+                    f"{rss} MB RSS "
+                    f"{result['output_bytes'] / 1024:>10.1f} KB"
+                )
+
+        try:
+            current = run_benchmark(
+                sizes=sizes,
+                kinds=_csv(options['kinds']),
+                operations=_csv(options['operations']),
+                repeat=options['repeat'],
+                work_dir=options['work_dir'],
+                progress=progress
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2)
+
+        baseline_path = options['baseline'] or get_default_baseline_path()
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Referință salvată: {baseline_path}"))
+            return
+
+        failures = [key for key, result in current['results'].items() if 'error' in result]
+        if not os.path.exists(baseline_path):
+            self.stdout.write(f"\nNu există referință ({baseline_path}); rulați cu --save-baseline.")
+        else:
+            with open(baseline_path, encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare_to_baseline(current, baseline, options['threshold'])
+            for regression in regressions:
+                if regression['metric'] == 'error':
+                    continue
+                self.stdout.write(self.style.ERROR(
+                    f"  ✗ {regression['key']} {regression['metric']}: "
+                    f"{regression['baseline']} → {regression['current']} (+{regression['change']:.0%})"
+                ))
+            failures += [regression['key'] for regression in regressions]
+
+        if failures:
+            raise CommandError(f"{len(set(failures))} măsurători au regresat sau au eșuat")
+        self.stdout.write(self.style.SUCCESS('\n✓ Nicio regresie'))
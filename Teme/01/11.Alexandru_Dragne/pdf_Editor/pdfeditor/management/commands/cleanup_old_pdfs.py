@@ -1,50 +1,228 @@
 """
-Management command pentru ștergerea fișierelor PDF procesate vechi.
+Management command pentru ștergerea fișierelor PDF încărcate și procesate vechi.
+
+Fișierele expirate sunt găsite prin indexul de expirare (vezi
+pdfeditor.retention), fără listarea directoarelor; --full-scan caută în
+plus fișierele scrise înainte de index.
 """
 import os
+import shutil
+import time
 from datetime import datetime, timedelta
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from pdfeditor.models import Document, ProcessedResult
+
+from pdfeditor.pdf_store import expire_documents, expire_references
+from pdfeditor.retention import KINDS, retention_hours, expire_files, enforce_quota
+from pdfeditor.chunked_upload import expire_stale_uploads
+from pdfeditor.search_index import remove_missing_documents
+from pdfeditor.page_render import evict_render_cache
+from pdfeditor.pdf_processor import evict_watermark_cache
+from pdfeditor.edit_session import expire_sessions
 
 
 class Command(BaseCommand):
-    help = 'Șterge fișierele PDF procesate mai vechi de PDF_CLEANUP_HOURS ore'
+    help = 'Șterge fișierele PDF încărcate și procesate mai vechi decât perioada de retenție'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--hours',
             type=int,
             default=None,
-            help='Numărul de ore după care să șteargă fișierele (default: din settings.PDF_CLEANUP_HOURS)'
+            help='Retenția în ore pentru tipurile fără valoare în PDF_RETENTION_HOURS '
+                 '(default: din settings.PDF_CLEANUP_HOURS)'
+        )
+        parser.add_argument(
+            '--retention',
+            action='append',
+            default=[],
+            metavar='TIP=ORE',
+            help=f'Retenția unui tip de fișier ({", ".join(KINDS)}), ex. --retention result=2'
+        )
+        parser.add_argument(
+            '--max-bytes',
+            type=int,
+            default=None,
+            help='Cota de spațiu: peste ea sunt șterse fișierele folosite cel mai demult '
+                 '(default: din settings.PDF_STORAGE_QUOTA_BYTES)'
+        )
+        parser.add_argument(
+            '--full-scan',
+            action='store_true',
+            help='Listează și directoarele uploads/ și processed/ (fișiere din afara indexului)'
+        )
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='Rulează continuu, la fiecare --interval secunde'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help='Secunde între rulări în modul daemon (default: din settings.PDF_CLEANUP_INTERVAL)'
         )
 
     def handle(self, *args, **options):
-        cleanup_hours = options.get('hours') or getattr(settings, 'PDF_CLEANUP_HOURS', 24)
-        cleanup_threshold = datetime.now() - timedelta(hours=cleanup_hours)
-        
-        # Cleanup both uploads and processed directories
+        overrides = {}
+        for value in options['retention']:
+            kind, _, hours = value.partition('=')
+            if kind not in KINDS:
+                raise CommandError(f'Tip necunoscut: {kind} (tipuri: {", ".join(KINDS)})')
+            try:
+                overrides[kind] = float(hours)
+            except ValueError:
+                raise CommandError(f'Număr de ore invalid: {value}')
+
+        if not options['daemon']:
+            self.cleanup(options, overrides)
+            return
+
+        interval = options['interval'] or getattr(settings, 'PDF_CLEANUP_INTERVAL', 3600)
+        self.stdout.write(self.style.SUCCESS(f'Cleanup pornit: o rulare la fiecare {interval:g}s'))
+        try:
+            while True:
+                close_old_connections()
+                self.cleanup(options, overrides)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nCleanup oprit.'))
+
+    def cleanup(self, options, overrides):
+        """O rulare: retenția pe tipuri, apoi cota de spațiu."""
+        hours = {kind: retention_hours(kind, overrides, options.get('hours')) for kind in KINDS}
+
+        total_deleted = 0
+        total_size = 0
+
+        if options['full_scan']:
+            deleted, size = self.full_scan(hours)
+            total_deleted += deleted
+            total_size += size
+
+        # Upload-uri: documentele expirate (indexul status/uploaded_at)
+        expired_refs, deleted_blobs, freed_bytes = expire_documents(hours['upload'] * 3600)
+        if expired_refs:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Store: {expired_refs} referințe expirate, {deleted_blobs} blob-uri șterse'
+                )
+            )
+        total_deleted += deleted_blobs
+        total_size += freed_bytes
+
+        # Rezultate, ieșiri de job-uri și directoare batch (indexul kind/created_at)
+        for kind, label in (('result', 'Rezultate'), ('job', 'Job-uri'), ('batch', 'Batch-uri')):
+            deleted, size = expire_files(kind, hours[kind] * 3600)
+            if deleted:
+                self.stdout.write(self.style.SUCCESS(f'{label}: {deleted} fișiere șterse'))
+            total_deleted += deleted
+            total_size += size
+
+        # Cache-ul de preview-uri randate: limită de dimensiune (LRU)
+        evicted_images, evicted_bytes = evict_render_cache()
+        if evicted_images:
+            self.stdout.write(
+                self.style.SUCCESS(f'Preview-uri randate șterse: {evicted_images}')
+            )
+        total_deleted += evicted_images
+        total_size += evicted_bytes
+
+        # Imaginile de watermark procesate nefolosite de la ultima retenție
+        evicted_watermarks, watermark_bytes = evict_watermark_cache(hours['result'] * 3600)
+        if evicted_watermarks:
+            self.stdout.write(
+                self.style.SUCCESS(f'Imagini de watermark din cache șterse: {evicted_watermarks}')
+            )
+        total_deleted += evicted_watermarks
+        total_size += watermark_bytes
+
+        # Upload-uri chunked neterminate
+        stale_uploads, stale_bytes = expire_stale_uploads(hours['upload'] * 3600)
+        if stale_uploads:
+            self.stdout.write(
+                self.style.SUCCESS(f'Upload-uri neterminate șterse: {stale_uploads}')
+            )
+        total_deleted += stale_uploads
+        total_size += stale_bytes
+
+        # Sesiuni de editare (copii de lucru + jurnal) nefolosite
+        expired_sessions, session_bytes = expire_sessions(hours['upload'] * 3600)
+        if expired_sessions:
+            self.stdout.write(
+                self.style.SUCCESS(f'Sesiuni de editare șterse: {expired_sessions}')
+            )
+        total_deleted += expired_sessions
+        total_size += session_bytes
+
+        # Cota de spațiu: fișierele și upload-urile folosite cel mai demult
+        evicted, evicted_bytes = enforce_quota(options.get('max_bytes'))
+        if evicted:
+            self.stdout.write(
+                self.style.SUCCESS(f'Cotă de spațiu: {evicted} fișiere/upload-uri șterse')
+            )
+            total_deleted += evicted
+            total_size += evicted_bytes
+
+        # Rândurile trecute de retenție: fișierele lor au fost șterse mai sus.
+        # Cele expirate mai devreme (cota) rămân până atunci, ca pagina de
+        # rezultat să poată spune că fișierul a expirat.
+        now = timezone.now()
+        deleted_results, _ = ProcessedResult.objects.filter(
+            created_at__lt=now - timedelta(hours=hours['result'])
+        ).delete()
+        deleted_documents, _ = Document.objects.filter(
+            status=Document.STATUS_EXPIRED,
+            uploaded_at__lt=now - timedelta(hours=hours['upload'])
+        ).delete()
+        if deleted_results or deleted_documents:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Rânduri șterse: {deleted_results} rezultate, {deleted_documents} documente'
+                )
+            )
+
+        if total_deleted > 0:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'\nTotal: {total_deleted} fișiere șterse ({total_size / 1024 / 1024:.2f} MB)'
+                )
+            )
+        else:
+            self.stdout.write(self.style.WARNING('Nu s-au găsit fișiere expirate.'))
+
+    def full_scan(self, hours):
+        """
+        Listează uploads/ și processed/, pentru fișierele din afara indexului
+        (scrise înainte de el sau rămase după o eroare).
+        """
+        now = datetime.now()
         directories = [
-            os.path.join(settings.MEDIA_ROOT, 'uploads'),
-            os.path.join(settings.MEDIA_ROOT, 'processed')
+            (os.path.join(settings.MEDIA_ROOT, 'uploads'), now - timedelta(hours=hours['upload'])),
+            (os.path.join(settings.MEDIA_ROOT, 'processed'), now - timedelta(hours=hours['result']))
         ]
-        
+
         total_deleted = 0
         total_size = 0
-        
-        for directory in directories:
+
+        for directory, cleanup_threshold in directories:
             if not os.path.exists(directory):
                 continue
-            
+
             for filename in os.listdir(directory):
                 filepath = os.path.join(directory, filename)
-                
+
                 # Skip if not a file
                 if not os.path.isfile(filepath):
                     continue
-                
+
                 # Check modification time
                 file_mtime = datetime.fromtimestamp(os.path.getmtime(filepath))
-                
+
                 if file_mtime < cleanup_threshold:
                     file_size = os.path.getsize(filepath)
                     try:
@@ -58,14 +236,40 @@ class Command(BaseCommand):
                         self.stdout.write(
                             self.style.ERROR(f'Eroare la ștergerea {filename}: {str(e)}')
                         )
-        
-        if total_deleted > 0:
+
+        # Batch result directories (media/processed/batch_*)
+        processed_dir = os.path.join(settings.MEDIA_ROOT, 'processed')
+        batch_threshold = now - timedelta(hours=hours['batch'])
+        if os.path.isdir(processed_dir):
+            for dirname in os.listdir(processed_dir):
+                dirpath = os.path.join(processed_dir, dirname)
+                if not dirname.startswith('batch_') or not os.path.isdir(dirpath):
+                    continue
+                if datetime.fromtimestamp(os.path.getmtime(dirpath)) >= batch_threshold:
+                    continue
+                for root, _, files in os.walk(dirpath):
+                    for filename in files:
+                        total_size += os.path.getsize(os.path.join(root, filename))
+                        total_deleted += 1
+                shutil.rmtree(dirpath, ignore_errors=True)
+                self.stdout.write(self.style.SUCCESS(f'Șters batch: {dirname}'))
+
+        # Store: referințe fără Document (de ex. create înainte de model)
+        expired_refs, deleted_blobs, freed_bytes = expire_references(hours['upload'] * 3600)
+        if expired_refs:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'\nTotal: {total_deleted} fișiere șterse ({total_size / 1024 / 1024:.2f} MB)'
+                    f'Store (scanare): {expired_refs} referințe expirate, {deleted_blobs} blob-uri șterse'
                 )
             )
-        else:
+        total_deleted += deleted_blobs
+        total_size += freed_bytes
+
+        # Indexul de căutare: documente al căror blob nu mai există
+        removed_documents = remove_missing_documents()
+        if removed_documents:
             self.stdout.write(
-                self.style.WARNING(f'Nu s-au găsit fișiere mai vechi de {cleanup_hours} ore.')
+                self.style.SUCCESS(f'Index de căutare: {removed_documents} documente eliminate')
             )
+
+        return total_deleted, total_size
@@ -0,0 +1,54 @@
+"""
+Management command care rulează job-urile PDF din coada de background.
+"""
+from django.core.management.base import BaseCommand
+
+from pdfeditor.jobs import JobRunner
+
+
+class Command(BaseCommand):
+    help = 'Rulează job-urile PDF puse în coadă de views (split, compress, OCR etc.)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Numărul de job-uri rulate în paralel (default: din settings.PDF_JOB_WORKERS)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=None,
+            help='Secunde după care un job este oprit (default: din settings.PDF_JOB_TIMEOUT)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Secunde între verificările cozii (default: 1.0)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesează coada curentă și se oprește'
+        )
+
+    def handle(self, *args, **options):
+        runner = JobRunner(
+            concurrency=options.get('workers'),
+            timeout=options.get('timeout'),
+            poll_interval=options['poll_interval']
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Worker pornit: {runner.concurrency} procese, timeout {runner.timeout}s '
+                f'(coada: {runner.db_path})'
+            )
+        )
+
+        try:
+            runner.run(once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nWorker oprit. Job-urile în curs au fost repuse în coadă.'))
@@ -0,0 +1,440 @@
+"""
+Metrics Module - per-operation timings and sampled profiles.
+
+PDF operations are decorated with @timed_operation (or wrapped in
+track_operation()) and time their phases with phase():
+
+    @timed_operation('compress_pdf')
+    def compress_pdf(pdf_path, ...):
+        with phase('open'):
+            doc = fitz.open(pdf_path)
+        current_operation().pages = len(doc)
+        with phase('process'):
+            ...
+        with phase('save'):
+            doc.save(output_path)
+        current_operation().output(output_path)
+
+Every finished operation adds its duration, phase timings, page count,
+input/output bytes and peak memory to counters in a SQLite file
+(settings.PDF_METRICS_DB), shared by the web server and the job workers.
+prometheus_text() renders them, together with the rephrase and render
+cache sizes, for the /metrics endpoint.
+
+ProfilingMiddleware saves a cProfile (or pyinstrument) profile of a
+sample of requests to settings.PDF_PROFILE_DIR.
+"""
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not measured
+    resource = None
+
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    operation TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    pages INTEGER NOT NULL DEFAULT 0,
+    input_bytes INTEGER NOT NULL DEFAULT 0,
+    output_bytes INTEGER NOT NULL DEFAULT 0,
+    peak_rss_bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (operation, status)
+);
+CREATE TABLE IF NOT EXISTS phases (
+    operation TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (operation, phase)
+);
+CREATE TABLE IF NOT EXISTS durations (
+    operation TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (operation, bucket)
+);
+"""
+
+
+# Operation being measured in this thread / task (see current_operation)
+_current: ContextVar[Optional['OperationMetrics']] = ContextVar('pdf_operation', default=None)
+
+
+def get_metrics_db_path() -> str:
+    return str(getattr(settings, 'PDF_METRICS_DB', os.path.join(settings.BASE_DIR, 'metrics.sqlite3')))
+
+
+def _connect() -> sqlite3.Connection:
+    db_path = get_metrics_db_path()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+# ==========================================
+# Recording
+# ==========================================
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident memory of this process (Linux), else its peak (None if unknown)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return _max_rss_bytes()
+
+
+def _max_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    unit = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+
+
+def _file_size(path: Optional[str]) -> int:
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+class OperationMetrics:
+    """Measurements of one running operation (see track_operation)."""
+
+    def __init__(self, name: str, input_paths: Iterable[str] = ()):
+        self.name = name
+        self.pages = 0
+        self.input_bytes = sum(_file_size(path) for path in input_paths)
+        self.output_bytes = 0
+        self.phases = {}
+        self.status = 'ok'
+        self.seconds = 0.0
+        self._max_rss_before = _max_rss_bytes()
+        self.peak_rss_bytes = _rss_bytes()  # None: memory cannot be measured here
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a phase ('open', 'process', 'save', ...); repeated phases add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            rss = _rss_bytes()
+            if rss is not None:
+                self.peak_rss_bytes = max(self.peak_rss_bytes or 0, rss)
+
+    def output(self, paths):
+        """Count the size of the output file(s)."""
+        if isinstance(paths, str):
+            paths = [paths]
+        self.output_bytes += sum(_file_size(path) for path in paths)
+
+    def _finish(self, seconds: float, failed: bool):
+        self.seconds = seconds
+        self.status = 'error' if failed else 'ok'
+        # Memory is sampled at phase ends; if the process reached a new
+        # high-water mark meanwhile, that mark is this operation's peak
+        max_rss = _max_rss_bytes()
+        if max_rss is not None and max_rss > self._max_rss_before:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, max_rss)
+
+
+def record(metrics: OperationMetrics):
+    """Add a finished operation to the counters."""
+    bucket = next((i for i, bound in enumerate(DURATION_BUCKETS) if metrics.seconds <= bound), len(DURATION_BUCKETS))
+
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            "INSERT INTO operations (operation, status, count, seconds, pages, input_bytes, output_bytes, peak_rss_bytes) "
+            "VALUES (?, ?, 1, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(operation, status) DO UPDATE SET "
+            "count = count + 1, seconds = seconds + excluded.seconds, pages = pages + excluded.pages, "
+            "input_bytes = input_bytes + excluded.input_bytes, output_bytes = output_bytes + excluded.output_bytes, "
+            "peak_rss_bytes = MAX(peak_rss_bytes, excluded.peak_rss_bytes)",
+            (metrics.name, metrics.status, metrics.seconds, metrics.pages,
+             metrics.input_bytes, metrics.output_bytes, metrics.peak_rss_bytes or 0)
+        )
+        for phase, seconds in metrics.phases.items():
+            conn.execute(
+                "INSERT INTO phases (operation, phase, count, seconds) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(operation, phase) DO UPDATE SET count = count + 1, seconds = seconds + excluded.seconds",
+                (metrics.name, phase, seconds)
+            )
+        conn.execute(
+            "INSERT INTO durations (operation, bucket, count) VALUES (?, ?, 1) "
+            "ON CONFLICT(operation, bucket) DO UPDATE SET count = count + 1",
+            (metrics.name, bucket)
+        )
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+
+@contextmanager
+def track_operation(name: str, *input_paths: str):
+    """
+    Measure an operation and record it when the block ends.
+
+    Exceptions propagate; the operation is then counted with status
+    'error'. A failure to record never breaks the operation.
+
+    Args:
+        name: Operation name (e.g. 'compress_pdf')
+        input_paths: Input files, for the input byte count
+
+    Yields:
+        OperationMetrics: set .pages, time phases with .phase(), report
+        outputs with .output()
+    """
+    metrics = OperationMetrics(name, input_paths)
+    token = _current.set(metrics)
+    start = time.perf_counter()
+    failed = True
+    try:
+        yield metrics
+        failed = False
+    finally:
+        metrics._finish(time.perf_counter() - start, failed)
+        _current.reset(token)
+        if getattr(settings, 'PDF_METRICS_ENABLED', True):
+            try:
+                record(metrics)
+            except sqlite3.Error:
+                pass
+
+
+def timed_operation(name: str):
+    """
+    Decorator: run the function inside track_operation(name).
+
+    The first argument is taken as the input: a path or a list of paths.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            inputs = args[0] if args else ()
+            inputs = [inputs] if isinstance(inputs, str) else [path for path in inputs if isinstance(path, str)]
+            with track_operation(name, *inputs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_operation() -> OperationMetrics:
+    """The operation being measured (a throwaway one outside track_operation)."""
+    return _current.get() or OperationMetrics('untracked')
+
+
+def phase(name: str):
+    """Time a phase of the current operation (see OperationMetrics.phase)."""
+    return current_operation().phase(name)
+
+
+def reset_metrics():
+    """Delete all recorded operations."""
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for table in ('operations', 'phases', 'durations'):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+
+# ==========================================
+# Prometheus exposition
+# ==========================================
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Exposition:
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def metric(self, name: str, kind: str, help_text: str, samples):
+        """samples: iterable of (suffix, labels dict, value)"""
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            self.lines.append(f"{name}{suffix}{_labels(**labels) if labels else ''} {_number(value)}")
+
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    conn = _connect()
+    try:
+        operations = conn.execute("SELECT * FROM operations ORDER BY operation, status").fetchall()
+        phases = conn.execute("SELECT * FROM phases ORDER BY operation, phase").fetchall()
+        durations = conn.execute("SELECT * FROM durations ORDER BY operation, bucket").fetchall()
+    finally:
+        conn.close()
+
+    out = _Exposition()
+    out.metric('pdf_operations_total', 'counter', 'PDF operations run, by result.', [
+        ('', {'operation': row['operation'], 'status': row['status']}, row['count']) for row in operations
+    ])
+
+    # Histogram of the total duration (buckets are cumulative)
+    histogram = []
+    by_operation = {}
+    for row in durations:
+        by_operation.setdefault(row['operation'], {})[row['bucket']] = row['count']
+    seconds = {}
+    for row in operations:
+        seconds[row['operation']] = seconds.get(row['operation'], 0.0) + row['seconds']
+    for operation, buckets in by_operation.items():
+        cumulative = 0
+        for index, bound in enumerate(DURATION_BUCKETS):
+            cumulative += buckets.get(index, 0)
+            histogram.append(('_bucket', {'operation': operation, 'le': repr(bound)}, cumulative))
+        cumulative += buckets.get(len(DURATION_BUCKETS), 0)
+        histogram.append(('_bucket', {'operation': operation, 'le': '+Inf'}, cumulative))
+        histogram.append(('_sum', {'operation': operation}, round(seconds.get(operation, 0.0), 6)))
+        histogram.append(('_count', {'operation': operation}, cumulative))
+    out.metric('pdf_operation_duration_seconds', 'histogram', 'Duration of PDF operations.', histogram)
+
+    out.metric('pdf_operation_phase_seconds_total', 'counter', 'Time spent per phase (open, process, save, ...).', [
+        ('', {'operation': row['operation'], 'phase': row['phase']}, round(row['seconds'], 6)) for row in phases
+    ])
+    out.metric('pdf_operation_phase_runs_total', 'counter', 'Number of timed phases.', [
+        ('', {'operation': row['operation'], 'phase': row['phase']}, row['count']) for row in phases
+    ])
+
+    totals = {}
+    for row in operations:
+        total = totals.setdefault(row['operation'], {'pages': 0, 'input_bytes': 0, 'output_bytes': 0, 'peak_rss_bytes': 0})
+        for key in ('pages', 'input_bytes', 'output_bytes'):
+            total[key] += row[key]
+        total['peak_rss_bytes'] = max(total['peak_rss_bytes'], row['peak_rss_bytes'])
+    for key, kind, help_text in (
+        ('pages', 'counter', 'Pages processed.'),
+        ('input_bytes', 'counter', 'Bytes of input PDFs.'),
+        ('output_bytes', 'counter', 'Bytes of output files.'),
+        ('peak_rss_bytes', 'gauge', 'Highest resident memory seen during an operation.'),
+    ):
+        name = f"pdf_operation_{key}_total" if kind == 'counter' else f"pdf_operation_{key}"
+        out.metric(name, kind, help_text, [
+            ('', {'operation': operation}, total[key]) for operation, total in totals.items()
+            # A peak of 0 was never measured (no resource module): no sample
+            if key != 'peak_rss_bytes' or total[key]
+        ])
+
+    from .rephrase_cache import cache_stats
+    from .page_render import render_cache_stats
+
+    rephrase = cache_stats()
+    out.metric('pdf_rephrase_cache_entries', 'gauge', 'Cached AI rephrase results.', [('', {}, rephrase['entries'])])
+    out.metric('pdf_rephrase_cache_bytes', 'gauge', 'Size of the cached rephrase results.', [('', {}, rephrase['bytes'])])
+    for counter in ('hits', 'misses', 'evictions'):
+        out.metric(f"pdf_rephrase_cache_{counter}_total", 'counter', f"Rephrase cache {counter}.", [
+            ('', {}, rephrase[counter])
+        ])
+
+    render = render_cache_stats()
+    out.metric('pdf_render_cache_images', 'gauge', 'Cached page thumbnails and tiles.', [('', {}, render['images'])])
+    out.metric('pdf_render_cache_bytes', 'gauge', 'Size of the page render cache.', [('', {}, render['bytes'])])
+
+    return '\n'.join(out.lines) + '\n'
+
+
+# ==========================================
+# Profiling
+# ==========================================
+
+class ProfilingMiddleware:
+    """
+    Profile a random sample of requests (settings.PDF_PROFILE_SAMPLE_RATE)
+    and save each profile in settings.PDF_PROFILE_DIR.
+
+    PDF_PROFILER = 'cprofile' writes .prof files (open with pstats or
+    snakeviz); 'pyinstrument' writes .html reports and falls back to
+    cProfile when pyinstrument is not installed. Disabled while
+    PDF_PROFILE_DIR is None.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile_dir = getattr(settings, 'PDF_PROFILE_DIR', None)
+        rate = getattr(settings, 'PDF_PROFILE_SAMPLE_RATE', 0.0)
+        if not profile_dir or random.random() >= rate:
+            return self.get_response(request)
+
+        profiler = _start_profiler(getattr(settings, 'PDF_PROFILER', 'cprofile'))
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            elapsed_ms = int((time.perf_counter() - start) * 1000)
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+            name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{request.method}_{slug[:60]}_{elapsed_ms}ms_{os.getpid()}"
+            os.makedirs(profile_dir, exist_ok=True)
+            _save_profile(profiler, os.path.join(profile_dir, name))
+
+
+def _start_profiler(kind: str):
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            pass
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _save_profile(profiler, base_path: str):
+    """Stop the profiler and write <base_path>.prof (cProfile) or .html."""
+    import cProfile
+
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.dump_stats(f"{base_path}.prof")
+    else:
+        profiler.stop()
+        with open(f"{base_path}.html", 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
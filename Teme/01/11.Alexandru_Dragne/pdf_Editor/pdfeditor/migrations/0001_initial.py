@@ -0,0 +1,63 @@
+# Generated by Django 4.2.26 on 2026-10-17 19:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Document',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=40)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('path', models.CharField(max_length=1024)),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField(default=0)),
+                ('page_count', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('expired', 'Expired')], default='active', max_length=16)),
+                ('edit_session_id', models.CharField(blank=True, max_length=64)),
+                ('uploaded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['uploaded_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProcessedResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=40)),
+                ('kind', models.CharField(choices=[('edit', 'Find & replace'), ('rephrase', 'AI rephrase'), ('split', 'Split'), ('merge', 'Merge'), ('compress', 'Compress'), ('watermark', 'Watermark'), ('rotate', 'Rotate'), ('page_numbers', 'Page numbers'), ('pipeline', 'Pipeline'), ('text', 'Extracted text')], max_length=16)),
+                ('paths', models.JSONField(default=list)),
+                ('sizes', models.JSONField(default=list)),
+                ('data', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('ready', 'Ready'), ('expired', 'Expired')], default='ready', max_length=16)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='pdfeditor.document')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['owner', 'status', 'uploaded_at'], name='document_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processedresult',
+            index=models.Index(fields=['owner', 'kind', 'status', 'created_at'], name='result_owner_kind_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processedresult',
+            index=models.Index(fields=['status', 'created_at'], name='result_status_idx'),
+        ),
+    ]
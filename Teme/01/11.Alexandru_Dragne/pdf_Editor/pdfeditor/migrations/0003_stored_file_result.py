@@ -0,0 +1,19 @@
+# Generated by Django 4.2.26 on 2026-10-17 19:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdfeditor', '0002_stored_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='result',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='pdfeditor.processedresult'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.26 on 2026-10-17 20:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdfeditor', '0003_stored_file_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Pipeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=40)),
+                ('name', models.CharField(max_length=100)),
+                ('steps', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pipeline',
+            constraint=models.UniqueConstraint(fields=('owner', 'name'), name='pipeline_owner_name_unique'),
+        ),
+    ]
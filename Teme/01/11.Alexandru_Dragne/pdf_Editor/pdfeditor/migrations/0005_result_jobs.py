@@ -0,0 +1,23 @@
+# Generated by Django 4.2.26 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdfeditor', '0004_pipelines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedresult',
+            name='job_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='processedresult',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('expired', 'Expired')], default='ready', max_length=16),
+        ),
+    ]
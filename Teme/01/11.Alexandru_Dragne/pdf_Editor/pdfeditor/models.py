@@ -1,3 +1,166 @@
+"""
+Models for uploaded documents and operation results.
+
+Both used to live in the session: a list of uploaded PDFs that was
+checked with os.path.exists on every request, and one session key per
+result path. Rows are now looked up by owner (the session key) through
+indexes, and their status is kept current by the store and by
+cleanup_old_pdfs instead of by stat calls per request. StoredFile is the
+expiry index of the files themselves (see retention). Named pipelines
+are kept per owner in Pipeline instead of the session.
+"""
+import os
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+class Document(models.Model):
+    """An uploaded PDF: one reference to a blob in the content-addressed store."""
+
+    STATUS_ACTIVE = 'active'
+    STATUS_EXPIRED = 'expired'  # Reference released by cleanup_old_pdfs
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_EXPIRED, 'Expired'),
+    ]
+
+    # The store reference id (see pdf_store.add_reference)
+    id = models.CharField(max_length=64, primary_key=True)
+    owner = models.CharField(max_length=40)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    path = models.CharField(max_length=1024)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField(default=0)
+    page_count = models.IntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    # Working copy with the undoable edits (see edit_session)
+    edit_session_id = models.CharField(max_length=64, blank=True)
+    uploaded_at = models.DateTimeField(default=timezone.now)
+    accessed_at = models.DateTimeField(default=timezone.now)  # For the storage quota (LRU)
+
+    class Meta:
+        ordering = ['uploaded_at']
+        indexes = [
+            models.Index(fields=['owner', 'status', 'uploaded_at'], name='document_owner_idx'),
+            models.Index(fields=['status', 'uploaded_at'], name='document_expiry_idx'),
+            models.Index(fields=['status', 'accessed_at'], name='document_lru_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def as_entry(self):
+        """The dict the views and templates use (same keys as the old session entry)."""
+        return {
+            'id': self.id,
+            'sha256': self.sha256,
+            'path': self.path,
+            'url': settings.MEDIA_URL + os.path.relpath(self.path, settings.MEDIA_ROOT),
+            'name': self.name,
+            'size': self.size,
+            'page_count': self.page_count,
+            'edit_session_id': self.edit_session_id,
+            'uploaded_at': self.uploaded_at.isoformat()
+        }
+
+
+class ProcessedResult(models.Model):
+    """The output file(s) of an operation, shown on its result page."""
+
+    STATUS_PENDING = 'pending'  # Waiting for its background job (see job_id)
+    STATUS_READY = 'ready'
+    STATUS_EXPIRED = 'expired'  # Files deleted by cleanup_old_pdfs or gone from disk
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_EXPIRED, 'Expired'),
+    ]
+
+    KIND_CHOICES = [
+        ('edit', 'Find & replace'),
+        ('rephrase', 'AI rephrase'),
+        ('split', 'Split'),
+        ('merge', 'Merge'),
+        ('compress', 'Compress'),
+        ('watermark', 'Watermark'),
+        ('rotate', 'Rotate'),
+        ('page_numbers', 'Page numbers'),
+        ('pipeline', 'Pipeline'),
+        ('text', 'Extracted text'),
+    ]
+
+    owner = models.CharField(max_length=40)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    document = models.ForeignKey(Document, null=True, blank=True, on_delete=models.SET_NULL)
+    paths = models.JSONField(default=list)
+    sizes = models.JSONField(default=list)  # Bytes of each path, recorded when it was written
+    data = models.JSONField(default=dict)  # Operation-specific details (counts, ratios, warnings)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_READY)
+    job_id = models.CharField(max_length=64, blank=True, db_index=True)  # Job producing the files, if queued
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'kind', 'status', 'created_at'], name='result_owner_kind_idx'),
+            models.Index(fields=['status', 'created_at'], name='result_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
+
+    @property
+    def path(self):
+        return self.paths[0] if self.paths else None
+
+    @property
+    def size(self):
+        return sum(self.sizes)
+
+
+class StoredFile(models.Model):
+    """A file (or batch directory) in MEDIA_ROOT/processed, recorded when it is written."""
+
+    KIND_CHOICES = [
+        ('result', 'Result'),  # Outputs of the views and edit exports
+        ('job', 'Job output'),
+        ('batch', 'Batch directory'),
+    ]
+
+    path = models.CharField(max_length=1024, unique=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    size = models.BigIntegerField(default=0)
+    # The result page showing this file, expired when the file is deleted
+    result = models.ForeignKey(ProcessedResult, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(default=timezone.now)
+    accessed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'created_at'], name='storedfile_expiry_idx'),
+            models.Index(fields=['accessed_at'], name='storedfile_lru_idx'),
+        ]
+
+    def __str__(self):
+        return self.path
+
+
+class Pipeline(models.Model):
+    """A named chain of pipeline steps (see pdf_processor.run_pipeline), saved by its owner."""
+
+    owner = models.CharField(max_length=40)
+    name = models.CharField(max_length=100)
+    steps = models.JSONField(default=list)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'name'], name='pipeline_owner_name_unique'),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return self.name
@@ -2,22 +2,37 @@
 Ollama Service Module - AI client for text rephrasing.
 
 Provides functions to communicate with Ollama API for text generation
-and rephrasing operations.
+and rephrasing operations. All requests go through one pooled
+requests.Session (kept-alive connections); the health check and model
+list are cached for OLLAMA_STATUS_TTL seconds, because they are needed on
+every rephrase page load. Successful results are memoized in the
+persistent rephrase cache (see rephrase_cache.py).
 """
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+
 import requests
-from typing import List, Optional, Tuple
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 
+from . import rephrase_cache
+
 
 # Default configuration (can be overridden in settings.py)
 OLLAMA_BASE_URL = getattr(settings, 'OLLAMA_BASE_URL', 'http://localhost:11434')
 OLLAMA_DEFAULT_MODEL = getattr(settings, 'OLLAMA_DEFAULT_MODEL', 'gemma3:latest')
 OLLAMA_TIMEOUT = getattr(settings, 'OLLAMA_TIMEOUT', 60)
+OLLAMA_STATUS_TTL = getattr(settings, 'OLLAMA_STATUS_TTL', 30)  # Seconds
+OLLAMA_MAX_IN_FLIGHT = getattr(settings, 'OLLAMA_MAX_IN_FLIGHT', 4)  # Concurrent generate requests
 
-# API endpoints
-OLLAMA_GENERATE_URL = f"{OLLAMA_BASE_URL}/api/generate"
-OLLAMA_CHAT_URL = f"{OLLAMA_BASE_URL}/api/chat"
-OLLAMA_TAGS_URL = f"{OLLAMA_BASE_URL}/api/tags"
+GENERATE_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9
+}
 
 
 # Rephrase style prompts
@@ -45,15 +60,69 @@ REPHRASE_STYLES = {
 }
 
 
+class OllamaError(Exception):
+    """Raised by the streaming API (the other functions return error tuples)."""
+
+
+# ==========================================
+# HTTP session and cached status
+# ==========================================
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# key -> (expires_at, value)
+_status_cache = {}
+
+
+def _api_url(endpoint: str) -> str:
+    return f"{OLLAMA_BASE_URL}/api/{endpoint}"
+
+
+def get_session() -> requests.Session:
+    """Shared session; its pool keeps up to OLLAMA_MAX_IN_FLIGHT connections alive."""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(OLLAMA_MAX_IN_FLIGHT, 1))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def _cached_status(key, compute):
+    """Return a cached value younger than OLLAMA_STATUS_TTL, else compute it."""
+    now = time.monotonic()
+    cached = _status_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    value = compute()
+    _status_cache[key] = (now + OLLAMA_STATUS_TTL, value)
+    return value
+
+
+def clear_status_cache():
+    """Forget the cached health check and model list."""
+    _status_cache.clear()
+
+
 def check_ollama_connection() -> Tuple[bool, str]:
     """
-    Check if Ollama is available and responding.
+    Check if Ollama is available and responding (cached for OLLAMA_STATUS_TTL).
     
     Returns:
         Tuple (is_connected: bool, message: str)
     """
+    return _cached_status('connection', _check_connection)
+
+
+def _check_connection() -> Tuple[bool, str]:
     try:
-        response = requests.get(OLLAMA_TAGS_URL, timeout=5)
+        response = get_session().get(_api_url('tags'), timeout=5)
         if response.status_code == 200:
             return True, "Ollama is connected and ready"
         else:
@@ -68,13 +137,17 @@ def check_ollama_connection() -> Tuple[bool, str]:
 
 def get_available_models() -> List[str]:
     """
-    Get list of available Ollama models.
+    Get list of available Ollama models (cached for OLLAMA_STATUS_TTL).
     
     Returns:
         List of model names, empty list if connection fails
     """
+    return list(_cached_status('models', _fetch_models))
+
+
+def _fetch_models() -> List[str]:
     try:
-        response = requests.get(OLLAMA_TAGS_URL, timeout=10)
+        response = get_session().get(_api_url('tags'), timeout=10)
         if response.status_code == 200:
             data = response.json()
             models = [model['name'] for model in data.get('models', [])]
@@ -84,82 +157,121 @@ def get_available_models() -> List[str]:
         return []
 
 
+# ==========================================
+# Rephrasing
+# ==========================================
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace (PDF selections break lines anywhere)."""
+    return ' '.join(text.split())
+
+
+def _cache_lookup(key: str) -> Optional[str]:
+    """Cached result or None; cache errors count as a miss."""
+    try:
+        return rephrase_cache.get_cached(key)
+    except sqlite3.Error:
+        return None
+
+
+def _cache_store(key: str, rephrased: str):
+    try:
+        rephrase_cache.set_cached(key, rephrased)
+    except sqlite3.Error:
+        pass  # The result is still returned, just not memoized
+
+
+def build_prompt(text: str, style: str = 'formal', custom_prompt: Optional[str] = None) -> str:
+    """Full generate prompt for a text and a style (or a custom prompt)."""
+    if custom_prompt:
+        system_prompt = custom_prompt
+    elif style in REPHRASE_STYLES:
+        system_prompt = REPHRASE_STYLES[style]['prompt']
+    else:
+        system_prompt = REPHRASE_STYLES['formal']['prompt']
+    
+    return f"""{system_prompt}
+
+Text to rephrase:
+"{text}"
+
+Provide ONLY the rephrased text, nothing else. Do not include quotes, explanations, or any additional text."""
+
+
+def clean_response(rephrased: str) -> str:
+    """Strip whitespace and the quotes models tend to wrap the answer in."""
+    rephrased = rephrased.strip()
+    if rephrased.startswith('"') and rephrased.endswith('"'):
+        rephrased = rephrased[1:-1]
+    if rephrased.startswith("'") and rephrased.endswith("'"):
+        rephrased = rephrased[1:-1]
+    return rephrased
+
+
+def _error_message(response) -> str:
+    """Detailed error message from an Ollama error response."""
+    try:
+        error_msg = response.json().get('error', f"HTTP {response.status_code}")
+    except ValueError:
+        error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
+    return f"Ollama error: {error_msg}"
+
+
 def rephrase_text(
     text: str,
     style: str = 'formal',
     model: Optional[str] = None,
-    custom_prompt: Optional[str] = None
+    custom_prompt: Optional[str] = None,
+    use_cache: bool = True
 ) -> Tuple[str, bool, str]:
     """
     Rephrase text using Ollama AI.
     
+    Identical requests (same normalized text, prompt, model and options)
+    are answered from the rephrase cache without calling Ollama.
+    
     Args:
         text: The text to rephrase
         style: One of 'formal', 'casual', 'simplified', 'concise', 'expanded'
         model: Ollama model to use (defaults to OLLAMA_DEFAULT_MODEL)
         custom_prompt: Optional custom prompt (overrides style)
+        use_cache: False to always ask Ollama for a fresh answer
         
     Returns:
         Tuple (rephrased_text: str, success: bool, error_message: str)
     """
-    if not model:
-        model = OLLAMA_DEFAULT_MODEL
+    model = model or OLLAMA_DEFAULT_MODEL
+    prompt = build_prompt(normalize_text(text), style, custom_prompt)
     
-    # Build the prompt
-    if custom_prompt:
-        system_prompt = custom_prompt
-    elif style in REPHRASE_STYLES:
-        system_prompt = REPHRASE_STYLES[style]['prompt']
-    else:
-        system_prompt = REPHRASE_STYLES['formal']['prompt']
+    key = rephrase_cache.cache_key(prompt, model, GENERATE_OPTIONS)
+    cached = _cache_lookup(key) if use_cache else None
+    if cached:
+        return cached, True, ""
     
-    # Create the full prompt
-    full_prompt = f"""{system_prompt}
-
-Text to rephrase:
-"{text}"
-
-Provide ONLY the rephrased text, nothing else. Do not include quotes, explanations, or any additional text."""
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "options": GENERATE_OPTIONS
+    }
 
     try:
-        payload = {
-            "model": model,
-            "prompt": full_prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9
-            }
-        }
-        
-        response = requests.post(
-            OLLAMA_GENERATE_URL, 
-            json=payload, 
+        response = get_session().post(
+            _api_url('generate'),
+            json=payload,
             timeout=OLLAMA_TIMEOUT
         )
         
         if response.status_code == 200:
-            data = response.json()
-            rephrased = data.get('response', '').strip()
-            
-            # Clean up the response - remove quotes if present
-            if rephrased.startswith('"') and rephrased.endswith('"'):
-                rephrased = rephrased[1:-1]
-            if rephrased.startswith("'") and rephrased.endswith("'"):
-                rephrased = rephrased[1:-1]
+            rephrased = clean_response(response.json().get('response', ''))
             
             if rephrased:
+                _cache_store(key, rephrased)
                 return rephrased, True, ""
             else:
                 return "", False, "Ollama returned empty response"
         else:
-            # Try to get detailed error message from Ollama
-            try:
-                error_data = response.json()
-                error_msg = error_data.get('error', f"HTTP {response.status_code}")
-            except:
-                error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
-            return "", False, f"Ollama error: {error_msg}"
+            return "", False, _error_message(response)
             
     except requests.exceptions.ConnectionError:
         return "", False, f"Cannot connect to Ollama at {OLLAMA_BASE_URL}"
@@ -169,6 +281,104 @@ Provide ONLY the rephrased text, nothing else. Do not include quotes, explanatio
         return "", False, f"Error: {str(e)}"
 
 
+def stream_rephrase_text(
+    text: str,
+    style: str = 'formal',
+    model: Optional[str] = None,
+    custom_prompt: Optional[str] = None,
+    use_cache: bool = True
+) -> Iterator[str]:
+    """
+    Rephrase text using Ollama AI, yielding tokens as they are generated.
+    
+    The raw tokens are yielded (quotes included); pass their concatenation
+    through clean_response() for the final text. A cached result is
+    yielded as a single fragment.
+    
+    Args:
+        Same as rephrase_text()
+    
+    Yields:
+        str: Generated text fragments
+    
+    Raises:
+        OllamaError: If Ollama cannot be reached or returns an error
+    """
+    model = model or OLLAMA_DEFAULT_MODEL
+    prompt = build_prompt(normalize_text(text), style, custom_prompt)
+    
+    key = rephrase_cache.cache_key(prompt, model, GENERATE_OPTIONS)
+    cached = _cache_lookup(key) if use_cache else None
+    if cached:
+        yield cached
+        return
+    
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+        "options": GENERATE_OPTIONS
+    }
+    tokens = []
+    finished = False
+
+    try:
+        with get_session().post(_api_url('generate'), json=payload, timeout=OLLAMA_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                raise OllamaError(_error_message(response))
+            
+            # One JSON object per line: {"response": "<token>", "done": false}
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise OllamaError(f"Ollama error: {chunk['error']}")
+                if chunk.get('response'):
+                    tokens.append(chunk['response'])
+                    yield chunk['response']
+                if chunk.get('done'):
+                    finished = True
+                    break
+    except requests.exceptions.ConnectionError:
+        raise OllamaError(f"Cannot connect to Ollama at {OLLAMA_BASE_URL}")
+    except requests.exceptions.Timeout:
+        raise OllamaError(f"Ollama request timed out after {OLLAMA_TIMEOUT}s. Try a smaller model.")
+    
+    # Only complete answers are memoized
+    rephrased = clean_response(''.join(tokens))
+    if finished and rephrased:
+        _cache_store(key, rephrased)
+
+
+def rephrase_many(
+    texts: Sequence[str],
+    style: str = 'formal',
+    model: Optional[str] = None,
+    custom_prompt: Optional[str] = None,
+    max_in_flight: Optional[int] = None
+) -> List[Tuple[str, bool, str]]:
+    """
+    Rephrase many texts concurrently, at most max_in_flight at a time.
+    
+    Args:
+        texts: Texts to rephrase (e.g. the paragraphs of a document)
+        style, model, custom_prompt: As for rephrase_text()
+        max_in_flight: Concurrent requests (default: OLLAMA_MAX_IN_FLIGHT)
+    
+    Returns:
+        List of rephrase_text() results, in the order of texts
+    """
+    if not texts:
+        return []
+
+    max_in_flight = max(1, min(max_in_flight or OLLAMA_MAX_IN_FLIGHT, len(texts)))
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        return list(executor.map(
+            lambda text: rephrase_text(text, style, model, custom_prompt),
+            texts
+        ))
+
 
 def get_style_choices():
     """
@@ -0,0 +1,262 @@
+"""
+Page Ranges Module - compact page sets for page-range arguments.
+
+A PageSet keeps its pages as sorted, merged, half-open intervals of
+0-based page indices, so "1-10000" is a single pair instead of a list of
+10,000 numbers. Sets are immutable; union, intersection and difference
+walk the interval lists once. Consecutive pages stay together, so a
+split writes each interval with one insert_pdf call.
+
+Range syntax (1-based, as typed by users; see PageSet.parse):
+
+    5          one page
+    3-7        pages 3 to 7
+    8-         page 8 to the last page
+    -1         the last page (negative numbers count from the end)
+    -3--1      the last three pages
+    odd, even, all
+    X/N        every Nth page of X, starting with its first page (1-20/2, all/3)
+    X&Y        pages that are in both X and Y (1-10&odd)
+    X,Y        pages that are in X or in Y
+"""
+import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+_SELECTOR_RE = re.compile(r'^(?P<start>-?\d+)(?:(?P<dash>-)(?P<end>-?\d+)?)?$')
+
+
+class PageSet:
+    """Immutable set of page indices (0-based) stored as merged intervals."""
+
+    __slots__ = ('intervals', 'total_pages')
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]] = (), total_pages: Optional[int] = None):
+        """
+        Args:
+            intervals: Half-open (start, stop) pairs, in any order; overlapping
+                and adjacent pairs are merged
+            total_pages: Page count of the document (needed by parse, odd/even)
+        """
+        merged: List[List[int]] = []
+        for start, stop in sorted(intervals):
+            if start >= stop:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        self.intervals: Tuple[Tuple[int, int], ...] = tuple((start, stop) for start, stop in merged)
+        self.total_pages = total_pages
+
+    # ------------------------------------------
+    # Constructors
+    # ------------------------------------------
+
+    @classmethod
+    def all(cls, total_pages: int) -> 'PageSet':
+        return cls([(0, total_pages)], total_pages)
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[int], total_pages: Optional[int] = None) -> 'PageSet':
+        """Set of individual page indices (0-based)."""
+        return cls(((page, page + 1) for page in pages), total_pages)
+
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[Tuple[int, int]], total_pages: int) -> 'PageSet':
+        """
+        Set of (start, end) ranges, 1-indexed and inclusive (as split_pdf takes them).
+
+        Raises:
+            ValueError: If a range is reversed or outside the document
+        """
+        intervals = []
+        for start, end in ranges:
+            if start < 1 or end > total_pages or start > end:
+                raise ValueError(f"Invalid range: {start}-{end} (PDF has {total_pages} pages)")
+            intervals.append((start - 1, end))
+        return cls(intervals, total_pages)
+
+    @classmethod
+    def parse(cls, spec: Optional[str], total_pages: int) -> 'PageSet':
+        """
+        Parse a page-range string (see the module docstring).
+
+        An empty string selects every page.
+
+        Raises:
+            ValueError: On bad syntax or pages outside 1..total_pages
+        """
+        spec = (spec or '').replace(' ', '')
+        if not spec:
+            return cls.all(total_pages)
+
+        result = cls((), total_pages)
+        for part in spec.split(','):
+            if not part:
+                raise ValueError(f"Invalid page range: empty part in '{spec}'")
+            factors = [cls._parse_factor(factor, total_pages) for factor in part.split('&')]
+            term = factors[0]
+            for factor in factors[1:]:
+                term = term & factor
+            result = result | term
+        return result
+
+    @classmethod
+    def _parse_factor(cls, text: str, total_pages: int) -> 'PageSet':
+        selector, _, step = text.partition('/')
+        if selector in ('all', 'odd', 'even'):
+            pages = cls.all(total_pages)
+            if selector != 'all':
+                pages = pages.every(2, offset=0 if selector == 'odd' else 1)
+        else:
+            match = _SELECTOR_RE.match(selector)
+            if not match:
+                raise ValueError(f"Invalid page range format: {text}")
+            start = cls._page_index(match.group('start'), total_pages)
+            if not match.group('dash'):
+                end = start
+            elif match.group('end') is None:
+                end = total_pages - 1
+            else:
+                end = cls._page_index(match.group('end'), total_pages)
+            if start > end:
+                raise ValueError(f"Invalid page range: {selector}")
+            pages = cls([(start, end + 1)], total_pages)
+
+        if step:
+            if not step.isdigit() or int(step) < 1:
+                raise ValueError(f"Invalid step: {text}")
+            pages = pages.every(int(step))
+        return pages
+
+    @staticmethod
+    def _page_index(number: str, total_pages: int) -> int:
+        """1-based page number (negative = from the end) to a 0-based index."""
+        value = int(number)
+        index = total_pages + value if value < 0 else value - 1
+        if value == 0 or not 0 <= index < total_pages:
+            raise ValueError(f"Page {number} out of range (1-{total_pages})")
+        return index
+
+    # ------------------------------------------
+    # Set operations
+    # ------------------------------------------
+
+    def __or__(self, other: 'PageSet') -> 'PageSet':
+        return PageSet(self.intervals + other.intervals, self.total_pages or other.total_pages)
+
+    union = __or__
+
+    def __and__(self, other: 'PageSet') -> 'PageSet':
+        result = []
+        i = j = 0
+        a, b = self.intervals, other.intervals
+        while i < len(a) and j < len(b):
+            start, stop = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+            if start < stop:
+                result.append((start, stop))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return PageSet(result, self.total_pages or other.total_pages)
+
+    intersection = __and__
+
+    def __sub__(self, other: 'PageSet') -> 'PageSet':
+        result = []
+        j = 0
+        b = other.intervals
+        for start, stop in self.intervals:
+            while j < len(b) and b[j][1] <= start:
+                j += 1
+            k = j
+            while k < len(b) and b[k][0] < stop:
+                if b[k][0] > start:
+                    result.append((start, b[k][0]))
+                start = max(start, b[k][1])
+                k += 1
+            if start < stop:
+                result.append((start, stop))
+        return PageSet(result, self.total_pages or other.total_pages)
+
+    difference = __sub__
+
+    def every(self, step: int, offset: int = 0) -> 'PageSet':
+        """
+        Every step-th page of the set, counted within the set.
+
+        every(2) keeps the 1st, 3rd, 5th... page of the set; offset=1
+        starts with the 2nd.
+        """
+        if step == 1 and offset == 0:
+            return self
+        result = []
+        position = 0  # Position of the interval's first page within the set
+        for start, stop in self.intervals:
+            first = start + (offset - position) % step
+            result.extend((page, page + 1) for page in range(first, stop, step))
+            position += stop - start
+        return PageSet(result, self.total_pages)
+
+    # ------------------------------------------
+    # Container protocol
+    # ------------------------------------------
+
+    def __iter__(self) -> Iterator[int]:
+        for start, stop in self.intervals:
+            yield from range(start, stop)
+
+    def __len__(self) -> int:
+        return sum(stop - start for start, stop in self.intervals)
+
+    def __bool__(self) -> bool:
+        return bool(self.intervals)
+
+    def __contains__(self, page: int) -> bool:
+        index = bisect_right(self.intervals, (page, float('inf'))) - 1
+        return index >= 0 and self.intervals[index][0] <= page < self.intervals[index][1]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PageSet) and self.intervals == other.intervals
+
+    def __hash__(self) -> int:
+        return hash(self.intervals)
+
+    def __str__(self) -> str:
+        """1-based range string, e.g. '1-3,5'."""
+        return ','.join(
+            str(start + 1) if stop - start == 1 else f"{start + 1}-{stop}"
+            for start, stop in self.intervals
+        )
+
+    def __repr__(self) -> str:
+        return f"PageSet('{self}', total_pages={self.total_pages})"
+
+    def to_list(self) -> List[int]:
+        return list(self)
+
+    def first(self) -> Optional[int]:
+        return self.intervals[0][0] if self.intervals else None
+
+    def last(self) -> Optional[int]:
+        return self.intervals[-1][1] - 1 if self.intervals else None
+
+
+def as_page_set(pages, total_pages: int) -> PageSet:
+    """
+    Accept the page arguments used across pdf_processor: None (all pages),
+    a range string, a PageSet, a (start, end) 1-indexed tuple or a
+    sequence of 0-based indices.
+    """
+    if pages is None:
+        return PageSet.all(total_pages)
+    if isinstance(pages, PageSet):
+        return pages
+    if isinstance(pages, str):
+        return PageSet.parse(pages, total_pages)
+    if isinstance(pages, tuple) and len(pages) == 2 and all(isinstance(value, int) for value in pages):
+        return PageSet.from_ranges([pages], total_pages)
+    return PageSet.from_pages(pages, total_pages)
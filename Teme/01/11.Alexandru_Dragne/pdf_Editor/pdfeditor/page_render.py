@@ -0,0 +1,376 @@
+"""
+Page Render Module - server-side page thumbnails and tiles.
+
+Previews used to send the whole PDF to PDF.js in the browser, so nothing
+showed until the complete file was downloaded. Pages are now rendered on
+the server with fitz.Page.get_pixmap and served as small images:
+
+    thumbnail - whole page, THUMBNAIL_WIDTH pixels wide
+    tile      - TILE_SIZE x TILE_SIZE pixel square of a page at a zoom level
+
+Rendering runs in a process pool (PDF_RENDER_WORKERS); identical requests
+made while a render is in flight wait for the same result. Images are
+cached under PDF_CACHE_DIR/render/<aa>/<hash>/, keyed by page, zoom and
+tile. Documents are content-addressed, so cached images never go stale;
+the cache is bounded by PDF_RENDER_CACHE_BYTES and the least recently
+served images are evicted first (files are touched when served).
+"""
+import io
+import json
+import math
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from django.conf import settings
+
+from .pdf_processor import get_cache_dir
+
+
+ZOOM_LEVELS = (0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0)
+DEFAULT_ZOOM = 1.5
+TILE_SIZE = 512
+THUMBNAIL_WIDTH = 200
+IMAGE_FORMATS = {'webp': 'image/webp', 'png': 'image/png'}
+RETRY_AFTER = 5  # Seconds a client waits before asking again for a slow render
+
+_executor: Optional[ProcessPoolExecutor] = None
+_lock = threading.RLock()  # Done callbacks may run while it is held
+_pending = {}  # cache path -> Future
+_cache_bytes: Optional[int] = None  # Running total, scanned on first use
+_cache_images = 0
+_cache_root: Optional[str] = None  # Render cache the running totals belong to
+
+
+class RenderTimeout(Exception):
+    """A render did not finish within PDF_RENDER_TIMEOUT."""
+
+
+# ==========================================
+# Rendering (worker processes)
+# ==========================================
+
+# Open documents of this worker process, most recently used last
+_open_documents: 'OrderedDict[str, fitz.Document]' = OrderedDict()
+OPEN_DOCUMENTS = 4
+
+
+def _open_document(pdf_path: str) -> fitz.Document:
+    doc = _open_documents.get(pdf_path)
+    if doc is None:
+        doc = fitz.open(pdf_path)
+        _open_documents[pdf_path] = doc
+        while len(_open_documents) > OPEN_DOCUMENTS:
+            _open_documents.popitem(last=False)[1].close()
+    _open_documents.move_to_end(pdf_path)
+    return doc
+
+
+def _render(pdf_path: str, page_index: int, zoom: Optional[float],
+            tile: Optional[Tuple[int, int]], image_format: str, output_path: str) -> int:
+    """
+    Render a thumbnail (zoom None) or one tile and write it to output_path.
+
+    Returns:
+        int: Size of the written image in bytes
+    """
+    page = _open_document(pdf_path)[page_index]
+
+    clip = None
+    if zoom is None:
+        zoom = THUMBNAIL_WIDTH / page.rect.width
+    elif tile is not None:
+        col, row = tile
+        size = TILE_SIZE / zoom
+        clip = fitz.Rect(col * size, row * size, (col + 1) * size, (row + 1) * size) & page.rect
+        if clip.is_empty:
+            raise ValueError(f"Tile {col},{row} is outside page {page_index + 1}")
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+    if image_format == 'png':
+        data = pix.tobytes('png')
+    else:
+        from PIL import Image
+
+        out = io.BytesIO()
+        Image.frombytes('RGB', (pix.width, pix.height), pix.samples).save(out, 'WEBP', quality=80, method=4)
+        data = out.getvalue()
+
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, output_path)
+    return len(data)
+
+
+# ==========================================
+# Cache
+# ==========================================
+
+def _render_root() -> str:
+    return os.path.join(str(getattr(settings, 'PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache'))), 'render')
+
+
+def snap_zoom(zoom: float) -> float:
+    """Closest supported zoom level (keeps the number of cached variants small)."""
+    return min(ZOOM_LEVELS, key=lambda level: abs(level - zoom))
+
+
+def render_cache_path(sha256: str, page_index: int, zoom: Optional[float] = None,
+                      tile: Optional[Tuple[int, int]] = None, image_format: str = 'webp') -> str:
+    """Cache file of a thumbnail (zoom None) or of a tile of a page."""
+    if zoom is None:
+        name = f"p{page_index}_thumb"
+    else:
+        name = f"p{page_index}_z{zoom:g}_{tile[0]}_{tile[1]}"
+    return os.path.join(get_cache_dir('render', sha256), f"{name}.{image_format}")
+
+
+def _cached_images(directory: Optional[str] = None):
+    """Yield (path, size, mtime) for every cached image (below directory)."""
+    for root, _, files in os.walk(directory or _render_root()):
+        for filename in files:
+            if os.path.splitext(filename)[1][1:] not in IMAGE_FORMATS:
+                continue
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+
+def evict_render_cache(max_bytes: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Delete the least recently served images until the cache fits.
+
+    The cache is trimmed to 90% of the limit, so eviction does not run again
+    on the very next render.
+
+    Args:
+        max_bytes: Size limit (default: settings.PDF_RENDER_CACHE_BYTES)
+
+    Returns:
+        Tuple (images_deleted, bytes_freed)
+    """
+    global _cache_bytes, _cache_images, _cache_root
+
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'PDF_RENDER_CACHE_BYTES', 256 * 1024 * 1024)
+
+    root = _render_root()
+    images = sorted(_cached_images(root), key=lambda image: image[2])
+    total = sum(size for _, size, _ in images)
+    deleted, freed = 0, 0
+
+    if total > max_bytes:
+        target = max_bytes * 0.9
+        for path, size, _ in images:
+            if total - freed <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            deleted += 1
+            freed += size
+
+    with _lock:
+        _cache_bytes = total - freed
+        _cache_images = len(images) - deleted
+        _cache_root = root
+    return deleted, freed
+
+
+def _totals_known() -> bool:
+    return _cache_bytes is not None and _cache_root == _render_root()
+
+
+def render_cache_stats() -> Dict[str, int]:
+    """
+    Cache size, for /metrics.
+
+    Read from the running totals; the cache is only scanned the first time
+    (or after PDF_CACHE_DIR changed). Images deleted by another process
+    (cleanup_old_pdfs) are counted until the next eviction here.
+
+    Returns:
+        Dict with images and bytes
+    """
+    if not _totals_known():
+        evict_render_cache()
+    with _lock:
+        return {'images': _cache_images, 'bytes': _cache_bytes}
+
+
+def _account(nbytes: int):
+    """Add a new image to the running cache size; evict when over the limit."""
+    global _cache_bytes, _cache_images
+
+    with _lock:
+        known = _totals_known()
+        if known:
+            _cache_bytes += nbytes
+            _cache_images += 1
+        over_limit = (
+            not known or
+            _cache_bytes > getattr(settings, 'PDF_RENDER_CACHE_BYTES', 256 * 1024 * 1024)
+        )
+    if over_limit:
+        evict_render_cache()
+
+
+def drop_renders(sha256: str):
+    """Delete the cached images of a document (when its blob is deleted)."""
+    global _cache_bytes, _cache_images
+
+    directory = os.path.join(_render_root(), sha256[:2], sha256)
+    images = list(_cached_images(directory)) if os.path.isdir(directory) else []
+    shutil.rmtree(directory, ignore_errors=True)
+    with _lock:
+        if _totals_known():
+            _cache_bytes = max(0, _cache_bytes - sum(size for _, size, _ in images))
+            _cache_images = max(0, _cache_images - len(images))
+
+
+# ==========================================
+# Rendering service
+# ==========================================
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        workers = getattr(settings, 'PDF_RENDER_WORKERS', None) or min(4, os.cpu_count() or 1)
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def _submit(pdf_path, sha256, page_index, zoom, tile, image_format):
+    """Queue a render unless the same image is already being rendered."""
+    global _executor
+
+    path = render_cache_path(sha256, page_index, zoom, tile, image_format)
+    with _lock:
+        future = _pending.get(path)
+        if future is None:
+            try:
+                future = _get_executor().submit(_render, pdf_path, page_index, zoom, tile, image_format, path)
+            except BrokenProcessPool:
+                _executor = None
+                future = _get_executor().submit(_render, pdf_path, page_index, zoom, tile, image_format, path)
+            _pending[path] = future
+            future.add_done_callback(lambda done: _finished(path, done))
+    return path, future
+
+
+def _finished(path, future):
+    with _lock:
+        if _pending.get(path) is future:  # Not dropped after a timeout
+            del _pending[path]
+    if not future.cancelled() and future.exception() is None:
+        _account(future.result())
+
+
+def render_page_image(pdf_path: str, sha256: str, page_index: int, zoom: Optional[float] = None,
+                      tile: Optional[Tuple[int, int]] = None, image_format: str = 'webp') -> str:
+    """
+    Return the cached image of a thumbnail or tile, rendering it if needed.
+
+    Args:
+        pdf_path: PDF absolute path
+        sha256: Document hash (cache key)
+        page_index: Page index (0-based)
+        zoom: Zoom level for a tile, None for a thumbnail
+        tile: (column, row) of the tile; required when zoom is given
+        image_format: 'webp' or 'png'
+
+    Returns:
+        str: Path of the image file
+
+    Raises:
+        ValueError: For a tile outside the page
+        RenderTimeout: If the render takes longer than settings.PDF_RENDER_TIMEOUT
+    """
+    if zoom is not None:
+        zoom = snap_zoom(zoom)
+    path = render_cache_path(sha256, page_index, zoom, tile, image_format)
+
+    if os.path.exists(path):
+        try:
+            os.utime(path)  # Mark as recently used
+            return path
+        except FileNotFoundError:
+            pass  # Evicted meanwhile
+
+    _, future = _submit(pdf_path, sha256, page_index, zoom, tile, image_format)
+    try:
+        future.result(timeout=getattr(settings, 'PDF_RENDER_TIMEOUT', 30))
+    except FutureTimeoutError:
+        # A stuck render must not answer every later request for this image
+        with _lock:
+            if _pending.get(path) is future:
+                del _pending[path]
+        future.cancel()
+        raise RenderTimeout(f"Rendering page {page_index + 1} timed out")
+    return path
+
+
+def page_sizes(pdf_path: str, sha256: str) -> List[Tuple[float, float]]:
+    """Width and height (points) of every page, cached next to the images."""
+    sizes_path = os.path.join(get_cache_dir('render', sha256), 'sizes.json')
+    try:
+        with open(sizes_path, encoding='utf-8') as f:
+            return [tuple(size) for size in json.load(f)]
+    except (OSError, ValueError):
+        pass
+
+    with fitz.open(pdf_path) as doc:
+        sizes = [(round(page.rect.width, 2), round(page.rect.height, 2)) for page in doc]
+
+    tmp_path = f"{sizes_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sizes, f)
+    os.replace(tmp_path, sizes_path)
+    return sizes
+
+
+def tile_grid(width: float, height: float, zoom: float) -> Tuple[int, int]:
+    """Number of (columns, rows) of tiles covering a page at a zoom level."""
+    return math.ceil(width * zoom / TILE_SIZE), math.ceil(height * zoom / TILE_SIZE)
+
+
+def prerender_pages(pdf_path: str, sha256: str, pages: Optional[int] = None, image_format: str = 'webp') -> list:
+    """
+    Queue thumbnails and default-zoom tiles of the first pages (at upload).
+
+    Does not wait for the renders; the first preview then reads the cache.
+
+    Args:
+        pdf_path: PDF absolute path
+        sha256: Document hash
+        pages: Number of pages (default: settings.PDF_RENDER_PRERENDER_PAGES)
+        image_format: 'webp' or 'png'
+
+    Returns:
+        List of futures of the queued renders
+    """
+    if pages is None:
+        pages = getattr(settings, 'PDF_RENDER_PRERENDER_PAGES', 3)
+
+    futures = []
+    for page_index, (width, height) in enumerate(page_sizes(pdf_path, sha256)[:pages]):
+        columns, rows = tile_grid(width, height, DEFAULT_ZOOM)
+        targets = [(None, None)] + [
+            (DEFAULT_ZOOM, (col, row)) for row in range(rows) for col in range(columns)
+        ]
+        for zoom, tile in targets:
+            if not os.path.exists(render_cache_path(sha256, page_index, zoom, tile, image_format)):
+                futures.append(_submit(pdf_path, sha256, page_index, zoom, tile, image_format)[1])
+    return futures
@@ -4,18 +4,30 @@ PDF Processing Module - Core logic pentru editare text în PDF-uri.
 Folosește PyMuPDF (fitz) pentru a găsi și înlocui text în PDF-uri,
 păstrând layout-ul original cât mai mult posibil.
 """
+import hashlib
 import os
 import re
+import shutil
+import uuid
+from bisect import bisect_left, bisect_right
 from datetime import datetime
+from functools import lru_cache
 import fitz  # PyMuPDF
 from django.conf import settings
 from typing import Tuple, List, Optional
 
+from .page_ranges import PageSet, as_page_set
+from .metrics import timed_operation, current_operation, phase
+
 
 def parse_page_range(range_string: str, total_pages: int) -> List[int]:
     """
     Parsează un string de tipul '1-3,5,7-9' într-o listă de indici de pagini.
     
+    Acceptă toată sintaxa PageSet (vezi page_ranges.py): 'odd', 'even',
+    '8-', '-1', '1-20/2', '1-10&odd'. Pentru documente mari, folosiți
+    direct PageSet.parse (intervale, nu liste de pagini).
+    
     Args:
         range_string: String cu intervale (ex: "1-3,5")
         total_pages: Numărul total de pagini din PDF
@@ -26,60 +38,24 @@ def parse_page_range(range_string: str, total_pages: int) -> List[int]:
     Raises:
         ValueError: Dacă range-ul este invalid
     """
-    if not range_string or not range_string.strip():
-        return list(range(total_pages))
-    
-    pages = set()
-    parts = range_string.replace(' ', '').split(',')
-    
-    for part in parts:
-        if '-' in part:
-            # Range: "1-3"
-            try:
-                start, end = part.split('-')
-                start_idx = int(start) - 1  # Convert to 0-indexed
-                end_idx = int(end) - 1
-                
-                if start_idx < 0 or end_idx >= total_pages or start_idx > end_idx:
-                    raise ValueError(f"Invalid page range: {part}")
-                
-                pages.update(range(start_idx, end_idx + 1))
-            except ValueError as e:
-                raise ValueError(f"Invalid page range format: {part}") from e
-        else:
-            # Single page: "5"
-            try:
-                page_num = int(part) - 1  # Convert to 0-indexed
-                if page_num < 0 or page_num >= total_pages:
-                    raise ValueError(f"Page {part} out of range (1-{total_pages})")
-                pages.add(page_num)
-            except ValueError as e:
-                raise ValueError(f"Invalid page number: {part}") from e
-    
-    return sorted(list(pages))
+    return PageSet.parse(range_string, total_pages).to_list()
 
 
-def check_pdf_has_text(pdf_path: str) -> Tuple[bool, str]:
+def check_pdf_has_text(pdf_path: str, sha256: Optional[str] = None) -> Tuple[bool, str]:
     """
     Verifică dacă PDF-ul conține text selectabil.
     
     Args:
         pdf_path: Calea către fișierul PDF
+        sha256: Hash-ul documentului, dacă e cunoscut
         
     Returns:
         Tuple (has_text: bool, message: str)
     """
+    from .text_index import get_text_index
+    
     try:
-        doc = fitz.open(pdf_path)
-        has_text = False
-        
-        for page in doc:
-            text = page.get_text().strip()
-            if text:
-                has_text = True
-                break
-        
-        doc.close()
+        has_text = get_text_index(pdf_path, sha256).has_text()
         
         if has_text:
             return True, "PDF-ul conține text selectabil."
@@ -90,22 +66,53 @@ def check_pdf_has_text(pdf_path: str) -> Tuple[bool, str]:
         return False, f"Eroare la verificarea PDF-ului: {str(e)}"
 
 
-def split_pdf(pdf_path: str, ranges: List[Tuple[int, int]]) -> List[str]:
+# Below this many pages, starting worker processes costs more than it saves
+SPLIT_PARALLEL_MIN_PAGES = 200
+
+_BLOB_NAME_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _output_stem(pdf_path, output_name=None):
+    """
+    File name stem for the outputs of an operation on pdf_path.
+    
+    Uploads are store blobs named <sha256>.pdf and shared by every session
+    that uploaded the same file, so their outputs get a fresh unique stem
+    instead of the blob name (two sessions would otherwise overwrite each
+    other's results). Other inputs keep their own name.
+    """
+    if output_name:
+        return output_name
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    if _BLOB_NAME_RE.match(stem):
+        return uuid.uuid4().hex
+    return stem
+
+
+@timed_operation('split_pdf')
+def split_pdf(pdf_path: str, ranges: List[Tuple[int, int]], workers: Optional[int] = None,
+              output_name: Optional[str] = None) -> List[str]:
     """
     Split PDF into multiple files based on page ranges.
     
+    Each part is written by its own worker process (settings.PDF_SPLIT_WORKERS)
+    when there are several parts of a large enough document.
+    
     Args:
         pdf_path: Path to input PDF
         ranges: List of (start, end) tuples (1-indexed, inclusive)
                 Example: [(1, 3), (5, 7)] splits pages 1-3 and 5-7
+                A part may also be a range string ('odd', '1-3,8-') or a PageSet
+        workers: Number of writer processes (1 = in-process)
+        output_name: Prefix of the output file names (default: see _output_stem)
     
     Returns:
         List of paths to output PDF files
     """
     try:
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
-        output_files = []
+        with phase('open'):
+            doc = fitz.open(pdf_path)
+        current_operation().pages = len(doc)
         
         # Determine output directory
         if '/media/uploads' in pdf_path:
@@ -114,44 +121,214 @@ def split_pdf(pdf_path: str, ranges: List[Tuple[int, int]]) -> List[str]:
         else:
             output_dir = os.path.join(os.path.dirname(pdf_path), 'processed')
         
-        os.makedirs(output_dir, exist_ok=True)
-        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        base_name = _output_stem(pdf_path, output_name)
+        parts = _split_parts(ranges, len(doc))
         
-        for idx, (start, end) in enumerate(ranges, 1):
-            # Validate range (1-indexed)
-            if start < 1 or end > total_pages or start > end:
-                raise ValueError(f"Invalid range: {start}-{end} (PDF has {total_pages} pages)")
-            
-            # Create new PDF with selected pages
-            new_doc = fitz.open()
-            new_doc.insert_pdf(doc, from_page=start-1, to_page=end-1)
-            
-            # Generate output filename
-            if len(ranges) == 1:
-                output_filename = f"{base_name}_pages_{start}-{end}.pdf"
-            else:
-                output_filename = f"{base_name}_part{idx}_pages_{start}-{end}.pdf"
-            
-            output_path = os.path.join(output_dir, output_filename)
-            new_doc.save(output_path, garbage=4, deflate=True)
-            new_doc.close()
+        workers = workers or getattr(settings, 'PDF_SPLIT_WORKERS', None) or os.cpu_count() or 1
+        workers = min(workers, len(parts))
+        if workers > 1 and len(doc) >= SPLIT_PARALLEL_MIN_PAGES:
+            doc.close()
+            os.makedirs(output_dir, exist_ok=True)
+            tasks = [
+                (pdf_path, pages.intervals, os.path.join(output_dir, filename), None)
+                for pages, filename in _split_filenames(parts, base_name)
+            ]
+            from concurrent.futures import ProcessPoolExecutor
             
-            output_files.append(output_path)
+            with phase('save'), ProcessPoolExecutor(max_workers=workers) as executor:
+                output_files = list(executor.map(_write_part_file, *zip(*tasks)))
+        else:
+            with phase('save'):
+                output_files = _write_page_ranges(doc, parts, output_dir, base_name)
+            doc.close()
         
-        doc.close()
+        current_operation().output(output_files)
         return output_files
         
     except Exception as e:
         raise Exception(f"Error splitting PDF: {str(e)}")
 
 
-def merge_pdfs(pdf_paths, output_name=None):
+def _split_parts(ranges, total_pages) -> List[PageSet]:
+    """Validate the parts of a split and return them as PageSets."""
+    parts = [as_page_set(part, total_pages) for part in ranges]
+    for part in parts:
+        if not part:
+            raise ValueError("Empty page range in split")
+    return parts
+
+
+def _split_filenames(parts, base_name):
+    """Pair each part with its output file name (pages_3-5, pages_1-2_7-9)."""
+    for idx, pages in enumerate(parts, 1):
+        if len(pages.intervals) == 1:
+            label = f"{pages.first() + 1}-{pages.last() + 1}"
+        else:
+            label = str(pages).replace(',', '_')
+        if len(parts) == 1:
+            yield pages, f"{base_name}_pages_{label}.pdf"
+        else:
+            yield pages, f"{base_name}_part{idx}_pages_{label}.pdf"
+
+
+def _insert_intervals(new_doc, doc, intervals):
+    """Copy page intervals of doc into new_doc, one insert_pdf per interval."""
+    for start, stop in intervals:
+        new_doc.insert_pdf(doc, from_page=start, to_page=stop - 1)
+
+
+def _write_part_file(pdf_path, intervals, output_path, save_options):
+    """Worker: write one part of a split (runs in a separate process)."""
+    with fitz.open(pdf_path) as doc, fitz.open() as new_doc:
+        _insert_intervals(new_doc, doc, intervals)
+        new_doc.save(output_path, **(save_options or {'garbage': 4, 'deflate': True}))
+    return output_path
+
+
+def _write_page_ranges(doc, ranges, output_dir, base_name, save_options=None):
+    """
+    Write each page range of an open document to its own file.
+    
+    Args:
+        doc: Open fitz.Document
+        ranges: List of (start, end) tuples (1-indexed, inclusive),
+                range strings or PageSets
+        output_dir: Directory for the output files
+        base_name: Prefix of the output file names
+        save_options: Keyword arguments for Document.save
+    
+    Returns:
+        List of paths to output PDF files
+    """
+    parts = _split_parts(ranges, len(doc))
+    output_files = []
+    os.makedirs(output_dir, exist_ok=True)
+    
+    for pages, output_filename in _split_filenames(parts, base_name):
+        # Create new PDF with selected pages
+        new_doc = fitz.open()
+        _insert_intervals(new_doc, doc, pages.intervals)
+        
+        output_path = os.path.join(output_dir, output_filename)
+        new_doc.save(output_path, **(save_options or {'garbage': 4, 'deflate': True}))
+        new_doc.close()
+        
+        output_files.append(output_path)
+    
+    return output_files
+
+
+def iter_split_parts(pdf_path: str, ranges, base_name: Optional[str] = None):
+    """
+    Split a PDF without writing the parts to disk.
+    
+    The ranges are validated before anything is produced, so errors are
+    raised by this call, not while the parts are being consumed.
+    
+    Args:
+        pdf_path: Path to input PDF
+        ranges: Parts as accepted by split_pdf
+        base_name: Prefix of the part names (default: see _output_stem)
+    
+    Returns:
+        Iterator of (filename, pdf_bytes), one part at a time
+    """
+    if not os.path.exists(pdf_path):
+        raise ValueError(f"PDF file not found: {pdf_path}")
+    
+    base_name = _output_stem(pdf_path, base_name)
+    with fitz.open(pdf_path) as doc:
+        parts = list(_split_filenames(_split_parts(ranges, len(doc)), base_name))
+    
+    def generate():
+        with fitz.open(pdf_path) as doc:
+            for pages, filename in parts:
+                with fitz.open() as new_doc:
+                    _insert_intervals(new_doc, doc, pages.intervals)
+                    data = new_doc.tobytes(garbage=4, deflate=True)
+                yield filename, data
+    
+    return generate()
+
+
+# Inputs appended between two incremental saves of a merge
+MERGE_CHUNK_SIZE = 20
+
+
+def _append_in_chunks(pdf_paths, output_path, chunk_size, garbage=None):
+    """
+    Append PDFs to a new file, chunk_size inputs at a time.
+    
+    After each chunk the output is saved incrementally and closed, so only
+    the pages of one chunk are held in memory, whatever the number of
+    inputs. The file is then rewritten once with the given garbage level
+    (4 deduplicates fonts and images shared between inputs); garbage=None
+    keeps the incremental file as is (intermediates of a parallel merge).
+    
+    Returns:
+        int: Number of pages written
+    """
+    work_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    chunks = [pdf_paths[i:i + chunk_size] for i in range(0, len(pdf_paths), chunk_size)]
+    try:
+        for index, chunk in enumerate(chunks):
+            doc = fitz.open(work_path) if index else fitz.open()
+            try:
+                for pdf_path in chunk:
+                    with phase('open'):
+                        input_doc = fitz.open(pdf_path)
+                    with phase('process'), input_doc:
+                        doc.insert_pdf(input_doc)
+                page_count = len(doc)
+                
+                with phase('save'):
+                    if len(chunks) == 1:
+                        doc.save(output_path, garbage=garbage or 0)
+                        return page_count
+                    if index:
+                        doc.saveIncr()
+                    else:
+                        doc.save(work_path)
+            finally:
+                doc.close()
+        
+        with phase('save'):
+            if garbage is None:
+                os.replace(work_path, output_path)
+            else:
+                with fitz.open(work_path) as doc:
+                    doc.save(output_path, garbage=garbage)
+        return page_count
+    finally:
+        if os.path.exists(work_path):
+            os.remove(work_path)
+
+
+def _merge_group(pdf_paths, output_path, chunk_size):
+    """Merge one group of inputs of a tree merge (runs in a worker process)."""
+    _append_in_chunks(pdf_paths, output_path, chunk_size)
+    return output_path
+
+
+@timed_operation('merge_pdfs')
+def merge_pdfs(pdf_paths, output_name=None, chunk_size=None, workers=None):
     """
     Merge multiple PDF files into one.
     
+    Inputs are appended in chunks with incremental saves, so peak memory
+    stays about the same for hundreds of inputs. With several workers
+    (settings.PDF_MERGE_WORKERS), contiguous groups of inputs are merged
+    in parallel processes and the intermediates are then merged in order.
+    Shared fonts and images are deduplicated by the final save when
+    settings.PDF_MERGE_DEDUPE is on (garbage=4; it compares every pair of
+    streams of equal length, so it slows down on many same-size images).
+    
     Args:
         pdf_paths (list): List of absolute paths to PDF files in desired merge order
         output_name (str, optional): Custom name for output file (without .pdf extension)
+        chunk_size (int, optional): Inputs appended between incremental saves
+                                    (default: settings.PDF_MERGE_CHUNK_SIZE)
+        workers (int, optional): Processes for a parallel merge (1 = in-process)
     
     Returns:
         str: Path to the merged PDF file
@@ -167,49 +344,220 @@ def merge_pdfs(pdf_paths, output_name=None):
         if not os.path.exists(pdf_path):
             raise ValueError(f"PDF file not found: {pdf_path}")
     
-    # Create output document
-    output_doc = fitz.open()
+    chunk_size = max(1, chunk_size or getattr(settings, 'PDF_MERGE_CHUNK_SIZE', MERGE_CHUNK_SIZE))
+    workers = workers or getattr(settings, 'PDF_MERGE_WORKERS', None) or 1
+    
+    # Generate output filename
+    if output_name:
+        # User provided custom name
+        filename = f"{output_name}.pdf"
+    else:
+        # Generate timestamp-based name
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"merged_{timestamp}.pdf"
+    
+    # Save to processed directory
+    output_path = os.path.join(settings.MEDIA_ROOT, 'processed', filename)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
+    intermediates = []
     try:
-        # Append each PDF to the output document
-        for pdf_path in pdf_paths:
-            with fitz.open(pdf_path) as input_doc:
-                output_doc.insert_pdf(input_doc)
-        
-        # Generate output filename
-        if output_name:
-            # User provided custom name
-            filename = f"{output_name}.pdf"
-        else:
-            # Generate timestamp-based name
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"merged_{timestamp}.pdf"
-        
-        # Save to processed directory
-        output_path = os.path.join(settings.MEDIA_ROOT, 'processed', filename)
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        output_doc.save(output_path)
-        output_doc.close()
-        
+        # A parallel merge pays off only when each group spans several chunks
+        groups = min(workers, len(pdf_paths) // chunk_size)
+        if groups > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            
+            size = -(-len(pdf_paths) // groups)
+            tasks = [pdf_paths[i:i + size] for i in range(0, len(pdf_paths), size)]
+            intermediates = [f"{output_path}.{uuid.uuid4().hex}.part" for _ in tasks]
+            with phase('process'), ProcessPoolExecutor(max_workers=len(tasks)) as executor:
+                list(executor.map(_merge_group, tasks, intermediates, [chunk_size] * len(tasks)))
+            # Each intermediate is already large: append them one at a time
+            pdf_paths, chunk_size = intermediates, 1
+        
+        garbage = 4 if getattr(settings, 'PDF_MERGE_DEDUPE', True) else 1
+        current_operation().pages = _append_in_chunks(pdf_paths, output_path, chunk_size, garbage)
+        current_operation().output(output_path)
         return output_path
         
     except Exception as e:
-        output_doc.close()
         raise Exception(f"Error merging PDFs: {str(e)}")
+    finally:
+        for path in intermediates:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# Quality presets for compress_pdf: JPEG quality and the resolution above
+# which images are downsampled
+COMPRESSION_PRESETS = {
+    'low': {'quality': 50, 'max_dpi': 96},      # Max compression
+    'medium': {'quality': 75, 'max_dpi': 150},  # Balanced
+    'high': {'quality': 90, 'max_dpi': 220}     # Minimal loss
+}
+
+
+def _recompress_image(image_bytes, scale, quality):
+    """
+    Downsample and re-encode one image as JPEG (runs in a worker process).
+
+    Args:
+        image_bytes: Image as returned by doc.extract_image()['image']
+        scale: Resize factor (<= 1.0)
+        quality: JPEG quality (1-95)
+
+    Returns:
+        Tuple (jpeg_bytes, width, height, colorspace) or None if the image
+        cannot be decoded
+    """
+    import io
+    from PIL import Image
+
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        img.load()
+    except Exception:
+        return None
+
+    if img.mode not in ('L', 'RGB'):
+        img = img.convert('L' if img.mode in ('1', 'LA', 'I', 'I;16') else 'RGB')
+
+    if scale < 1.0:
+        new_size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+        img = img.resize(new_size, Image.LANCZOS)
+
+    out = io.BytesIO()
+    img.save(out, 'JPEG', quality=quality, optimize=True)
+    colorspace = '/DeviceGray' if img.mode == 'L' else '/DeviceRGB'
+    return out.getvalue(), img.width, img.height, colorspace
+
+
+def _optimize_images(doc, quality, max_dpi, workers=None, progress=None):
+    """
+    Recompress the images of an open document in place.
+
+    Each image xref is handled once, however many pages show it, and images
+    with byte-identical streams are recompressed only once (save with
+    garbage=4 then merges the identical results). Images shown above max_dpi
+    are downsampled; an image is only replaced if the result is smaller.
+
+    Args:
+        progress: Called with (fraction done, message): the page scan is the
+                  first 20%, the recompressed images the rest
+
+    Returns:
+        Dict with per-image byte savings and totals
+    """
+    # 1. Unique image xrefs and the highest resolution each one is shown at
+    display_dpi = {}
+    for page_number, page in enumerate(doc, 1):
+        if progress:
+            progress(0.2 * page_number / len(doc), f'Scanning page {page_number}/{len(doc)}')
+        for img in page.get_images(full=True):
+            xref, smask, width, height, bpc = img[0], img[1], img[2], img[3], img[4]
+            # Masked images and 1-bit scans are left alone (JPEG has no alpha,
+            # and bilevel images are already stored efficiently)
+            if smask or bpc < 8 or doc.xref_get_key(xref, "ImageMask")[1] == 'true':
+                continue
+            dpi = 0
+            for rect in page.get_image_rects(xref):
+                if rect.width > 0 and rect.height > 0:
+                    dpi = max(dpi, width * 72 / rect.width, height * 72 / rect.height)
+            display_dpi[xref] = max(display_dpi.get(xref, 0), dpi)
+
+    # 2. Group xrefs with identical streams
+    groups = {}
+    for xref in display_dpi:
+        raw = doc.xref_stream_raw(xref)
+        groups.setdefault(hashlib.sha256(raw).hexdigest(), []).append((xref, len(raw)))
+
+    tasks = []
+    for members in groups.values():
+        dpi = max(display_dpi[xref] for xref, _ in members)
+        scale = min(1.0, max_dpi / dpi) if dpi else 1.0
+        tasks.append((members, doc.extract_image(members[0][0])['image'], scale))
 
+    # 3. Recompress, in parallel when there is enough work
+    def recompressed(results):
+        for index, result in enumerate(results, 1):
+            if progress:
+                progress(0.2 + 0.8 * index / len(tasks), f'Recompressing image {index}/{len(tasks)}')
+            yield result
 
-def compress_pdf(pdf_path, quality='medium', output_name=None):
+    workers = workers or getattr(settings, 'PDF_COMPRESS_WORKERS', None) or os.cpu_count() or 1
+    if workers > 1 and len(tasks) >= 4:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(recompressed(executor.map(
+                _recompress_image,
+                [task[1] for task in tasks], [task[2] for task in tasks], [quality] * len(tasks),
+                chunksize=max(1, len(tasks) // (workers * 4))
+            )))
+    else:
+        results = list(recompressed(_recompress_image(task[1], task[2], quality) for task in tasks))
+
+    # 4. Write back the smaller streams
+    stats = {
+        'images_total': len(display_dpi),
+        'images_recompressed': 0,
+        'images_deduplicated': sum(len(members) - 1 for members in groups.values()),
+        'bytes_before': 0,
+        'bytes_after': 0,
+        'images': []
+    }
+
+    for (members, _, scale), result in zip(tasks, results):
+        for index, (xref, before) in enumerate(members):
+            stats['bytes_before'] += before
+            if result is None or len(result[0]) >= before:
+                stats['bytes_after'] += before
+                continue
+
+            jpeg_bytes, new_width, new_height, colorspace = result
+            doc.update_stream(xref, jpeg_bytes, compress=False)
+            doc.xref_set_key(xref, "Filter", "/DCTDecode")
+            doc.xref_set_key(xref, "DecodeParms", "null")
+            doc.xref_set_key(xref, "Decode", "null")
+            doc.xref_set_key(xref, "Width", str(new_width))
+            doc.xref_set_key(xref, "Height", str(new_height))
+            doc.xref_set_key(xref, "ColorSpace", colorspace)
+            doc.xref_set_key(xref, "BitsPerComponent", "8")
+
+            # Duplicates collapse into the first copy when saved with garbage=4
+            after = len(jpeg_bytes) if index == 0 else 0
+            stats['bytes_after'] += after
+            stats['images_recompressed'] += 1
+            stats['images'].append({
+                'xref': xref,
+                'bytes_before': before,
+                'bytes_after': after,
+                'width': new_width,
+                'height': new_height,
+                'downsampled': scale < 1.0
+            })
+
+    return stats
+
+
+@timed_operation('compress_pdf')
+def compress_pdf(pdf_path, quality='medium', output_name=None, progress=None):
     """
     Compress PDF by reducing image quality and optimizing.
     
+    Images shown above the preset's resolution are downsampled, all eligible
+    images are re-encoded as JPEG at the preset's quality, then the file is
+    saved with garbage collection, object deduplication and deflate.
+    
     Args:
         pdf_path (str): Absolute path to source PDF
         quality (str): 'low' (max compression), 'medium' (balanced), 'high' (minimal compression)
         output_name (str, optional): Custom output filename
+        progress (callable, optional): Called with (fraction done, message)
+            per page scanned and per image recompressed
     
     Returns:
-        tuple: (output_path, original_size, compressed_size, compression_ratio)
+        tuple: (output_path, original_size, compressed_size, compression_ratio, image_stats)
     
     Raises:
         ValueError: If PDF file doesn't exist
@@ -220,35 +568,19 @@ def compress_pdf(pdf_path, quality='medium', output_name=None):
     # Get original file size
     original_size = os.path.getsize(pdf_path)
     
-    # Quality settings: (image_quality, deflate)
-    quality_settings = {
-        'low': {'quality': 50, 'deflate': True},      # Max compression
-        'medium': {'quality': 75, 'deflate': True},   # Balanced
-        'high': {'quality': 90, 'deflate': True}      # Minimal loss
-    }
-    
-    settings_used = quality_settings.get(quality, quality_settings['medium'])
+    settings_used = COMPRESSION_PRESETS.get(quality, COMPRESSION_PRESETS['medium'])
     
     try:
         # Open source document
-        doc = fitz.open(pdf_path)
-        
-        # Process each page
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Get images on page
-            image_list = page.get_images(full=True)
-            
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                
-                # Extract image
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                
-                # Re-compress image with lower quality
-                # Note: PyMuPDF will handle this during save with deflate
+        with phase('open'):
+            doc = fitz.open(pdf_path)
+        current_operation().pages = len(doc)
+        
+        # Downsample / re-encode images
+        with phase('process'):
+            image_stats = _optimize_images(
+                doc, settings_used['quality'], settings_used['max_dpi'], progress=progress
+            )
         
         # Generate output filename
         if output_name:
@@ -262,16 +594,18 @@ def compress_pdf(pdf_path, quality='medium', output_name=None):
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
         # Save with compression options
-        doc.save(
-            output_path,
-            garbage=4,           # Maximum garbage collection
-            deflate=settings_used['deflate'],  # Compress streams
-            clean=True           # Clean up unused objects
-        )
+        with phase('save'):
+            doc.save(
+                output_path,
+                garbage=4,           # Maximum garbage collection + merge duplicate objects
+                deflate=True,        # Compress streams
+                clean=True           # Clean up unused objects
+            )
         doc.close()
         
         # Get compressed file size
         compressed_size = os.path.getsize(output_path)
+        current_operation().output_bytes = compressed_size
         
         # Calculate compression ratio
         if original_size > 0:
@@ -279,12 +613,274 @@ def compress_pdf(pdf_path, quality='medium', output_name=None):
         else:
             compression_ratio = 0
         
-        return output_path, original_size, compressed_size, compression_ratio
+        return output_path, original_size, compressed_size, compression_ratio, image_stats
         
     except Exception as e:
         raise Exception(f"Error compressing PDF: {str(e)}")
 
 
+# Processed watermark images are resized to fit in this box
+WATERMARK_MAX_IMAGE_SIZE = 800
+
+
+def _prepare_watermark_image(image_path, rotation, opacity):
+    """
+    Resize, rotate and fade a watermark image, cached by content hash.
+    
+    The result only depends on the image bytes, rotation and opacity, so
+    the same logo stamped by later jobs is read from
+    PDF_CACHE_DIR/watermarks instead of being processed again. A cache hit
+    refreshes the file's mtime; evict_watermark_cache deletes the unused ones.
+    
+    Returns:
+        str: Path of the processed PNG
+    """
+    if not os.path.exists(image_path):
+        raise ValueError(f"Watermark image not found: {image_path}")
+    
+    key = hashlib.sha256()
+    key.update(file_sha256(image_path).encode())
+    key.update(f"|{rotation}|{opacity}|{WATERMARK_MAX_IMAGE_SIZE}".encode())
+    digest = key.hexdigest()
+    cached_path = os.path.join(get_cache_dir('watermarks', digest), f"{digest}.png")
+    try:
+        os.utime(cached_path)
+        return cached_path
+    except FileNotFoundError:
+        pass  # Not cached yet, or just evicted
+    
+    # Apply opacity and rotation to image using PIL
+    from PIL import Image as PILImage
+    
+    pil_img = PILImage.open(image_path)
+    
+    # Convert to RGBA if not already
+    if pil_img.mode != 'RGBA':
+        pil_img = pil_img.convert('RGBA')
+    
+    # CRITICAL: Resize to reasonable dimensions to prevent huge PDFs
+    max_size = WATERMARK_MAX_IMAGE_SIZE
+    if pil_img.width > max_size or pil_img.height > max_size:
+        ratio = min(max_size / pil_img.width, max_size / pil_img.height)
+        new_size = (int(pil_img.width * ratio), int(pil_img.height * ratio))
+        pil_img = pil_img.resize(new_size, PILImage.LANCZOS)
+    
+    # Apply rotation (expand=True to keep entire rotated image)
+    if rotation != 0:
+        pil_img = pil_img.rotate(-rotation, expand=True, resample=PILImage.BICUBIC)
+    
+    # Apply opacity by adjusting alpha channel
+    alpha = pil_img.split()[3]
+    alpha = alpha.point(lambda p: int(p * opacity))
+    pil_img.putalpha(alpha)
+    
+    # Unique temp name: batch workers may prepare the same image concurrently
+    tmp_path = f"{cached_path}.{uuid.uuid4().hex}.tmp"
+    pil_img.save(tmp_path, 'PNG', optimize=True, compress_level=9)
+    os.replace(tmp_path, cached_path)
+    return cached_path
+
+
+def evict_watermark_cache(max_age_seconds: float) -> Tuple[int, int]:
+    """
+    Delete processed watermark images not used for max_age_seconds.
+
+    Used by cleanup_old_pdfs; leftover temp files of interrupted writes
+    are old by then too and go the same way.
+
+    Returns:
+        Tuple (files_deleted, bytes_freed)
+    """
+    base = str(getattr(settings, 'PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache')))
+    root = os.path.join(base, 'watermarks')
+    if not os.path.isdir(root):
+        return 0, 0
+
+    threshold = datetime.now().timestamp() - max_age_seconds
+    deleted = freed = 0
+    for directory, _, files in os.walk(root, topdown=False):
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime >= threshold:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            deleted += 1
+            freed += stat.st_size
+        if directory != root:
+            try:
+                os.rmdir(directory)  # Only succeeds once empty
+            except OSError:
+                pass
+    return deleted, freed
+
+
+def _draw_watermark(stamp_page, watermark_type, content, position, rotation, font_size):
+    """Draw the watermark on a blank page the size of the target pages."""
+    page_width = stamp_page.rect.width
+    page_height = stamp_page.rect.height
+    
+    if watermark_type == 'text':
+        # Calculate text dimensions (approximate)
+        text_width = len(content) * font_size * 0.6
+        text_height = font_size
+        
+        x, y = _calculate_position(position, page_width, page_height, text_width, text_height)
+        
+        # Rotate around the text center point (insert_text's own
+        # `rotate` only accepts multiples of 90)
+        morph = None
+        if rotation != 0:
+            center = fitz.Point(x + text_width / 2, y - text_height / 2)
+            morph = (center, fitz.Matrix(rotation))
+        
+        # PyMuPDF text has no opacity here, so a light gray stands in for it
+        stamp_page.insert_text(
+            point=(x, y),
+            text=content,
+            fontsize=font_size,
+            fontname="hebo",  # Helvetica-Bold (Base-14)
+            color=(0.5, 0.5, 0.5),
+            overlay=True,
+            morph=morph
+        )
+    else:
+        # content is the processed image (opacity and rotation applied)
+        with fitz.open(content) as img_doc:
+            img_rect = img_doc[0].rect
+        
+        # Scale image to reasonable size (max 30% of page, don't upscale)
+        scale = min(page_width * 0.3 / img_rect.width, page_height * 0.3 / img_rect.height, 1.0)
+        img_width = img_rect.width * scale
+        img_height = img_rect.height * scale
+        
+        x, y = _calculate_position(position, page_width, page_height, img_width, img_height)
+        stamp_page.insert_image(fitz.Rect(x, y, x + img_width, y + img_height), filename=content, overlay=True)
+
+
+def _xobject_resources(doc, page_xref):
+    """
+    (xref, key prefix) of the dictionary holding the page's XObject
+    resources, or None when the page inherits its resources.
+    """
+    kind, value = doc.xref_get_key(page_xref, 'Resources')
+    if kind == 'xref':
+        xref, prefix = int(value.split()[0]), ''
+    elif kind == 'dict':
+        xref, prefix = page_xref, 'Resources/'
+    else:
+        return None
+    
+    kind, value = doc.xref_get_key(xref, f"{prefix}XObject")
+    if kind == 'xref':
+        return int(value.split()[0]), ''
+    if kind in ('dict', 'null'):
+        return xref, f"{prefix}XObject/"
+    return None
+
+
+def _show_stamp(page, stamps, stamp_number, shown):
+    """
+    Show a stamp page on a page, reusing the references made for an
+    earlier page with the same geometry.
+    
+    show_pdf_page creates the stamp's Form XObject once per document, but
+    still adds a wrapper XObject, a resource name and a content stream to
+    every page. A page shaped like one already stamped gets that page's
+    wrapper and content stream instead, so each page only gains two
+    references. Anything unusual, including a content stream or resources
+    PyMuPDF writes differently, falls back to show_pdf_page.
+    
+    Args:
+        page: Target page
+        stamps: Stamp document
+        stamp_number: Page of the stamp document to show
+        shown: Dict shared by the calls for one document
+    """
+    doc = page.parent
+    page_xref = page.xref  # Looked up in the page tree on every access
+    key = (stamp_number, tuple(page.mediabox), tuple(page.transformation_matrix))
+    resources = _xobject_resources(doc, page_xref)
+    
+    if key in shown and resources:
+        name, form_xref, stream_xref = shown[key]
+        xref, prefix = resources
+        try:
+            kind, value = doc.xref_get_key(xref, f"{prefix}{name}")
+            if kind == 'null' or value == f"{form_xref} 0 R":
+                if kind == 'null':
+                    doc.xref_set_key(xref, f"{prefix}{name}", f"{form_xref} 0 R")
+                page.wrap_contents()  # ensure a balanced graphics state
+                contents = page.get_contents() + [stream_xref]
+                doc.xref_set_key(page_xref, 'Contents', '[' + ' '.join(f"{c} 0 R" for c in contents) + ']')
+                return
+        except (RuntimeError, ValueError):
+            del shown[key]  # Stamp this page (and the next ones) the usual way
+    
+    page.show_pdf_page(page.rect, stamps, stamp_number, overlay=True)
+    if resources and key not in shown:
+        try:
+            # The last content stream should be ' q /<name> Do Q '
+            stream_xref = page.get_contents()[-1]
+            match = re.search(rb'/([^\s/\[\]<>()]+)\s+Do\b', doc.xref_stream(stream_xref) or b'')
+            if match:
+                name = match.group(1).decode('latin-1')
+                xref, prefix = _xobject_resources(doc, page_xref)
+                kind, value = doc.xref_get_key(xref, f"{prefix}{name}")
+                if kind == 'xref':
+                    shown[key] = (name, int(value.split()[0]), stream_xref)
+        except (IndexError, TypeError, RuntimeError, ValueError):
+            pass  # Not reused; later pages call show_pdf_page too
+
+
+def _apply_watermark(doc, watermark_type, watermark_content, options=None):
+    """
+    Stamp a watermark on every page of an open document (in memory).
+    
+    The watermark is drawn once per distinct page size on a stamp document,
+    and every page shows that stamp (see _show_stamp). Its content becomes
+    a single Form XObject that all pages reference, so the text is laid out
+    and the image embedded only once, however many pages the document has.
+    
+    Args: see add_watermark
+    """
+    # Default options
+    if options is None:
+        options = {}
+    
+    position = options.get('position', 'center')
+    opacity = float(options.get('opacity', 0.3))
+    rotation = int(options.get('rotation', 45))
+    font_size = int(options.get('font_size', 48))
+    
+    if watermark_type == 'image':
+        content = _prepare_watermark_image(watermark_content, rotation, opacity)
+    else:
+        content = watermark_content
+    
+    page_sizes = [(round(page.rect.width, 2), round(page.rect.height, 2)) for page in doc]
+    
+    # All stamps must exist before the first show_pdf_page: the stamp
+    # document cannot change once its objects are being grafted
+    stamps = fitz.open()
+    stamp_pages = {}  # (width, height) -> stamp page number
+    try:
+        for size in dict.fromkeys(page_sizes):
+            stamp_page = stamps.new_page(width=size[0], height=size[1])
+            _draw_watermark(stamp_page, watermark_type, content, position, rotation, font_size)
+            stamp_pages[size] = stamp_page.number
+        
+        shown = {}
+        for page, size in zip(doc, page_sizes):
+            _show_stamp(page, stamps, stamp_pages[size], shown)
+    finally:
+        stamps.close()
+
+
+@timed_operation('add_watermark')
 def add_watermark(pdf_path, watermark_type, watermark_content, options=None):
     """
     Add watermark to PDF pages.
@@ -305,131 +901,12 @@ def add_watermark(pdf_path, watermark_type, watermark_content, options=None):
     if not os.path.exists(pdf_path):
         raise ValueError(f"PDF file not found: {pdf_path}")
     
-    # Default options
-    if options is None:
-        options = {}
-    
-    position = options.get('position', 'center')
-    opacity = float(options.get('opacity', 0.3))
-    rotation = int(options.get('rotation', 45))
-    font_size = int(options.get('font_size', 48))
-    
     try:
-        doc = fitz.open(pdf_path)
-        
-        # Pre-process image watermark ONCE before page loop (to avoid huge file sizes)
-        temp_img_path = None
-        if watermark_type == 'image':
-            if not os.path.exists(watermark_content):
-                raise ValueError(f"Watermark image not found: {watermark_content}")
-            
-            # Apply opacity and rotation to image using PIL
-            from PIL import Image as PILImage
-            
-            # Open image with PIL
-            pil_img = PILImage.open(watermark_content)
-            
-            # Convert to RGBA if not already
-            if pil_img.mode != 'RGBA':
-                pil_img = pil_img.convert('RGBA')
-            
-            # CRITICAL: Resize to reasonable dimensions to prevent huge PDFs
-            # Max 800x800 for watermarks is more than enough
-            max_size = 800
-            if pil_img.width > max_size or pil_img.height > max_size:
-                ratio = min(max_size / pil_img.width, max_size / pil_img.height)
-                new_size = (int(pil_img.width * ratio), int(pil_img.height * ratio))
-                pil_img = pil_img.resize(new_size, PILImage.LANCZOS)
-            
-            # Apply rotation (expand=True to keep entire rotated image)
-            if rotation != 0:
-                pil_img = pil_img.rotate(-rotation, expand=True, resample=PILImage.BICUBIC)
-            
-            # Apply opacity by adjusting alpha channel
-            alpha = pil_img.split()[3]  # Get alpha channel
-            alpha = alpha.point(lambda p: int(p * opacity))  # Apply opacity
-            pil_img.putalpha(alpha)
-            
-            # Save temporarily with compression
-            temp_img_path = watermark_content.replace('.', f'_watermark.')
-            pil_img.save(temp_img_path, 'PNG', optimize=True, compress_level=9)
-        
-        # Process each page
-        for page in doc:
-            page_rect = page.rect
-            page_width = page_rect.width
-            page_height = page_rect.height
-            
-            if watermark_type == 'text':
-                # Text watermark
-                text = watermark_content
-                
-                # Calculate text dimensions (approximate)
-                text_width = len(text) * font_size * 0.6
-                text_height = font_size
-                
-                # Calculate position
-                x, y = _calculate_position(position, page_width, page_height, text_width, text_height)
-                
-                # Create rotation matrix
-                if rotation != 0:
-                    # Rotate around text center point
-                    center_x = x + text_width / 2
-                    center_y = y + text_height / 2
-                    mat = fitz.Matrix(1, 0, 0, 1, center_x, center_y)
-                    mat = mat * fitz.Matrix(rotation)
-                    mat = mat * fitz.Matrix(1, 0, 0, 1, -center_x, -center_y)
-                else:
-                    mat = fitz.Matrix(1, 0, 0, 1, 0, 0)
-                
-                # Insert text with opacity
-                page.insert_text(
-                    point=(x, y),
-                    text=text,
-                    fontsize=font_size,
-                    fontname="helv-bold",
-                    color=(0.5, 0.5, 0.5),
-                    rotate=rotation,
-                    overlay=True,
-                    morph=(fitz.Point(x, y), mat)
-                )
-                
-                # Apply opacity by adding transparent overlay
-                # Note: PyMuPDF doesn't directly support text opacity, 
-                # so we use a lighter color for transparency effect
-                
-            elif watermark_type == 'image':
-                # Image already processed above, just insert it
-                img_doc = fitz.open(temp_img_path)
-                img_page = img_doc[0]
-                img_rect = img_page.rect
-                
-                # Scale image to reasonable size (max 30% of page)
-                max_width = page_width * 0.3
-                max_height = page_height * 0.3
-                
-                scale = min(max_width / img_rect.width, max_height / img_rect.height, 1.0)  # Don't upscale
-                img_width = img_rect.width * scale
-                img_height = img_rect.height * scale
-                
-                # Calculate position
-                x, y = _calculate_position(position, page_width, page_height, img_width, img_height)
-                
-                # Create target rectangle
-                target_rect = fitz.Rect(x, y, x + img_width, y + img_height)
-                
-                # Insert image with opacity and rotation already applied
-                page.insert_image(
-                    target_rect,
-                    filename=temp_img_path,
-                    overlay=True
-                )
-                
-                img_doc.close()
-        
-        # Clean up temp image file
-        if temp_img_path and os.path.exists(temp_img_path):
-            os.remove(temp_img_path)
+        with phase('open'):
+            doc = fitz.open(pdf_path)
+        current_operation().pages = len(doc)
+        with phase('process'):
+            _apply_watermark(doc, watermark_type, watermark_content, options)
         
         # Generate output filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -439,15 +916,37 @@ def add_watermark(pdf_path, watermark_type, watermark_content, options=None):
         output_path = os.path.join(settings.MEDIA_ROOT, 'processed', filename)
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        doc.save(output_path)
+        # garbage=4 merges the identical per-page references to the stamp
+        with phase('save'):
+            doc.save(output_path, garbage=4, deflate=True)
         doc.close()
         
+        current_operation().output(output_path)
         return output_path
         
     except Exception as e:
         raise Exception(f"Error adding watermark: {str(e)}")
 
 
+def _apply_rotation(doc, rotation_angle, page_range=None):
+    """
+    Rotate pages of an open document (in memory).
+    
+    Args: see rotate_pages
+    """
+    if rotation_angle not in [90, 180, 270]:
+        raise ValueError("Rotation angle must be 90, 180, or 270 degrees")
+    
+    # Determine which pages to rotate (empty range = all pages)
+    pages_to_rotate = as_page_set(page_range or None, len(doc))
+    
+    # Rotate selected pages
+    for page_idx in pages_to_rotate:
+        page = doc[page_idx]
+        page.set_rotation(rotation_angle)
+
+
+@timed_operation('rotate_pages')
 def rotate_pages(pdf_path, rotation_angle, page_range=None):
     """
     Rotate specific pages in PDF.
@@ -467,150 +966,408 @@ def rotate_pages(pdf_path, rotation_angle, page_range=None):
         raise ValueError("Rotation angle must be 90, 180, or 270 degrees")
     
     try:
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
+        with phase('open'):
+            doc = fitz.open(pdf_path)
+        current_operation().pages = len(doc)
+        with phase('process'):
+            _apply_rotation(doc, rotation_angle, page_range)
         
-        # Determine which pages to rotate
-        if page_range:
-            pages_to_rotate = parse_page_range(page_range, total_pages)
-        else:
-            pages_to_rotate = list(range(total_pages))  # All pages
+        # Generate output filename
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"rotated_{timestamp}.pdf"
         
-        # Rotate selected pages
-        for page_idx in pages_to_rotate:
-            page = doc[page_idx]
-            page.set_rotation(rotation_angle)
+        # Save to processed directory
+        output_path = os.path.join(settings.MEDIA_ROOT, 'processed', filename)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        
+        with phase('save'):
+            doc.save(output_path)
+        doc.close()
+        
+        current_operation().output(output_path)
+        return output_path
+        
+    except Exception as e:
+        raise Exception(f"Error rotating pages: {str(e)}")
+
+
+def _apply_page_numbers(doc, options=None):
+    """
+    Stamp page numbers on an open document (in memory).
+    
+    Args: see add_page_numbers
+    """
+    # Default options
+    if options is None:
+        options = {}
+    
+    position = options.get('position', 'bottom-center')
+    format_type = options.get('format', 'number')
+    font_size = int(options.get('font_size', 12))
+    start_page = int(options.get('start_page', 1))
+    
+    total_pages = len(doc)
+    
+    # Pages to number: the 'pages' range (default all) from start_page on
+    pages_to_number = as_page_set(options.get('pages') or None, total_pages)
+    pages_to_number &= PageSet([(start_page - 1, total_pages)])
+    
+    for page_idx in pages_to_number:
+        page = doc[page_idx]
+        
+        page_rect = page.rect
+        page_width = page_rect.width
+        page_height = page_rect.height
+        
+        # Calculate page number for display
+        display_page_num = page_idx + 1
+        
+        # Format the page number text
+        if format_type == 'number':
+            page_text = str(display_page_num)
+        elif format_type == 'page_number':
+            page_text = f"Page {display_page_num}"
+        elif format_type == 'of_total':
+            page_text = f"{display_page_num} of {total_pages}"
+        else:
+            page_text = str(display_page_num)
+        
+        # Calculate position
+        margin = 30
+        text_width = len(page_text) * font_size * 0.6  # Approximate width
+        
+        if position == 'bottom-center':
+            x = (page_width - text_width) / 2
+            y = page_height - margin
+        elif position == 'bottom-left':
+            x = margin
+            y = page_height - margin
+        elif position == 'bottom-right':
+            x = page_width - text_width - margin
+            y = page_height - margin
+        elif position == 'top-center':
+            x = (page_width - text_width) / 2
+            y = margin + font_size
+        elif position == 'top-left':
+            x = margin
+            y = margin + font_size
+        elif position == 'top-right':
+            x = page_width - text_width - margin
+            y = margin + font_size
+        else:
+            x = (page_width - text_width) / 2
+            y = page_height - margin
+        
+        # Insert page number
+        page.insert_text(
+            point=(x, y),
+            text=page_text,
+            fontsize=font_size,
+            fontname="helv",
+            color=(0, 0, 0),
+            overlay=True
+        )
+
+
+@timed_operation('add_page_numbers')
+def add_page_numbers(pdf_path, options=None):
+    """
+    Add page numbers to PDF pages.
+    
+    Args:
+        pdf_path: Source PDF absolute path
+        options: dict with keys:
+            - position: 'bottom-center', 'bottom-left', 'bottom-right', 
+                       'top-center', 'top-left', 'top-right'
+            - format: 'number' (1,2,3), 'page_number' (Page 1), 'of_total' (1 of 10)
+            - font_size: int (default 12)
+            - start_page: int (default 1, 1-indexed)
+            - pages: optional page range string like '2-', 'odd' or '1-10&even'
+    
+    Returns:
+        str: Path to PDF with page numbers
+    """
+    if not os.path.exists(pdf_path):
+        raise ValueError(f"PDF file not found: {pdf_path}")
+    
+    try:
+        with phase('open'):
+            doc = fitz.open(pdf_path)
+        current_operation().pages = len(doc)
+        with phase('process'):
+            _apply_page_numbers(doc, options)
         
         # Generate output filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"rotated_{timestamp}.pdf"
+        filename = f"numbered_{timestamp}.pdf"
         
         # Save to processed directory
         output_path = os.path.join(settings.MEDIA_ROOT, 'processed', filename)
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        doc.save(output_path)
+        with phase('save'):
+            doc.save(output_path)
         doc.close()
         
+        current_operation().output(output_path)
         return output_path
         
-    except Exception as e:
-        raise Exception(f"Error rotating pages: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Error adding page numbers: {str(e)}")
+
+
+# ==========================================
+# Operation chains (open once, save once)
+# ==========================================
+# A chain is a list of steps such as
+#   [{'operation': 'rotate', 'rotation_angle': 90, 'page_range': '1-3'},
+#    {'operation': 'watermark', 'watermark_type': 'text', 'watermark_content': 'DRAFT'},
+#    {'operation': 'page_numbers', 'options': {'position': 'bottom-right'}},
+#    {'operation': 'compress', 'quality': 'medium'}]
+# whose keys are the keyword arguments of the single-file functions above.
+# 'split' ({'ranges': [[1, 3], [4, 6]]}) may only be the last step.
+
+def _compress_step(doc, quality='medium', workers=None):
+    preset = COMPRESSION_PRESETS.get(quality, COMPRESSION_PRESETS['medium'])
+    return _optimize_images(doc, preset['quality'], preset['max_dpi'], workers=workers)
+
+
+OPERATION_STEPS = {
+    'rotate': _apply_rotation,
+    'watermark': _apply_watermark,
+    'page_numbers': _apply_page_numbers,
+    'compress': _compress_step,
+}
+
+
+def validate_operations(operations):
+    """
+    Check a chain of operations before any document is opened.
+    
+    Args:
+        operations: List of step dicts (see above)
+    
+    Returns:
+        List of normalized step dicts
+    
+    Raises:
+        ValueError: On unknown operations, missing arguments or a misplaced split
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("At least one operation is required")
+    
+    steps = []
+    for index, step in enumerate(operations):
+        if not isinstance(step, dict) or 'operation' not in step:
+            raise ValueError(f"Step {index + 1} has no 'operation'")
+        step = dict(step)
+        name = step['operation']
+        
+        if name == 'split':
+            if index != len(operations) - 1:
+                raise ValueError("'split' can only be the last operation")
+            try:
+                step['ranges'] = [(int(start), int(end)) for start, end in step['ranges']]
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("'split' needs 'ranges' as a list of [start, end] pairs")
+        elif name == 'rotate':
+            try:
+                step['rotation_angle'] = int(step['rotation_angle'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("'rotate' needs 'rotation_angle' (90, 180 or 270)")
+            if step['rotation_angle'] not in [90, 180, 270]:
+                raise ValueError("Rotation angle must be 90, 180, or 270 degrees")
+        elif name == 'watermark':
+            if step.get('watermark_type', 'text') not in ('text', 'image') or not step.get('watermark_content'):
+                raise ValueError("'watermark' needs 'watermark_type' and 'watermark_content'")
+            step.setdefault('watermark_type', 'text')
+        elif name == 'compress':
+            if step.get('quality', 'medium') not in COMPRESSION_PRESETS:
+                raise ValueError(f"Unknown compression quality: {step['quality']}")
+        elif name not in OPERATION_STEPS:
+            raise ValueError(f"Unknown operation: {name}")
+        steps.append(step)
+    
+    return steps
+
+
+def apply_operations(doc, operations, workers=None):
+    """
+    Run a validated chain on an open document, without saving it.
+    
+    The trailing 'split' step (if any) is left to the caller, since it
+    produces several files.
+    
+    Args:
+        doc: Open fitz.Document
+        operations: Steps returned by validate_operations
+        workers: Worker processes for image recompression (1 = in-process)
+    
+    Returns:
+        Dict with 'compressed' (bool) and 'image_stats' (or None)
+    """
+    summary = {'compressed': False, 'image_stats': None}
+    
+    for step in operations:
+        name = step['operation']
+        if name == 'split':
+            break
+        kwargs = {key: value for key, value in step.items() if key != 'operation'}
+        if name == 'compress':
+            summary['image_stats'] = _compress_step(doc, workers=workers, **kwargs)
+            summary['compressed'] = True
+        else:
+            OPERATION_STEPS[name](doc, **kwargs)
+    
+    return summary
+
+
+@timed_operation('process_document')
+def process_document(pdf_path, operations, output_dir, output_name=None, workers=None):
+    """
+    Open a PDF once, apply a chain of operations in memory and save once.
+    
+    Args:
+        pdf_path: Source PDF absolute path
+        operations: Steps returned by validate_operations
+        output_dir: Directory for the output file(s)
+        output_name: Output file name without extension (default: see _output_stem)
+        workers: Worker processes for image recompression (1 = in-process)
+    
+    Returns:
+        Dict with 'output_paths' (list), 'original_size', 'output_size'
+        and 'image_stats'
+    """
+    if not os.path.exists(pdf_path):
+        raise ValueError(f"PDF file not found: {pdf_path}")
+    
+    base_name = _output_stem(pdf_path, output_name)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    with phase('open'):
+        doc = fitz.open(pdf_path)
+    current_operation().pages = len(doc)
+    try:
+        with phase('process'):
+            summary = apply_operations(doc, operations, workers=workers)
+        
+        # Full garbage collection only when the chain asked for compression
+        if summary['compressed']:
+            save_options = {'garbage': 4, 'deflate': True, 'clean': True}
+        else:
+            save_options = {}
+        
+        last_step = operations[-1]
+        with phase('save'):
+            if last_step['operation'] == 'split':
+                output_paths = _write_page_ranges(
+                    doc, last_step['ranges'], output_dir, base_name,
+                    save_options={'garbage': 4, 'deflate': True, **save_options}
+                )
+            else:
+                output_path = os.path.join(output_dir, f"{base_name}.pdf")
+                doc.save(output_path, **save_options)
+                output_paths = [output_path]
+    finally:
+        doc.close()
+    
+    current_operation().output(output_paths)
+    return {
+        'output_paths': output_paths,
+        'original_size': os.path.getsize(pdf_path),
+        'output_size': sum(os.path.getsize(path) for path in output_paths),
+        'image_stats': summary['image_stats']
+    }
 
 
-def add_page_numbers(pdf_path, options=None):
+def run_pipeline(pdf_path, steps, output_name=None):
     """
-    Add page numbers to PDF pages.
+    Run several tools on one PDF with a single open and a single save.
+    
+    Equivalent to calling rotate_pages, add_watermark, add_page_numbers,
+    compress_pdf (and finally split_pdf) one after another, without the
+    intermediate files in media/processed.
     
     Args:
         pdf_path: Source PDF absolute path
-        options: dict with keys:
-            - position: 'bottom-center', 'bottom-left', 'bottom-right', 
-                       'top-center', 'top-left', 'top-right'
-            - format: 'number' (1,2,3), 'page_number' (Page 1), 'of_total' (1 of 10)
-            - font_size: int (default 12)
-            - start_page: int (default 1, 1-indexed)
+        steps: Ordered list of step dicts (see validate_operations)
+        output_name: Output file name without extension
     
     Returns:
-        str: Path to PDF with page numbers
+        Dict with 'output_paths', 'original_size', 'output_size', 'image_stats'
+    
+    Raises:
+        ValueError: If the PDF doesn't exist or the steps are invalid
     """
     if not os.path.exists(pdf_path):
         raise ValueError(f"PDF file not found: {pdf_path}")
     
-    # Default options
-    if options is None:
-        options = {}
+    steps = validate_operations(steps)
     
-    position = options.get('position', 'bottom-center')
-    format_type = options.get('format', 'number')
-    font_size = int(options.get('font_size', 12))
-    start_page = int(options.get('start_page', 1))
+    if not output_name:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_name = f"pipeline_{timestamp}"
     
     try:
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
-        
-        for page_idx, page in enumerate(doc):
-            if page_idx < start_page - 1:
-                continue  # Skip pages before start_page
-            
-            page_rect = page.rect
-            page_width = page_rect.width
-            page_height = page_rect.height
-            
-            # Calculate page number for display
-            display_page_num = page_idx + 1
-            
-            # Format the page number text
-            if format_type == 'number':
-                page_text = str(display_page_num)
-            elif format_type == 'page_number':
-                page_text = f"Page {display_page_num}"
-            elif format_type == 'of_total':
-                page_text = f"{display_page_num} of {total_pages}"
-            else:
-                page_text = str(display_page_num)
-            
-            # Calculate position
-            margin = 30
-            text_width = len(page_text) * font_size * 0.6  # Approximate width
-            
-            if position == 'bottom-center':
-                x = (page_width - text_width) / 2
-                y = page_height - margin
-            elif position == 'bottom-left':
-                x = margin
-                y = page_height - margin
-            elif position == 'bottom-right':
-                x = page_width - text_width - margin
-                y = page_height - margin
-            elif position == 'top-center':
-                x = (page_width - text_width) / 2
-                y = margin + font_size
-            elif position == 'top-left':
-                x = margin
-                y = margin + font_size
-            elif position == 'top-right':
-                x = page_width - text_width - margin
-                y = margin + font_size
-            else:
-                x = (page_width - text_width) / 2
-                y = page_height - margin
-            
-            # Insert page number
-            page.insert_text(
-                point=(x, y),
-                text=page_text,
-                fontsize=font_size,
-                fontname="helv",
-                color=(0, 0, 0),
-                overlay=True
-            )
-        
-        # Generate output filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"numbered_{timestamp}.pdf"
-        
-        # Save to processed directory
-        output_path = os.path.join(settings.MEDIA_ROOT, 'processed', filename)
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        doc.save(output_path)
-        doc.close()
-        
-        return output_path
-        
+        return process_document(
+            pdf_path, steps, os.path.join(settings.MEDIA_ROOT, 'processed'), output_name
+        )
     except Exception as e:
-        raise Exception(f"Error adding page numbers: {str(e)}")
+        raise Exception(f"Error running pipeline: {str(e)}")
+
+
+NO_TEXT_MESSAGE = "No text found in PDF. This might be a scanned document - try OCR instead."
+
+
+def format_page_text(page_num, page_text):
+    """Page block used in extracted text output ('' for pages without text)."""
+    if not page_text.strip():
+        return ''
+    return f"=== Page {page_num} ===\n{page_text}\n"
+
+
+def iter_text_pages(pdf_path, sha256=None):
+    """
+    Yield (page_number, text) for each page, one page at a time.
+    
+    Reads the text index when it is already built; otherwise every page is
+    parsed right before it is yielded, so the first page is available
+    without waiting for the whole document.
+    
+    Args:
+        pdf_path: Source PDF absolute path
+        sha256: Document hash, if already known
+    
+    Yields:
+        tuple: (1-indexed page number, page text)
+    
+    Raises:
+        ValueError: If PDF file doesn't exist
+    """
+    if not os.path.exists(pdf_path):
+        raise ValueError(f"PDF file not found: {pdf_path}")
+    
+    from .text_index import load_text_index
+    
+    index = load_text_index(pdf_path, sha256)
+    if index is not None:
+        yield from enumerate(index.pages, 1)
+        return
+    
+    with fitz.open(pdf_path) as doc:
+        for page_num, page in enumerate(doc, 1):
+            yield page_num, page.get_text()
 
 
-def extract_text_from_pdf(pdf_path):
+@timed_operation('extract_text_from_pdf')
+def extract_text_from_pdf(pdf_path, sha256=None):
     """
     Extract text from PDF using PyMuPDF (native text extraction).
     Works best for PDFs with actual text layers.
     
     Args:
         pdf_path: Source PDF absolute path
+        sha256: Document hash, if already known
     
     Returns:
         str: Extracted text from all pages
@@ -621,73 +1378,195 @@ def extract_text_from_pdf(pdf_path):
     if not os.path.exists(pdf_path):
         raise ValueError(f"PDF file not found: {pdf_path}")
     
+    from .text_index import get_text_index
+    
     try:
-        doc = fitz.open(pdf_path)
+        with phase('open'):
+            index = get_text_index(pdf_path, sha256)
+        current_operation().pages = len(index.pages)
         text_content = []
         
-        for page_num, page in enumerate(doc, 1):
-            page_text = page.get_text()
-            if page_text.strip():
-                text_content.append(f"=== Page {page_num} ===\n{page_text}\n")
-        
-        doc.close()
+        with phase('process'):
+            for page_num, page_text in enumerate(index.pages, 1):
+                if page_text.strip():
+                    text_content.append(format_page_text(page_num, page_text))
         
         if not text_content:
-            return "No text found in PDF. This might be a scanned document - try OCR instead."
+            return NO_TEXT_MESSAGE
         
-        return "\n".join(text_content)
+        text = "\n".join(text_content)
+        current_operation().output_bytes = len(text.encode('utf-8'))
+        return text
         
     except Exception as e:
         raise Exception(f"Error extracting text: {str(e)}")
 
 
-def ocr_pdf_to_text(pdf_path):
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_dir(*parts: str) -> str:
+    """
+    Return (and create) a directory under settings.PDF_CACHE_DIR.
+
+    Cache entries are sharded by the first two characters of the
+    document hash, e.g. get_cache_dir('ocr', doc_hash).
+    """
+    base = str(getattr(settings, 'PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache')))
+    if len(parts) >= 2:
+        parts = (parts[0], parts[1][:2]) + tuple(parts[1:])
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _ocr_page_range(pdf_path, page_indices, dpi, cache_dir, on_page=None):
+    """
+    OCR a chunk of pages inside a worker process.
+
+    The page is rendered straight to a grayscale pixmap and its raw samples
+    are handed to tesseract, without encoding to PNG in between. Each result
+    is written to the page cache as soon as it is ready.
+
+    Args:
+        on_page: Called after each page (only when run in-process)
+
+    Returns:
+        List of (page_index, text) tuples
+    """
+    import pytesseract
+    from PIL import Image
+
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for page_idx in page_indices:
+            pix = doc[page_idx].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            img = Image.frombytes('L', (pix.width, pix.height), pix.samples)
+            page_text = pytesseract.image_to_string(img)
+
+            cache_path = os.path.join(cache_dir, f"p{page_idx}_{dpi}.txt")
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(page_text)
+            os.replace(tmp_path, cache_path)
+
+            results.append((page_idx, page_text))
+            if on_page:
+                on_page()
+    return results
+
+
+@timed_operation('ocr_pdf_to_text')
+def drop_ocr_cache(sha256: str):
+    """Delete the cached OCR text of a document (when its blob is deleted)."""
+    base = str(getattr(settings, 'PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache')))
+    shutil.rmtree(os.path.join(base, 'ocr', sha256[:2], sha256), ignore_errors=True)
+
+
+def ocr_pdf_to_text(pdf_path, dpi=None, workers=None, progress=None, sha256=None):
     """
     OCR PDF to text using pytesseract.
     Converts each page to image, then applies OCR.
     Best for scanned PDFs or images.
-    
+
+    Pages are spread across a process pool and each page's text is cached
+    by (document hash, page index, DPI), so a repeated OCR of the same file
+    only reads the cache.
+
     Args:
         pdf_path: Source PDF absolute path
-    
+        dpi: Render resolution (default: settings.PDF_OCR_DPI, 300)
+        workers: Number of OCR processes (default: settings.PDF_OCR_WORKERS or CPU count)
+        progress: Called with (fraction done, message) as pages finish; with
+                  a pool, pages are then handed out in smaller chunks
+        sha256: Hash of the file, if known (uploads); otherwise computed
+
     Returns:
         str: OCR-extracted text from all pages
-    
+
     Raises:
         ValueError: If PDF file doesn't exist
     """
     if not os.path.exists(pdf_path):
         raise ValueError(f"PDF file not found: {pdf_path}")
-    
+
+    dpi = int(dpi or getattr(settings, 'PDF_OCR_DPI', 300))
+    workers = workers or getattr(settings, 'PDF_OCR_WORKERS', None) or os.cpu_count() or 1
+
     try:
-        import pytesseract
-        from PIL import Image
-        import io
-        
-        doc = fitz.open(pdf_path)
+        with phase('open'), fitz.open(pdf_path) as doc:
+            total_pages = len(doc)
+        current_operation().pages = total_pages
+
+        cache_dir = get_cache_dir('ocr', sha256 or file_sha256(pdf_path))
+        page_texts = {}
+        missing = []
+
+        # Read cached pages first
+        for page_idx in range(total_pages):
+            cache_path = os.path.join(cache_dir, f"p{page_idx}_{dpi}.txt")
+            if os.path.exists(cache_path):
+                with open(cache_path, encoding='utf-8') as f:
+                    page_texts[page_idx] = f.read()
+            else:
+                missing.append(page_idx)
+
+        done = len(page_texts)
+
+        def page_done(count=1):
+            nonlocal done
+            done += count
+            if progress:
+                progress(done / total_pages, f'OCR page {done}/{total_pages}')
+
+        if missing:
+            import pytesseract  # noqa: F401 - fail early if not installed
+
+            # Contiguous chunks, so every worker opens the document only once
+            # (or a few times, when progress is reported)
+            workers = max(1, min(workers, len(missing)))
+            chunk_count = workers if workers == 1 or not progress else workers * 4
+            chunk_size = -(-len(missing) // chunk_count)
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+
+            with phase('process'):
+                if len(chunks) == 1:
+                    results = [_ocr_page_range(pdf_path, chunks[0], dpi, cache_dir, on_page=page_done)]
+                else:
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    results = []
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        for chunk_results in executor.map(
+                            _ocr_page_range,
+                            [pdf_path] * len(chunks), chunks,
+                            [dpi] * len(chunks), [cache_dir] * len(chunks)
+                        ):
+                            results.append(chunk_results)
+                            page_done(len(chunk_results))
+
+            for chunk_results in results:
+                page_texts.update(chunk_results)
+
         text_content = []
-        
-        for page_num, page in enumerate(doc, 1):
-            # Convert page to image
-            pix = page.get_pixmap(dpi=300)  # Higher DPI for better OCR
-            img_data = pix.tobytes("png")
-            
-            # Open with PIL
-            img = Image.open(io.BytesIO(img_data))
-            
-            # Perform OCR
-            page_text = pytesseract.image_to_string(img)
-            
+        for page_idx in range(total_pages):
+            page_text = page_texts.get(page_idx, '')
             if page_text.strip():
-                text_content.append(f"=== Page {page_num} ===\n{page_text}\n")
-        
-        doc.close()
-        
+                text_content.append(f"=== Page {page_idx + 1} ===\n{page_text}\n")
+
         if not text_content:
             return "No text could be extracted via OCR. The document might be blank or poor quality."
-        
-        return "\n".join(text_content)
-        
+
+        text = "\n".join(text_content)
+        current_operation().output_bytes = len(text.encode('utf-8'))
+        return text
+
     except ImportError:
         raise Exception("pytesseract not installed. Run: pip install pytesseract")
     except Exception as e:
@@ -711,6 +1590,49 @@ def _calculate_position(position, page_width, page_height, content_width, conten
     return positions.get(position, positions['center'])
 
 
+# Mapping pentru fonturi comune din PDF -> fonturi PyMuPDF Base14
+# PyMuPDF suportă doar anumite fonturi pentru insert_text
+BASE14_FONT_MAPPING = {
+    'times': 'times',
+    'timesnewroman': 'times',
+    'times-roman': 'times',
+    'times-bold': 'tibo',
+    'times-italic': 'tiri',
+    'times-bolditalic': 'tibi',
+    'helvetica': 'helv',
+    'arial': 'helv',
+    'helvetica-bold': 'hebo',
+    'arial-bold': 'hebo',
+    'helvetica-oblique': 'heit',
+    'arial-italic': 'heit',
+    'courier': 'cour',
+    'couriernew': 'cour',
+    'courier-bold': 'cobo',
+    'courier-oblique': 'coit',
+    'symbol': 'symb',
+    'zapfdingbats': 'zadb',
+}
+
+
+def _strip_subset_prefix(font_name: str) -> str:
+    """Lowercase font name without the subset prefix ("ABCDEF+Arial" -> "arial")."""
+    font_name = font_name.lower()
+    if '+' in font_name:
+        font_name = font_name.split('+')[1]
+    return font_name
+
+
+@lru_cache(maxsize=1024)
+def _match_base14_font(font_name: str) -> str:
+    """First BASE14_FONT_MAPPING entry contained in a PDF font name (memoized)."""
+    # Remove hyphens and spaces for matching
+    clean_font = _strip_subset_prefix(font_name).replace('-', '').replace(' ', '')
+    for pdf_font, pymupdf_font in BASE14_FONT_MAPPING.items():
+        if pdf_font in clean_font:
+            return pymupdf_font
+    return 'helv'
+
+
 def extract_font_info_at_position(page, rect):
     """
     Încearcă să extragă informații despre font din poziția specificată.
@@ -729,29 +1651,6 @@ def extract_font_info_at_position(page, rect):
         'color': (0, 0, 0)
     }
     
-    # Mapping pentru fonturi comune din PDF -> fonturi PyMuPDF Base14
-    # PyMuPDF suportă doar anumite fonturi pentru insert_text
-    font_mapping = {
-        'times': 'times',
-        'timesnewroman': 'times',
-        'times-roman': 'times',
-        'times-bold': 'tibo',
-        'times-italic': 'tiri',
-        'times-bolditalic': 'tibi',
-        'helvetica': 'helv',
-        'arial': 'helv',
-        'helvetica-bold': 'hebo',
-        'arial-bold': 'hebo',
-        'helvetica-oblique': 'heit',
-        'arial-italic': 'heit',
-        'courier': 'cour',
-        'couriernew': 'cour',
-        'courier-bold': 'cobo',
-        'courier-oblique': 'coit',
-        'symbol': 'symb',
-        'zapfdingbats': 'zadb',
-    }
-    
     try:
         # Get text blocks with detailed information
         blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
@@ -766,24 +1665,7 @@ def extract_font_info_at_position(page, rect):
                 if line_bbox.intersects(rect):
                     # Found overlapping line, get font info from first span
                     for span in line.get("spans", []):
-                        # Get original font name from PDF
-                        original_font = span.get('font', 'helv').lower()
-                        
-                        # Clean up font name (remove subset prefix like "ABCDEF+")
-                        if '+' in original_font:
-                            original_font = original_font.split('+')[1]
-                        
-                        # Remove hyphens and spaces for matching
-                        clean_font = original_font.replace('-', '').replace(' ', '')
-                        
-                        # Try to find a matching PyMuPDF font
-                        matched_font = 'helv'  # default
-                        for pdf_font, pymupdf_font in font_mapping.items():
-                            if pdf_font in clean_font:
-                                matched_font = pymupdf_font
-                                break
-                        
-                        font_info['fontname'] = matched_font
+                        font_info['fontname'] = _match_base14_font(span.get('font', 'helv'))
                         font_info['fontsize'] = span.get('size', 11)
                         font_info['color'] = span.get('color', 0)  # Integer color code
                         
@@ -803,13 +1685,104 @@ def extract_font_info_at_position(page, rect):
     return font_info
 
 
-def detect_text_line_containing(page, target_rect):
+class PageLineIndex:
+    """
+    The text lines of a page, parsed once, for lookups by rectangle.
+    
+    Lines are sorted by their top edge; a lookup bisects to the lines whose
+    top lies at most one line height above the target, so a page with
+    hundreds of matches costs one get_text("dict") and one bisect per match
+    instead of one parse per match. Built before the page is modified: the
+    lines keep their original text and position.
+    """
+    
+    def __init__(self, page):
+        self.page_width = page.rect.width
+        lines = []
+        blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+        for block in blocks.get("blocks", []):
+            if block.get("type") != 0:  # Skip non-text blocks
+                continue
+            for line in block.get("lines", []):
+                lines.append((fitz.Rect(line["bbox"]), line))
+        
+        # Reading order is kept as the tie-breaker: the first matching line wins
+        self._lines = sorted(
+            ((rect.y0, order, rect, line) for order, (rect, line) in enumerate(lines)),
+            key=lambda entry: entry[:2]
+        )
+        self._tops = [entry[0] for entry in self._lines]
+        self._max_height = max((entry[2].height for entry in self._lines), default=0)
+        self._info = {}  # order -> line info, built on first lookup
+    
+    def find(self, target_rect):
+        """
+        The first line (in reading order) that intersects or contains target_rect.
+        
+        Returns:
+            Line info dict (see detect_text_line_containing) or None
+        """
+        start = bisect_left(self._tops, target_rect.y0 - self._max_height)
+        stop = bisect_right(self._tops, target_rect.y1)
+        
+        found = None
+        for _, order, line_rect, line in self._lines[start:stop]:
+            if found is not None and order > found[0]:
+                continue
+            if line_rect.intersects(target_rect) or line_rect.contains(target_rect):
+                found = (order, line_rect, line)
+        
+        if found is None:
+            return None
+        order, line_rect, line = found
+        if order not in self._info:
+            self._info[order] = self._line_info(line_rect, line)
+        return self._info[order]
+    
+    def _line_info(self, line_rect, line):
+        line_text = ""
+        font_info = None
+        
+        # Extract text and font info from spans
+        for span in line.get("spans", []):
+            line_text += span.get("text", "")
+            
+            # Get font info from first span
+            if font_info is None:
+                font_info = {
+                    'fontname': resolve_font_name(span.get('font', 'helv')),
+                    'fontsize': span.get('size', 11),
+                    'color': convert_color(span.get('color', 0))
+                }
+        
+        # Detect alignment based on x position in page
+        x_center = (line_rect.x0 + line_rect.x1) / 2
+        
+        if x_center < self.page_width * 0.35:
+            alignment = 'left'
+        elif x_center > self.page_width * 0.65:
+            alignment = 'right'
+        else:
+            alignment = 'center'
+        
+        return {
+            'rect': line_rect,
+            'text': line_text,
+            'font_info': font_info or {'fontname': 'helv', 'fontsize': 11, 'color': (0, 0, 0)},
+            'alignment': alignment,
+            'y_position': line_rect.y1  # Bottom of line for text insertion
+        }
+
+
+def detect_text_line_containing(page, target_rect, line_index=None):
     """
     Detectează LINIA de text care conține rectangleul dat (nu blocul întreg).
     
     Args:
         page: PyMuPDF page object
         target_rect: Rectangle care conține textul căutat
+        line_index: PageLineIndex al paginii, pentru mai multe căutări pe
+                    aceeași pagină (implicit: pagina e parsată acum)
         
     Returns:
         Dict cu informații despre linie: {
@@ -820,59 +1793,16 @@ def detect_text_line_containing(page, target_rect):
             'y_position': float - poziția Y a liniei
         }
     """
-    blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
-    page_width = page.rect.width
-    
-    for block in blocks.get("blocks", []):
-        if block.get("type") != 0:  # Skip non-text blocks
-            continue
-        
-        for line in block.get("lines", []):
-            line_rect = fitz.Rect(line["bbox"])
-            
-            # Check if target rectangle intersects with this line
-            if line_rect.intersects(target_rect) or line_rect.contains(target_rect):
-                # Found the line!
-                line_text = ""
-                font_info = None
-                
-                # Extract text and font info from spans
-                for span in line.get("spans", []):
-                    line_text += span.get("text", "")
-                    
-                    # Get font info from first span
-                    if font_info is None:
-                        original_font = span.get('font', 'helv').lower()
-                        if '+' in original_font:
-                            original_font = original_font.split('+')[1]
-                        
-                        font_info = {
-                            'fontname': map_font_name(original_font),
-                            'fontsize': span.get('size', 11),
-                            'color': convert_color(span.get('color', 0))
-                        }
-                
-                # Detect alignment based on x position in page
-                x_center = (line_rect.x0 + line_rect.x1) / 2
-                
-                if x_center < page_width * 0.35:
-                    alignment = 'left'
-                elif x_center > page_width * 0.65:
-                    alignment = 'right'
-                else:
-                    alignment = 'center'
-                
-                return {
-                    'rect': line_rect,
-                    'text': line_text,
-                    'font_info': font_info or {'fontname': 'helv', 'fontsize': 11, 'color': (0, 0, 0)},
-                    'alignment': alignment,
-                    'y_position': line_rect.y1  # Bottom of line for text insertion
-                }
-    
-    return None
+    return (line_index or PageLineIndex(page)).find(target_rect)
+
+
+@lru_cache(maxsize=1024)
+def resolve_font_name(font_name: str) -> str:
+    """Base14 font for a span's font name, subset prefix included (memoized)."""
+    return map_font_name(_strip_subset_prefix(font_name))
 
 
+@lru_cache(maxsize=1024)
 def map_font_name(original_font):
     """Helper pentru maparea numelor de fonturi, păstrând bold/italic."""
     # Clean font name
@@ -961,36 +1891,272 @@ def reflow_single_line(page, line_info, modified_text):
         page.add_redact_annot(clear_rect, fill=(1, 1, 1))
         page.apply_redactions()
         
-        # Calculate text width
-        text_width = fitz.get_text_length(
-            modified_text,
-            fontname=font_info['fontname'],
-            fontsize=font_info['fontsize']
+        # Calculate text width
+        text_width = fitz.get_text_length(
+            modified_text,
+            fontname=font_info['fontname'],
+            fontsize=font_info['fontsize']
+        )
+        
+        # Calculate X position based on alignment
+        page_width = page.rect.width
+        
+        if alignment == 'center':
+            x_pos = (page_width - text_width) / 2
+        elif alignment == 'right':
+            x_pos = page_width - text_width - line_rect.x0  # Same margin as original
+        else:  # left
+            x_pos = line_rect.x0
+        
+        # Insert text at calculated position
+        rc = page.insert_text(
+            (x_pos, y_pos),
+            modified_text,
+            fontname=font_info['fontname'],
+            fontsize=font_info['fontsize'],
+            color=font_info['color']
+        )
+        
+        return rc >= 0
+        
+    except Exception as e:
+        return False
+
+
+def rephrase_on_page(doc, page_number, bounding_box, replace_text):
+    """
+    Replace the text inside a bounding box of an open document (no save).
+    
+    Used by rephrase_with_coordinates and by edit sessions, which save the
+    document incrementally.
+    
+    Args:
+        doc: Open fitz.Document
+        page_number: Numărul paginii (0-indexed)
+        bounding_box: Dict cu coordonatele {"x0": ..., "y0": ..., "x1": ..., "y1": ...}
+        replace_text: Textul de înlocuire
+    
+    Returns:
+        List[str]: Warnings
+    
+    Raises:
+        ValueError: For an invalid page number
+    """
+    if page_number < 0 or page_number >= len(doc):
+        raise ValueError(f"Invalid page number: {page_number}")
+    
+    warnings = []
+    
+    page = doc[page_number]
+    page_width = page.rect.width
+    page_height = page.rect.height
+    
+    # Create rectangle from bounding box
+    rect = fitz.Rect(
+        bounding_box['x0'],
+        bounding_box['y0'],
+        bounding_box['x1'],
+        bounding_box['y1']
+    )
+    
+    # Extract ALL text blocks from the page with positions
+    text_dict = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE)
+    all_blocks = []
+    
+    for block in text_dict.get("blocks", []):
+        if block.get("type") == 0:  # Text block
+            for line in block.get("lines", []):
+                for span in line.get("spans", []):
+                    span_rect = fitz.Rect(span["bbox"])
+                    span_text = span["text"]
+                    if span_text.strip():
+                        all_blocks.append({
+                            "text": span_text,
+                            "rect": span_rect,
+                            "font": span.get("font", "helv"),
+                            "size": span.get("size", 11),
+                            "color": span.get("color", 0),
+                            "flags": span.get("flags", 0)
+                        })
+    
+    # Determine font for replacement text
+    fontname = 'helv'
+    fontsize = 11
+    fontcolor = (0, 0, 0)
+    
+    # Find spans in or near the selection area to get font info
+    for blk in all_blocks:
+        if blk["rect"].intersects(rect):
+            # Map font to PyMuPDF builtin
+            fname = blk["font"].lower()
+            if 'times' in fname or 'roman' in fname or 'serif' in fname:
+                fontname = 'tiro'
+            elif 'courier' in fname or 'mono' in fname:
+                fontname = 'cour'
+            elif 'bold' in fname:
+                fontname = 'hebo'
+            else:
+                fontname = 'helv'
+            fontsize = blk["size"]
+            
+            # Convert color
+            color_int = blk["color"]
+            if isinstance(color_int, int):
+                r = ((color_int >> 16) & 0xFF) / 255.0
+                g = ((color_int >> 8) & 0xFF) / 255.0
+                b = (color_int & 0xFF) / 255.0
+                fontcolor = (r, g, b)
+            break
+    
+    # Calculate original height of selection
+    original_height = rect.height
+    original_width = rect.width
+    
+    # Calculate how much space the new text needs
+    line_height = fontsize * 1.3
+    char_width = fitz.get_text_length("x", fontname=fontname, fontsize=fontsize)
+    chars_per_line = int(original_width / char_width) if char_width > 0 else 60
+    
+    # Word wrap replacement text
+    words = replace_text.split()
+    wrapped_lines = []
+    current_line = []
+    current_length = 0
+    
+    for word in words:
+        word_len = len(word)
+        if current_length + word_len + 1 <= chars_per_line:
+            current_line.append(word)
+            current_length += word_len + 1
+        else:
+            if current_line:
+                wrapped_lines.append(' '.join(current_line))
+            current_line = [word]
+            current_length = word_len
+    
+    if current_line:
+        wrapped_lines.append(' '.join(current_line))
+    
+    # Calculate new text height
+    new_text_height = len(wrapped_lines) * line_height
+    
+    # Calculate extra space needed
+    extra_space = max(0, new_text_height - original_height)
+    
+    if extra_space > 0:
+        warnings.append(f"Content below selection shifted down by {extra_space:.0f}pt")
+    
+    # Separate blocks into: above selection, in selection, below selection
+    blocks_above = []
+    blocks_below = []
+    
+    selection_bottom = rect.y1
+    
+    for blk in all_blocks:
+        blk_center_y = (blk["rect"].y0 + blk["rect"].y1) / 2
+        
+        if blk["rect"].intersects(rect):
+            # Skip blocks in selection area - they will be replaced
+            continue
+        elif blk_center_y < rect.y0:
+            # Above selection - keep as is
+            blocks_above.append(blk)
+        else:
+            # Below selection - needs to be shifted down
+            blocks_below.append(blk)
+    
+    # Clear the entire page
+    page.add_redact_annot(page.rect, fill=(1, 1, 1))
+    page.apply_redactions()
+    
+    # Re-insert blocks ABOVE selection (unchanged positions)
+    for blk in blocks_above:
+        # Map font for insertion
+        fname = blk["font"].lower()
+        if 'times' in fname or 'roman' in fname:
+            insert_font = 'tiro'
+        elif 'courier' in fname or 'mono' in fname:
+            insert_font = 'cour'
+        elif 'bold' in fname and 'italic' in fname:
+            insert_font = 'hebi'
+        elif 'bold' in fname:
+            insert_font = 'hebo'
+        elif 'italic' in fname:
+            insert_font = 'heit'
+        else:
+            insert_font = 'helv'
+        
+        # Convert color
+        color = (0, 0, 0)
+        if isinstance(blk["color"], int):
+            color_int = blk["color"]
+            r = ((color_int >> 16) & 0xFF) / 255.0
+            g = ((color_int >> 8) & 0xFF) / 255.0
+            b = (color_int & 0xFF) / 255.0
+            color = (r, g, b)
+        
+        page.insert_text(
+            (blk["rect"].x0, blk["rect"].y1),  # baseline position
+            blk["text"],
+            fontname=insert_font,
+            fontsize=blk["size"],
+            color=color
         )
-        
-        # Calculate X position based on alignment
-        page_width = page.rect.width
-        
-        if alignment == 'center':
-            x_pos = (page_width - text_width) / 2
-        elif alignment == 'right':
-            x_pos = page_width - text_width - line_rect.x0  # Same margin as original
-        else:  # left
-            x_pos = line_rect.x0
-        
-        # Insert text at calculated position
-        rc = page.insert_text(
+    
+    # Insert NEW replacement text
+    y_pos = rect.y0 + fontsize
+    x_pos = rect.x0
+    
+    for line in wrapped_lines:
+        page.insert_text(
             (x_pos, y_pos),
-            modified_text,
-            fontname=font_info['fontname'],
-            fontsize=font_info['fontsize'],
-            color=font_info['color']
+            line,
+            fontname=fontname,
+            fontsize=fontsize,
+            color=fontcolor
         )
-        
-        return rc >= 0
-        
-    except Exception as e:
-        return False
+        y_pos += line_height
+    
+    # Re-insert blocks BELOW selection (shifted down by extra_space)
+    for blk in blocks_below:
+        fname = blk["font"].lower()
+        if 'times' in fname or 'roman' in fname:
+            insert_font = 'tiro'
+        elif 'courier' in fname or 'mono' in fname:
+            insert_font = 'cour'
+        elif 'bold' in fname and 'italic' in fname:
+            insert_font = 'hebi'
+        elif 'bold' in fname:
+            insert_font = 'hebo'
+        elif 'italic' in fname:
+            insert_font = 'heit'
+        else:
+            insert_font = 'helv'
+        
+        color = (0, 0, 0)
+        if isinstance(blk["color"], int):
+            color_int = blk["color"]
+            r = ((color_int >> 16) & 0xFF) / 255.0
+            g = ((color_int >> 8) & 0xFF) / 255.0
+            b = (color_int & 0xFF) / 255.0
+            color = (r, g, b)
+        
+        # Shift Y position down
+        new_y = blk["rect"].y1 + extra_space
+        
+        # Check if it would overflow the page
+        if new_y > page_height - 20:
+            warnings.append("Some content may overflow the page")
+        
+        page.insert_text(
+            (blk["rect"].x0, new_y),
+            blk["text"],
+            fontname=insert_font,
+            fontsize=blk["size"],
+            color=color
+        )
+    
+    return warnings
 
 
 def rephrase_with_coordinates(
@@ -998,7 +2164,8 @@ def rephrase_with_coordinates(
     page_number: int,
     bounding_box: dict,
     replace_text: str,
-    original_text: str = ""
+    original_text: str = "",
+    output_name: Optional[str] = None
 ) -> Tuple[str, int, List[str]]:
     """
     Înlocuiește text în PDF folosind coordonate exacte din selecția PDF.js.
@@ -1010,231 +2177,22 @@ def rephrase_with_coordinates(
         bounding_box: Dict cu coordonatele {"x0": ..., "y0": ..., "x1": ..., "y1": ...}
         replace_text: Textul de înlocuire (reformulat de AI)
         original_text: Textul original (pentru a estima dimensiunea fontului)
+        output_name: Numele fișierului rezultat, fără extensie (implicit: vezi _output_stem)
         
     Returns:
         Tuple (output_path: str, replacement_count: int, warnings: List[str])
     """
-    warnings = []
-    
     try:
         doc = fitz.open(pdf_path)
         
-        if page_number < 0 or page_number >= len(doc):
+        try:
+            warnings = rephrase_on_page(doc, page_number, bounding_box, replace_text)
+        except ValueError:
             doc.close()
-            raise ValueError(f"Invalid page number: {page_number}")
-        
-        page = doc[page_number]
-        page_width = page.rect.width
-        page_height = page.rect.height
-        
-        # Create rectangle from bounding box
-        rect = fitz.Rect(
-            bounding_box['x0'],
-            bounding_box['y0'],
-            bounding_box['x1'],
-            bounding_box['y1']
-        )
-        
-        # Extract ALL text blocks from the page with positions
-        text_dict = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE)
-        all_blocks = []
-        
-        for block in text_dict.get("blocks", []):
-            if block.get("type") == 0:  # Text block
-                for line in block.get("lines", []):
-                    for span in line.get("spans", []):
-                        span_rect = fitz.Rect(span["bbox"])
-                        span_text = span["text"]
-                        if span_text.strip():
-                            all_blocks.append({
-                                "text": span_text,
-                                "rect": span_rect,
-                                "font": span.get("font", "helv"),
-                                "size": span.get("size", 11),
-                                "color": span.get("color", 0),
-                                "flags": span.get("flags", 0)
-                            })
-        
-        # Determine font for replacement text
-        fontname = 'helv'
-        fontsize = 11
-        fontcolor = (0, 0, 0)
-        
-        # Find spans in or near the selection area to get font info
-        for blk in all_blocks:
-            if blk["rect"].intersects(rect):
-                # Map font to PyMuPDF builtin
-                fname = blk["font"].lower()
-                if 'times' in fname or 'roman' in fname or 'serif' in fname:
-                    fontname = 'tiro'
-                elif 'courier' in fname or 'mono' in fname:
-                    fontname = 'cour'
-                elif 'bold' in fname:
-                    fontname = 'hebo'
-                else:
-                    fontname = 'helv'
-                fontsize = blk["size"]
-                
-                # Convert color
-                color_int = blk["color"]
-                if isinstance(color_int, int):
-                    r = ((color_int >> 16) & 0xFF) / 255.0
-                    g = ((color_int >> 8) & 0xFF) / 255.0
-                    b = (color_int & 0xFF) / 255.0
-                    fontcolor = (r, g, b)
-                break
-        
-        # Calculate original height of selection
-        original_height = rect.height
-        original_width = rect.width
-        
-        # Calculate how much space the new text needs
-        line_height = fontsize * 1.3
-        char_width = fitz.get_text_length("x", fontname=fontname, fontsize=fontsize)
-        chars_per_line = int(original_width / char_width) if char_width > 0 else 60
-        
-        # Word wrap replacement text
-        words = replace_text.split()
-        wrapped_lines = []
-        current_line = []
-        current_length = 0
-        
-        for word in words:
-            word_len = len(word)
-            if current_length + word_len + 1 <= chars_per_line:
-                current_line.append(word)
-                current_length += word_len + 1
-            else:
-                if current_line:
-                    wrapped_lines.append(' '.join(current_line))
-                current_line = [word]
-                current_length = word_len
-        
-        if current_line:
-            wrapped_lines.append(' '.join(current_line))
-        
-        # Calculate new text height
-        new_text_height = len(wrapped_lines) * line_height
-        
-        # Calculate extra space needed
-        extra_space = max(0, new_text_height - original_height)
-        
-        if extra_space > 0:
-            warnings.append(f"Content below selection shifted down by {extra_space:.0f}pt")
-        
-        # Separate blocks into: above selection, in selection, below selection
-        blocks_above = []
-        blocks_below = []
-        
-        selection_bottom = rect.y1
-        
-        for blk in all_blocks:
-            blk_center_y = (blk["rect"].y0 + blk["rect"].y1) / 2
-            
-            if blk["rect"].intersects(rect):
-                # Skip blocks in selection area - they will be replaced
-                continue
-            elif blk_center_y < rect.y0:
-                # Above selection - keep as is
-                blocks_above.append(blk)
-            else:
-                # Below selection - needs to be shifted down
-                blocks_below.append(blk)
-        
-        # Clear the entire page
-        page.add_redact_annot(page.rect, fill=(1, 1, 1))
-        page.apply_redactions()
-        
-        # Re-insert blocks ABOVE selection (unchanged positions)
-        for blk in blocks_above:
-            # Map font for insertion
-            fname = blk["font"].lower()
-            if 'times' in fname or 'roman' in fname:
-                insert_font = 'tiro'
-            elif 'courier' in fname or 'mono' in fname:
-                insert_font = 'cour'
-            elif 'bold' in fname and 'italic' in fname:
-                insert_font = 'hebi'
-            elif 'bold' in fname:
-                insert_font = 'hebo'
-            elif 'italic' in fname:
-                insert_font = 'heit'
-            else:
-                insert_font = 'helv'
-            
-            # Convert color
-            color = (0, 0, 0)
-            if isinstance(blk["color"], int):
-                color_int = blk["color"]
-                r = ((color_int >> 16) & 0xFF) / 255.0
-                g = ((color_int >> 8) & 0xFF) / 255.0
-                b = (color_int & 0xFF) / 255.0
-                color = (r, g, b)
-            
-            page.insert_text(
-                (blk["rect"].x0, blk["rect"].y1),  # baseline position
-                blk["text"],
-                fontname=insert_font,
-                fontsize=blk["size"],
-                color=color
-            )
-        
-        # Insert NEW replacement text
-        y_pos = rect.y0 + fontsize
-        x_pos = rect.x0
-        
-        for line in wrapped_lines:
-            page.insert_text(
-                (x_pos, y_pos),
-                line,
-                fontname=fontname,
-                fontsize=fontsize,
-                color=fontcolor
-            )
-            y_pos += line_height
-        
-        # Re-insert blocks BELOW selection (shifted down by extra_space)
-        for blk in blocks_below:
-            fname = blk["font"].lower()
-            if 'times' in fname or 'roman' in fname:
-                insert_font = 'tiro'
-            elif 'courier' in fname or 'mono' in fname:
-                insert_font = 'cour'
-            elif 'bold' in fname and 'italic' in fname:
-                insert_font = 'hebi'
-            elif 'bold' in fname:
-                insert_font = 'hebo'
-            elif 'italic' in fname:
-                insert_font = 'heit'
-            else:
-                insert_font = 'helv'
-            
-            color = (0, 0, 0)
-            if isinstance(blk["color"], int):
-                color_int = blk["color"]
-                r = ((color_int >> 16) & 0xFF) / 255.0
-                g = ((color_int >> 8) & 0xFF) / 255.0
-                b = (color_int & 0xFF) / 255.0
-                color = (r, g, b)
-            
-            # Shift Y position down
-            new_y = blk["rect"].y1 + extra_space
-            
-            # Check if it would overflow the page
-            if new_y > page_height - 20:
-                warnings.append("Some content may overflow the page")
-            
-            page.insert_text(
-                (blk["rect"].x0, new_y),
-                blk["text"],
-                fontname=insert_font,
-                fontsize=blk["size"],
-                color=color
-            )
+            raise
         
         # Generate output path
-        base_name = os.path.basename(pdf_path)
-        name_without_ext = os.path.splitext(base_name)[0]
+        name_without_ext = _output_stem(pdf_path, output_name)
         
         if '/media/uploads' in pdf_path:
             base_media = pdf_path.split('/media/uploads')[0]
@@ -1261,13 +2219,17 @@ def rephrase_text_in_pdf(
     search_text: str,
     replace_text: str,
     case_sensitive: bool = True,
-    page_range: Optional[str] = None
+    page_range: Optional[str] = None,
+    output_name: Optional[str] = None,
+    sha256: Optional[str] = None
 ) -> Tuple[str, int, List[str]]:
     """
     Caută și înlocuiește text în PDF, gestionând text pe mai multe linii.
     Folosește PyMuPDF search pentru a găsi textul exact.
     """
     import re
+    from .text_index import get_text_index
+    
     warnings = []
     replacement_count = 0
     
@@ -1295,17 +2257,21 @@ def rephrase_text_in_pdf(
         if len(words) < 2:
             # For very short text, use regular find_and_replace
             doc.close()
-            return find_and_replace_text(pdf_path, search_text, replace_text, case_sensitive, page_range)
+            return find_and_replace_text(
+                pdf_path, search_text, replace_text, case_sensitive, page_range, output_name, sha256
+            )
         
         # Get first few words and last few words for searching
         first_words = ' '.join(words[:min(4, len(words))])
         last_words = ' '.join(words[-min(4, len(words)):])
         
-        for page_num in pages_to_process:
+        index = get_text_index(pdf_path, sha256)
+        
+        for page_num in index.candidate_pages(normalized_search, pages_to_process):
             page = doc[page_num]
             
             # Verify text exists in page (normalized)
-            page_text = page.get_text()
+            page_text = index.page_text(page_num)
             normalized_page = normalize_whitespace(page_text)
             
             if case_sensitive:
@@ -1403,8 +2369,7 @@ def rephrase_text_in_pdf(
             replacement_count += 1
         
         # Save output
-        base_name = os.path.basename(pdf_path)
-        name_without_ext = os.path.splitext(base_name)[0]
+        name_without_ext = _output_stem(pdf_path, output_name)
         
         if '/media/uploads' in pdf_path:
             base_media = pdf_path.split('/media/uploads')[0]
@@ -1424,12 +2389,424 @@ def rephrase_text_in_pdf(
         raise Exception(f"Error processing PDF: {str(e)}")
 
 
+# ==========================================
+# Whole-document rephrase
+# ==========================================
+
+MIN_FONT_SCALE = 0.75  # Smallest font shrink used to fit a longer paragraph
+
+
+def _line_font(line):
+    """Font info (as in detect_text_line_containing) of a line's first non-blank span."""
+    span = next((s for s in line['spans'] if s['text'].strip()), line['spans'][0])
+    return {
+        'fontname': resolve_font_name(span.get('font', 'helv')),
+        'fontsize': span.get('size', 11),
+        'color': convert_color(span.get('color', 0))
+    }
+
+
+def _continues_paragraph(paragraph, rect, font_info):
+    """True if a line (rect, font) belongs to the paragraph above it."""
+    last = paragraph['lines'][-1]
+    size = paragraph['font_info']['fontsize']
+    gap = rect.y0 - last.y1
+    return (
+        abs(font_info['fontsize'] - size) <= 0.5 and
+        font_info['fontname'] == paragraph['font_info']['fontname'] and
+        -size * 0.3 <= gap <= size * 0.8 and
+        rect.x0 < paragraph['rect'].x1 and rect.x1 > paragraph['rect'].x0
+    )
+
+
+def _paragraph_alignment(lines):
+    """'center', 'right' or 'left' from how the lines line up."""
+    if len(lines) < 2:
+        return 'left'
+    tolerance = 2
+    lefts = [r.x0 for r in lines]
+    rights = [r.x1 for r in lines]
+    centers = [(r.x0 + r.x1) / 2 for r in lines]
+    if max(lefts) - min(lefts) <= tolerance:
+        return 'left'
+    if max(centers) - min(centers) <= tolerance:
+        return 'center'
+    if max(rights) - min(rights) <= tolerance:
+        return 'right'
+    return 'left'
+
+
+def _join_lines(texts):
+    """Join the lines of a paragraph, undoing end-of-line hyphenation."""
+    result = ''
+    for text in texts:
+        text = ' '.join(text.split())
+        if result.endswith('-') and text[:1].islower():
+            result = result[:-1] + text
+        else:
+            result = f"{result} {text}" if result else text
+    return result
+
+
+def extract_paragraph_blocks(pdf_path, sha256=None, page_range=None, min_words=4):
+    """
+    Split a PDF into paragraph blocks from the cached span extraction.
+    
+    Consecutive lines are merged when they share font and size, are close
+    vertically and overlap horizontally. Blocks shorter than min_words
+    (headings, page numbers, labels) are skipped.
+    
+    Args:
+        pdf_path: PDF absolute path
+        sha256: Document hash, if known
+        page_range: Pages to use, e.g. "1-3,5" (default: all)
+        min_words: Minimum number of words of a paragraph
+    
+    Returns:
+        List of dicts: {'page', 'rect', 'lines', 'text', 'font_info',
+        'alignment', 'line_pitch'}, in reading order
+    """
+    from .text_index import get_text_index
+    
+    index = get_text_index(pdf_path, sha256)
+    pages = PageSet.parse(page_range, index.page_count)
+    
+    paragraphs = []
+    for page_num in pages:
+        page_paragraphs = []
+        current = None
+        for line in index.lines(page_num):
+            if not line['text'].strip():
+                continue
+            rect = fitz.Rect(line['bbox'])
+            font_info = _line_font(line)
+            if current and _continues_paragraph(current, rect, font_info):
+                current['lines'].append(rect)
+                current['texts'].append(line['text'])
+                current['rect'] |= rect
+            else:
+                current = {
+                    'page': page_num,
+                    'rect': fitz.Rect(rect),
+                    'lines': [rect],
+                    'texts': [line['text']],
+                    'font_info': font_info
+                }
+                page_paragraphs.append(current)
+        
+        for paragraph in page_paragraphs:
+            lines = paragraph['lines']
+            paragraph['text'] = _join_lines(paragraph.pop('texts'))
+            paragraph['alignment'] = _paragraph_alignment(lines)
+            if paragraph['alignment'] == 'left':
+                # A short paragraph may use the full width of its text column
+                paragraph['rect'].x1 = max(
+                    other['rect'].x1 for other in page_paragraphs
+                    if abs(other['rect'].x0 - paragraph['rect'].x0) <= 2
+                )
+            if len(lines) > 1:
+                paragraph['line_pitch'] = (lines[-1].y1 - lines[0].y1) / (len(lines) - 1)
+            else:
+                paragraph['line_pitch'] = paragraph['font_info']['fontsize'] * 1.2
+            if len(paragraph['text'].split()) >= min_words:
+                paragraphs.append(paragraph)
+    
+    return paragraphs
+
+
+def _wrap_text(text, fontname, fontsize, width):
+    """Greedy word wrap by measured text width."""
+    lines = []
+    current = ''
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and fitz.get_text_length(candidate, fontname=fontname, fontsize=fontsize) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _first_baseline(paragraph):
+    """Baseline of the paragraph's first line (bbox bottom minus the font descent)."""
+    font_info = paragraph['font_info']
+    descender = fitz.Font(font_info['fontname']).descender
+    return paragraph['lines'][0].y1 + descender * font_info['fontsize']
+
+
+def _layout_paragraph(paragraph, new_text, bottom):
+    """
+    Wrap new_text into the paragraph's width, shrinking the font (down to
+    MIN_FONT_SCALE) until it ends above `bottom`.
+    
+    Returns:
+        Tuple (lines, fontsize, pitch, fits)
+    """
+    font_info = paragraph['font_info']
+    rect = paragraph['rect']
+    first_baseline = _first_baseline(paragraph)
+    
+    scale = 1.0
+    while True:
+        fontsize = font_info['fontsize'] * scale
+        pitch = paragraph['line_pitch'] * scale
+        lines = _wrap_text(new_text, font_info['fontname'], fontsize, rect.width)
+        fits = first_baseline + (len(lines) - 1) * pitch <= bottom
+        if fits or scale <= MIN_FONT_SCALE:
+            return lines, fontsize, pitch, fits
+        scale = max(MIN_FONT_SCALE, scale - 0.05)
+
+
+def _space_below(page, paragraph, obstacles):
+    """Lowest baseline the paragraph may grow to: just above the next text below it."""
+    rect = paragraph['rect']
+    bottom = page.rect.height - 36  # Keep a bottom margin
+    for other in obstacles:
+        if other.y0 >= rect.y1 - 1 and other.x0 < rect.x1 and other.x1 > rect.x0:
+            bottom = min(bottom, other.y0 - 1)
+    return max(bottom, rect.y1)
+
+
+def rephrase_document(pdf_path, style='formal', model=None, page_range=None,
+                      custom_prompt=None, max_in_flight=None, min_words=4,
+                      sha256=None, output_name=None):
+    """
+    Rephrase every paragraph of a PDF with AI, keeping the layout.
+    
+    Paragraphs come from extract_paragraph_blocks and are sent to Ollama
+    concurrently (ollama_service.rephrase_many, bounded by max_in_flight).
+    Each page is then redacted once for all its paragraphs and the new text
+    is reflowed in place (same position, font and alignment as
+    reflow_single_line, wrapped to the paragraph width); the document is
+    saved once at the end.
+    
+    Args:
+        pdf_path: Source PDF absolute path
+        style: Rephrase style (see ollama_service.REPHRASE_STYLES)
+        model: Ollama model (default: OLLAMA_DEFAULT_MODEL)
+        page_range: Pages to rephrase, e.g. "1-3,5" (default: all)
+        custom_prompt: Custom instruction instead of the style prompt
+        max_in_flight: Concurrent AI requests (default: OLLAMA_MAX_IN_FLIGHT)
+        min_words: Shorter blocks (headings, labels) are left as they are
+        sha256: Document hash, if known
+        output_name: Output file name without extension
+    
+    Returns:
+        Dict with 'output_path', 'paragraph_count', 'rephrased_count',
+        'failed_count' and 'warnings'
+    
+    Raises:
+        ValueError: If the PDF doesn't exist, the page range is invalid or
+            there is no text to rephrase
+    """
+    from .ollama_service import rephrase_many
+    
+    if not os.path.exists(pdf_path):
+        raise ValueError(f"PDF file not found: {pdf_path}")
+    
+    paragraphs = extract_paragraph_blocks(pdf_path, sha256, page_range, min_words)
+    if not paragraphs:
+        raise ValueError(NO_TEXT_MESSAGE)
+    
+    results = rephrase_many(
+        [paragraph['text'] for paragraph in paragraphs],
+        style=style, model=model, custom_prompt=custom_prompt, max_in_flight=max_in_flight
+    )
+    
+    warnings = []
+    by_page = {}
+    for paragraph, (new_text, success, error) in zip(paragraphs, results):
+        if not success or not new_text.strip():
+            warnings.append(f"Page {paragraph['page'] + 1}: paragraph left unchanged ({error or 'empty answer'})")
+            continue
+        by_page.setdefault(paragraph['page'], []).append((paragraph, new_text))
+    
+    if not output_name:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_name = f"rephrased_{timestamp}"
+    output_dir = os.path.join(settings.MEDIA_ROOT, 'processed')
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{output_name}.pdf")
+    
+    from .text_index import get_text_index
+    index = get_text_index(pdf_path, sha256)
+    
+    rephrased_count = 0
+    try:
+        doc = fitz.open(pdf_path)
+        for page_num, replacements in by_page.items():
+            page = doc[page_num]
+            
+            # Text that stays on the page limits how far a paragraph may grow
+            replaced = {tuple(line) for paragraph, _ in replacements for line in paragraph['lines']}
+            obstacles = [
+                fitz.Rect(line['bbox']) for line in index.lines(page_num)
+                if line['text'].strip() and tuple(fitz.Rect(line['bbox'])) not in replaced
+            ]
+            
+            # One redaction pass for the whole page; backgrounds, images and
+            # vector graphics are kept
+            for paragraph, _ in replacements:
+                for line in paragraph['lines']:
+                    page.add_redact_annot(line, fill=False)
+            page.apply_redactions(
+                images=fitz.PDF_REDACT_IMAGE_NONE,
+                graphics=fitz.PDF_REDACT_LINE_ART_NONE
+            )
+            
+            for paragraph, new_text in replacements:
+                rect = paragraph['rect']
+                font_info = paragraph['font_info']
+                bottom = _space_below(page, paragraph, obstacles)
+                lines, fontsize, pitch, fits = _layout_paragraph(paragraph, new_text, bottom)
+                if not fits:
+                    warnings.append(f"Page {page_num + 1}: rephrased paragraph overflows its space")
+                
+                y_pos = _first_baseline(paragraph)
+                for text in lines:
+                    text_width = fitz.get_text_length(text, fontname=font_info['fontname'], fontsize=fontsize)
+                    if paragraph['alignment'] == 'center':
+                        x_pos = rect.x0 + (rect.width - text_width) / 2
+                    elif paragraph['alignment'] == 'right':
+                        x_pos = rect.x1 - text_width
+                    else:
+                        x_pos = rect.x0
+                    page.insert_text(
+                        (x_pos, y_pos),
+                        text,
+                        fontname=font_info['fontname'],
+                        fontsize=fontsize,
+                        color=font_info['color']
+                    )
+                    y_pos += pitch
+                rephrased_count += 1
+        
+        doc.save(output_path, garbage=4, deflate=True, clean=True)
+        doc.close()
+    except Exception as e:
+        raise Exception(f"Error rephrasing document: {str(e)}")
+    
+    return {
+        'output_path': output_path,
+        'paragraph_count': len(paragraphs),
+        'rephrased_count': rephrased_count,
+        'failed_count': len(paragraphs) - sum(len(r) for r in by_page.values()),
+        'warnings': warnings
+    }
+
+
+def replace_text_on_pages(doc, pages, search_text, replace_text, case_sensitive=True):
+    """
+    Find & replace on the given pages of an open document (no save).
+    
+    Used by find_and_replace_text and by edit sessions, which save the
+    document incrementally.
+    
+    Args:
+        doc: Open fitz.Document
+        pages: Page indices to process (0-based)
+        search_text: Textul de căutat
+        replace_text: Textul de înlocuire
+        case_sensitive: Dacă căutarea e case-sensitive
+    
+    Returns:
+        Tuple (replacement_count: int, warnings: List[str], changed_pages: List[int])
+    """
+    warnings = []
+    replacement_count = 0
+    changed_pages = []
+    
+    for page_num in pages:
+        page = doc[page_num]
+        
+        # Search for text in page
+        # PyMuPDF search_for with flags parameter
+        # No flags = case-sensitive; TEXT_INHIBIT_SPACES = case-insensitive
+        if case_sensitive:
+            text_instances = page.search_for(search_text)
+        else:
+            text_instances = page.search_for(search_text, flags=fitz.TEXT_INHIBIT_SPACES)
+        
+        if not text_instances:
+            continue
+        
+        # Track which lines we've already processed to avoid duplicates
+        processed_lines = set()
+        line_index = PageLineIndex(page)
+        
+        # Process instances in REVERSE order to avoid position shifts
+        for inst in reversed(text_instances):
+            try:
+                # Detect the specific LINE containing this match (not the whole block!)
+                line_info = detect_text_line_containing(page, inst, line_index)
+                
+                if line_info is None:
+                    warnings.append(
+                        f"Warning pe pagina {page_num + 1}: Nu s-a putut detecta linia. "
+                        f"Textul nu a fost înlocuit."
+                    )
+                    continue
+                
+                # Create a unique identifier for this line based on position
+                line_id = (round(line_info['rect'].x0, 2), 
+                          round(line_info['rect'].y0, 2),
+                          round(line_info['rect'].x1, 2), 
+                          round(line_info['rect'].y1, 2))
+                
+                # Skip if we've already processed this line
+                if line_id in processed_lines:
+                    continue
+                
+                processed_lines.add(line_id)
+                
+                # Get the line text
+                line_text = line_info['text']
+                
+                # Perform text replacement in this line only
+                if case_sensitive:
+                    modified_line = line_text.replace(search_text, replace_text)
+                    count_in_line = line_text.count(search_text)
+                else:
+                    # Case-insensitive replacement
+                    import re
+                    pattern = re.compile(re.escape(search_text), re.IGNORECASE)
+                    modified_line = pattern.sub(replace_text, line_text)
+                    count_in_line = len(re.findall(pattern, line_text))
+                
+                # Re-render the line if text was modified
+                if modified_line != line_text:
+                    success = reflow_single_line(page, line_info, modified_line)
+                    
+                    if success:
+                        replacement_count += count_in_line
+                        if page_num not in changed_pages:
+                            changed_pages.append(page_num)
+                    else:
+                        warnings.append(
+                            f"Warning pe pagina {page_num + 1}: Nu s-a putut re-renderarea liniei. "
+                            f"Posibil text prea lung."
+                        )
+                    
+            except Exception as e:
+                warnings.append(
+                    f"Warning pe pagina {page_num + 1}: {str(e)}"
+                )
+    
+    return replacement_count, warnings, changed_pages
+
+
+@timed_operation('find_and_replace_text')
 def find_and_replace_text(
     pdf_path: str,
     search_text: str,
     replace_text: str,
     case_sensitive: bool = True,
-    page_range: Optional[str] = None
+    page_range: Optional[str] = None,
+    output_name: Optional[str] = None,
+    sha256: Optional[str] = None
 ) -> Tuple[str, int, List[str]]:
     """
     Găsește și înlocuiește text într-un PDF, păstrând layout-ul original.
@@ -1440,6 +2817,8 @@ def find_and_replace_text(
         replace_text: Textul de înlocuire
         case_sensitive: Dacă căutarea e case-sensitive
         page_range: String cu interval de pagini (ex: "1-3,5") sau None pentru toate
+        output_name: Numele fișierului rezultat, fără extensie (implicit: vezi _output_stem)
+        sha256: Hash-ul documentului, dacă e cunoscut
         
     Returns:
         Tuple (output_path: str, replacement_count: int, warnings: List[str])
@@ -1447,100 +2826,35 @@ def find_and_replace_text(
     Raises:
         Exception: Dacă procesarea PDF-ului eșuează
     """
-    warnings = []
-    replacement_count = 0
+    from .text_index import get_text_index, stored_sha256
     
     try:
-        doc = fitz.open(pdf_path)
+        with phase('open'):
+            doc = fitz.open(pdf_path)
         total_pages = len(doc)
+        current_operation().pages = total_pages
         
         # Determine pages to process
-        if page_range:
-            try:
-                pages_to_process = parse_page_range(page_range, total_pages)
-            except ValueError as e:
-                doc.close()
-                raise ValueError(f"Invalid page range: {str(e)}")
-        else:
-            pages_to_process = list(range(total_pages))
-        
-        # Process each page
-        for page_num in pages_to_process:
-            page = doc[page_num]
-            
-            # Search for text in page
-            # PyMuPDF search_for with flags parameter
-            # No flags = case-sensitive; TEXT_INHIBIT_SPACES = case-insensitive
-            if case_sensitive:
-                text_instances = page.search_for(search_text)
-            else:
-                text_instances = page.search_for(search_text, flags=fitz.TEXT_INHIBIT_SPACES)
-            
-            if not text_instances:
-                continue
-            
-            # Track which lines we've already processed to avoid duplicates
-            processed_lines = set()
+        try:
+            pages_to_process = PageSet.parse(page_range, total_pages)
+        except ValueError as e:
+            doc.close()
+            raise ValueError(f"Invalid page range: {str(e)}")
+        
+        with phase('process'):
+            # Only pages whose indexed text can contain a match are parsed.
+            # Files outside the store have no index; building one would parse
+            # every page once more, so all pages go to the replace pass
+            sha256 = stored_sha256(pdf_path, sha256)
+            if sha256:
+                pages_to_process = get_text_index(pdf_path, sha256).candidate_pages(search_text, pages_to_process)
             
-            # Process instances in REVERSE order to avoid position shifts
-            for inst in reversed(text_instances):
-                try:
-                    # Detect the specific LINE containing this match (not the whole block!)
-                    line_info = detect_text_line_containing(page, inst)
-                    
-                    if line_info is None:
-                        warnings.append(
-                            f"Warning pe pagina {page_num + 1}: Nu s-a putut detecta linia. "
-                            f"Textul nu a fost înlocuit."
-                        )
-                        continue
-                    
-                    # Create a unique identifier for this line based on position
-                    line_id = (round(line_info['rect'].x0, 2), 
-                              round(line_info['rect'].y0, 2),
-                              round(line_info['rect'].x1, 2), 
-                              round(line_info['rect'].y1, 2))
-                    
-                    # Skip if we've already processed this line
-                    if line_id in processed_lines:
-                        continue
-                    
-                    processed_lines.add(line_id)
-                    
-                    # Get the line text
-                    line_text = line_info['text']
-                    
-                    # Perform text replacement in this line only
-                    if case_sensitive:
-                        modified_line = line_text.replace(search_text, replace_text)
-                        count_in_line = line_text.count(search_text)
-                    else:
-                        # Case-insensitive replacement
-                        import re
-                        pattern = re.compile(re.escape(search_text), re.IGNORECASE)
-                        modified_line = pattern.sub(replace_text, line_text)
-                        count_in_line = len(re.findall(pattern, line_text))
-                    
-                    # Re-render the line if text was modified
-                    if modified_line != line_text:
-                        success = reflow_single_line(page, line_info, modified_line)
-                        
-                        if success:
-                            replacement_count += count_in_line
-                        else:
-                            warnings.append(
-                                f"Warning pe pagina {page_num + 1}: Nu s-a putut re-renderarea liniei. "
-                                f"Posibil text prea lung."
-                            )
-                        
-                except Exception as e:
-                    warnings.append(
-                        f"Warning pe pagina {page_num + 1}: {str(e)}"
-                    )
+            replacement_count, warnings, _ = replace_text_on_pages(
+                doc, pages_to_process, search_text, replace_text, case_sensitive
+            )
         
         # Generate output path
-        base_name = os.path.basename(pdf_path)
-        name_without_ext = os.path.splitext(base_name)[0]
+        name_without_ext = _output_stem(pdf_path, output_name)
         
         # Determine processed directory
         # If pdf_path is in .../media/uploads/, use .../media/processed/
@@ -1558,9 +2872,11 @@ def find_and_replace_text(
         output_path = os.path.join(processed_dir, f"{name_without_ext}_modified.pdf")
         
         # Save with optimization
-        doc.save(output_path, garbage=4, deflate=True, clean=True)
+        with phase('save'):
+            doc.save(output_path, garbage=4, deflate=True, clean=True)
         doc.close()
         
+        current_operation().output(output_path)
         return output_path, replacement_count, warnings
         
     except Exception as e:
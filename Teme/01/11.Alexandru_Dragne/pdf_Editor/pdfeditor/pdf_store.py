@@ -0,0 +1,312 @@
+"""
+PDF Store Module - content-addressed storage for uploaded PDFs.
+
+Every upload is hashed (SHA-256) while it is written to disk; identical
+files share one blob under media/uploads/store/<aa>/<hash>.pdf. Each upload
+only adds a reference (an empty marker file in <hash>.refs/), and the blob
+is deleted when its last reference is released. Adding and releasing
+references to one hash are serialized by a lock file (<hash>.lock), so a
+release never deletes a blob that an upload has just found and is about
+to reference. Per-document analysis
+(page count, text layer, fonts) is computed once, together with the text
+index (see text_index), and cached next to the blob as <hash>.json.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking (single-process development server)
+    fcntl = None
+
+from .models import Document
+from .text_index import get_text_index, drop_text_index
+from .search_index import remove_document
+from .page_render import drop_renders
+from .pdf_processor import drop_ocr_cache
+
+
+def get_store_root() -> str:
+    """Return the root directory of the blob store."""
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', 'store')
+
+
+def blob_path(sha256: str) -> str:
+    """Path of the blob for a given hash."""
+    return os.path.join(get_store_root(), sha256[:2], f"{sha256}.pdf")
+
+
+def _refs_dir(sha256: str) -> str:
+    return os.path.join(get_store_root(), sha256[:2], f"{sha256}.refs")
+
+
+def _analysis_path(sha256: str) -> str:
+    return os.path.join(get_store_root(), sha256[:2], f"{sha256}.json")
+
+
+def _lock_path(sha256: str) -> str:
+    return os.path.join(get_store_root(), sha256[:2], f"{sha256}.lock")
+
+
+@contextmanager
+def _blob_lock(sha256: str):
+    """
+    Hold the exclusive lock of one hash (across threads and processes).
+
+    release_reference deletes the lock file together with the blob; a
+    waiter that then gets the lock on the deleted file opens it again.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    path = _lock_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        f = open(path, 'a')
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        f.close()
+    try:
+        yield
+    finally:
+        f.close()  # Releases the lock
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def store_upload(uploaded_file) -> Tuple[str, str, str, bool]:
+    """
+    Stream an uploaded file into the store and add a reference to it.
+
+    The file is hashed chunk by chunk while it is written to a temporary
+    file; if a blob with the same hash already exists the temporary file
+    is dropped and only a new reference is recorded.
+
+    Args:
+        uploaded_file: Django UploadedFile (anything with .chunks())
+
+    Returns:
+        Tuple (ref_id: str, sha256: str, path: str, is_duplicate: bool)
+    """
+    root = get_store_root()
+    tmp_dir = os.path.join(root, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.part")
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+                f.write(chunk)
+        sha256 = digest.hexdigest()
+        ref_id, path, is_duplicate = commit_upload(tmp_path, sha256)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return ref_id, sha256, path, is_duplicate
+
+
+def commit_upload(tmp_path: str, sha256: str) -> Tuple[str, str, bool]:
+    """
+    Move a fully written upload into the store and add a reference to it.
+
+    If the blob already exists the temporary file is left in place for the
+    caller to remove.
+
+    Returns:
+        Tuple (ref_id: str, path: str, is_duplicate: bool)
+    """
+    with _blob_lock(sha256):
+        is_duplicate = reference_count(sha256) > 0
+        path = commit_blob(tmp_path, sha256)
+        ref_id = add_reference(sha256)
+    return ref_id, path, is_duplicate
+
+
+def commit_blob(tmp_path: str, sha256: str) -> str:
+    """
+    Move a fully written temporary file to its content address.
+
+    Call it under the hash lock (see commit_upload), with add_reference.
+
+    Returns:
+        str: Path of the blob
+    """
+    path = blob_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        os.replace(tmp_path, path)
+    return path
+
+
+def add_reference(sha256: str) -> str:
+    """Record a new reference to a blob and return its id."""
+    refs_dir = _refs_dir(sha256)
+    os.makedirs(refs_dir, exist_ok=True)
+    ref_id = str(uuid.uuid4())
+    open(os.path.join(refs_dir, ref_id), 'w').close()
+    return ref_id
+
+
+def reference_count(sha256: str) -> int:
+    """Number of live references to a blob."""
+    refs_dir = _refs_dir(sha256)
+    if not os.path.isdir(refs_dir):
+        return 0
+    return len(os.listdir(refs_dir))
+
+
+def release_reference(sha256: str, ref_id: str) -> bool:
+    """
+    Drop a reference; delete the blob and its analysis when none are left.
+
+    Returns:
+        bool: True if the blob itself was deleted
+    """
+    with _blob_lock(sha256):
+        ref_path = os.path.join(_refs_dir(sha256), os.path.basename(ref_id))
+        if os.path.exists(ref_path):
+            os.remove(ref_path)
+
+        if reference_count(sha256) > 0:
+            return False
+
+        # Derived data too, before a new upload of the same file can rebuild it
+        for path in (blob_path(sha256), _analysis_path(sha256), _lock_path(sha256)):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(_refs_dir(sha256), ignore_errors=True)
+        drop_text_index(sha256)
+        drop_renders(sha256)
+        drop_ocr_cache(sha256)
+        remove_document(sha256)
+    return True
+
+
+def expire_references(max_age_seconds: float) -> Tuple[int, int, int]:
+    """
+    Release references older than max_age_seconds.
+
+    Used by cleanup_old_pdfs, since references belong to sessions that are
+    never explicitly closed. The Documents of the released references are
+    marked expired, so they drop out of the dashboard without a file check.
+
+    Returns:
+        Tuple (expired_refs: int, deleted_blobs: int, freed_bytes: int)
+    """
+    root = get_store_root()
+    if not os.path.isdir(root):
+        return 0, 0, 0
+
+    threshold = time.time() - max_age_seconds
+    expired = deleted = freed = 0
+
+    for shard in os.listdir(root):
+        shard_dir = os.path.join(root, shard)
+        if shard == 'tmp' or not os.path.isdir(shard_dir):
+            continue
+        for entry in os.listdir(shard_dir):
+            if not entry.endswith('.refs'):
+                continue
+            sha256 = entry[:-len('.refs')]
+            refs_dir = os.path.join(shard_dir, entry)
+            for ref_id in os.listdir(refs_dir):
+                if os.path.getmtime(os.path.join(refs_dir, ref_id)) >= threshold:
+                    continue
+                size = os.path.getsize(blob_path(sha256)) if os.path.exists(blob_path(sha256)) else 0
+                expired += 1
+                if release_reference(sha256, ref_id):
+                    deleted += 1
+                    freed += size
+                Document.objects.filter(pk=ref_id).update(status=Document.STATUS_EXPIRED)
+    return expired, deleted, freed
+
+
+def expire_documents(max_age_seconds: float) -> Tuple[int, int, int]:
+    """
+    Release the references of Documents uploaded more than max_age_seconds ago.
+
+    Unlike expire_references, only the expired rows are read (through the
+    status/uploaded_at index); the store directories are not listed.
+
+    Returns:
+        Tuple (expired_refs: int, deleted_blobs: int, freed_bytes: int)
+    """
+    threshold = timezone.now() - timedelta(seconds=max_age_seconds)
+    documents = Document.objects.filter(status=Document.STATUS_ACTIVE, uploaded_at__lt=threshold)
+    expired = deleted = freed = 0
+
+    for document in documents.only('id', 'sha256', 'size'):
+        expired += 1
+        if document.sha256 and release_reference(document.sha256, document.id):
+            deleted += 1
+            freed += document.size
+        Document.objects.filter(pk=document.pk).update(status=Document.STATUS_EXPIRED)
+    return expired, deleted, freed
+
+
+def analyze_pdf(pdf_path: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Page count, text-layer presence and fonts, read from the text index
+    (which is built here on first use, i.e. at upload time).
+
+    Returns:
+        Dict with keys: page_count, has_text, message, fonts
+    """
+    index = get_text_index(pdf_path, sha256)
+    has_text = index.has_text()
+
+    if has_text:
+        message = "PDF-ul conține text selectabil."
+    else:
+        message = "PDF-ul nu conține text selectabil (posibil scanat doar cu imagini)."
+
+    return {
+        'page_count': index.page_count,
+        'has_text': has_text,
+        'message': message,
+        'fonts': index.fonts
+    }
+
+
+def get_analysis(sha256: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached analysis for a blob, computing it on first access.
+
+    Returns:
+        Dict (see analyze_pdf) or None if the blob does not exist
+    """
+    cache_path = _analysis_path(sha256)
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    path = blob_path(sha256)
+    if not os.path.exists(path):
+        return None
+
+    analysis = analyze_pdf(path, sha256)
+    _write_json_atomic(cache_path, analysis)
+    return analysis
@@ -0,0 +1,159 @@
+"""
+Rephrase Cache Module - persistent memoization of AI rephrase results.
+
+The same paragraphs get rephrased again and again while a document is
+tweaked, and every Ollama call costs seconds. Results are kept in a SQLite
+file (settings.OLLAMA_CACHE_DB), so they survive restarts and are shared
+by all server processes. The key is a hash of everything that determines
+the answer: the full prompt (style or custom prompt plus the text with
+whitespace normalized), the model and the generation options.
+
+The cache is bounded by OLLAMA_CACHE_MAX_ENTRIES and OLLAMA_CACHE_MAX_BYTES;
+the least recently used entries are evicted first. Hits, misses and
+evictions are counted in the same file (see cache_stats()).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ('hits', 'misses', 'evictions')
+
+
+def get_cache_db_path() -> str:
+    """Return the SQLite file backing the cache (settings.OLLAMA_CACHE_DB)."""
+    return str(getattr(
+        settings, 'OLLAMA_CACHE_DB',
+        os.path.join(settings.BASE_DIR, 'rephrase_cache.sqlite3')
+    ))
+
+
+def _connect() -> sqlite3.Connection:
+    db_path = get_cache_db_path()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _count(conn: sqlite3.Connection, name: str, amount: int = 1):
+    conn.execute(
+        "INSERT INTO counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+
+def cache_key(prompt: str, model: str, options: Dict[str, Any]) -> str:
+    """Key of a generate request: hash of prompt, model and options."""
+    payload = json.dumps([prompt, model, options], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cached(key: str) -> Optional[str]:
+    """
+    Return the cached result for a key, or None (counted as hit or miss).
+
+    A hit marks the entry as recently used.
+    """
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row:
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        _count(conn, 'hits' if row else 'misses')
+        conn.execute('COMMIT')
+        return row['value'] if row else None
+    finally:
+        conn.close()
+
+
+def set_cached(key: str, value: str):
+    """Store a result, then evict least recently used entries over the caps."""
+    max_entries = getattr(settings, 'OLLAMA_CACHE_MAX_ENTRIES', 10000)
+    max_bytes = getattr(settings, 'OLLAMA_CACHE_MAX_BYTES', 50 * 1024 * 1024)
+    size = len(value.encode('utf-8'))
+    now = time.time()
+
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, value, size, now, now)
+        )
+
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        evicted = 0
+        if entries > max_entries or total > max_bytes:
+            for row in conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if entries <= max_entries and total <= max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (row['key'],))
+                entries -= 1
+                total -= row['size']
+                evicted += 1
+        if evicted:
+            _count(conn, 'evictions', evicted)
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+
+def cache_stats() -> Dict[str, Any]:
+    """
+    Cache size and counters.
+
+    Returns:
+        Dict with entries, bytes, hits, misses, evictions and hit_rate
+    """
+    conn = _connect()
+    try:
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        counters = {name: 0 for name in COUNTERS}
+        counters.update({row['name']: row['value'] for row in conn.execute("SELECT name, value FROM counters")})
+    finally:
+        conn.close()
+
+    lookups = counters['hits'] + counters['misses']
+    return {
+        'entries': entries,
+        'bytes': total,
+        **counters,
+        'hit_rate': round(counters['hits'] / lookups, 4) if lookups else 0.0
+    }
+
+
+def clear_cache():
+    """Delete all entries and reset the counters."""
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM counters")
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
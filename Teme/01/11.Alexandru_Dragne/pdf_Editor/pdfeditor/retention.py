@@ -0,0 +1,235 @@
+"""
+Retention Module - indexed expiry of uploads and results.
+
+cleanup_old_pdfs used to list MEDIA_ROOT/uploads and MEDIA_ROOT/processed
+and stat every file on each run, without knowing which files were still
+in use. Files are now recorded when they are written:
+
+    upload  - Document rows (references to pdf_store blobs)
+    result  - StoredFile rows: outputs of the views and edit exports
+    job     - StoredFile rows: outputs of background jobs
+    batch   - StoredFile rows: batch result directories
+
+A cleanup run only reads the rows past their retention, through the
+(kind, created_at) indexes. Retention is set per kind with
+PDF_RETENTION_HOURS (default: PDF_CLEANUP_HOURS for every kind), and
+PDF_STORAGE_QUOTA_BYTES evicts the least recently used files and uploads
+once the total grows past it. Files written before the index existed are
+only found by cleanup_old_pdfs --full-scan.
+"""
+import heapq
+import os
+import shutil
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import Document, ProcessedResult, StoredFile
+
+
+KINDS = ('upload', 'result', 'job', 'batch')
+
+# accessed_at is rewritten at most this often per row
+TOUCH_INTERVAL = timedelta(minutes=5)
+
+# Rows read per query while evicting for the storage quota
+QUOTA_CHUNK_SIZE = 500
+
+
+def processed_root() -> str:
+    return os.path.join(settings.MEDIA_ROOT, 'processed')
+
+
+def _is_managed(path: str) -> bool:
+    """Only MEDIA_ROOT/processed is indexed (edit working copies belong to edit_session)."""
+    root = os.path.abspath(processed_root())
+    path = os.path.abspath(path)
+    return path != root and os.path.commonpath([path, root]) == root
+
+
+def _disk_usage(path: str) -> int:
+    """Size of a file, or of all files below a directory."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except FileNotFoundError:
+                continue
+    return total
+
+
+def register_file(path: str, kind: str, result: Optional[ProcessedResult] = None):
+    """
+    Record a newly written file or directory in the expiry index.
+
+    Writing the same path again (e.g. a re-exported edit session) restarts
+    its retention. Paths outside MEDIA_ROOT/processed are ignored.
+
+    Args:
+        path: File or directory
+        kind: 'result', 'job' or 'batch'
+        result: ProcessedResult showing the file, expired when it is deleted
+    """
+    if not path or not _is_managed(path):
+        return
+    try:
+        size = _disk_usage(path)
+    except FileNotFoundError:
+        return
+    now = timezone.now()
+    defaults = {'kind': kind, 'size': size, 'created_at': now, 'accessed_at': now}
+    if result is not None:
+        defaults['result'] = result
+    StoredFile.objects.update_or_create(path=os.path.abspath(path), defaults=defaults)
+
+
+def touch(path: str):
+    """Mark a file as used (downloaded), for the storage quota."""
+    now = timezone.now()
+    StoredFile.objects.filter(
+        path=os.path.abspath(path), accessed_at__lt=now - TOUCH_INTERVAL
+    ).update(accessed_at=now)
+
+
+def retention_hours(kind: str, overrides: Optional[Dict[str, float]] = None,
+                    default: Optional[float] = None) -> float:
+    """
+    Retention of a kind of file, in hours.
+
+    Args:
+        kind: One of KINDS
+        overrides: Per-kind values that take precedence (command line)
+        default: Used for kinds without a setting (default: PDF_CLEANUP_HOURS)
+    """
+    for source in (overrides or {}, getattr(settings, 'PDF_RETENTION_HOURS', None) or {}):
+        if source.get(kind) is not None:
+            return source[kind]
+    return default if default is not None else getattr(settings, 'PDF_CLEANUP_HOURS', 24)
+
+
+def _delete(path: str) -> bool:
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _delete_rows(rows: Iterable[StoredFile]) -> Tuple[int, int]:
+    """Delete the files of rows (read with 'path', 'size' and 'result'), then the rows and their results."""
+    deleted, freed, ids, result_ids = 0, 0, [], set()
+    for row in rows:
+        if _delete(row.path):
+            deleted += 1
+            freed += row.size
+        ids.append(row.pk)
+        if row.result_id:
+            result_ids.add(row.result_id)
+    StoredFile.objects.filter(pk__in=ids).delete()
+    if result_ids:
+        ProcessedResult.objects.filter(pk__in=result_ids).update(status=ProcessedResult.STATUS_EXPIRED)
+    return deleted, freed
+
+
+def expire_files(kind: str, max_age_seconds: float) -> Tuple[int, int]:
+    """
+    Delete the files of a kind written more than max_age_seconds ago.
+
+    Returns:
+        Tuple (files_deleted, bytes_freed)
+    """
+    threshold = timezone.now() - timedelta(seconds=max_age_seconds)
+    rows = StoredFile.objects.filter(kind=kind, created_at__lt=threshold).only('path', 'size', 'result')
+    return _delete_rows(list(rows))
+
+
+def storage_usage() -> int:
+    """Bytes of the indexed files plus the blobs of active uploads (shared blobs counted once)."""
+    files = StoredFile.objects.aggregate(total=Sum('size'))['total'] or 0
+    blobs = dict(
+        Document.objects.filter(status=Document.STATUS_ACTIVE).values_list('sha256', 'size').distinct()
+    )
+    return files + sum(blobs.values())
+
+
+def _least_recently_used(queryset, *fields: str) -> Iterator:
+    """
+    Yield rows in (accessed_at, pk) order, QUOTA_CHUNK_SIZE per query.
+
+    Each chunk starts after the last row of the previous one (keyset
+    pagination), so rows deleted or expired meanwhile do not shift it.
+    """
+    queryset = queryset.order_by('accessed_at', 'pk').only('accessed_at', *fields)
+    rows = list(queryset[:QUOTA_CHUNK_SIZE])
+    while rows:
+        yield from rows
+        if len(rows) < QUOTA_CHUNK_SIZE:
+            return
+        last = rows[-1]
+        rows = list(queryset.filter(
+            Q(accessed_at__gt=last.accessed_at) | Q(accessed_at=last.accessed_at, pk__gt=last.pk)
+        )[:QUOTA_CHUNK_SIZE])
+
+
+def enforce_quota(max_bytes: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Evict the least recently used files and uploads until storage fits.
+
+    Result files and uploads are merged in accessed_at order, both read in
+    chunks through their accessed_at indexes; reading stops as soon as
+    enough was evicted. Like the render cache, storage is trimmed to 90%
+    of the quota so eviction does not run again right away.
+
+    Args:
+        max_bytes: Quota (default: settings.PDF_STORAGE_QUOTA_BYTES; None = no quota)
+
+    Returns:
+        Tuple (items_evicted, bytes_freed)
+    """
+    from .pdf_store import release_reference
+
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'PDF_STORAGE_QUOTA_BYTES', None)
+    if max_bytes is None:
+        return 0, 0
+
+    total = storage_usage()
+    if total <= max_bytes:
+        return 0, 0
+
+    target = max_bytes * 0.9
+    files = (
+        (row.accessed_at, 0, row)
+        for row in _least_recently_used(StoredFile.objects.all(), 'path', 'size', 'result')
+    )
+    documents = (
+        (document.accessed_at, 1, document)
+        for document in _least_recently_used(
+            Document.objects.filter(status=Document.STATUS_ACTIVE), 'sha256', 'size'
+        )
+    )
+
+    evicted, freed = 0, 0
+    for _, is_document, item in heapq.merge(files, documents, key=lambda entry: entry[:2]):
+        if total - freed <= target:
+            break
+        evicted += 1
+        if is_document:
+            if item.sha256 and release_reference(item.sha256, item.id):
+                freed += item.size
+            Document.objects.filter(pk=item.pk).update(status=Document.STATUS_EXPIRED)
+        else:
+            # Counted even if the file was already gone: it was part of the total;
+            # its result page is expired along with it
+            _delete_rows([item])
+            freed += item.size
+    return evicted, freed
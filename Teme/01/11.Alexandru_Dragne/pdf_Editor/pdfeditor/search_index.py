@@ -0,0 +1,182 @@
+"""
+Search Index Module - full-text search across uploaded PDFs.
+
+Every stored document (one per content hash, however many users uploaded
+it) is added page by page to a SQLite FTS5 table when it is uploaded; the
+text comes from the per-document text index, so the PDF is not parsed
+again. A search is limited to the hashes of the caller's own uploads and
+returns pages ranked by BM25, with highlighted snippets. Documents are
+removed from the index together with their blob.
+"""
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    sha256 TEXT PRIMARY KEY,
+    page_count INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+    text,
+    sha256 UNINDEXED,
+    page UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+SNIPPET_TOKENS = 12
+
+
+def get_search_db_path() -> str:
+    """Return the SQLite file backing the index (settings.PDF_SEARCH_DB)."""
+    return str(getattr(
+        settings, 'PDF_SEARCH_DB',
+        os.path.join(settings.BASE_DIR, 'pdf_search.sqlite3')
+    ))
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the search database, creating the schema on first use."""
+    db_path = get_search_db_path()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def index_document(sha256: str, pdf_path: str) -> bool:
+    """
+    Add a document's pages to the index (no-op if already indexed).
+
+    Args:
+        sha256: Document hash
+        pdf_path: PDF absolute path (only read if it has no text index yet)
+
+    Returns:
+        bool: True if the document was added now
+    """
+    from .text_index import get_text_index
+
+    conn = _connect()
+    try:
+        if conn.execute("SELECT 1 FROM documents WHERE sha256 = ?", (sha256,)).fetchone():
+            return False
+
+        index = get_text_index(pdf_path, sha256)
+        conn.execute('BEGIN IMMEDIATE')
+        # Another process may have indexed it while we were reading
+        if conn.execute("SELECT 1 FROM documents WHERE sha256 = ?", (sha256,)).fetchone():
+            conn.execute('ROLLBACK')
+            return False
+        conn.executemany(
+            "INSERT INTO pages (text, sha256, page) VALUES (?, ?, ?)",
+            ((text, sha256, page) for page, text in enumerate(index.pages, 1) if text.strip())
+        )
+        conn.execute(
+            "INSERT INTO documents (sha256, page_count, indexed_at) VALUES (?, ?, ?)",
+            (sha256, index.page_count, time.time())
+        )
+        conn.execute('COMMIT')
+        return True
+    finally:
+        conn.close()
+
+
+def remove_document(sha256: str):
+    """Drop a document from the index."""
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute("DELETE FROM pages WHERE sha256 = ?", (sha256,))
+        conn.execute("DELETE FROM documents WHERE sha256 = ?", (sha256,))
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+
+def remove_missing_documents() -> int:
+    """
+    Drop documents whose blob no longer exists (used by cleanup_old_pdfs).
+
+    Returns:
+        int: Number of documents removed
+    """
+    from .pdf_store import blob_path
+
+    conn = _connect()
+    try:
+        hashes = [row['sha256'] for row in conn.execute("SELECT sha256 FROM documents")]
+    finally:
+        conn.close()
+
+    missing = [sha256 for sha256 in hashes if not os.path.exists(blob_path(sha256))]
+    for sha256 in missing:
+        remove_document(sha256)
+    return len(missing)
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query: every word must appear (as a prefix for the last one)."""
+    terms = ['"{}"'.format(word.replace('"', '""')) for word in query.split()]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(query: str, sha256s: Iterable[str], limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Search the pages of the given documents.
+
+    Args:
+        query: Free text; all words must match (diacritics and case ignored)
+        sha256s: Hashes of the documents to search (the user's uploads)
+        limit: Maximum number of page hits
+
+    Returns:
+        List of dicts (sha256, page, snippet, score), best match first.
+        Snippets mark matches with <mark>…</mark>, the rest is HTML-escaped.
+    """
+    sha256s = list(dict.fromkeys(sha256s))
+    fts_query = _fts_query(query)
+    if not sha256s or not fts_query:
+        return []
+
+    placeholders = ','.join('?' * len(sha256s))
+    # Control characters as markers, so the text can be escaped afterwards
+    sql = f"""
+        SELECT sha256, page,
+               snippet(pages, 0, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet,
+               bm25(pages) AS score
+        FROM pages
+        WHERE pages MATCH ? AND sha256 IN ({placeholders})
+        ORDER BY score
+        LIMIT ?
+    """
+
+    conn = _connect()
+    try:
+        rows = conn.execute(sql, [fts_query, *sha256s, limit]).fetchall()
+    except sqlite3.OperationalError:
+        return []  # Query syntax FTS5 cannot parse
+    finally:
+        conn.close()
+
+    from django.utils.html import escape
+
+    return [
+        {
+            'sha256': row['sha256'],
+            'page': row['page'],
+            'snippet': escape(row['snippet']).replace('\x02', '<mark>').replace('\x03', '</mark>'),
+            'score': -row['score']
+        }
+        for row in rows
+    ]
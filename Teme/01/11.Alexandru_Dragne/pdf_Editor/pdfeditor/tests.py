@@ -1,9 +1,13 @@
 """
 Tests pentru aplicația PDF Editor.
 """
+import hashlib
+import io
+import json
 import os
+import shutil
 import tempfile
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 import fitz  # PyMuPDF
@@ -11,15 +15,69 @@ import fitz  # PyMuPDF
 from .pdf_processor import (
     parse_page_range,
     check_pdf_has_text,
-    find_and_replace_text
+    find_and_replace_text,
+    compress_pdf,
+    ocr_pdf_to_text,
+    extract_text_from_pdf,
+    file_sha256,
+    get_cache_dir,
+    split_pdf,
+    merge_pdfs,
+    SPLIT_PARALLEL_MIN_PAGES
 )
+from .page_ranges import PageSet
+from .jobs import submit_job, get_job, JobRunner
+from .pdf_store import store_upload, get_analysis, reference_count, release_reference
+from .models import Document, Pipeline, ProcessedResult, StoredFile
 
 
-class PDFProcessorTests(TestCase):
+def add_document(client, pdf_id, path, name):
+    """Înregistrează un PDF existent ca document încărcat în sesiunea clientului."""
+    return Document.objects.create(
+        id=pdf_id,
+        owner=client.session.session_key,
+        path=path,
+        name=name,
+        size=os.path.getsize(path)
+    )
+
+
+class StorageTestCase(TestCase):
+    """
+    Bază pentru testele care scriu pe disc: MEDIA_ROOT, cache-urile, sesiunile
+    de editare și bazele SQLite partajate sunt mutate într-un director temporar.
+    """
+
+    # Setări suplimentare ale clasei de test
+    extra_settings = {}
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(**{
+            'MEDIA_ROOT': self.temp_dir,
+            'PDF_CACHE_DIR': os.path.join(self.temp_dir, 'cache'),
+            'PDF_SEARCH_DB': os.path.join(self.temp_dir, 'search.sqlite3'),
+            'PDF_EDIT_SESSION_DIR': os.path.join(self.temp_dir, 'edits'),
+            'PDF_JOBS_DB': os.path.join(self.temp_dir, 'jobs.sqlite3'),
+            'OLLAMA_CACHE_DB': os.path.join(self.temp_dir, 'rephrase_cache.sqlite3'),
+            'PDF_VIEW_JOBS': False,
+            'PDF_METRICS_DB': os.path.join(self.temp_dir, 'metrics.sqlite3'),
+            'PDF_RENDER_PRERENDER_PAGES': 0,
+            **self.extra_settings
+        })
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+class PDFProcessorTests(StorageTestCase):
     """Teste pentru funcțiile de procesare PDF."""
     
     def setUp(self):
         """Creează PDF-uri de test."""
+        super().setUp()
         # Create a simple PDF with text
         self.test_pdf_text = self._create_test_pdf_with_text("Acesta este un test simplu. Test repetat.")
         
@@ -32,6 +90,7 @@ class PDFProcessorTests(TestCase):
             os.remove(self.test_pdf_text)
         if os.path.exists(self.test_pdf_blank):
             os.remove(self.test_pdf_blank)
+        super().tearDown()
     
     def _create_test_pdf_with_text(self, text):
         """Helper pentru crearea unui PDF cu text."""
@@ -150,10 +209,11 @@ class PDFProcessorTests(TestCase):
             os.remove(output_path)
 
 
-class ViewTests(TestCase):
+class ViewTests(StorageTestCase):
     """Teste pentru views."""
     
     def setUp(self):
+        super().setUp()
         self.client = Client()
         
         # Create a test PDF
@@ -169,6 +229,7 @@ class ViewTests(TestCase):
         os.close(self.pdf_fd)
         if os.path.exists(self.test_pdf_path):
             os.remove(self.test_pdf_path)
+        super().tearDown()
     
     def test_upload_view_get(self):
         """Test GET request la upload view."""
@@ -245,3 +306,2044 @@ class ViewTests(TestCase):
         response = self.client.get(reverse('download'))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/pdf')
+
+
+class JobQueueTests(StorageTestCase):
+    """Teste pentru coada de job-uri din background."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(3):
+            doc.new_page().insert_text((50, 50), f"Pagina {i + 1}", fontsize=12)
+        self.pdf_path = os.path.join(self.temp_dir, 'uploads', 'jobs.pdf')
+        os.makedirs(os.path.dirname(self.pdf_path))
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def test_submit_unknown_operation(self):
+        """Operațiile necunoscute sunt respinse la submit."""
+        with self.assertRaises(ValueError):
+            submit_job('nope', {})
+
+    def test_runner_executes_job(self):
+        """Un job pus în coadă este rulat de worker și marcat done."""
+        job_id = submit_job('rotate', {'pdf_path': self.pdf_path, 'rotation_angle': 90}, owner='abc')
+        self.assertEqual(get_job(job_id)['status'], 'queued')
+
+        JobRunner(concurrency=2, timeout=60).run(once=True)
+
+        job = get_job(job_id, owner='abc')
+        self.assertEqual(job['status'], 'done', job['error'])
+        self.assertEqual(job['progress'], 100)
+        with fitz.open(job['result']['output_path']) as doc:
+            self.assertEqual(doc[0].rotation, 90)
+
+        # Alt owner nu vede job-ul
+        self.assertIsNone(get_job(job_id, owner='other'))
+
+    def test_runner_records_failure(self):
+        """Erorile din operație ajung în câmpul error al job-ului."""
+        job_id = submit_job('rotate', {'pdf_path': '/nu/exista.pdf', 'rotation_angle': 90})
+        JobRunner(concurrency=1, timeout=60).run(once=True)
+
+        job = get_job(job_id)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('not found', job['error'])
+
+    def test_timeout_kills_processes_started_by_job(self):
+        """La timeout sunt oprite și procesele pornite de job (ex. pool-ul de OCR)."""
+        import subprocess
+        import sys
+        import time
+        import unittest
+        from unittest import mock
+
+        if not hasattr(os, 'killpg') or not os.path.isdir('/proc'):
+            raise unittest.SkipTest('necesită grupuri de procese și /proc')
+
+        pid_file = os.path.join(self.temp_dir, 'child.pid')
+
+        def start_child_and_hang():
+            child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+            with open(pid_file, 'w') as f:
+                f.write(str(child.pid))
+            time.sleep(60)
+
+        with mock.patch.dict('pdfeditor.jobs.OPERATIONS', {'hang': start_child_and_hang}):
+            job_id = submit_job('hang', {})
+            JobRunner(concurrency=1, timeout=1).run(once=True)
+
+        self.assertEqual(get_job(job_id)['status'], 'failed')
+        with open(pid_file) as f:
+            child_pid = int(f.read())
+
+        def is_running(pid):
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+            except FileNotFoundError:
+                return False
+
+        deadline = time.time() + 5
+        while is_running(child_pid) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(is_running(child_pid))
+
+    def test_runner_executes_ocr_job_with_process_pool(self):
+        """Job-ul de OCR își poate porni propriul pool de procese."""
+        from unittest import mock
+
+        job_id = submit_job('ocr', {'pdf_path': self.pdf_path, 'dpi': 72})
+        with override_settings(PDF_OCR_WORKERS=2), \
+                mock.patch('pytesseract.image_to_string', return_value='text OCR'):
+            JobRunner(concurrency=1, timeout=60).run(once=True)
+
+        job = get_job(job_id)
+        self.assertEqual(job['status'], 'done', job['error'])
+        self.assertEqual(job['result']['text'].count('text OCR'), 3)
+
+    def test_submit_view_returns_job_id(self):
+        """View-ul de submit întoarce imediat un job id fără a procesa PDF-ul."""
+        add_document(self.client, 'pdf-1', self.pdf_path, 'jobs.pdf')
+
+        response = self.client.post(reverse('job_submit', args=['compress']), {
+            'pdf': 'pdf-1', 'quality': 'low'
+        })
+        data = response.json()
+        self.assertTrue(data['success'], data)
+
+        response = self.client.get(reverse('job_status', args=[data['job_id']]))
+        self.assertEqual(response.json()['status'], 'queued')
+
+    def test_events_stream_is_bounded(self):
+        """Fluxul SSE se închide cu un retry: chiar dacă job-ul nu s-a terminat."""
+        add_document(self.client, 'pdf-1', self.pdf_path, 'jobs.pdf')
+        job_id = self.client.post(reverse('job_submit', args=['rotate']), {
+            'pdf': 'pdf-1', 'rotation_angle': '90'
+        }).json()['job_id']
+
+        with override_settings(PDF_JOB_EVENTS_SECONDS=0):
+            response = self.client.get(reverse('job_events', args=[job_id]))
+            events = b''.join(response.streaming_content).decode().split('\n\n')
+        self.assertEqual(json.loads(events[0][len('data: '):])['status'], 'queued')
+        self.assertEqual(events[1], 'retry: 1000')
+
+    def test_ocr_and_compress_report_progress_per_page(self):
+        """OCR-ul și compresia raportează progresul pe pagini, nu doar 10 → 100."""
+        from unittest import mock
+        from .jobs import execute_job
+
+        for operation, params in (('ocr', {'dpi': 72}), ('compress', {'quality': 'low'})):
+            job_id = submit_job(operation, {'pdf_path': self.pdf_path, **params})
+            with override_settings(PDF_OCR_WORKERS=1), \
+                    mock.patch('pytesseract.image_to_string', return_value='text OCR'), \
+                    mock.patch('pdfeditor.jobs.update_progress') as update_progress:
+                execute_job(job_id)
+
+            reported = [(call.args[1], call.args[2]) for call in update_progress.call_args_list]
+            if operation == 'ocr':
+                self.assertEqual(reported, [
+                    (10, 'Processing'), (39, 'OCR page 1/3'), (69, 'OCR page 2/3'), (99, 'OCR page 3/3')
+                ])
+            else:
+                self.assertEqual([message for _, message in reported[1:]],
+                                 [f'Scanning page {page}/3' for page in (1, 2, 3)])
+
+
+class ViewJobTests(StorageTestCase):
+    """Teste pentru paginile de unelte care își pun lucrul în coadă."""
+
+    extra_settings = {'PDF_VIEW_JOBS': True}
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(3):
+            doc.new_page().insert_text((50, 50), f"Pagina {i + 1}", fontsize=12)
+        self.pdf_path = os.path.join(self.temp_dir, 'uploads', 'jobs.pdf')
+        os.makedirs(os.path.dirname(self.pdf_path))
+        doc.save(self.pdf_path)
+        doc.close()
+        add_document(self.client, 'pdf-1', self.pdf_path, 'jobs.pdf')
+
+    def test_rotate_view_waits_for_job(self):
+        """Formularul pune job-ul în coadă, pagina de așteptare duce la rezultat."""
+        response = self.client.post(reverse('rotate') + '?pdf=pdf-1', {
+            'rotation_angle': '90', 'page_range': ''
+        })
+        result = ProcessedResult.objects.get(kind='rotate')
+        self.assertEqual(result.status, ProcessedResult.STATUS_PENDING)
+        wait_url = reverse('job_wait', args=[result.job_id])
+        self.assertRedirects(response, wait_url)
+
+        # Job-ul nu a rulat încă: pagina se reîncarcă
+        response = self.client.get(wait_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'http-equiv="refresh"')
+
+        JobRunner(concurrency=1, timeout=60).run(once=True)
+
+        self.assertRedirects(self.client.get(wait_url), reverse('rotate_result'))
+        result.refresh_from_db()
+        self.assertEqual(result.status, ProcessedResult.STATUS_READY)
+        self.assertEqual(result.data['rotation_angle'], 90)
+        self.assertTrue(StoredFile.objects.filter(path=result.path, kind='result', result=result).exists())
+        with fitz.open(result.path) as doc:
+            self.assertEqual(doc[0].rotation, 90)
+
+    def test_compress_result_details_come_from_job(self):
+        """Detaliile compresiei (mărime inițială, imagini) sunt completate din rezultatul job-ului."""
+        self.client.post(reverse('compress') + '?pdf=pdf-1', {'quality': 'low'})
+        JobRunner(concurrency=1, timeout=60).run(once=True)
+
+        job_id = ProcessedResult.objects.get(kind='compress').job_id
+        self.assertRedirects(self.client.get(reverse('job_wait', args=[job_id])), reverse('compress_result'))
+        result = ProcessedResult.objects.get(kind='compress')
+        self.assertEqual(result.data['original_size'], os.path.getsize(self.pdf_path))
+        self.assertIn('images_total', result.data['images'])
+
+    def test_failed_job_returns_to_form(self):
+        """Un job eșuat trimite înapoi la formular, cu eroarea."""
+        self.client.post(reverse('rotate') + '?pdf=pdf-1', {'rotation_angle': '90', 'page_range': ''})
+        result = ProcessedResult.objects.get(kind='rotate')
+        os.remove(self.pdf_path)
+        JobRunner(concurrency=1, timeout=60).run(once=True)
+
+        response = self.client.get(reverse('job_wait', args=[result.job_id]))
+        self.assertRedirects(response, reverse('rotate') + '?pdf=pdf-1', fetch_redirect_response=False)
+        result.refresh_from_db()
+        self.assertEqual(result.status, ProcessedResult.STATUS_EXPIRED)
+
+    def test_ocr_ajax_returns_job(self):
+        """OCR-ul întoarce un job; textul vine cu job-ul terminat și poate fi descărcat."""
+        from unittest import mock
+
+        data = self.client.post(reverse('ocr_text', args=['pdf-1']), {'dpi': '72'}).json()
+        self.assertTrue(data['success'], data)
+        self.assertNotIn('text', data)
+
+        with override_settings(PDF_OCR_WORKERS=1), \
+                mock.patch('pytesseract.image_to_string', return_value='text OCR'):
+            JobRunner(concurrency=1, timeout=60).run(once=True)
+
+        job = self.client.get(data['status_url']).json()
+        self.assertEqual(job['status'], 'done', job['error'])
+        self.assertEqual(job['result']['text'].count('text OCR'), 3)
+
+        response = self.client.get(reverse('download_text'))
+        self.assertEqual(b''.join(response.streaming_content).decode().count('text OCR'), 3)
+
+
+class OCRCacheTests(StorageTestCase):
+    """Teste pentru cache-ul de OCR per pagină."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        doc.new_page()
+        doc.new_page()
+        self.pdf_path = os.path.join(self.temp_dir, 'scan.pdf')
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def test_cached_pages_skip_ocr(self):
+        """Paginile din cache sunt citite fără a rula tesseract."""
+        cache_dir = get_cache_dir('ocr', file_sha256(self.pdf_path))
+        for page_idx, text in enumerate(['Prima pagina', 'A doua pagina']):
+            with open(os.path.join(cache_dir, f"p{page_idx}_150.txt"), 'w', encoding='utf-8') as f:
+                f.write(text)
+
+        text = ocr_pdf_to_text(self.pdf_path, dpi=150)
+
+        self.assertIn("=== Page 1 ===\nPrima pagina", text)
+        self.assertIn("=== Page 2 ===\nA doua pagina", text)
+
+    def test_cache_is_keyed_by_dpi(self):
+        """Un DPI diferit nu reutilizează textul din cache."""
+        from unittest import mock
+
+        cache_dir = get_cache_dir('ocr', file_sha256(self.pdf_path))
+        for page_idx in range(2):
+            with open(os.path.join(cache_dir, f"p{page_idx}_150.txt"), 'w', encoding='utf-8') as f:
+                f.write('cached')
+
+        with mock.patch(
+            'pdfeditor.pdf_processor._ocr_page_range',
+            side_effect=lambda path, pages, dpi, cache, on_page=None: [(i, f'ocr {dpi}') for i in pages]
+        ) as ocr_pages:
+            text = ocr_pdf_to_text(self.pdf_path, dpi=300, workers=1)
+
+        # Ambele pagini sunt re-procesate la 300 DPI
+        ocr_pages.assert_called_once_with(self.pdf_path, [0, 1], 300, cache_dir, on_page=mock.ANY)
+        self.assertIn("=== Page 2 ===\nocr 300", text)
+        self.assertNotIn('cached', text)
+
+    def test_only_missing_pages_are_processed(self):
+        """Paginile deja în cache nu mai ajung la OCR."""
+        from unittest import mock
+
+        cache_dir = get_cache_dir('ocr', file_sha256(self.pdf_path))
+        with open(os.path.join(cache_dir, "p0_300.txt"), 'w', encoding='utf-8') as f:
+            f.write('Prima pagina')
+
+        with mock.patch(
+            'pdfeditor.pdf_processor._ocr_page_range', return_value=[(1, 'A doua pagina')]
+        ) as ocr_pages:
+            text = ocr_pdf_to_text(self.pdf_path, dpi=300, workers=4)
+
+        ocr_pages.assert_called_once_with(self.pdf_path, [1], 300, cache_dir, on_page=mock.ANY)
+        self.assertIn("=== Page 1 ===\nPrima pagina", text)
+        self.assertIn("=== Page 2 ===\nA doua pagina", text)
+
+    def test_pages_are_split_across_processes(self):
+        """Cu mai mulți workeri, fiecare proces scrie paginile lui în cache."""
+        from unittest import mock
+
+        # Procesele din pool sunt create prin fork și moștenesc patch-ul
+        with mock.patch('pytesseract.image_to_string', return_value='text OCR'):
+            text = ocr_pdf_to_text(self.pdf_path, dpi=72, workers=2)
+
+        self.assertIn("=== Page 1 ===\ntext OCR", text)
+        self.assertIn("=== Page 2 ===\ntext OCR", text)
+        cache_dir = get_cache_dir('ocr', file_sha256(self.pdf_path))
+        self.assertTrue(os.path.exists(os.path.join(cache_dir, "p0_72.txt")))
+        self.assertTrue(os.path.exists(os.path.join(cache_dir, "p1_72.txt")))
+
+    def test_known_hash_is_not_recomputed(self):
+        """Pentru upload-uri hash-ul e dat de apelant și fișierul nu mai este citit integral."""
+        from unittest import mock
+
+        sha = file_sha256(self.pdf_path)
+        with mock.patch('pdfeditor.pdf_processor.file_sha256') as hash_file, \
+                mock.patch('pytesseract.image_to_string', return_value='text OCR'):
+            ocr_pdf_to_text(self.pdf_path, dpi=72, workers=1, sha256=sha)
+
+        hash_file.assert_not_called()
+        self.assertTrue(os.path.exists(os.path.join(get_cache_dir('ocr', sha), "p0_72.txt")))
+
+    def test_cache_is_dropped_with_blob(self):
+        """Textul OCR din cache este șters odată cu ultimul upload al documentului."""
+        from unittest import mock
+
+        with open(self.pdf_path, 'rb') as f:
+            ref, sha, blob, _ = store_upload(SimpleUploadedFile('scan.pdf', f.read()))
+        with mock.patch('pytesseract.image_to_string', return_value='text OCR'):
+            ocr_pdf_to_text(blob, dpi=72, workers=1, sha256=sha)
+        cache_dir = get_cache_dir('ocr', sha)
+        self.assertTrue(os.listdir(cache_dir))
+
+        self.assertTrue(release_reference(sha, ref))
+        self.assertFalse(os.path.exists(cache_dir))
+
+
+class PDFStoreTests(StorageTestCase):
+    """Teste pentru store-ul content-addressed."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Brosura", fontsize=12)
+        self.pdf_bytes = doc.tobytes()
+        doc.close()
+
+    def test_duplicate_uploads_share_blob(self):
+        """Același fișier urcat de două ori ocupă un singur blob."""
+        ref1, sha1, path1, dup1 = store_upload(SimpleUploadedFile("a.pdf", self.pdf_bytes))
+        ref2, sha2, path2, dup2 = store_upload(SimpleUploadedFile("b.pdf", self.pdf_bytes))
+
+        self.assertEqual(sha1, sha2)
+        self.assertEqual(path1, path2)
+        self.assertFalse(dup1)
+        self.assertTrue(dup2)
+        self.assertNotEqual(ref1, ref2)
+        self.assertEqual(reference_count(sha1), 2)
+        self.assertEqual(file_sha256(path1), sha1)
+
+        # Blob-ul dispare doar la ultima referință
+        self.assertFalse(release_reference(sha1, ref1))
+        self.assertTrue(os.path.exists(path1))
+        self.assertTrue(release_reference(sha1, ref2))
+        self.assertFalse(os.path.exists(path1))
+
+    def test_analysis_is_cached(self):
+        """Analiza documentului se calculează o singură dată."""
+        ref, sha, path, _ = store_upload(SimpleUploadedFile("a.pdf", self.pdf_bytes))
+
+        analysis = get_analysis(sha)
+        self.assertEqual(analysis['page_count'], 1)
+        self.assertTrue(analysis['has_text'])
+        self.assertIn('Helvetica', analysis['fonts'])
+
+        # A doua citire vine din fișierul JSON de lângă blob
+        with open(path.replace('.pdf', '.json'), 'w') as f:
+            json.dump({'page_count': 99}, f)
+        self.assertEqual(get_analysis(sha)['page_count'], 99)
+
+    def test_release_waits_for_concurrent_upload(self):
+        """Un release concurent nu șterge blob-ul unui upload care tocmai îl referă."""
+        import threading
+        from .pdf_store import _blob_lock, add_reference, blob_path
+
+        ref1, sha, path, _ = store_upload(SimpleUploadedFile("a.pdf", self.pdf_bytes))
+
+        # Upload-ul al doilea a găsit blob-ul și îl referă sub lock
+        with _blob_lock(sha):
+            release = threading.Thread(target=release_reference, args=(sha, ref1))
+            release.start()
+            release.join(0.2)
+            self.assertTrue(release.is_alive())
+            ref2 = add_reference(sha)
+        release.join(5)
+
+        self.assertTrue(os.path.exists(blob_path(sha)))
+        self.assertEqual(reference_count(sha), 1)
+        self.assertTrue(release_reference(sha, ref2))
+        self.assertFalse(os.path.exists(path))
+
+
+class ChunkedUploadTests(StorageTestCase):
+    """Teste pentru upload-ul chunked resumable."""
+
+    extra_settings = {'PDF_MAX_UPLOAD_SIZE': 10 * 1024 * 1024}
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(20):
+            doc.new_page().insert_text((50, 50), f"Pagina mare {i}", fontsize=12)
+        self.pdf_bytes = doc.tobytes()
+        doc.close()
+
+    def _create(self, size, filename='mare.pdf'):
+        return self.client.post(reverse('chunked_upload_create'), {'filename': filename, 'size': size})
+
+    def test_resumable_upload(self):
+        """Fișierul trimis în bucăți, cu reluare după offset, ajunge în store."""
+        data = self._create(len(self.pdf_bytes)).json()
+        self.assertTrue(data['success'])
+        url = data['upload_url']
+
+        half = len(self.pdf_bytes) // 2
+        response = self.client.put(url, self.pdf_bytes[:half], content_type='application/octet-stream',
+                                   HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.json()['offset'], half)
+
+        # Clientul "pierde" conexiunea și întreabă unde a rămas
+        self.assertEqual(self.client.get(url).json()['offset'], half)
+
+        # Offset greșit -> 409
+        response = self.client.put(url, self.pdf_bytes[half:], content_type='application/octet-stream',
+                                   HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.put(url, self.pdf_bytes[half:], content_type='application/octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(half))
+        data = response.json()
+        self.assertTrue(data['complete'])
+
+        pdf = Document.objects.get(owner=self.client.session.session_key).as_entry()
+        self.assertEqual(pdf['id'], data['pdf_id'])
+        self.assertEqual(pdf['page_count'], 20)
+        self.assertEqual(file_sha256(pdf['path']), pdf['sha256'])
+
+    def test_rejects_non_pdf_first_chunk(self):
+        """Primul chunk trebuie să înceapă cu %PDF."""
+        url = self._create(100).json()['upload_url']
+        response = self.client.put(url, b'x' * 100, content_type='application/octet-stream',
+                                   HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.client.get(url).json()['offset'], 0)
+
+    def test_magic_bytes_split_across_reads_and_chunks(self):
+        """Header-ul %PDF- poate sosi în mai multe citiri sau chunk-uri."""
+        from .chunked_upload import create_upload, append_chunk, UploadError
+
+        class TinyReads(io.BytesIO):
+            def read(self, size=-1):
+                return super().read(min(size, 2))
+
+        upload = create_upload('mic.pdf', len(self.pdf_bytes))
+        meta = append_chunk(upload['upload_id'], 0, TinyReads(self.pdf_bytes[:3]))
+        self.assertEqual(meta['offset'], 3)
+        meta = append_chunk(upload['upload_id'], 3, io.BytesIO(self.pdf_bytes[3:]))
+        self.assertTrue(meta['complete'])
+
+        # Un fișier care diverge de la %PDF- doar după prima citire
+        upload = create_upload('fals.pdf', 100)
+        with self.assertRaises(UploadError) as error:
+            append_chunk(upload['upload_id'], 0, TinyReads(b'%PX' + b'x' * 97))
+        self.assertEqual(error.exception.status, 415)
+
+    def test_size_limits(self):
+        """Limita de mărime se aplică la creare și în timpul streaming-ului."""
+        self.assertEqual(self._create(20 * 1024 * 1024).status_code, 413)
+
+        url = self._create(10).json()['upload_url']
+        response = self.client.put(url, self.pdf_bytes[:64], content_type='application/octet-stream',
+                                   HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, 413)
+
+
+class CompressPDFTests(StorageTestCase):
+    """Teste pentru recompresia imaginilor din compress_pdf."""
+
+    def setUp(self):
+        from PIL import Image
+
+        super().setUp()
+
+        # Imagine mare (1200x900) afișată pe doar 200pt lățime
+        buffer = io.BytesIO()
+        Image.effect_noise((1200, 900), 60).convert('RGB').save(buffer, 'PNG')
+        doc = fitz.open()
+        doc.new_page().insert_image(fitz.Rect(50, 50, 250, 200), stream=buffer.getvalue())
+        self.pdf_path = os.path.join(self.temp_dir, 'scan.pdf')
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def test_images_are_downsampled_and_reencoded(self):
+        """Calitatea aleasă schimbă efectiv imaginile din PDF."""
+        output_path, original_size, compressed_size, ratio, stats = compress_pdf(self.pdf_path, 'low')
+
+        self.assertEqual(stats['images_recompressed'], 1)
+        self.assertLess(stats['bytes_after'], stats['bytes_before'])
+        self.assertLess(compressed_size, original_size / 10)
+
+        with fitz.open(output_path) as doc:
+            image = doc[0].get_images(full=True)[0]
+            width, image_filter = image[2], image[8]
+            self.assertEqual(image_filter, 'DCTDecode')
+            # 200pt la 96 DPI
+            self.assertEqual(width, 266)
+
+    def test_quality_levels_differ(self):
+        """'high' păstrează mai mulți bytes decât 'low'."""
+        low = compress_pdf(self.pdf_path, 'low', output_name='low')
+        high = compress_pdf(self.pdf_path, 'high', output_name='high')
+        self.assertLess(low[2], high[2])
+
+
+class BatchTests(StorageTestCase):
+    """Teste pentru modul batch (un lanț de operații pe mai multe PDF-uri)."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.input_dir = os.path.join(self.temp_dir, 'facturi')
+        os.makedirs(self.input_dir)
+        for name in ('a', 'b'):
+            doc = fitz.open()
+            for i in range(3):
+                doc.new_page().insert_text((72, 72), f"Factura {name} pagina {i + 1}")
+            doc.save(os.path.join(self.input_dir, f'{name}.pdf'))
+            doc.close()
+        with open(os.path.join(self.input_dir, 'stricat.pdf'), 'wb') as f:
+            f.write(b'%PDF-1.4 not really a pdf')
+
+        self.operations = [
+            {'operation': 'rotate', 'rotation_angle': 90},
+            {'operation': 'page_numbers', 'options': {'format': 'of_total'}},
+            {'operation': 'compress', 'quality': 'medium'}
+        ]
+
+    def test_validate_operations(self):
+        """Operațiile necunoscute și split-ul care nu e ultimul sunt respinse."""
+        from .pdf_processor import validate_operations
+
+        with self.assertRaises(ValueError):
+            validate_operations([{'operation': 'explode'}])
+        with self.assertRaises(ValueError):
+            validate_operations([{'operation': 'split', 'ranges': [[1, 1]]}, {'operation': 'compress'}])
+
+        steps = validate_operations([{'operation': 'rotate', 'rotation_angle': '180'}])
+        self.assertEqual(steps[0]['rotation_angle'], 180)
+
+    def test_run_batch_applies_chain_once_per_document(self):
+        """Fiecare document primește tot lanțul; fișierele invalide apar ca erori."""
+        from .batch import collect_pdf_paths, run_batch
+
+        pdf_paths = collect_pdf_paths([self.input_dir])
+        self.assertEqual(len(pdf_paths), 3)
+
+        batch = run_batch(pdf_paths, self.operations, workers=2)
+        self.assertEqual(batch['succeeded'], 2)
+        self.assertEqual(batch['failed'], 1)
+
+        result = batch['results'][0]
+        self.assertEqual(os.path.basename(result['output_paths'][0]), 'a.pdf')
+        with fitz.open(result['output_paths'][0]) as doc:
+            self.assertEqual(doc[0].rotation, 90)
+            self.assertIn('1 of 3', doc[0].get_text())
+
+    def test_batch_view_queues_job_and_streams_zip(self):
+        """View-ul batch pune un job în coadă; arhiva ZIP vine din rezultatul lui."""
+        import zipfile
+
+        client = Client()
+        for name in ('a', 'b'):
+            add_document(client, name, os.path.join(self.input_dir, f'{name}.pdf'), f'{name}.pdf')
+
+        data = client.post(reverse('batch'), {
+            'selected_pdfs': 'a,b',
+            'operations': json.dumps(self.operations + [{'operation': 'split', 'ranges': [[1, 1], [2, 3]]}])
+        }).json()
+        self.assertTrue(data['success'], data)
+        self.assertEqual(get_job(data['job_id'])['status'], 'queued')
+        self.assertEqual(client.get(data['download_url']).status_code, 404)
+
+        JobRunner(concurrency=1, timeout=60).run(once=True)
+        status = client.get(data['status_url']).json()
+        self.assertEqual(status['status'], 'done', status['error'])
+        self.assertEqual(status['download_urls'], [data['download_url']])
+
+        response = client.get(data['download_url'])
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        names = archive.namelist()
+        self.assertIn('a_part1_pages_1-1.pdf', names)
+        self.assertIn('b_part2_pages_2-3.pdf', names)
+        summary = json.loads(archive.read('results.json'))
+        self.assertEqual(summary['succeeded'], 2)
+
+
+class PipelineTests(StorageTestCase):
+    """Teste pentru pipeline-uri (mai multe unelte, o singură salvare)."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(4):
+            doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+        self.pdf_path = os.path.join(self.temp_dir, 'doc.pdf')
+        doc.save(self.pdf_path)
+        doc.close()
+
+        self.steps = [
+            {'operation': 'rotate', 'rotation_angle': 180, 'page_range': '2'},
+            {'operation': 'watermark', 'watermark_type': 'text', 'watermark_content': 'DRAFT'},
+            {'operation': 'page_numbers', 'options': {'format': 'page_number'}},
+            {'operation': 'compress', 'quality': 'high'}
+        ]
+
+    def test_run_pipeline_writes_one_file(self):
+        """Toți pașii se aplică, iar în media/processed apare un singur fișier."""
+        from .pdf_processor import run_pipeline
+
+        result = run_pipeline(self.pdf_path, self.steps, output_name='rezultat')
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'processed')), ['rezultat.pdf'])
+
+        with fitz.open(result['output_paths'][0]) as doc:
+            self.assertEqual(doc[0].rotation, 0)
+            self.assertEqual(doc[1].rotation, 180)
+            text = doc[3].get_text()
+            self.assertIn('DRAFT', text)
+            self.assertIn('Page 4', text)
+
+    def test_pipeline_view_saves_and_runs(self):
+        """Un pipeline salvat cu nume e un rând al proprietarului și poate fi rulat."""
+        client = Client()
+        add_document(client, 'doc', self.pdf_path, 'doc.pdf')
+
+        response = client.post(reverse('pipeline'), {
+            'action': 'save',
+            'steps': json.dumps(self.steps),
+            'pipeline_name': 'Facturi'
+        })
+        self.assertEqual(response.status_code, 302)
+        pipeline = Pipeline.objects.get(name='Facturi')
+        self.assertEqual(pipeline.owner, client.session.session_key)
+        self.assertEqual(pipeline.steps[0]['operation'], 'rotate')
+        self.assertContains(client.get(reverse('pipeline')), 'Facturi')
+
+        # Alt proprietar nu îl vede; salvarea cu același nume îl înlocuiește
+        other = Client()
+        add_document(other, 'doc-2', self.pdf_path, 'doc.pdf')
+        self.assertNotContains(other.get(reverse('pipeline')), 'Facturi')
+        client.post(reverse('pipeline'), {
+            'action': 'save', 'steps': json.dumps(self.steps[:1]), 'pipeline_name': 'Facturi'
+        })
+        self.assertEqual(len(Pipeline.objects.get(name='Facturi').steps), 1)
+
+        response = client.post(reverse('pipeline'), {
+            'action': 'run',
+            'steps': json.dumps(self.steps + [{'operation': 'split', 'ranges': [[1, 2], [3, 4]]}])
+        })
+        self.assertRedirects(response, reverse('pipeline_result'))
+        self.assertEqual(len(ProcessedResult.objects.get(kind='pipeline').paths), 2)
+
+        response = client.get(reverse('pipeline_result'))
+        self.assertContains(response, 'Pipeline Applied Successfully')
+
+
+class TextIndexTests(StorageTestCase):
+    """Teste pentru indexul de text per document."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(20):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Capitolul {i + 1}")
+            if i == 13:
+                page.insert_text((72, 120), "Garantia expira dupa doi ani.")
+        self.pdf_bytes = doc.tobytes()
+        doc.close()
+
+        # Ca un blob din store: numit după hash
+        self.sha = hashlib.sha256(self.pdf_bytes).hexdigest()
+        self.pdf_path = os.path.join(self.temp_dir, f'{self.sha}.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(self.pdf_bytes)
+
+    def tearDown(self):
+        from . import text_index
+        text_index._loaded.clear()
+        super().tearDown()
+
+    def test_index_is_built_once_and_reloaded_from_disk(self):
+        """Indexul se scrie pe disc și se recitește fără a reparsa PDF-ul."""
+        from . import text_index
+
+        index = text_index.get_text_index(self.pdf_path)
+        self.assertEqual(index.page_count, 20)
+        self.assertTrue(os.path.exists(os.path.join(index.directory, 'pages.json.gz')))
+
+        text_index._loaded.clear()
+        os.remove(self.pdf_path)  # Nu mai poate fi reparsat
+        reloaded = text_index.get_text_index(self.pdf_path, index.sha256)
+        self.assertEqual(reloaded.page_text(13), index.page_text(13))
+        self.assertEqual(reloaded.lines(13)[1]['text'], 'Garantia expira dupa doi ani.')
+
+    def test_search_uses_inverted_index(self):
+        """Căutarea găsește pagina și poziția, iar celelalte pagini sunt sărite."""
+        from .text_index import get_text_index
+
+        index = get_text_index(self.pdf_path)
+        hits = index.find_words('doi ANI')
+        self.assertEqual(len(hits), 1)
+        page, rect = hits[0]
+        self.assertEqual(page, 13)
+        self.assertGreater(rect[1], 100)
+
+        self.assertEqual(index.candidate_pages('expira'), [13])
+        self.assertEqual(index.candidate_pages('Capitolul 1', range(0, 5)), [0])
+
+    def test_replace_and_extract_read_from_index(self):
+        """find_and_replace_text și extract_text_from_pdf folosesc indexul."""
+
+        output_path, count, warnings = find_and_replace_text(self.pdf_path, 'doi ani', 'trei ani')
+        self.assertEqual(count, 1)
+        with fitz.open(output_path) as doc:
+            self.assertIn('trei ani', doc[13].get_text())
+
+        text = extract_text_from_pdf(self.pdf_path)
+        self.assertIn('=== Page 14 ===', text)
+        self.assertIn('Garantia', text)
+
+    def test_files_outside_store_are_not_hashed_or_cached(self):
+        """Fișierele intermediare nu sunt citite pentru hash și nu lasă index pe disc."""
+        from unittest import mock
+        from . import text_index
+
+        pdf_path = os.path.join(self.temp_dir, 'intermediar.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(self.pdf_bytes)
+        text_index._loaded.clear()
+
+        with mock.patch('pdfeditor.text_index.file_sha256') as hash_file, \
+                mock.patch('pdfeditor.text_index.build_text_index', wraps=text_index.build_text_index) as build:
+            output_path, count, _ = find_and_replace_text(pdf_path, 'doi ani', 'trei ani')
+            build.assert_not_called()  # Fără index: toate paginile trec prin înlocuire
+
+            text = extract_text_from_pdf(pdf_path)
+            self.assertEqual(check_pdf_has_text(pdf_path)[0], True)
+        hash_file.assert_not_called()
+
+        self.assertEqual(count, 1)
+        self.assertIn('Garantia', text)
+        self.assertEqual(text_index.get_text_index(pdf_path).lines(13)[1]['text'], 'Garantia expira dupa doi ani.')
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'cache', 'text')))
+        self.assertEqual(len(text_index._loaded), 0)
+
+    def test_known_hash_is_used_for_other_paths(self):
+        """Cu hash-ul dat (ex. job-uri), indexul din cache este folosit și pentru alte căi."""
+        pdf_path = os.path.join(self.temp_dir, 'copie.pdf')
+        shutil.copyfile(self.pdf_path, pdf_path)
+
+        output_path, count, _ = find_and_replace_text(pdf_path, 'doi ani', 'trei ani', sha256=self.sha)
+        self.assertEqual(count, 1)
+        self.assertTrue(os.path.exists(os.path.join(get_cache_dir('text', self.sha), 'pages.json.gz')))
+
+
+class SearchIndexTests(StorageTestCase):
+    """Teste pentru căutarea full-text în toate PDF-urile unui utilizator."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+
+    def _upload(self, name, pages):
+        doc = fitz.open()
+        for text in pages:
+            doc.new_page().insert_text((72, 72), text)
+        data = doc.tobytes()
+        doc.close()
+        self.client.post(reverse('upload'), {'pdf_file': SimpleUploadedFile(name, data, content_type='application/pdf')})
+        return Document.objects.filter(owner=self.client.session.session_key).last().as_entry()
+
+    def test_search_ranks_pages_across_documents(self):
+        """Rezultatele vin din toate PDF-urile, cu pagina și fragmentul găsit."""
+        from .search_index import search
+
+        contract = self._upload('contract.pdf', ['Introducere', 'Perioada de garantie este de doi ani'])
+        manual = self._upload('manual.pdf', ['Garantie garantie garantie', 'Instalare'])
+
+        response = self.client.get(reverse('search'), {'q': 'garantie'})
+        self.assertContains(response, 'contract.pdf')
+        self.assertContains(response, 'manual.pdf')
+        self.assertContains(response, '<mark>garantie</mark>')
+
+        hits = search('garantie', [contract['sha256'], manual['sha256']])
+        self.assertEqual([(hit['sha256'], hit['page']) for hit in hits],
+                         [(manual['sha256'], 1), (contract['sha256'], 2)])
+
+        # Prefix pentru ultimul cuvânt, toate cuvintele obligatorii
+        self.assertEqual(len(search('perioada gar', [contract['sha256']])), 1)
+        self.assertEqual(search('perioada instalare', [contract['sha256'], manual['sha256']]), [])
+
+    def test_search_is_limited_to_own_documents_and_dropped_with_blob(self):
+        """Alți utilizatori nu văd documentul; ștergerea blob-ului îl scoate din index."""
+        from .search_index import search
+
+        pdf = self._upload('secret.pdf', ['Parola este 1234'])
+
+        other = Client()
+        self.assertNotContains(other.get(reverse('search'), {'q': 'parola'}), 'secret.pdf')
+
+        self.client.get(reverse('delete_pdf', args=[pdf['id']]))
+        self.assertEqual(search('parola', [pdf['sha256']]), [])
+
+
+class ExtractTextStreamTests(StorageTestCase):
+    """Teste pentru extragerea textului în flux (NDJSON) și descărcarea din fișier."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+
+        doc = fitz.open()
+        for text in ['Prima pagina', '', 'A treia pagina']:
+            page = doc.new_page()
+            if text:
+                page.insert_text((72, 72), text)
+        data = doc.tobytes()
+        doc.close()
+        self.client.post(reverse('upload'), {'pdf_file': SimpleUploadedFile('doc.pdf', data, content_type='application/pdf')})
+        self.pdf = Document.objects.get(owner=self.client.session.session_key).as_entry()
+
+    def _extract(self):
+        import json
+
+        response = self.client.post(reverse('extract_text', args=[self.pdf['id']]))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_extract_streams_one_line_per_page(self):
+        """Fiecare pagină vine pe o linie separată, urmată de linia 'done'."""
+        lines = self._extract()
+
+        self.assertEqual([line['type'] for line in lines], ['page', 'page', 'page', 'done'])
+        self.assertEqual([line['page'] for line in lines[:3]], [1, 2, 3])
+        self.assertIn('Prima pagina', lines[0]['text'])
+        self.assertEqual(lines[1]['text'], '')
+        self.assertTrue(lines[3]['has_text'])
+
+        # Textul nu este păstrat în sesiune, doar calea fișierului
+        self.assertNotIn('extracted_text', self.client.session)
+        self.assertEqual(ProcessedResult.objects.get(kind='text').data['filename'], 'doc_extracted.txt')
+
+    def test_download_streams_text_file(self):
+        """Descărcarea citește fișierul scris în timpul extragerii."""
+        self._extract()
+        first_path = ProcessedResult.objects.get(kind='text').path
+
+        response = self.client.get(reverse('download_text'))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="doc_extracted.txt"')
+        text = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(text, extract_text_from_pdf(self.pdf['path']))
+
+        # O nouă extragere înlocuiește fișierul anterior
+        self._extract()
+        self.assertFalse(os.path.exists(first_path))
+
+
+class PageRenderTests(StorageTestCase):
+    """Teste pentru preview-urile randate pe server (thumbnail-uri, tile-uri, cache LRU)."""
+
+    extra_settings = {'PDF_RENDER_PRERENDER_PAGES': 2}
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+
+        doc = fitz.open()
+        for i in range(3):
+            doc.new_page().insert_text((72, 72), f'Pagina {i + 1}')
+        data = doc.tobytes()
+        doc.close()
+        self.client.post(reverse('upload'), {'pdf_file': SimpleUploadedFile('doc.pdf', data, content_type='application/pdf')})
+        self.pdf = Document.objects.get(owner=self.client.session.session_key).as_entry()
+
+    def test_thumbnail_and_tiles_are_rendered_and_cached(self):
+        """Imaginile se randează o singură dată și apoi se citesc din cache."""
+        from PIL import Image
+        from .page_render import render_cache_path, TILE_SIZE
+
+        info = self.client.get(reverse('page_info', args=[self.pdf['id']])).json()
+        self.assertEqual(info['page_count'], 3)
+        self.assertEqual(info['pages'][0], [595.0, 842.0])
+
+        response = self.client.get(reverse('page_thumbnail', args=[self.pdf['id'], 3]))
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        thumbnail = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(thumbnail.width, 200)
+
+        response = self.client.get(reverse('page_tile', args=[self.pdf['id'], 3]), {'zoom': 2, 'x': 2, 'y': 0, 'format': 'png'})
+        tile = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tile.size, (595 * 2 - 2 * TILE_SIZE, TILE_SIZE))  # Ultima coloană
+
+        cached = render_cache_path(self.pdf['sha256'], 2, 2.0, (2, 0), 'png')
+        self.assertTrue(os.path.exists(cached))
+        os.utime(cached, (0, 0))
+        self.client.get(reverse('page_tile', args=[self.pdf['id'], 3]), {'zoom': 2, 'x': 2, 'y': 0, 'format': 'png'})
+        self.assertGreater(os.path.getmtime(cached), 0)  # Servit din cache, marcat ca folosit
+
+        # În afara documentului
+        self.assertEqual(self.client.get(reverse('page_thumbnail', args=[self.pdf['id'], 4])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('page_tile', args=[self.pdf['id'], 1]), {'zoom': 1, 'x': 5}).status_code, 404)
+
+    def test_upload_prerenders_first_pages(self):
+        """La upload se randează primele pagini (thumbnail + tile-uri la zoom-ul implicit)."""
+        from .page_render import prerender_pages, render_cache_path, DEFAULT_ZOOM
+
+        # Randările pornite la upload, plus cele care mai lipsesc
+        for future in prerender_pages(self.pdf['path'], self.pdf['sha256']):
+            future.result(timeout=30)
+
+        sha256 = self.pdf['sha256']
+        self.assertTrue(os.path.exists(render_cache_path(sha256, 1)))
+        self.assertTrue(os.path.exists(render_cache_path(sha256, 1, DEFAULT_ZOOM, (1, 2))))
+        self.assertFalse(os.path.exists(render_cache_path(sha256, 2)))
+
+    def test_cache_evicts_least_recently_used(self):
+        """Peste limită se șterg mai întâi imaginile folosite cel mai demult."""
+        from unittest import mock
+        from .page_render import (
+            render_page_image, evict_render_cache, prerender_pages, drop_renders, render_cache_stats
+        )
+
+        # Doar imaginile din acest test în cache
+        for future in prerender_pages(self.pdf['path'], self.pdf['sha256']):
+            future.result(timeout=30)
+        drop_renders(self.pdf['sha256'])
+
+        paths = [render_page_image(self.pdf['path'], self.pdf['sha256'], page) for page in range(3)]
+        for age, path in enumerate(paths):
+            os.utime(path, (1000 + age, 1000 + age))
+        os.utime(paths[0])  # Folosită recent
+
+        sizes = [os.path.getsize(path) for path in paths]
+        deleted, freed = evict_render_cache(max_bytes=sum(sizes) - 1)
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(freed, sizes[1])
+        self.assertEqual([os.path.exists(path) for path in paths], [True, False, True])
+
+        # /metrics citește totalurile ținute la zi, fără a lista cache-ul
+        with mock.patch('os.walk', side_effect=AssertionError('render cache scanned')):
+            self.assertEqual(render_cache_stats(), {'images': 2, 'bytes': sizes[0] + sizes[2]})
+
+    def test_slow_render_returns_503(self):
+        """O randare care depășește PDF_RENDER_TIMEOUT întoarce 503 cu Retry-After."""
+        from concurrent.futures import Future
+        from unittest import mock
+        from . import page_render
+
+        stuck = Future()  # Nu se termină niciodată
+        executor = mock.Mock(**{'submit.return_value': stuck})
+        with override_settings(PDF_RENDER_TIMEOUT=0.05), \
+                mock.patch.object(page_render, '_get_executor', return_value=executor):
+            response = self.client.get(reverse('page_tile', args=[self.pdf['id'], 3]), {'zoom': 4, 'x': 1, 'y': 1})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(page_render.RETRY_AFTER))
+        # Randarea blocată nu mai este așteptată de request-urile următoare
+        self.assertNotIn(stuck, page_render._pending.values())
+        self.assertTrue(stuck.cancelled())
+
+
+class FakeOllamaTestCase(StorageTestCase):
+    """Bază pentru testele AI: un server Ollama fals și un cache de rephrase gol."""
+
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from unittest import mock
+        from . import ollama_service
+
+        super().setUp()
+
+        stats = self.stats = {'tags': 0, 'generate': 0, 'in_flight': 0, 'max_in_flight': 0, 'clients': set()}
+        lock = threading.Lock()
+
+        class FakeOllama(BaseHTTPRequestHandler):
+            """Server Ollama minimal: răspunsul este textul cu majuscule."""
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, content_type='application/json'):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stats['tags'] += 1
+                self._send(json.dumps({'models': [{'name': 'test-model'}]}).encode())
+
+            def do_POST(self):
+                import time
+
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                text = payload['prompt'].split('Text to rephrase:\n"', 1)[1].split('"\n', 1)[0]
+                with lock:
+                    stats['generate'] += 1
+                    stats['clients'].add(self.client_address)
+                    stats['in_flight'] += 1
+                    stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+                time.sleep(0.05)
+                with lock:
+                    stats['in_flight'] -= 1
+
+                if payload['stream']:
+                    lines = [json.dumps({'response': word + ' ', 'done': False}) for word in text.upper().split()]
+                    lines.append(json.dumps({'response': '', 'done': True}))
+                    self._send('\n'.join(lines).encode(), 'application/x-ndjson')
+                else:
+                    self._send(json.dumps({'response': f'"{text.upper()}"'}).encode())
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOllama)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.patches = [
+            mock.patch.object(ollama_service, 'OLLAMA_BASE_URL', base_url),
+            mock.patch.object(ollama_service, '_session', None),
+        ]
+        for patch in self.patches:
+            patch.start()
+        ollama_service.clear_status_cache()
+
+    def tearDown(self):
+        from . import ollama_service
+
+        ollama_service.clear_status_cache()
+        for patch in self.patches:
+            patch.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+
+class OllamaClientTests(FakeOllamaTestCase):
+    """Teste pentru clientul Ollama (sesiune comună, cache de status, batch, streaming)."""
+
+    def test_status_and_models_are_cached(self):
+        """Verificarea conexiunii și lista de modele nu mai ajung la Ollama la fiecare apel."""
+        from .ollama_service import check_ollama_connection, get_available_models, clear_status_cache
+
+        for _ in range(3):
+            self.assertTrue(check_ollama_connection()[0])
+            self.assertEqual(get_available_models(), ['test-model'])
+        self.assertEqual(self.stats['tags'], 2)
+
+        clear_status_cache()
+        check_ollama_connection()
+        self.assertEqual(self.stats['tags'], 3)
+
+    def test_rephrase_many_is_bounded_and_ordered(self):
+        """Paragrafele se trimit în paralel, limitat, pe conexiuni refolosite."""
+        from .ollama_service import rephrase_many
+
+        texts = [f'paragraful {i}' for i in range(12)]
+        results = rephrase_many(texts, max_in_flight=3)
+
+        self.assertEqual([rephrased for rephrased, _, _ in results], [text.upper() for text in texts])
+        self.assertTrue(all(success for _, success, _ in results))
+        self.assertGreater(self.stats['max_in_flight'], 1)
+        self.assertLessEqual(self.stats['max_in_flight'], 3)
+        self.assertLessEqual(len(self.stats['clients']), 3)
+
+    def test_preview_streams_server_sent_events(self):
+        """Preview-ul trimite fragmentele generate ca server-sent events."""
+        response = self.client.post(reverse('rephrase_preview'), {
+            'text': 'un text scurt', 'style': 'formal', 'model': 'test-model', 'stream': '1'
+        })
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        body = b''.join(response.streaming_content).decode('utf-8')
+        events = [json.loads(event[len('data: '):]) for event in body.split('\n\n') if event]
+
+        self.assertEqual([event['token'] for event in events[:-1]], ['UN ', 'TEXT ', 'SCURT '])
+        self.assertTrue(events[-1]['success'])
+        self.assertEqual(events[-1]['rephrased_text'], 'UN TEXT SCURT')
+
+
+class RephraseCacheTests(FakeOllamaTestCase):
+    """Teste pentru cache-ul persistent al rezultatelor de rephrase."""
+
+    def test_identical_requests_are_answered_from_cache(self):
+        """Același text (spații normalizate), stil și model nu mai ajung la Ollama."""
+        from .ollama_service import rephrase_text, stream_rephrase_text
+        from .rephrase_cache import cache_stats
+
+        self.assertEqual(rephrase_text('un  paragraf\nrepetat', 'formal', 'test-model'), ('UN PARAGRAF REPETAT', True, ''))
+        self.assertEqual(rephrase_text('un paragraf repetat', 'formal', 'test-model'), ('UN PARAGRAF REPETAT', True, ''))
+        self.assertEqual(list(stream_rephrase_text('un paragraf repetat', 'formal', 'test-model')), ['UN PARAGRAF REPETAT'])
+        self.assertEqual(self.stats['generate'], 1)
+
+        # Alt stil, alt model sau cerere explicită fără cache: din nou la Ollama
+        rephrase_text('un paragraf repetat', 'casual', 'test-model')
+        rephrase_text('un paragraf repetat', 'formal', 'alt-model')
+        rephrase_text('un paragraf repetat', 'formal', 'test-model', use_cache=False)
+        self.assertEqual(self.stats['generate'], 4)
+
+        stats = cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 3, 3))
+
+    def test_cache_evicts_least_recently_used_entries(self):
+        """Peste limita de intrări se șterg cele folosite cel mai demult."""
+        from .ollama_service import rephrase_text
+        from .rephrase_cache import cache_stats
+
+        with override_settings(OLLAMA_CACHE_MAX_ENTRIES=2):
+            rephrase_text('primul', 'formal', 'test-model')
+            rephrase_text('al doilea', 'formal', 'test-model')
+            rephrase_text('primul', 'formal', 'test-model')  # Folosit recent
+            rephrase_text('al treilea', 'formal', 'test-model')
+            self.assertEqual(self.stats['generate'], 3)
+
+            rephrase_text('primul', 'formal', 'test-model')
+            self.assertEqual(self.stats['generate'], 3)
+            rephrase_text('al doilea', 'formal', 'test-model')
+            self.assertEqual(self.stats['generate'], 4)
+
+        self.assertEqual(cache_stats()['evictions'], 2)
+        self.assertEqual(self.client.get(reverse('rephrase_cache_stats')).json()['entries'], 2)
+
+
+class RephraseDocumentTests(FakeOllamaTestCase):
+    """Teste pentru reformularea întregului document într-un singur job."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(3):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Capitolul {i + 1}", fontsize=18)
+            page.insert_textbox(
+                fitz.Rect(72, 100, 520, 200),
+                f"primul paragraf are destul de multe cuvinte ca sa se intinda pe mai multe "
+                f"randuri ale paginii {i + 1} si sa fie tratat ca un singur bloc de text",
+                fontsize=11
+            )
+            page.insert_textbox(fitz.Rect(72, 240, 520, 300), f"al doilea paragraf {i + 1} este scurt", fontsize=11)
+        self.pdf_path = os.path.join(self.temp_dir, 'document.pdf')
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def test_paragraph_blocks(self):
+        """Liniile consecutive devin un paragraf; titlurile scurte sunt ignorate."""
+        from .pdf_processor import extract_paragraph_blocks
+
+        blocks = extract_paragraph_blocks(self.pdf_path)
+
+        self.assertEqual(len(blocks), 6)
+        self.assertEqual([block['page'] for block in blocks], [0, 0, 1, 1, 2, 2])
+        self.assertGreater(len(blocks[0]['lines']), 1)
+        self.assertTrue(blocks[0]['text'].startswith('primul paragraf are destul'))
+        self.assertTrue(blocks[0]['text'].endswith('un singur bloc de text'))
+        self.assertEqual(blocks[1]['text'], 'al doilea paragraf 1 este scurt')
+        self.assertEqual(extract_paragraph_blocks(self.pdf_path, page_range='2')[0]['page'], 1)
+
+    def test_job_rephrases_all_paragraphs(self):
+        """Un singur job reformulează toate paragrafele și păstrează titlurile."""
+        job_id = submit_job('rephrase_document', {'pdf_path': self.pdf_path, 'model': 'test-model'})
+        JobRunner(concurrency=1, timeout=60).run(once=True)
+
+        job = get_job(job_id)
+        self.assertEqual(job['status'], 'done', job['error'])
+        self.assertEqual((job['result']['paragraph_count'], job['result']['rephrased_count']), (6, 6))
+        self.assertEqual(self.stats['generate'], 6)
+
+        with fitz.open(job['result']['output_path']) as doc:
+            self.assertEqual(len(doc), 3)
+            for i, page in enumerate(doc):
+                text = ' '.join(page.get_text().split())
+                self.assertIn(f'Capitolul {i + 1}', text)
+                self.assertIn('PRIMUL PARAGRAF ARE DESTUL', text)
+                self.assertIn(f'AL DOILEA PARAGRAF {i + 1} ESTE SCURT', text)
+                self.assertNotIn('primul paragraf', text)
+
+
+class EditSessionTests(StorageTestCase):
+    """Teste pentru sesiunile de editare (salvări incrementale, undo/redo)."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(50):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Contract pagina {i + 1}: garantie doi ani", fontsize=12)
+            page.insert_textbox(fitz.Rect(72, 100, 520, 700), "text de umplutura " * 120, fontsize=9)
+        self.pdf_path = os.path.join(self.temp_dir, 'contract.pdf')
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_edits_are_incremental_and_undoable(self):
+        """Fiecare editare adaugă doar un increment; undo/redo nu mai rulează editarea."""
+        from .edit_session import create_session, apply_edit, undo, redo, get_session, EditSessionError
+
+        session = create_session(self.pdf_path, 'contract.pdf')
+        session_id, working_path = session['session_id'], session['working_path']
+        original = self._read(working_path)
+
+        result = apply_edit(session_id, 'find_replace', {'search_text': 'pagina 3:', 'replace_text': 'pagina III:'})
+        self.assertEqual((result['replacement_count'], result['recorded']), (1, True))
+        after_first = self._read(working_path)
+        self.assertTrue(after_first.startswith(original))
+        self.assertLess(len(after_first) - len(original), len(original) / 10)
+
+        apply_edit(session_id, 'find_replace', {'search_text': 'doi ani', 'replace_text': 'trei ani', 'page_range': '5'})
+        with fitz.open(working_path) as doc:
+            self.assertIn('pagina III:', doc[2].get_text())
+            self.assertIn('trei ani', doc[4].get_text())
+
+        undo(session_id)
+        self.assertEqual(self._read(working_path), after_first)
+        undo(session_id)
+        self.assertEqual(self._read(working_path), original)
+        with self.assertRaises(EditSessionError):
+            undo(session_id)
+
+        redo(session_id)
+        self.assertEqual(self._read(working_path), after_first)
+
+        # O editare nouă după undo renunță la redo
+        apply_edit(session_id, 'find_replace', {'search_text': 'pagina III', 'replace_text': 'pagina 3'})
+        session = get_session(session_id)
+        self.assertEqual((session['position'], len(session['edits']), session['can_redo']), (2, 2, False))
+        with fitz.open(working_path) as doc:
+            self.assertIn('pagina 3:', doc[2].get_text())
+            self.assertIn('doi ani', doc[4].get_text())
+
+        # Editările fără efect nu ajung în jurnal
+        self.assertFalse(apply_edit(session_id, 'find_replace', {'search_text': 'inexistent', 'replace_text': 'x'})['recorded'])
+
+    def test_view_flow_with_undo_and_compacted_download(self):
+        """Edit → undo → redo din views; download-ul e exportul compactat."""
+        add_document(self.client, 'pdf-1', self.pdf_path, 'contract.pdf')
+
+        for search, replace in (('pagina 1:', 'prima pagina:'), ('pagina 2:', 'a doua pagina:')):
+            response = self.client.post(f"{reverse('edit')}?pdf=pdf-1", {
+                'search_text': search, 'replace_text': replace, 'case_sensitive': True
+            })
+            self.assertRedirects(response, reverse('result'), fetch_redirect_response=False)
+
+        response = self.client.get(reverse('result'))
+        self.assertEqual((response.context['edit_count'], response.context['can_undo']), (2, True))
+
+        undo_url = reverse('edit_history', args=['pdf-1', 'undo'])
+        self.client.post(undo_url, {'next': reverse('result')})
+        response = self.client.get(reverse('result'))
+        self.assertEqual((response.context['edit_count'], response.context['can_redo']), (1, True))
+
+        response = self.client.get(reverse('download'))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="contract_modified.pdf"')
+        with fitz.open(stream=b''.join(response.streaming_content), filetype='pdf') as doc:
+            self.assertIn('prima pagina:', doc[0].get_text())
+            self.assertIn('pagina 2:', doc[1].get_text())
+
+
+class PageSetTests(StorageTestCase):
+    """Teste pentru intervalele de pagini (PageSet) și split-ul paralel."""
+
+    def test_range_syntax(self):
+        """Sintaxa: negative, deschise, odd/even, fiecare a N-a, intersecție."""
+        self.assertEqual(PageSet.parse("-1", 10).to_list(), [9])
+        self.assertEqual(PageSet.parse("-3--1", 10).to_list(), [7, 8, 9])
+        self.assertEqual(PageSet.parse("8-", 10).to_list(), [7, 8, 9])
+        self.assertEqual(PageSet.parse("odd", 6).to_list(), [0, 2, 4])
+        self.assertEqual(PageSet.parse("even", 6).to_list(), [1, 3, 5])
+        self.assertEqual(PageSet.parse("2-9/3", 10).to_list(), [1, 4, 7])
+        self.assertEqual(PageSet.parse("1-6&even,9-", 10).to_list(), [1, 3, 5, 8, 9])
+        self.assertEqual(parse_page_range("1-3,2-5", 10), [0, 1, 2, 3, 4])
+
+        pages = PageSet.parse("1-10", 10)
+        self.assertEqual(str(pages - PageSet.parse("4-6", 10)), "1-3,7-10")
+        self.assertEqual(str(pages & PageSet.parse("9-", 10)), "9-10")
+        self.assertEqual(str(pages.every(2)), str(PageSet.parse("odd", 10)))
+
+        for invalid in ("0", "11", "5-3", "-11", "odd/0", "1,,2", "x"):
+            with self.assertRaises(ValueError):
+                PageSet.parse(invalid, 10)
+
+    def test_large_ranges_stay_compact(self):
+        """Un interval de 100.000 de pagini ocupă o singură pereche."""
+        pages = PageSet.parse("1-100000", 100000)
+        self.assertEqual(pages.intervals, ((0, 100000),))
+        self.assertEqual(len(pages), 100000)
+        self.assertIn(99999, pages)
+        self.assertNotIn(100000, pages)
+
+        merged = PageSet.parse("1-50000", 100000) | PageSet.parse("50001-", 100000)
+        self.assertEqual(merged, pages)
+        self.assertEqual(len((pages - PageSet.parse("-1", 100000)).intervals), 1)
+
+    def test_parallel_split_writes_correct_parts(self):
+        """Split cu mai multe procese: fiecare parte are paginile cerute."""
+        doc = fitz.open()
+        for i in range(SPLIT_PARALLEL_MIN_PAGES):
+            doc.new_page().insert_text((72, 72), f"Pagina {i + 1}", fontsize=12)
+        pdf_path = os.path.join(self.temp_dir, 'mare.pdf')
+        doc.save(pdf_path)
+        doc.close()
+
+        output_files = split_pdf(pdf_path, [(1, 10), 'odd&-10-', (150, 150)], workers=3)
+        self.assertEqual([os.path.basename(path) for path in output_files], [
+            'mare_part1_pages_1-10.pdf',
+            'mare_part2_pages_191_193_195_197_199.pdf',
+            'mare_part3_pages_150-150.pdf'
+        ])
+
+        expected = [list(range(1, 11)), [191, 193, 195, 197, 199], [150]]
+        for path, pages in zip(output_files, expected):
+            with fitz.open(path) as part:
+                self.assertEqual(
+                    [page.get_text().strip() for page in part],
+                    [f"Pagina {number}" for number in pages]
+                )
+
+        with self.assertRaises(Exception):
+            split_pdf(pdf_path, [(1, 10), (190, 201)], workers=3)
+
+    def test_outputs_of_shared_blobs_do_not_collide(self):
+        """Două sesiuni cu același blob (<sha256>.pdf) primesc fișiere rezultat diferite."""
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Pagina 1", fontsize=12)
+        blob = os.path.join(self.temp_dir, f"{'ab' * 32}.pdf")
+        doc.save(blob)
+        doc.close()
+
+        first = find_and_replace_text(blob, 'Pagina', 'Page')[0]
+        second = find_and_replace_text(blob, 'Pagina', 'Seite')[0]
+        self.assertNotEqual(first, second)
+        self.assertNotIn('ab' * 32, os.path.basename(first))
+        with fitz.open(first) as doc:
+            self.assertIn('Page 1', doc[0].get_text())
+
+        self.assertNotEqual(split_pdf(blob, [(1, 1)]), split_pdf(blob, [(1, 1)]))
+
+
+class SplitZipTests(StorageTestCase):
+    """Teste pentru descărcarea părților unui split ca ZIP (streaming)."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(6):
+            doc.new_page().insert_text((72, 72), f"Pagina {i + 1}", fontsize=12)
+        uploads_dir = os.path.join(self.temp_dir, 'uploads')
+        os.makedirs(uploads_dir)
+        self.pdf_path = os.path.join(uploads_dir, 'raport.pdf')
+        doc.save(self.pdf_path)
+        doc.close()
+
+        add_document(self.client, 'pdf-1', self.pdf_path, 'raport.pdf')
+
+    def _read_zip(self, response):
+        import zipfile
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        parts = {}
+        for name in archive.namelist():
+            with fitz.open(stream=archive.read(name), filetype='pdf') as part:
+                parts[name] = [page.get_text().strip() for page in part]
+        return parts
+
+    def test_direct_zip_writes_no_files(self):
+        """Cu as_zip, părțile merg direct în arhivă, fără fișiere pe disc."""
+        response = self.client.post(f"{reverse('split')}?pdf=pdf-1", {'ranges': '1-2, 5', 'as_zip': 'on'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="raport_split.zip"')
+        self.assertEqual(self._read_zip(response), {
+            'raport_part1_pages_1-2.pdf': ['Pagina 1', 'Pagina 2'],
+            'raport_part2_pages_5-5.pdf': ['Pagina 5']
+        })
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'processed')))
+
+        # Un interval invalid apare ca mesaj, nu ca arhivă stricată
+        response = self.client.post(f"{reverse('split')}?pdf=pdf-1", {'ranges': '1-9', 'as_zip': 'on'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Invalid range')
+
+    def test_zip_of_split_results(self):
+        """După un split obișnuit, toate părțile se descarcă într-un ZIP."""
+        response = self.client.post(f"{reverse('split')}?pdf=pdf-1", {'ranges': '1-3, 4-6'})
+        self.assertRedirects(response, reverse('split_result'), fetch_redirect_response=False)
+
+        response = self.client.get(reverse('download_split_zip'))
+        parts = self._read_zip(response)
+        self.assertEqual(sorted(parts), ['raport_part1_pages_1-3.pdf', 'raport_part2_pages_4-6.pdf'])
+        self.assertEqual(parts['raport_part2_pages_4-6.pdf'], ['Pagina 4', 'Pagina 5', 'Pagina 6'])
+
+
+class WatermarkTests(StorageTestCase):
+    """Teste pentru watermark-ul desenat o singură dată (Form XObject comun)."""
+
+    def _create_pdf(self, page_count):
+        doc = fitz.open()
+        for i in range(page_count):
+            doc.new_page().insert_text((72, 72), f"Pagina {i + 1}", fontsize=12)
+        path = os.path.join(self.temp_dir, f"doc_{page_count}.pdf")
+        doc.save(path)
+        doc.close()
+        return path
+
+    def test_text_stamp_is_shared_by_all_pages(self):
+        """Toate paginile referă același XObject; mărimea crește foarte puțin pe pagină."""
+        from .pdf_processor import add_watermark
+
+        sizes = {}
+        for page_count in (10, 200):
+            pdf_path = self._create_pdf(page_count)
+            output_path = add_watermark(pdf_path, 'text', 'CONFIDENTIAL', {'position': 'center'})
+            with fitz.open(output_path) as doc:
+                stamps = {
+                    next(xref for xref, name, *_ in page.get_xobjects() if name != 'fzFrm0')
+                    for page in doc
+                }
+                self.assertEqual(len(stamps), 1)
+                self.assertIn('CONFIDENTIAL', doc[-1].get_text())
+            with fitz.open(pdf_path) as source:
+                source_size = len(source.tobytes(garbage=4, deflate=True))
+            sizes[page_count] = os.path.getsize(output_path) - source_size
+            os.remove(output_path)
+
+        # Fiecare pagină în plus adaugă doar referințele la stamp
+        self.assertLess((sizes[200] - sizes[10]) / 190, 20)
+
+    def test_unexpected_stamp_stream_falls_back_to_show_pdf_page(self):
+        """Dacă stream-ul scris de show_pdf_page arată altfel, fiecare pagină e ștampilată normal."""
+        from unittest import mock
+        from .pdf_processor import add_watermark
+
+        pdf_path = self._create_pdf(5)
+        with mock.patch.object(fitz.Document, 'xref_stream', return_value=b''):
+            output_path = add_watermark(pdf_path, 'text', 'CONFIDENTIAL', {'position': 'center'})
+        with fitz.open(output_path) as doc:
+            for page in doc:
+                self.assertIn('CONFIDENTIAL', page.get_text())
+
+    def test_processed_image_is_cached_by_content(self):
+        """Același logo nu se mai procesează a doua oară (alt job, altă cale)."""
+        from unittest import mock
+        from PIL import Image
+        from .pdf_processor import add_watermark
+
+        logo_path = os.path.join(self.temp_dir, 'logo.png')
+        Image.new('RGB', (1600, 400), (200, 30, 30)).save(logo_path)
+        pdf_path = self._create_pdf(5)
+
+        first = add_watermark(pdf_path, 'image', logo_path, {'rotation': 0})
+        copy_path = os.path.join(self.temp_dir, 'logo_copie.png')
+        shutil.copyfile(logo_path, copy_path)
+        with mock.patch('PIL.Image.open', side_effect=AssertionError('image processed again')):
+            second = add_watermark(pdf_path, 'image', copy_path, {'rotation': 0})
+
+        for output_path in (first, second):
+            with fitz.open(output_path) as doc:
+                self.assertEqual(len(doc[0].get_images(full=True)), 1)
+                self.assertEqual(doc[0].get_images(full=True)[0][2], 800)
+
+    def test_unused_cached_images_are_evicted(self):
+        """Cleanup-ul șterge imaginile procesate nefolosite de la ultima retenție."""
+        import time
+        from django.core.management import call_command
+        from PIL import Image
+        from .pdf_processor import _prepare_watermark_image
+
+        paths = []
+        for color in ((200, 30, 30), (30, 200, 30)):
+            logo_path = os.path.join(self.temp_dir, f'logo_{color[0]}.png')
+            Image.new('RGB', (100, 100), color).save(logo_path)
+            paths.append(_prepare_watermark_image(logo_path, 0, 0.5))
+        old, recent = paths
+        week_ago = time.time() - 7 * 24 * 3600
+        os.utime(old, (week_ago, week_ago))
+        os.utime(recent, (week_ago, week_ago))
+
+        # Folosită din nou: rămâne în cache
+        self.assertEqual(_prepare_watermark_image(os.path.join(self.temp_dir, 'logo_30.png'), 0, 0.5), recent)
+
+        call_command('cleanup_old_pdfs', '--retention', 'result=24', stdout=io.StringIO())
+        self.assertFalse(os.path.exists(old))
+        self.assertFalse(os.path.exists(os.path.dirname(old)))
+        self.assertTrue(os.path.exists(recent))
+
+
+class BenchmarkTests(StorageTestCase):
+    """Teste pentru benchmark (măsurători și comparația cu referința)."""
+
+    def test_measurements_are_recorded(self):
+        """Fiecare operație are timp, peak RSS și mărimea rezultatului."""
+        from .benchmark import run_benchmark
+
+        current = run_benchmark(sizes=[3], kinds=['text', 'scanned'], operations=['split_pdf', 'extract_text_from_pdf'])
+        self.assertEqual(sorted(current['results']), [
+            'extract_text_from_pdf/scanned/3', 'extract_text_from_pdf/text/3',
+            'split_pdf/scanned/3', 'split_pdf/text/3'
+        ])
+        for result in current['results'].values():
+            self.assertNotIn('error', result)
+            self.assertGreater(result['peak_rss_bytes'], 0)
+            self.assertGreater(result['output_bytes'], 0)
+        # Rezultatele nu rămân pe disc
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'cache', 'benchmark', 'media', 'processed')))
+        # Măsurătorile nu ajung în metricile serverului
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'metrics.sqlite3')))
+
+    def test_command_fails_on_regression(self):
+        """Comanda eșuează doar când o măsurătoare depășește pragul."""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        baseline_path = os.path.join(self.temp_dir, 'baseline.json')
+        args = ['--sizes', '30', '--kinds', 'text', '--operations', 'rotate_pages', '--baseline', baseline_path]
+        call_command('benchmark_pdfs', *args, '--save-baseline', stdout=io.StringIO())
+        call_command('benchmark_pdfs', *args, stdout=io.StringIO())
+
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        baseline['results']['rotate_pages/text/30']['output_bytes'] //= 10
+        with open(baseline_path, 'w') as f:
+            json.dump(baseline, f)
+        with self.assertRaises(CommandError):
+            call_command('benchmark_pdfs', *args, stdout=io.StringIO())
+
+    def test_peak_memory_unavailable_without_resource(self):
+        """Fără modulul resource (Windows) benchmark-ul rulează, cu peak RSS necunoscut."""
+        from unittest import mock
+        from django.core.management import call_command
+
+        baseline_path = os.path.join(self.temp_dir, 'baseline.json')
+        args = ['--sizes', '3', '--kinds', 'text', '--operations', 'rotate_pages', '--baseline', baseline_path]
+        call_command('benchmark_pdfs', *args, '--save-baseline', stdout=io.StringIO())
+
+        out = io.StringIO()
+        with mock.patch('pdfeditor.benchmark.resource', None):
+            call_command('benchmark_pdfs', *args, stdout=out)
+        self.assertIn('n/a MB RSS', out.getvalue())
+
+
+class MetricsTests(StorageTestCase):
+    """Teste pentru metricile operațiilor și profilarea request-urilor."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.pdf_path = os.path.join(self.temp_dir, 'test.pdf')
+        doc = fitz.open()
+        for i in range(3):
+            doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def test_operations_are_exported(self):
+        """Operațiile reușite și cele eșuate apar la /metrics."""
+        from .pdf_processor import rotate_pages
+
+        output_path = rotate_pages(self.pdf_path, 90)
+        with self.assertRaises(Exception):
+            rotate_pages(os.path.join(self.temp_dir, 'missing.pdf'), 90)
+        with open(os.path.join(self.temp_dir, 'broken.pdf'), 'wb') as f:
+            f.write(b'not a pdf')
+        with self.assertRaises(Exception):
+            rotate_pages(os.path.join(self.temp_dir, 'broken.pdf'), 90)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+
+        self.assertIn('pdf_operations_total{operation="rotate_pages",status="ok"} 1', body)
+        self.assertIn('pdf_operations_total{operation="rotate_pages",status="error"} 2', body)
+        self.assertIn('pdf_operation_duration_seconds_count{operation="rotate_pages"} 3', body)
+        self.assertIn('pdf_operation_duration_seconds_bucket{operation="rotate_pages",le="+Inf"} 3', body)
+        self.assertIn('pdf_operation_pages_total{operation="rotate_pages"} 3', body)
+        self.assertIn(f'pdf_operation_output_bytes_total{{operation="rotate_pages"}} {os.path.getsize(output_path)}', body)
+        for phase in ('open', 'process', 'save'):
+            self.assertIn(f'pdf_operation_phase_seconds_total{{operation="rotate_pages",phase="{phase}"}}', body)
+        self.assertIn('pdf_rephrase_cache_entries 0', body)
+        self.assertIn('pdf_render_cache_bytes 0', body)
+
+    def test_peak_memory_unavailable_without_resource(self):
+        """Fără modulul resource (Windows) operațiile merg, iar peak RSS lipsește din /metrics."""
+        from unittest import mock
+        from .pdf_processor import rotate_pages
+
+        with mock.patch('pdfeditor.metrics.resource', None), \
+                mock.patch('pdfeditor.metrics._rss_bytes', return_value=None):
+            rotate_pages(self.pdf_path, 90)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('pdf_operations_total{operation="rotate_pages",status="ok"} 1', body)
+        self.assertNotIn('pdf_operation_peak_rss_bytes{', body)
+
+    def test_sampled_requests_are_profiled(self):
+        """Cu rata 1.0 fiecare request lasă un profil; fără director, niciunul."""
+        import pstats
+
+        profile_dir = os.path.join(self.temp_dir, 'profiles')
+        with self.settings(PDF_PROFILE_DIR=profile_dir, PDF_PROFILE_SAMPLE_RATE=1.0, PDF_PROFILER='cprofile'):
+            self.client.get('/metrics')
+        profiles = os.listdir(profile_dir)
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].endswith('.prof') and '_GET_metrics_' in profiles[0])
+        pstats.Stats(os.path.join(profile_dir, profiles[0]))
+
+        with self.settings(PDF_PROFILE_DIR=None, PDF_PROFILE_SAMPLE_RATE=1.0):
+            self.client.get('/metrics')
+        self.assertEqual(len(os.listdir(profile_dir)), 1)
+
+
+class DocumentModelTests(StorageTestCase):
+    """Teste pentru documentele și rezultatele păstrate în baza de date."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(2):
+            doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+        self.pdf_bytes = doc.tobytes()
+        doc.close()
+
+    def test_dashboard_reads_documents_without_file_checks(self):
+        """Dashboard-ul nu verifică fișierele; documentele expirate dispar prin status."""
+        from unittest import mock
+        from .pdf_store import expire_references
+
+        self.client.post(reverse('upload'), {
+            'pdf_file': SimpleUploadedFile('doc.pdf', self.pdf_bytes, content_type='application/pdf')
+        })
+        uploaded = Document.objects.get()
+        for i in range(20):
+            add_document(self.client, f'pdf-{i}', uploaded.path, f'copie_{i}.pdf')
+        Document.objects.create(id='other', owner='other-session', path='/nu/exista.pdf', name='strain.pdf')
+
+        exists = os.path.exists
+        checked = []
+
+        def tracking_exists(path):
+            if str(path).startswith(self.temp_dir):
+                checked.append(path)
+            return exists(path)
+
+        with mock.patch('os.path.exists', side_effect=tracking_exists):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(checked, [])
+        self.assertEqual(len(response.context['uploaded_pdfs']), 21)
+        self.assertNotContains(response, 'strain.pdf')
+        self.assertContains(self.client.get(reverse('split'), {'pdf': 'other'}, follow=True), 'Selected PDF not found.')
+
+        expired, deleted, _ = expire_references(-1)
+        self.assertEqual((expired, deleted), (1, 1))
+        uploaded.refresh_from_db()
+        self.assertEqual(uploaded.status, Document.STATUS_EXPIRED)
+        self.assertEqual(len(self.client.get(reverse('dashboard')).context['uploaded_pdfs']), 20)
+
+    def test_results_are_recorded_and_expired(self):
+        """Rezultatul unei operații e un rând cu mărimea fișierului; cleanup-ul îl expiră."""
+        from django.core.management import call_command
+
+        self.client.post(reverse('upload'), {
+            'pdf_file': SimpleUploadedFile('doc.pdf', self.pdf_bytes, content_type='application/pdf')
+        })
+        pdf_id = Document.objects.get().id
+        response = self.client.post(f"{reverse('rotate')}?pdf={pdf_id}", {'rotation_angle': '90', 'page_range': ''})
+        self.assertRedirects(response, reverse('rotate_result'))
+
+        result = ProcessedResult.objects.get(kind='rotate')
+        self.assertEqual((result.document_id, result.data['rotation_angle']), (pdf_id, 90))
+        self.assertEqual(result.size, os.path.getsize(result.path))
+        self.assertEqual(self.client.get(reverse('rotate_result')).context['rotated_size'], result.size)
+
+        # Un fișier șters din afara aplicației expiră rezultatul la download
+        os.remove(result.path)
+        self.assertRedirects(self.client.get(reverse('download_rotated')), reverse('dashboard'))
+        self.assertEqual(ProcessedResult.objects.get(pk=result.pk).status, ProcessedResult.STATUS_EXPIRED)
+
+        # cleanup_old_pdfs expiră rezultatele vechi
+        self.client.post(f"{reverse('rotate')}?pdf={pdf_id}", {'rotation_angle': '180', 'page_range': ''})
+        ProcessedResult.objects.filter(status=ProcessedResult.STATUS_READY).update(
+            created_at=ProcessedResult.objects.get(pk=result.pk).created_at.replace(year=2000)
+        )
+        call_command('cleanup_old_pdfs', stdout=io.StringIO())
+        self.assertFalse(ProcessedResult.objects.filter(status=ProcessedResult.STATUS_READY).exists())
+        self.assertRedirects(self.client.get(reverse('rotate_result')), reverse('dashboard'))
+
+
+class FileServingTests(StorageTestCase):
+    """Teste pentru descărcări (Range, ETag, backend-uri)."""
+
+    def setUp(self):
+        super().setUp()
+
+        doc = fitz.open()
+        for i in range(3):
+            doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+        self.client.post(reverse('upload'), {
+            'pdf_file': SimpleUploadedFile('doc.pdf', doc.tobytes(), content_type='application/pdf')
+        })
+        doc.close()
+        pdf_id = Document.objects.get().id
+        self.client.post(f"{reverse('rotate')}?pdf={pdf_id}", {'rotation_angle': '90', 'page_range': ''})
+        self.result_path = ProcessedResult.objects.get(kind='rotate').path
+        with open(self.result_path, 'rb') as f:
+            self.result_bytes = f.read()
+
+    def test_range_and_conditional_requests(self):
+        """Range primește 206, un interval invalid 416, un ETag neschimbat 304."""
+        size = len(self.result_bytes)
+        url = reverse('download_rotated')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.result_bytes)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', response['Content-Disposition'])
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{size}')
+        self.assertEqual(b''.join(response.streaming_content), self.result_bytes[10:20])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.result_bytes[-5:])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+        # If-Range cu un ETag vechi: tot fișierul
+        response = self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"vechi"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_front_server_backends(self):
+        """Cu X-Accel-Redirect / X-Sendfile aplicația trimite doar antetele."""
+        relative = os.path.relpath(self.result_path, self.temp_dir).replace(os.sep, '/')
+
+        with self.settings(PDF_DOWNLOAD_BACKEND='x-accel-redirect', PDF_X_ACCEL_PREFIX='/internal/'):
+            response = self.client.get(reverse('download_rotated'))
+        self.assertEqual(response['X-Accel-Redirect'], f'/internal/{relative}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+        with self.settings(PDF_DOWNLOAD_BACKEND='x-sendfile'):
+            response = self.client.get(reverse('download_rotated'))
+        self.assertEqual(response['X-Sendfile'], os.path.abspath(self.result_path))
+
+
+class RetentionTests(StorageTestCase):
+    """Teste pentru indexul de expirare și cleanup_old_pdfs."""
+
+    extra_settings = {'PDF_RETENTION_HOURS': {}, 'PDF_STORAGE_QUOTA_BYTES': None}
+
+    def setUp(self):
+        super().setUp()
+        self.processed_dir = os.path.join(self.temp_dir, 'processed')
+        os.makedirs(self.processed_dir)
+
+    def _write(self, name, size, kind='result'):
+        from .retention import register_file
+
+        path = os.path.join(self.processed_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        register_file(path, kind)
+        return path
+
+    def test_cleanup_reads_only_expired_rows(self):
+        """Cleanup-ul folosește indexul (fără listarea processed/) și retenția pe tipuri."""
+        from datetime import timedelta
+        from unittest import mock
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from django.utils import timezone
+
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Pagina 1")
+        self.client.post(reverse('upload'), {
+            'pdf_file': SimpleUploadedFile('doc.pdf', doc.tobytes(), content_type='application/pdf')
+        })
+        doc.close()
+        old_result = self._write('vechi.pdf', 100)
+        new_result = self._write('nou.pdf', 100)
+        job_output = self._write('job.pdf', 100, kind='job')
+        StoredFile.objects.exclude(path=new_result).update(created_at=timezone.now() - timedelta(hours=3))
+        Document.objects.update(uploaded_at=timezone.now() - timedelta(hours=3))
+        unindexed = os.path.join(self.processed_dir, 'neindexat.pdf')
+        open(unindexed, 'wb').close()
+        os.utime(unindexed, (0, 0))
+
+        listdir = os.listdir
+        listed = []
+
+        def tracking_listdir(path='.'):
+            listed.append(os.path.abspath(path))
+            return listdir(path)
+
+        with mock.patch('os.listdir', side_effect=tracking_listdir):
+            call_command('cleanup_old_pdfs', '--retention', 'result=2', stdout=io.StringIO())
+        self.assertNotIn(os.path.abspath(self.processed_dir), listed)
+        self.assertNotIn(os.path.abspath(os.path.join(self.temp_dir, 'uploads')), listed)
+
+        # Doar rezultatul vechi: job-urile și upload-urile au retenția implicită (24h)
+        self.assertFalse(os.path.exists(old_result))
+        self.assertTrue(os.path.exists(new_result) and os.path.exists(job_output))
+        self.assertEqual(StoredFile.objects.count(), 2)
+        self.assertEqual(Document.objects.get().status, Document.STATUS_ACTIVE)
+        self.assertTrue(os.path.exists(unindexed))
+
+        call_command('cleanup_old_pdfs', '--retention', 'upload=1', '--full-scan', stdout=io.StringIO())
+        # Expirat și trecut de retenție: rândul e șters în aceeași rulare
+        self.assertFalse(Document.objects.exists())
+        self.assertFalse(os.path.exists(unindexed))
+
+        with self.assertRaises(CommandError):
+            call_command('cleanup_old_pdfs', '--retention', 'altceva=1', stdout=io.StringIO())
+
+    def test_quota_evicts_least_recently_used(self):
+        """Peste cotă sunt șterse întâi fișierele descărcate cel mai demult."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .retention import enforce_quota, storage_usage, touch
+
+        paths = [self._write(f'{name}.pdf', 1000) for name in ('a', 'b', 'c', 'd')]
+        for age, path in enumerate(reversed(paths)):
+            StoredFile.objects.filter(path=path).update(accessed_at=timezone.now() - timedelta(hours=age + 1))
+        # 'a' e cel mai vechi, dar tocmai a fost descărcat
+        touch(paths[0])
+
+        self.assertEqual(enforce_quota(5000), (0, 0))
+        self.assertEqual(enforce_quota(3000), (2, 2000))
+        self.assertEqual([os.path.exists(path) for path in paths], [True, False, False, True])
+        self.assertEqual(storage_usage(), 2000)
+
+    def test_quota_and_retention_expire_result_rows(self):
+        """Rezultatul unui fișier șters de cotă expiră imediat; rândul e șters după retenție."""
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .retention import enforce_quota, register_file
+
+        results = []
+        for name in ('vechi', 'nou'):
+            path = self._write(f'{name}.pdf', 1000)
+            result = ProcessedResult.objects.create(owner='o', kind='rotate', paths=[path], sizes=[1000])
+            register_file(path, 'result', result=result)
+            results.append(result)
+        StoredFile.objects.filter(result=results[0]).update(accessed_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(enforce_quota(1500), (1, 1000))
+        statuses = dict(ProcessedResult.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[results[0].pk], ProcessedResult.STATUS_EXPIRED)
+        self.assertEqual(statuses[results[1].pk], ProcessedResult.STATUS_READY)
+
+        # Cleanup-ul păstrează rezultatul expirat până la retenție, apoi îl șterge
+        call_command('cleanup_old_pdfs', stdout=io.StringIO())
+        self.assertEqual(ProcessedResult.objects.count(), 2)
+        ProcessedResult.objects.filter(pk=results[0].pk).update(created_at=timezone.now() - timedelta(days=2))
+        call_command('cleanup_old_pdfs', stdout=io.StringIO())
+        self.assertEqual(list(ProcessedResult.objects.values_list('pk', flat=True)), [results[1].pk])
+
+    def test_quota_reads_rows_in_chunks(self):
+        """Rândurile sunt citite pe bucăți, în ordinea (accessed_at, id), doar până la țintă."""
+        from unittest import mock
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        from .retention import enforce_quota
+
+        paths = [self._write(f'{i}.pdf', 1000) for i in range(9)]
+        StoredFile.objects.update(accessed_at=timezone.now())  # Aceeași oră: ordinea după id
+
+        with mock.patch('pdfeditor.retention.QUOTA_CHUNK_SIZE', 2), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(enforce_quota(6700), (3, 3000))
+
+        self.assertEqual([os.path.exists(path) for path in paths], [False] * 3 + [True] * 6)
+        # 2 bucăți de fișiere (a treia nu mai e necesară) și una de documente
+        chunk_reads = [q for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'LIMIT 2' in q['sql']]
+        self.assertEqual(len(chunk_reads), 3)
+
+    def test_text_outputs_are_indexed_once_written(self):
+        """Textul extras (streaming sau OCR) intră în index cu mărimea reală și expiră."""
+        from unittest import mock
+        from .retention import expire_files
+
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Pagina 1")
+        self.client.post(reverse('upload'), {
+            'pdf_file': SimpleUploadedFile('doc.pdf', doc.tobytes(), content_type='application/pdf')
+        })
+        doc.close()
+        pdf_id = Document.objects.get().id
+
+        def assert_indexed():
+            result = ProcessedResult.objects.get(kind='text', status=ProcessedResult.STATUS_READY)
+            size = os.path.getsize(result.path)
+            self.assertGreater(size, 0)
+            self.assertEqual(result.sizes, [size])
+            self.assertEqual(StoredFile.objects.get(path=os.path.abspath(result.path)).size, size)
+            return result.path, size
+
+        response = self.client.post(reverse('extract_text', args=[pdf_id]))
+        b''.join(response.streaming_content)
+        assert_indexed()
+
+        with mock.patch('pdfeditor.views.ocr_pdf_to_text', return_value='=== Page 1 ===\ntext OCR\n'):
+            self.assertTrue(self.client.post(reverse('ocr_text', args=[pdf_id])).json()['success'])
+        ocr_path, ocr_size = assert_indexed()
+
+        # Textul expiră ca orice rezultat
+        self.assertEqual(expire_files('result', 0), (1, ocr_size))
+        self.assertFalse(os.path.exists(ocr_path))
+
+
+class MergePDFTests(StorageTestCase):
+    """Teste pentru merge-ul pe bucăți (memorie limitată) și merge-ul paralel."""
+
+    extra_settings = {'PDF_MERGE_DEDUPE': True}
+
+    def setUp(self):
+        from PIL import Image
+
+        super().setUp()
+
+        # Aceeași imagine în toate documentele (trebuie păstrată o singură dată)
+        image = io.BytesIO()
+        Image.frombytes('RGB', (200, 200), os.urandom(200 * 200 * 3)).save(image, 'PNG')
+        self.pdf_paths = []
+        for i in range(7):
+            doc = fitz.open()
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Document {i + 1}")
+            page.insert_image(fitz.Rect(72, 100, 272, 300), stream=image.getvalue())
+            path = os.path.join(self.temp_dir, f'doc_{i + 1}.pdf')
+            doc.save(path)
+            doc.close()
+            self.pdf_paths.append(path)
+        self.input_size = sum(os.path.getsize(path) for path in self.pdf_paths)
+
+    def _page_texts(self, path):
+        with fitz.open(path) as doc:
+            return [page.get_text().strip() for page in doc]
+
+    def test_chunked_merge_keeps_order_and_dedupes(self):
+        """Bucăți de 2 documente: ordinea e păstrată, imaginea comună apare o dată."""
+        output_path = merge_pdfs(self.pdf_paths, 'rezultat', chunk_size=2, workers=1)
+
+        self.assertEqual(self._page_texts(output_path), [f"Document {i + 1}" for i in range(7)])
+        self.assertLess(os.path.getsize(output_path), self.input_size / 3)
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'processed')), ['rezultat.pdf'])
+
+    def test_parallel_merge(self):
+        """Grupuri unite în paralel, apoi unite în ordine; fără fișiere intermediare rămase."""
+        output_path = merge_pdfs(self.pdf_paths, 'paralel', chunk_size=2, workers=3)
+
+        self.assertEqual(self._page_texts(output_path), [f"Document {i + 1}" for i in range(7)])
+        self.assertLess(os.path.getsize(output_path), self.input_size / 3)
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'processed')), ['paralel.pdf'])
+
+
+class LineIndexTests(StorageTestCase):
+    """Teste pentru indexul de linii al paginii și rezolvarea memorată a fonturilor."""
+
+    def test_page_parsed_once_for_many_matches(self):
+        """O pagină cu multe potriviri e parsată o singură dată; liniile găsite sunt aceleași."""
+        from unittest import mock
+        from .pdf_processor import detect_text_line_containing, replace_text_on_pages, PageLineIndex
+
+        doc = fitz.open()
+        page = doc.new_page(height=1200)
+        for i in range(40):
+            page.insert_text((72, 40 + i * 25), f"Linia {i} contine cuvantul test.", fontname='tibo', fontsize=10)
+        rects = page.search_for('test')
+
+        line_index = PageLineIndex(page)
+        for rect in rects:
+            self.assertEqual(line_index.find(rect)['text'], detect_text_line_containing(page, rect)['text'])
+        self.assertEqual(line_index.find(rects[0])['font_info']['fontname'], 'tibo')
+        self.assertIsNone(line_index.find(fitz.Rect(0, 1150, 10, 1160)))
+
+        get_text = fitz.Page.get_text
+        calls = []
+
+        def counting_get_text(page, option='text', **kwargs):
+            calls.append(option)
+            return get_text(page, option, **kwargs)
+
+        with mock.patch.object(fitz.Page, 'get_text', counting_get_text):
+            count, warnings, changed_pages = replace_text_on_pages(doc, [0], 'test', 'proba')
+        self.assertEqual((count, warnings, changed_pages), (40, [], [0]))
+        self.assertEqual(calls.count('dict'), 1)
+        self.assertEqual(doc[0].get_text().count('proba'), 40)
+        doc.close()
+
+    def test_font_names_are_memoized(self):
+        """Numele de fonturi (cu prefix de subset) sunt rezolvate o dată per nume."""
+        from .pdf_processor import resolve_font_name
+
+        resolve_font_name.cache_clear()
+        self.assertEqual(resolve_font_name('ABCDEF+Arial-BoldMT'), 'hebo')
+        self.assertEqual(resolve_font_name('TimesNewRomanPS-ItalicMT'), 'tiit')
+        self.assertEqual(resolve_font_name('Unknown'), 'helv')
+        for _ in range(10):
+            resolve_font_name('ABCDEF+Arial-BoldMT')
+        self.assertEqual(resolve_font_name.cache_info().misses, 3)
+        self.assertEqual(resolve_font_name.cache_info().hits, 10)
@@ -0,0 +1,330 @@
+"""
+Text Index Module - per-document text index, built once per upload.
+
+Extraction, text checks, search and replace used to re-open the PDF and
+call page.get_text() (a full parse) every time. The index parses each page
+once and keeps, per document hash:
+
+    pages.json.gz - per-page plain text, words with their rects, the
+                    word -> (page, word) inverted index and the fonts
+    spans.json.gz - per-page text lines with their spans (bbox, font,
+                    size, flags, color); loaded only when needed
+
+Both live under PDF_CACHE_DIR/text/<aa>/<hash>/. Documents are immutable
+(content-addressed), so an index never needs to be invalidated. Files
+outside the store (intermediate results) are not hashed and their index is
+kept in memory only.
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from .pdf_processor import file_sha256, get_cache_dir
+
+
+INDEX_VERSION = 1
+MEMORY_CACHE_SIZE = 8
+
+_SHA256_NAME_RE = re.compile(r'^([0-9a-f]{64})\.pdf$')
+_WORD_EDGE_RE = re.compile(r'^\W+|\W+$')
+
+# sha256 -> TextIndex for the most recently used documents
+_loaded: 'OrderedDict[str, TextIndex]' = OrderedDict()
+
+
+def normalize_word(word: str) -> str:
+    """Key used in the inverted index: lowercase, no surrounding punctuation."""
+    return _WORD_EDGE_RE.sub('', word.lower())
+
+
+def normalize_for_search(text: str) -> str:
+    """
+    Lowercase, collapse whitespace and join line-end hyphenation.
+
+    page.search_for() is case-insensitive and de-hyphenates, so a page whose
+    normalized text does not contain the normalized query has no hits.
+    """
+    return ' '.join(text.lower().split()).replace('- ', '')
+
+
+class TextIndex:
+    """Read-only view of a document's text index."""
+
+    def __init__(self, sha256: Optional[str], data: Dict[str, Any], directory: Optional[str],
+                 spans: Optional[Dict[str, Any]] = None):
+        self.sha256 = sha256
+        self.directory = directory
+        self.pages: List[str] = data['pages']
+        self.words: List[List[list]] = data['words']
+        self.postings: Dict[str, List[int]] = data['postings']
+        self.fonts: List[str] = data['fonts']
+        self._search_pages: Optional[List[str]] = None
+        self._spans: Optional[Dict[str, Any]] = spans
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def has_text(self) -> bool:
+        return any(text.strip() for text in self.pages)
+
+    def page_text(self, page_index: int) -> str:
+        return self.pages[page_index]
+
+    def candidate_pages(self, query: str, pages: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Pages (0-indexed) that can contain `query`; all others have no hits.
+
+        Args:
+            query: Search string
+            pages: Restrict to these page indices (default: all pages)
+        """
+        if self._search_pages is None:
+            self._search_pages = [normalize_for_search(text) for text in self.pages]
+
+        needle = normalize_for_search(query)
+        if pages is None:
+            pages = range(self.page_count)
+        return [page for page in pages if needle in self._search_pages[page]]
+
+    def find_words(self, query: str) -> List[Tuple[int, Tuple[float, float, float, float]]]:
+        """
+        Locate whole-word occurrences of `query` (one word or a phrase).
+
+        Uses the inverted index only; the PDF is not opened.
+
+        Returns:
+            List of (page_index, (x0, y0, x1, y1)) in page order. For a phrase
+            the rect covers all its words.
+        """
+        tokens = [normalize_word(token) for token in query.split()]
+        tokens = [token for token in tokens if token]
+        if not tokens:
+            return []
+
+        postings = self.postings.get(tokens[0], [])
+        hits = []
+        for i in range(0, len(postings), 2):
+            page, position = postings[i], postings[i + 1]
+            page_words = self.words[page]
+            if position + len(tokens) > len(page_words):
+                continue
+            matched = page_words[position:position + len(tokens)]
+            if all(normalize_word(word[4]) == token for word, token in zip(matched, tokens)):
+                hits.append((page, (
+                    min(word[0] for word in matched), min(word[1] for word in matched),
+                    max(word[2] for word in matched), max(word[3] for word in matched)
+                )))
+        return hits
+
+    def lines(self, page_index: int) -> List[Dict[str, Any]]:
+        """
+        Text lines of a page as dicts, like get_text('dict') lines:
+        {'bbox', 'text', 'spans': [{'bbox', 'text', 'font', 'size', 'flags', 'color'}]}
+        """
+        if self._spans is None:
+            self._spans = _read_json_gz(os.path.join(self.directory, 'spans.json.gz'))
+
+        fonts = self._spans['fonts']
+        result = []
+        for x0, y0, x1, y1, spans in self._spans['pages'][page_index]:
+            span_dicts = [
+                {
+                    'bbox': (sx0, sy0, sx1, sy1),
+                    'font': fonts[font_id],
+                    'size': size,
+                    'flags': flags,
+                    'color': color,
+                    'text': text
+                }
+                for sx0, sy0, sx1, sy1, font_id, size, flags, color, text in spans
+            ]
+            result.append({
+                'bbox': (x0, y0, x1, y1),
+                'text': ''.join(span['text'] for span in span_dicts),
+                'spans': span_dicts
+            })
+        return result
+
+
+def _read_json_gz(path: str) -> Dict[str, Any]:
+    with open(path, 'rb') as f:
+        return json.loads(gzip.decompress(f.read()))
+
+
+def _write_json_gz(path: str, data: Dict[str, Any]):
+    # json.dumps uses the C encoder; json.dump to a stream does not
+    payload = gzip.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), compresslevel=6)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _index_dir(sha256: str) -> str:
+    return get_cache_dir('text', sha256)
+
+
+def document_sha256(pdf_path: str) -> str:
+    """Hash of a document; store blobs are named after it, so no re-read."""
+    return stored_sha256(pdf_path) or file_sha256(pdf_path)
+
+
+def stored_sha256(pdf_path: str, sha256: Optional[str] = None) -> Optional[str]:
+    """Hash of a store blob (given, or from its name); None for other files."""
+    if sha256:
+        return sha256
+    match = _SHA256_NAME_RE.match(os.path.basename(pdf_path))
+    return match.group(1) if match else None
+
+
+def build_text_index(pdf_path: str, sha256: Optional[str] = None, cache: bool = True) -> TextIndex:
+    """
+    Parse every page once and write the index to disk.
+
+    Args:
+        pdf_path: PDF absolute path
+        sha256: Document hash (computed if not given)
+        cache: False to keep the index in memory only (not written, not
+               remembered), for files outside the store
+
+    Returns:
+        TextIndex
+    """
+    if cache:
+        sha256 = sha256 or document_sha256(pdf_path)
+
+    pages, words, span_pages = [], [], []
+    postings: Dict[str, List[int]] = {}
+    fonts: List[str] = []
+    font_ids: Dict[str, int] = {}
+    embedded_fonts = set()
+
+    with fitz.open(pdf_path) as doc:
+        for page_index, page in enumerate(doc):
+            # One text page, three views of it
+            textpage = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+            pages.append(page.get_text('text', textpage=textpage))
+
+            page_words = []
+            for x0, y0, x1, y1, word, *_ in page.get_text('words', textpage=textpage):
+                key = normalize_word(word)
+                if key:
+                    postings.setdefault(key, []).extend((page_index, len(page_words)))
+                page_words.append([round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2), word])
+            words.append(page_words)
+
+            page_lines = []
+            for block in page.get_text('dict', textpage=textpage).get('blocks', []):
+                if block.get('type') != 0:
+                    continue
+                for line in block.get('lines', []):
+                    spans = []
+                    for span in line.get('spans', []):
+                        font = span.get('font', '')
+                        if font not in font_ids:
+                            font_ids[font] = len(fonts)
+                            fonts.append(font)
+                        spans.append([
+                            *(round(v, 2) for v in span['bbox']), font_ids[font],
+                            round(span.get('size', 11), 2), span.get('flags', 0),
+                            span.get('color', 0), span.get('text', '')
+                        ])
+                    page_lines.append([*(round(v, 2) for v in line['bbox']), spans])
+            span_pages.append(page_lines)
+
+            for font in page.get_fonts():
+                # (xref, ext, type, basefont, name, encoding, ...)
+                basefont = font[3].split('+', 1)[-1]
+                if basefont:
+                    embedded_fonts.add(basefont)
+
+    data = {
+        'version': INDEX_VERSION,
+        'pages': pages,
+        'words': words,
+        'postings': postings,
+        'fonts': sorted(embedded_fonts)
+    }
+    spans = {'version': INDEX_VERSION, 'fonts': fonts, 'pages': span_pages}
+    if not cache:
+        return TextIndex(sha256, data, None, spans)
+
+    directory = _index_dir(sha256)
+    _write_json_gz(os.path.join(directory, 'spans.json.gz'), spans)
+    _write_json_gz(os.path.join(directory, 'pages.json.gz'), data)
+
+    index = TextIndex(sha256, data, directory)
+    _remember(index)
+    return index
+
+
+def _remember(index: TextIndex):
+    _loaded[index.sha256] = index
+    _loaded.move_to_end(index.sha256)
+    while len(_loaded) > MEMORY_CACHE_SIZE:
+        _loaded.popitem(last=False)
+
+
+def load_text_index(pdf_path: str, sha256: Optional[str] = None) -> Optional[TextIndex]:
+    """
+    Return the index of a document if it was already built, else None.
+
+    Files outside the store have no saved index (None, without hashing).
+
+    Args:
+        pdf_path: PDF absolute path
+        sha256: Document hash, if already known
+    """
+    sha256 = stored_sha256(pdf_path, sha256)
+    if sha256 is None:
+        return None
+
+    index = _loaded.get(sha256)
+    if index is not None:
+        _loaded.move_to_end(sha256)
+        return index
+
+    directory = _index_dir(sha256)
+    pages_path = os.path.join(directory, 'pages.json.gz')
+    if os.path.exists(pages_path):
+        try:
+            data = _read_json_gz(pages_path)
+            if data.get('version') == INDEX_VERSION:
+                index = TextIndex(sha256, data, directory)
+                _remember(index)
+                return index
+        except (OSError, ValueError):
+            pass  # Corrupt or partial index: treated as missing
+
+    return None
+
+
+def get_text_index(pdf_path: str, sha256: Optional[str] = None) -> TextIndex:
+    """
+    Return the index of a document: from memory, from disk, or built now.
+
+    Files outside the store (no sha256, not a blob) are neither hashed nor
+    cached: their index is built in memory for this call only.
+
+    Args:
+        pdf_path: PDF absolute path
+        sha256: Document hash, if already known
+    """
+    sha256 = stored_sha256(pdf_path, sha256)
+    if sha256 is None:
+        return build_text_index(pdf_path, cache=False)
+    return load_text_index(pdf_path, sha256) or build_text_index(pdf_path, sha256)
+
+
+def drop_text_index(sha256: str):
+    """Delete the index of a document (when its blob is deleted)."""
+    _loaded.pop(sha256, None)
+    shutil.rmtree(_index_dir(sha256), ignore_errors=True)
@@ -4,13 +4,20 @@ from . import views
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
     path('upload/', views.upload_view, name='upload'),
+    path('upload/chunked/', views.chunked_upload_create_view, name='chunked_upload_create'),
+    path('upload/chunked/<str:upload_id>/', views.chunked_upload_chunk_view, name='chunked_upload_chunk'),
     path('edit/', views.edit_view, name='edit'),
     path('result/', views.result_view, name='result'),
     path('download/', views.download_view, name='download'),
+    path('edits/<str:pdf_id>/<str:action>/', views.edit_history_view, name='edit_history'),
     path('preview/', views.preview_view, name='preview'),
+    path('pages/<str:pdf_id>/', views.page_info_ajax, name='page_info'),
+    path('pages/<str:pdf_id>/<int:page>/thumb/', views.page_thumbnail_view, name='page_thumbnail'),
+    path('pages/<str:pdf_id>/<int:page>/tile/', views.page_tile_view, name='page_tile'),
     path('split/', views.split_view, name='split'),
     path('split/result/', views.split_result_view, name='split_result'),
     path('download_split/', views.download_split_file_view, name='download_split'),
+    path('download_split/zip/', views.download_split_zip_view, name='download_split_zip'),
     path('merge/', views.merge_view, name='merge'),
     path('merge/result/', views.merge_result_view, name='merge_result'),
     path('download_merged/', views.download_merged_view, name='download_merged'),
@@ -27,13 +34,31 @@ urlpatterns = [
     path('page-numbers/result/', views.page_numbers_result_view, name='page_numbers_result'),
     path('download_numbered/', views.download_numbered_view, name='download_numbered'),
     path('more-tools/', views.more_tools_view, name='more_tools'),
+    path('metrics', views.metrics_view, name='metrics'),
     path('extract-text/<str:pdf_id>/', views.extract_text_ajax, name='extract_text'),
+    path('search/', views.search_view, name='search'),
+    path('search-text/<str:pdf_id>/', views.search_text_ajax, name='search_text'),
     path('ocr-text/<str:pdf_id>/', views.ocr_text_ajax, name='ocr_text'),
     path('download-text/', views.download_text_view, name='download_text'),
     path('delete-pdf/<str:pdf_id>/', views.delete_pdf_view, name='delete_pdf'),
     # AI Rephrase
     path('rephrase/', views.rephrase_view, name='rephrase'),
     path('rephrase/preview/', views.rephrase_preview_ajax, name='rephrase_preview'),
+    path('rephrase/batch/', views.rephrase_batch_ajax, name='rephrase_batch'),
+    path('rephrase/cache-stats/', views.rephrase_cache_stats_ajax, name='rephrase_cache_stats'),
     path('rephrase/result/', views.rephrase_result_view, name='rephrase_result'),
     path('download_rephrased/', views.download_rephrased_view, name='download_rephrased'),
+    # Pipelines
+    path('pipeline/', views.pipeline_view, name='pipeline'),
+    path('pipeline/result/', views.pipeline_result_view, name='pipeline_result'),
+    path('download_pipeline/', views.download_pipeline_view, name='download_pipeline'),
+    # Batch mode
+    path('batch/', views.batch_view, name='batch'),
+    path('batch/<str:job_id>/download/', views.batch_download_view, name='batch_download'),
+    # Background jobs
+    path('jobs/<str:operation>/submit/', views.job_submit_view, name='job_submit'),
+    path('jobs/<str:job_id>/', views.job_status_view, name='job_status'),
+    path('jobs/<str:job_id>/wait/', views.job_wait_view, name='job_wait'),
+    path('jobs/<str:job_id>/events/', views.job_events_view, name='job_events'),
+    path('jobs/<str:job_id>/download/', views.job_download_view, name='job_download'),
 ]
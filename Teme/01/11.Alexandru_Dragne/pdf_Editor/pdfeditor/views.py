@@ -5,34 +5,233 @@ import os
 import uuid
 from datetime import datetime
 from django.shortcuts import render, redirect
-from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
+from django.http import Http404, HttpResponse
 from django.conf import settings
 from django.core.files.storage import FileSystemStorage
 from django.contrib import messages
+from django.utils import timezone
 
-from .forms import FindReplaceForm, SplitPDFForm, MergePDFForm, CompressPDFForm, WatermarkForm, RotatePagesForm, PageNumbersForm
-from .pdf_processor import find_and_replace_text, check_pdf_has_text, split_pdf, merge_pdfs, compress_pdf, add_watermark, rotate_pages, add_page_numbers, extract_text_from_pdf, ocr_pdf_to_text
+from .models import Document, Pipeline, ProcessedResult
+from .forms import FindReplaceForm, SplitPDFForm, MergePDFForm, CompressPDFForm, WatermarkForm, RotatePagesForm, PageNumbersForm, PipelineForm
+from .pdf_store import store_upload, get_analysis, release_reference
+from .search_index import index_document
+from .page_render import prerender_pages
+from .chunked_upload import PDF_MAGIC, is_pdf_header
+from .file_serving import serve_file
+from .retention import register_file, touch, TOUCH_INTERVAL
+from .pdf_processor import split_pdf, iter_split_parts, merge_pdfs, compress_pdf, add_watermark, rotate_pages, add_page_numbers, extract_text_from_pdf, ocr_pdf_to_text, run_pipeline
 
 
 def get_uploaded_pdfs(request):
-    """Get list of uploaded PDFs from session, filtering out deleted files."""
-    uploaded_pdfs = request.session.get('uploaded_pdfs', [])
-    valid_pdfs = [pdf for pdf in uploaded_pdfs if os.path.exists(pdf['path'])]
+    """
+    Get the PDFs uploaded in this session.
     
-    # Update session if any were filtered out
-    if len(valid_pdfs) != len(uploaded_pdfs):
-        request.session['uploaded_pdfs'] = valid_pdfs
-    
-    return valid_pdfs
+    One indexed query; expired documents are marked by cleanup_old_pdfs,
+    so no file is checked here.
+    """
+    owner = request.session.session_key
+    if not owner:
+        return []
+    documents = Document.objects.filter(owner=owner, status=Document.STATUS_ACTIVE)
+    return [document.as_entry() for document in documents]
 
 
 def get_pdf_by_id(request, pdf_id):
-    """Get specific PDF by ID from session."""
-    uploaded_pdfs = get_uploaded_pdfs(request)
-    for pdf in uploaded_pdfs:
-        if pdf['id'] == pdf_id:
-            return pdf
-    return None
+    """Get specific PDF by ID (primary key lookup, limited to this session)."""
+    owner = request.session.session_key
+    if not owner or not pdf_id:
+        return None
+    document = Document.objects.filter(pk=pdf_id, owner=owner, status=Document.STATUS_ACTIVE).first()
+    if not document:
+        return None
+    # Recently used uploads are evicted last under the storage quota
+    if document.accessed_at < timezone.now() - TOUCH_INTERVAL:
+        Document.objects.filter(pk=document.pk).update(accessed_at=timezone.now())
+    return document.as_entry()
+
+
+def _save_result(request, kind, paths, document=None, **data):
+    """
+    Record the output of an operation for its result and download views.
+    
+    File sizes are read once here, so result pages need no stat calls.
+    
+    Args:
+        kind: One of ProcessedResult.KIND_CHOICES
+        paths: Output path or list of paths
+        document: Entry of the source PDF (from get_pdf_by_id), if any
+        data: Operation-specific details shown on the result page
+    
+    Returns:
+        ProcessedResult
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    result = ProcessedResult.objects.create(
+        owner=_get_session_owner(request),
+        kind=kind,
+        document_id=document['id'] if document else None,
+        paths=list(paths),
+        sizes=[os.path.getsize(path) if os.path.exists(path) else 0 for path in paths],
+        data=data
+    )
+    # Deleting a file (retention or quota) expires the result with it
+    for path in paths:
+        register_file(path, 'result', result=result)
+    return result
+
+
+# Tool page and result page of each kind of result that can be queued
+RESULT_VIEWS = {
+    'split': ('split', 'split_result'),
+    'merge': ('merge', 'merge_result'),
+    'compress': ('compress', 'compress_result'),
+    'watermark': ('watermark', 'watermark_result'),
+    'rotate': ('rotate', 'rotate_result'),
+    'page_numbers': ('page_numbers', 'page_numbers_result'),
+    'pipeline': ('pipeline', 'pipeline_result'),
+}
+
+
+def _use_jobs():
+    """Whether the tool views queue their work (settings.PDF_VIEW_JOBS) instead of running it in the request."""
+    return getattr(settings, 'PDF_VIEW_JOBS', False)
+
+
+def _queue_result(request, kind, operation, params, document=None, **data):
+    """
+    Run the work of a tool view as a background job.
+    
+    A pending result records what the result page needs; it is completed
+    by _finish_result once the job is done (see job_wait_view).
+    
+    Args:
+        kind: One of ProcessedResult.KIND_CHOICES
+        operation: Key of jobs.OPERATIONS
+        params: Keyword arguments of the operation
+        document: Entry of the source PDF (from get_pdf_by_id), if any
+        data: Operation-specific details shown on the result page
+    
+    Returns:
+        ProcessedResult (pending)
+    """
+    from .jobs import submit_job
+    
+    owner = _get_session_owner(request)
+    return ProcessedResult.objects.create(
+        owner=owner,
+        kind=kind,
+        document_id=document['id'] if document else None,
+        data=data,
+        status=ProcessedResult.STATUS_PENDING,
+        job_id=submit_job(operation, params, owner=owner)
+    )
+
+
+def _compress_data(original_size, compression_ratio, image_stats):
+    """Result page details of a compression."""
+    return {
+        'original_size': original_size,
+        'compression_ratio': compression_ratio,
+        'images': {
+            key: image_stats[key]
+            for key in ('images_total', 'images_recompressed', 'images_deduplicated', 'bytes_before', 'bytes_after')
+        }
+    }
+
+
+def _expire_text_outputs(owner):
+    """Delete the previous extracted text of an owner (only one is kept)."""
+    previous = ProcessedResult.objects.filter(owner=owner, kind='text', status=ProcessedResult.STATUS_READY).first()
+    if previous:
+        if previous.path and os.path.exists(previous.path):
+            os.remove(previous.path)
+        ProcessedResult.objects.filter(pk=previous.pk).update(status=ProcessedResult.STATUS_EXPIRED)
+
+
+def _finish_result(result, job):
+    """
+    Complete a pending result from the output of its finished job.
+    
+    Called by whichever request sees the job done first; the status
+    update is conditional, so the files are recorded only once.
+    """
+    output = job['result'] or {}
+    data = dict(result.data)
+    
+    if result.kind == 'text':
+        # OCR text is written to a file, like the synchronous view does
+        _expire_text_outputs(result.owner)
+        processed_dir = os.path.join(settings.MEDIA_ROOT, 'processed')
+        os.makedirs(processed_dir, exist_ok=True)
+        paths = [os.path.join(processed_dir, f"text_{uuid.uuid4().hex}.txt")]
+        with open(paths[0], 'w', encoding='utf-8') as f:
+            f.write(output.get('text', ''))
+    else:
+        paths = output.get('output_paths') or [output['output_path']]
+    
+    if result.kind == 'compress':
+        data.update(_compress_data(output['original_size'], output['compression_ratio'], output['image_stats']))
+    elif result.kind == 'pipeline':
+        data['original_size'] = output['original_size']
+    
+    finished = ProcessedResult.objects.filter(pk=result.pk, status=ProcessedResult.STATUS_PENDING).update(
+        paths=paths,
+        sizes=[os.path.getsize(path) if os.path.exists(path) else 0 for path in paths],
+        data=data,
+        status=ProcessedResult.STATUS_READY,
+        created_at=timezone.now()
+    )
+    if finished:
+        result.refresh_from_db()
+        for path in paths:
+            register_file(path, 'result', result=result)
+    elif result.kind == 'text':
+        os.remove(paths[0])  # Another request finished it first
+
+
+def _finish_job_result(job):
+    """Complete the pending result of a finished job, if it has one; returns it."""
+    result = ProcessedResult.objects.filter(owner=job['owner'], job_id=job['id']).first()
+    if result and result.status == ProcessedResult.STATUS_PENDING:
+        if job['status'] == 'done':
+            _finish_result(result, job)
+        elif job['status'] == 'failed':
+            ProcessedResult.objects.filter(pk=result.pk).update(status=ProcessedResult.STATUS_EXPIRED)
+        result.refresh_from_db()
+    return result
+
+
+def _get_result(request, kind):
+    """The latest ready result of an operation in this session, or None."""
+    owner = request.session.session_key
+    if not owner:
+        return None
+    return ProcessedResult.objects.filter(owner=owner, kind=kind, status=ProcessedResult.STATUS_READY).first()
+
+
+def _serve_result_file(request, result, index=0, path=None, **kwargs):
+    """
+    Send a result file through file_serving.serve_file.
+    
+    Args:
+        index: Index of the file in result.paths
+        path: File to send instead (e.g. an exported edit session)
+        kwargs: Passed to serve_file (filename, content_type, ...)
+    
+    Returns:
+        HttpResponse, or None if the file is gone (the result is then
+        marked expired)
+    """
+    path = path or result.paths[index]
+    try:
+        response = serve_file(request, path, **kwargs)
+        touch(path)
+        return response
+    except Http404:
+        ProcessedResult.objects.filter(pk=result.pk).update(status=ProcessedResult.STATUS_EXPIRED)
+        return None
 
 
 def dashboard_view(request):
@@ -45,6 +244,33 @@ def dashboard_view(request):
     return render(request, 'pdfeditor/dashboard.html', context)
 
 
+def _create_document(request, ref_id, sha256, file_path, name, size):
+    """Record a stored upload as a Document of this session (analysis is cached per blob)."""
+    analysis = get_analysis(sha256)
+    if not analysis['has_text']:
+        messages.warning(request, f'{name}: {analysis["message"]}')
+    else:
+        # Cross-document search; reuses the text index built by get_analysis
+        index_document(sha256, file_path)
+    
+    # Queue the first preview pages, so the first preview is served from cache
+    try:
+        prerender_pages(file_path, sha256)
+    except Exception:
+        pass  # Previews are rendered on demand anyway
+    
+    document = Document.objects.create(
+        id=ref_id,
+        owner=_get_session_owner(request),
+        sha256=sha256,
+        path=file_path,
+        name=name,
+        size=size,
+        page_count=analysis['page_count']
+    )
+    return document.as_entry()
+
+
 def upload_view(request):
     """View for uploading one or more PDF files."""
     if request.method == 'POST':
@@ -54,42 +280,25 @@ def upload_view(request):
             messages.error(request, 'Please select at least one PDF file.')
             return render(request, 'pdfeditor/upload.html')
         
-        # Get or initialize PDF list in session
-        uploaded_pdfs = request.session.get('uploaded_pdfs', [])
-        
+        uploaded_pdfs = []
         uploaded_count = 0
         for uploaded_file in uploaded_files:
             if not uploaded_file.name.lower().endswith('.pdf'):
                 messages.warning(request, f'Skipped "{uploaded_file.name}" - only PDF files are accepted.')
                 continue
             
-            # Save file
-            fs = FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, 'uploads'))
-            filename = fs.save(uploaded_file.name, uploaded_file)
-            file_path = fs.path(filename)
-            
-            # Check for text
-            has_text, message = check_pdf_has_text(file_path)
-            if not has_text:
-                messages.warning(request, f'{uploaded_file.name}: {message}')
-            
-            # Generate unique ID
-            
-            
-            pdf_data = {
-                'id': str(uuid.uuid4()),
-                'path': file_path,
-                'name': uploaded_file.name,
-                'size': uploaded_file.size,
-                'uploaded_at': datetime.now().isoformat()
-            }
+            # Reject files that only look like PDFs by name
+            header = uploaded_file.read(len(PDF_MAGIC))
+            uploaded_file.seek(0)
+            if not is_pdf_header(header):
+                messages.warning(request, f'Skipped "{uploaded_file.name}" - file is not a valid PDF.')
+                continue
             
-            uploaded_pdfs.append(pdf_data)
+            # Save file (identical uploads share one blob in the store)
+            ref_id, sha256, file_path, is_duplicate = store_upload(uploaded_file)
+            uploaded_pdfs.append(_create_document(request, ref_id, sha256, file_path, uploaded_file.name, uploaded_file.size))
             uploaded_count += 1
         
-        # Save to session
-        request.session['uploaded_pdfs'] = uploaded_pdfs
-        
         if uploaded_count > 0:
             if uploaded_count == 1:
                 messages.success(request, f'PDF "{uploaded_pdfs[-1]["name"]}" uploaded successfully! Choose an operation below.')
@@ -102,6 +311,45 @@ def upload_view(request):
     return render(request, 'pdfeditor/upload.html')
 
 
+def _edit_session_for(request, pdf, create=True):
+    """
+    Edit session (working copy) of an uploaded PDF, created on first edit.
+    
+    Returns:
+        Session dict from edit_session.get_session, or None if there is
+        none yet and create is False
+    """
+    from .edit_session import create_session, get_session, EditSessionError
+    
+    owner = _get_session_owner(request)
+    session_id = pdf.get('edit_session_id')
+    if session_id:
+        try:
+            return get_session(session_id, owner=owner)
+        except EditSessionError:
+            pass
+    if not create:
+        return None
+    
+    edit_session = create_session(pdf['path'], pdf['name'], pdf.get('sha256'), owner=owner)
+    Document.objects.filter(pk=pdf['id']).update(edit_session_id=edit_session['session_id'])
+    pdf['edit_session_id'] = edit_session['session_id']
+    return edit_session
+
+
+def _export_edit_session(request, pdf):
+    """Compact the working copy of a PDF for download; None if it has no session."""
+    from .edit_session import export_session, EditSessionError
+    
+    session_id = pdf.get('edit_session_id')
+    if not session_id:
+        return None
+    try:
+        return export_session(session_id, owner=_get_session_owner(request))
+    except EditSessionError:
+        return None
+
+
 def edit_view(request):
     """View for find & replace form."""
     # Get uploaded PDFs
@@ -133,19 +381,22 @@ def edit_view(request):
             page_range = form.cleaned_data.get('page_range', '').strip()
             
             try:
-                # Process PDF
-                output_path, replacement_count, warnings = find_and_replace_text(
-                    pdf_path=pdf_path,
-                    search_text=search_text,
-                    replace_text=replace_text,
-                    case_sensitive=case_sensitive,
-                    page_range=page_range if page_range else None
-                )
+                from .edit_session import apply_edit
                 
-                # Store result in session
-                request.session['processed_pdf_path'] = output_path
-                request.session['replacement_count'] = replacement_count
-                request.session['warnings'] = warnings
+                # Apply to the working copy (incremental save, undoable)
+                edit_session = _edit_session_for(request, selected_pdf)
+                result = apply_edit(edit_session['session_id'], 'find_replace', {
+                    'search_text': search_text,
+                    'replace_text': replace_text,
+                    'case_sensitive': case_sensitive,
+                    'page_range': page_range if page_range else None
+                }, owner=_get_session_owner(request))
+                
+                _save_result(
+                    request, 'edit', edit_session['working_path'], document=selected_pdf,
+                    replacement_count=result['replacement_count'],
+                    warnings=result['warnings']
+                )
                 
                 return redirect('result')
                 
@@ -156,10 +407,16 @@ def edit_view(request):
     else:
         form = FindReplaceForm()
     
+    # Show earlier edits of this PDF
+    edit_session = _edit_session_for(request, selected_pdf, create=False)
+    if edit_session:
+        pdf_path = edit_session['working_path']
+    
     context = {
         'form': form,
         'pdf_name': pdf_name,
         'pdf_path_relative': os.path.relpath(pdf_path, settings.MEDIA_ROOT),
+        'pdf_version': edit_session['revision'] if edit_session else 0,
         'uploaded_pdfs': uploaded_pdfs,
         'selected_pdf': selected_pdf
     }
@@ -168,53 +425,112 @@ def edit_view(request):
 
 def result_view(request):
     """View pentru afișarea rezultatului și link de download."""
-    processed_pdf_path = request.session.get('processed_pdf_path')
-    replacement_count = request.session.get('replacement_count', 0)
-    warnings = request.session.get('warnings', [])
+    result = _get_result(request, 'edit')
     
-    if not processed_pdf_path or not os.path.exists(processed_pdf_path):
+    if not result:
         messages.error(request, 'Processed file not found.')
         return redirect('dashboard')
     
+    warnings = result.data.get('warnings', [])
     context = {
-        'replacement_count': replacement_count,
+        'replacement_count': result.data.get('replacement_count', 0),
         'warnings': warnings,
         'has_warnings': len(warnings) > 0,
-        'pdf_path_relative': os.path.relpath(processed_pdf_path, settings.MEDIA_ROOT)
+        'pdf_path_relative': os.path.relpath(result.path, settings.MEDIA_ROOT),
+        **_edit_history_context(request, result.document_id)
     }
     return render(request, 'pdfeditor/result.html', context)
 
 
+def _edit_history_context(request, pdf_id):
+    """Template context for the undo/redo buttons of an edited PDF."""
+    pdf = get_pdf_by_id(request, pdf_id) if pdf_id else None
+    edit_session = _edit_session_for(request, pdf, create=False) if pdf else None
+    if not edit_session:
+        return {}
+    return {
+        'edit_pdf_id': pdf_id,
+        'edit_count': edit_session['position'],
+        'edit_revision': edit_session['revision'],
+        'can_undo': edit_session['can_undo'],
+        'can_redo': edit_session['can_redo']
+    }
+
+
+def edit_history_view(request, pdf_id, action):
+    """Undo or redo the last edit of a PDF (POST), then go back to the result page."""
+    from .edit_session import undo, redo, EditSessionError
+    
+    if action not in ('undo', 'redo'):
+        raise Http404('Unknown action')
+    
+    pdf = get_pdf_by_id(request, pdf_id)
+    edit_session = _edit_session_for(request, pdf, create=False) if pdf else None
+    if request.method != 'POST' or not edit_session:
+        messages.error(request, 'Nothing to undo.')
+        return redirect('dashboard')
+    
+    try:
+        (undo if action == 'undo' else redo)(edit_session['session_id'], owner=_get_session_owner(request))
+        messages.success(request, 'Last edit undone.' if action == 'undo' else 'Edit redone.')
+    except EditSessionError as e:
+        messages.error(request, str(e))
+    
+    next_url = request.POST.get('next', '')
+    if next_url not in (reverse('result'), reverse('rephrase_result')):
+        next_url = reverse('result')
+    return redirect(next_url)
+
+
 def download_view(request):
     """View pentru descărcarea PDF-ului modificat."""
-    processed_pdf_path = request.session.get('processed_pdf_path')
-    
-    if not processed_pdf_path or not os.path.exists(processed_pdf_path):
+    result = _get_result(request, 'edit')
+    if not result:
         raise Http404('PDF-ul nu a fost găsit.')
     
-    # Serve file
-    response = FileResponse(
-        open(processed_pdf_path, 'rb'),
-        content_type='application/pdf'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(processed_pdf_path)}"'
+    # Edits are compacted only now, at export
+    processed_pdf_path = result.path
+    filename = os.path.basename(processed_pdf_path)
+    pdf = get_pdf_by_id(request, result.document_id)
+    if pdf:
+        processed_pdf_path = _export_edit_session(request, pdf) or processed_pdf_path
+        filename = f"{os.path.splitext(pdf['name'])[0]}_modified.pdf"
+    
+    response = _serve_result_file(request, result, path=processed_pdf_path, filename=filename)
+    if not response:
+        raise Http404('PDF-ul nu a fost găsit.')
     
     return response
 
 
 def preview_view(request):
-    """View pentru preview PDF cu PDF.js."""
+    """View pentru preview PDF cu PDF.js (sau din pagini randate pe server, cu ?pdf=<id>)."""
+    # Uploaded PDFs by id are shown from server-rendered tiles
+    pdf_id = request.GET.get('pdf')
+    if pdf_id:
+        pdf = get_pdf_by_id(request, pdf_id)
+        if not pdf:
+            messages.error(request, 'PDF not found for preview.')
+            return redirect('dashboard')
+        return render(request, 'pdfeditor/preview.html', {
+            'pdf_name': pdf['name'],
+            'pdf_id': pdf['id'],
+            'pdf_type': 'uploaded'
+        })
+    
     # Can preview either uploaded or processed PDF
     pdf_type = request.GET.get('type', 'uploaded')  # 'uploaded' or 'processed'
     
     if pdf_type == 'processed':
-        pdf_path = request.session.get('processed_pdf_path')
+        result = _get_result(request, 'edit')
+        pdf_path = result.path if result else None
         pdf_name = 'Modified PDF'
     else:
-        pdf_path = request.session.get('uploaded_pdf_path')
-        pdf_name = request.session.get('uploaded_pdf_name', 'Uploaded PDF')
+        uploaded_pdfs = get_uploaded_pdfs(request)
+        pdf_path = uploaded_pdfs[0]['path'] if uploaded_pdfs else None
+        pdf_name = uploaded_pdfs[0]['name'] if uploaded_pdfs else 'Uploaded PDF'
     
-    if not pdf_path or not os.path.exists(pdf_path):
+    if not pdf_path:
         messages.error(request, 'PDF not found for preview.')
         return redirect('dashboard')
     
@@ -256,14 +572,26 @@ def split_view(request):
         form = SplitPDFForm(request.POST)
         if form.is_valid():
             ranges = form.cleaned_data['ranges']
+            base_name = os.path.splitext(pdf_name)[0]
             
             try:
-                # Split PDF
-                output_files = split_pdf(pdf_path, ranges)
+                if form.cleaned_data.get('as_zip'):
+                    # Parts are generated straight into the archive
+                    return _split_zip_response(iter_split_parts(pdf_path, ranges, base_name), base_name)
                 
-                # Store results in session
-                request.session['split_files'] = output_files
-                request.session['split_count'] = len(output_files)
+                # Split PDF (the upload is a shared blob: name the parts per request)
+                stem = f"{base_name}_{uuid.uuid4().hex[:8]}"
+                if _use_jobs():
+                    result = _queue_result(
+                        request, 'split', 'split',
+                        {'pdf_path': pdf_path, 'ranges': ranges, 'output_name': stem},
+                        document=selected_pdf, name=base_name, stem=stem
+                    )
+                    return redirect('job_wait', result.job_id)
+                
+                output_files = split_pdf(pdf_path, ranges, output_name=stem)
+                
+                _save_result(request, 'split', output_files, document=selected_pdf, name=base_name, stem=stem)
                 
                 messages.success(request, f'PDF split successfully into {len(output_files)} files!')
                 return redirect('split_result')
@@ -285,57 +613,87 @@ def split_view(request):
     return render(request, 'pdfeditor/split.html', context)
 
 
+def _split_part_name(result, path):
+    """Download name of a split part: the file name without the per-request token."""
+    name = os.path.basename(path)
+    stem = result.data.get('stem')
+    if stem and name.startswith(stem):
+        name = result.data.get('name', 'document') + name[len(stem):]
+    return name
+
+
 def split_result_view(request):
     """View pentru rezultatele split PDF."""
-    split_files = request.session.get('split_files', [])
-    split_count = request.session.get('split_count', 0)
+    result = _get_result(request, 'split')
     
-    if not split_files:
+    if not result:
         messages.error(request, 'No split files found.')
         return redirect('dashboard')
     
     # Prepare file info for display
-    files_info = []
-    for file_path in split_files:
-        if os.path.exists(file_path):
-            files_info.append({
-                'name': os.path.basename(file_path),
-                'path': file_path,
-                'path_relative': os.path.relpath(file_path, settings.MEDIA_ROOT),
-                'size': os.path.getsize(file_path)
-            })
+    files_info = [
+        {
+            'name': _split_part_name(result, file_path),
+            'path': file_path,
+            'path_relative': os.path.relpath(file_path, settings.MEDIA_ROOT),
+            'size': size
+        }
+        for file_path, size in zip(result.paths, result.sizes)
+    ]
     
     context = {
         'files_info': files_info,
-        'split_count': split_count
+        'split_count': len(result.paths)
     }
     return render(request, 'pdfeditor/split_result.html', context)
 
 
+def _split_zip_response(entries, base_name):
+    """Stream (filename, path or bytes) entries as <base_name>_split.zip."""
+    import zipfile
+    from django.http import StreamingHttpResponse
+    from .zip_stream import stream_zip
+    
+    # The parts are already deflated PDFs; compressing them again costs CPU for nothing
+    response = StreamingHttpResponse(
+        stream_zip(entries, compression=zipfile.ZIP_STORED),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{base_name}_split.zip"'
+    return response
+
+
+def download_split_zip_view(request):
+    """Download all split files as one ZIP, built while it is sent."""
+    result = _get_result(request, 'split')
+    split_files = [path for path in result.paths if os.path.exists(path)] if result else []
+    if not split_files:
+        raise Http404('File not found')
+    
+    entries = ((_split_part_name(result, path), path) for path in split_files)
+    return _split_zip_response(entries, result.data.get('name', 'document'))
+
+
 def download_split_file_view(request):
     """Download individual split file."""
     file_index = request.GET.get('file')
-    split_files = request.session.get('split_files', [])
+    result = _get_result(request, 'split')
     
-    if file_index is None or not split_files:
+    if file_index is None or not result:
         raise Http404('File not found')
     
     try:
         file_index = int(file_index)
-        if file_index < 0 or file_index >= len(split_files):
+        if file_index < 0 or file_index >= len(result.paths):
             raise Http404('File index out of range')
         
-        file_path = split_files[file_index]
+        response = _serve_result_file(
+            request, result, file_index, filename=_split_part_name(result, result.paths[file_index])
+        )
         
-        if not os.path.exists(file_path):
+        if not response:
             raise Http404('File not found on disk')
         
-        response = FileResponse(
-            open(file_path, 'rb'),
-            content_type='application/pdf'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
-        
         return response
     except (ValueError, IndexError):
         raise Http404('Invalid file index')
@@ -371,12 +729,17 @@ def merge_view(request):
                     messages.error(request, 'At least 2 PDFs are required for merging.')
                     return redirect('merge')
                 
+                if _use_jobs():
+                    result = _queue_result(
+                        request, 'merge', 'merge', {'pdf_paths': pdf_paths, 'output_name': output_name},
+                        count=len(pdf_paths)
+                    )
+                    return redirect('job_wait', result.job_id)
+                
                 # Merge PDFs                
                 merged_path = merge_pdfs(pdf_paths, output_name)
                 
-                # Store result in session
-                request.session['merged_pdf_path'] = merged_path
-                request.session['merged_pdf_count'] = len(pdf_paths)
+                _save_result(request, 'merge', merged_path, count=len(pdf_paths))
                 
                 messages.success(request, f'Successfully merged {len(pdf_paths)} PDFs!')
                 return redirect('merge_result')
@@ -397,39 +760,31 @@ def merge_view(request):
 
 def merge_result_view(request):
     """View for displaying merge result."""
-    merged_path = request.session.get('merged_pdf_path')
-    merged_count = request.session.get('merged_pdf_count', 0)
+    result = _get_result(request, 'merge')
     
-    if not merged_path or not os.path.exists(merged_path):
+    if not result:
         messages.error(request, 'Merged file not found.')
         return redirect('dashboard')
     
     context = {
-        'merged_filename': os.path.basename(merged_path),
-        'merged_size': os.path.getsize(merged_path),
-        'merged_count': merged_count,
-        'pdf_path_relative': os.path.relpath(merged_path, settings.MEDIA_ROOT)
+        'merged_filename': os.path.basename(result.path),
+        'merged_size': result.size,
+        'merged_count': result.data.get('count', 0),
+        'pdf_path_relative': os.path.relpath(result.path, settings.MEDIA_ROOT)
     }
     return render(request, 'pdfeditor/merge_result.html', context)
 
 
 def download_merged_view(request):
     """Download the merged PDF file."""
-    merged_path = request.session.get('merged_pdf_path')
+    result = _get_result(request, 'merge')
+    response = _serve_result_file(request, result) if result else None
     
-    if not merged_path or not os.path.exists(merged_path):
+    if not response:
         messages.error(request, 'File not found.')
         return redirect('dashboard')
     
-    try:
-        return FileResponse(
-            open(merged_path, 'rb'),
-            as_attachment=True,
-            filename=os.path.basename(merged_path)
-        )
-    except Exception as e:
-        messages.error(request, f'Error downloading file: {str(e)}')
-        return redirect('dashboard')
+    return response
 
 
 def compress_view(request):
@@ -460,17 +815,23 @@ def compress_view(request):
             quality = form.cleaned_data['quality']
             
             try:
+                if _use_jobs():
+                    result = _queue_result(
+                        request, 'compress', 'compress', {'pdf_path': pdf_path, 'quality': quality},
+                        document=selected_pdf
+                    )
+                    return redirect('job_wait', result.job_id)
+                
                 # Compress PDF
-                output_path, original_size, compressed_size, compression_ratio = compress_pdf(
+                output_path, original_size, compressed_size, compression_ratio, image_stats = compress_pdf(
                     pdf_path, 
                     quality=quality
                 )
                 
-                # Store results in session
-                request.session['compressed_pdf_path'] = output_path
-                request.session['original_size'] = original_size
-                request.session['compressed_size'] = compressed_size
-                request.session['compression_ratio'] = compression_ratio
+                _save_result(
+                    request, 'compress', output_path, document=selected_pdf,
+                    **_compress_data(original_size, compression_ratio, image_stats)
+                )
                 
                 messages.success(request, f'PDF compressed successfully! Saved {compression_ratio:.1f}% space.')
                 return redirect('compress_result')
@@ -486,28 +847,33 @@ def compress_view(request):
         'pdf_path_relative': os.path.relpath(pdf_path, settings.MEDIA_ROOT),
         'uploaded_pdfs': uploaded_pdfs,
         'selected_pdf': selected_pdf,
-        'original_size': os.path.getsize(pdf_path)
+        'original_size': selected_pdf['size']
     }
     return render(request, 'pdfeditor/compress.html', context)
 
 
 def compress_result_view(request):
     """View for displaying compression result."""
-    compressed_path = request.session.get('compressed_pdf_path')
-    original_size = request.session.get('original_size', 0)
-    compressed_size = request.session.get('compressed_size', 0)
-    compression_ratio = request.session.get('compression_ratio', 0)
+    result = _get_result(request, 'compress')
     
-    if not compressed_path or not os.path.exists(compressed_path):
+    if not result:
         messages.error(request, 'Compressed file not found.')
         return redirect('dashboard')
     
+    compressed_path = result.path
+    original_size = result.data.get('original_size', 0)
+    compressed_size = result.size
+    compression_ratio = result.data.get('compression_ratio', 0)
+    image_stats = result.data.get('images')
+    
     context = {
         'compressed_filename': os.path.basename(compressed_path),
         'original_size': original_size,
         'compressed_size': compressed_size,
         'compression_ratio': compression_ratio,
         'saved_bytes': original_size - compressed_size,
+        'image_stats': image_stats,
+        'image_saved_bytes': image_stats['bytes_before'] - image_stats['bytes_after'] if image_stats else 0,
         'pdf_path_relative': os.path.relpath(compressed_path, settings.MEDIA_ROOT)
     }
     return render(request, 'pdfeditor/compress_result.html', context)
@@ -515,21 +881,14 @@ def compress_result_view(request):
 
 def download_compressed_view(request):
     """Download the compressed PDF file."""
-    compressed_path = request.session.get('compressed_pdf_path')
+    result = _get_result(request, 'compress')
+    response = _serve_result_file(request, result) if result else None
     
-    if not compressed_path or not os.path.exists(compressed_path):
+    if not response:
         messages.error(request, 'File not found.')
         return redirect('dashboard')
     
-    try:
-        return FileResponse(
-            open(compressed_path, 'rb'),
-            as_attachment=True,
-            filename=os.path.basename(compressed_path)
-        )
-    except Exception as e:
-        messages.error(request, f'Error downloading file: {str(e)}')
-        return redirect('dashboard')
+    return response
 
 
 def watermark_view(request):
@@ -574,6 +933,13 @@ def watermark_view(request):
                         'font_size': font_size
                     }
                     
+                    if _use_jobs():
+                        result = _queue_result(request, 'watermark', 'watermark', {
+                            'pdf_path': pdf_path, 'watermark_type': 'text',
+                            'watermark_content': text_content, 'options': options
+                        }, document=selected_pdf)
+                        return redirect('job_wait', result.job_id)
+                    
                     output_path = add_watermark(pdf_path, 'text', text_content, options)
                     
                 elif watermark_type == 'image':
@@ -590,14 +956,21 @@ def watermark_view(request):
                         'rotation': rotation
                     }
                     
+                    if _use_jobs():
+                        # The job deletes the image once it has been stamped
+                        result = _queue_result(request, 'watermark', 'watermark', {
+                            'pdf_path': pdf_path, 'watermark_type': 'image',
+                            'watermark_content': image_path, 'options': options, 'temp_image': True
+                        }, document=selected_pdf)
+                        return redirect('job_wait', result.job_id)
+                    
                     output_path = add_watermark(pdf_path, 'image', image_path, options)
                     
                     # Clean up temp image
                     if os.path.exists(image_path):
                         os.remove(image_path)
                 
-                # Store result in session
-                request.session['watermarked_pdf_path'] = output_path
+                _save_result(request, 'watermark', output_path, document=selected_pdf)
                 
                 messages.success(request, 'Watermark added successfully!')
                 return redirect('watermark_result')
@@ -619,37 +992,30 @@ def watermark_view(request):
 
 def watermark_result_view(request):
     """View for displaying watermark result."""
-    watermarked_path = request.session.get('watermarked_pdf_path')
+    result = _get_result(request, 'watermark')
     
-    if not watermarked_path or not os.path.exists(watermarked_path):
+    if not result:
         messages.error(request, 'Watermarked file not found.')
         return redirect('dashboard')
     
     context = {
-        'watermarked_filename': os.path.basename(watermarked_path),
-        'watermarked_size': os.path.getsize(watermarked_path),
-        'pdf_path_relative': os.path.relpath(watermarked_path, settings.MEDIA_ROOT)
+        'watermarked_filename': os.path.basename(result.path),
+        'watermarked_size': result.size,
+        'pdf_path_relative': os.path.relpath(result.path, settings.MEDIA_ROOT)
     }
     return render(request, 'pdfeditor/watermark_result.html', context)
 
 
 def download_watermarked_view(request):
     """Download the watermarked PDF file."""
-    watermarked_path = request.session.get('watermarked_pdf_path')
+    result = _get_result(request, 'watermark')
+    response = _serve_result_file(request, result) if result else None
     
-    if not watermarked_path or not os.path.exists(watermarked_path):
+    if not response:
         messages.error(request, 'File not found.')
         return redirect('dashboard')
     
-    try:
-        return FileResponse(
-            open(watermarked_path, 'rb'),
-            as_attachment=True,
-            filename=os.path.basename(watermarked_path)
-        )
-    except Exception as e:
-        messages.error(request, f'Error downloading file: {str(e)}')
-        return redirect('dashboard')
+    return response
 
 
 def rotate_view(request):
@@ -679,14 +1045,19 @@ def rotate_view(request):
             page_range = form.cleaned_data.get('page_range', '').strip()
             
             try:
+                if _use_jobs():
+                    result = _queue_result(request, 'rotate', 'rotate', {
+                        'pdf_path': pdf_path, 'rotation_angle': rotation_angle, 'page_range': page_range or None
+                    }, document=selected_pdf, rotation_angle=rotation_angle)
+                    return redirect('job_wait', result.job_id)
+                
                 output_path = rotate_pages(
                     pdf_path,
                     rotation_angle,
                     page_range if page_range else None
                 )
                 
-                request.session['rotated_pdf_path'] = output_path
-                request.session['rotation_angle'] = rotation_angle
+                _save_result(request, 'rotate', output_path, document=selected_pdf, rotation_angle=rotation_angle)
                 
                 messages.success(request, f'Pages rotated {rotation_angle}° successfully!')
                 return redirect('rotate_result')
@@ -710,39 +1081,31 @@ def rotate_view(request):
 
 def rotate_result_view(request):
     """View for displaying rotation result."""
-    rotated_path = request.session.get('rotated_pdf_path')
-    rotation_angle = request.session.get('rotation_angle', 0)
+    result = _get_result(request, 'rotate')
     
-    if not rotated_path or not os.path.exists(rotated_path):
+    if not result:
         messages.error(request, 'Rotated file not found.')
         return redirect('dashboard')
     
     context = {
-        'rotated_filename': os.path.basename(rotated_path),
-        'rotated_size': os.path.getsize(rotated_path),
-        'rotation_angle': rotation_angle,
-        'pdf_path_relative': os.path.relpath(rotated_path, settings.MEDIA_ROOT)
+        'rotated_filename': os.path.basename(result.path),
+        'rotated_size': result.size,
+        'rotation_angle': result.data.get('rotation_angle', 0),
+        'pdf_path_relative': os.path.relpath(result.path, settings.MEDIA_ROOT)
     }
     return render(request, 'pdfeditor/rotate_result.html', context)
 
 
 def download_rotated_view(request):
     """Download the rotated PDF file."""
-    rotated_path = request.session.get('rotated_pdf_path')
+    result = _get_result(request, 'rotate')
+    response = _serve_result_file(request, result) if result else None
     
-    if not rotated_path or not os.path.exists(rotated_path):
+    if not response:
         messages.error(request, 'File not found.')
         return redirect('dashboard')
     
-    try:
-        return FileResponse(
-            open(rotated_path, 'rb'),
-            as_attachment=True,
-            filename=os.path.basename(rotated_path)
-        )
-    except Exception as e:
-        messages.error(request, f'Error downloading file: {str(e)}')
-        return redirect('dashboard')
+    return response
 
 
 def page_numbers_view(request):
@@ -772,18 +1135,27 @@ def page_numbers_view(request):
             format_type = form.cleaned_data['format']
             font_size = form.cleaned_data['font_size']
             start_page = form.cleaned_data['start_page']
+            pages = form.cleaned_data.get('pages', '').strip()
             
             try:
                 options = {
                     'position': position,
                     'format': format_type,
                     'font_size': font_size,
-                    'start_page': start_page
+                    'start_page': start_page,
+                    'pages': pages or None
                 }
                 
+                if _use_jobs():
+                    result = _queue_result(
+                        request, 'page_numbers', 'page_numbers', {'pdf_path': pdf_path, 'options': options},
+                        document=selected_pdf
+                    )
+                    return redirect('job_wait', result.job_id)
+                
                 output_path = add_page_numbers(pdf_path, options)
                 
-                request.session['numbered_pdf_path'] = output_path
+                _save_result(request, 'page_numbers', output_path, document=selected_pdf)
                 
                 messages.success(request, 'Page numbers added successfully!')
                 return redirect('page_numbers_result')
@@ -805,37 +1177,30 @@ def page_numbers_view(request):
 
 def page_numbers_result_view(request):
     """View for displaying page numbers result."""
-    numbered_path = request.session.get('numbered_pdf_path')
+    result = _get_result(request, 'page_numbers')
     
-    if not numbered_path or not os.path.exists(numbered_path):
+    if not result:
         messages.error(request, 'Numbered file not found.')
         return redirect('dashboard')
     
     context = {
-        'numbered_filename': os.path.basename(numbered_path),
-        'numbered_size': os.path.getsize(numbered_path),
-        'pdf_path_relative': os.path.relpath(numbered_path, settings.MEDIA_ROOT)
+        'numbered_filename': os.path.basename(result.path),
+        'numbered_size': result.size,
+        'pdf_path_relative': os.path.relpath(result.path, settings.MEDIA_ROOT)
     }
     return render(request, 'pdfeditor/page_numbers_result.html', context)
 
 
 def download_numbered_view(request):
     """Download the numbered PDF file."""
-    numbered_path = request.session.get('numbered_pdf_path')
+    result = _get_result(request, 'page_numbers')
+    response = _serve_result_file(request, result) if result else None
     
-    if not numbered_path or not os.path.exists(numbered_path):
+    if not response:
         messages.error(request, 'File not found.')
         return redirect('dashboard')
     
-    try:
-        return FileResponse(
-            open(numbered_path, 'rb'),
-            as_attachment=True,
-            filename=os.path.basename(numbered_path)
-        )
-    except Exception as e:
-        messages.error(request, f'Error downloading file: {str(e)}')
-        return redirect('dashboard')
+    return response
 
 
 def more_tools_view(request):
@@ -852,9 +1217,89 @@ def more_tools_view(request):
     return render(request, 'pdfeditor/more_tools.html', context)
 
 
+def _new_text_output(request, pdf, filename):
+    """
+    Reserve a file in media/processed for extracted text.
+    
+    Only the path and download name are recorded (never the text itself);
+    the previous extraction's file is deleted. Call _finish_text_output
+    once the file is written.
+    
+    Returns:
+        ProcessedResult of the (not yet written) text file
+    """
+    _expire_text_outputs(_get_session_owner(request))
+    
+    processed_dir = os.path.join(settings.MEDIA_ROOT, 'processed')
+    os.makedirs(processed_dir, exist_ok=True)
+    output_path = os.path.join(processed_dir, f"text_{uuid.uuid4().hex}.txt")
+    
+    return _save_result(request, 'text', output_path, document=pdf, filename=filename)
+
+
+def _finish_text_output(result):
+    """Record a written text file in the expiry index, with its real size."""
+    register_file(result.path, 'result', result=result)
+    ProcessedResult.objects.filter(pk=result.pk).update(sizes=[os.path.getsize(result.path)])
+
+
+def _stream_text_pages(pdf, result):
+    """
+    Yield NDJSON lines (one per page) while writing the text file.
+    
+    The file is written to a .part file and renamed only once the whole
+    document was read, so an interrupted stream never leaves a truncated
+    download behind.
+    """
+    import json
+    from .pdf_processor import iter_text_pages, format_page_text, NO_TEXT_MESSAGE
+    
+    output_path = result.path
+    part_path = f"{output_path}.part"
+    page_count = pdf.get('page_count')
+    has_text = False
+    
+    try:
+        with open(part_path, 'w', encoding='utf-8') as f:
+            for page_num, page_text in iter_text_pages(pdf['path'], pdf.get('sha256')):
+                block = format_page_text(page_num, page_text)
+                if block:
+                    f.write(f"\n{block}" if has_text else block)
+                    has_text = True
+                yield json.dumps({
+                    'type': 'page',
+                    'page': page_num,
+                    'page_count': page_count,
+                    'text': block
+                }) + '\n'
+            
+            if not has_text:
+                f.write(NO_TEXT_MESSAGE)
+        
+        os.replace(part_path, output_path)
+        _finish_text_output(result)
+        yield json.dumps({
+            'type': 'done',
+            'has_text': has_text,
+            'message': '' if has_text else NO_TEXT_MESSAGE,
+            'download_url': reverse('download_text')
+        }) + '\n'
+    except Exception as e:
+        yield json.dumps({'type': 'error', 'error': f"Error extracting text: {str(e)}"}) + '\n'
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
 def extract_text_ajax(request, pdf_id):
-    """AJAX endpoint for extracting text from PDF."""
-    from django.http import JsonResponse
+    """
+    AJAX endpoint for extracting text from PDF.
+    
+    Streams NDJSON as pages are read: one {"type": "page"} line per page,
+    then a {"type": "done"} (or {"type": "error"}) line. The full text is
+    written to a file for download_text_view instead of the session.
+    """
+    from django.http import JsonResponse, StreamingHttpResponse
     
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid method'})
@@ -863,22 +1308,81 @@ def extract_text_ajax(request, pdf_id):
     if not pdf:
         return JsonResponse({'success': False, 'error': 'PDF not found'})
     
+    result = _new_text_output(request, pdf, pdf['name'].replace('.pdf', '_extracted.txt'))
+    
+    response = StreamingHttpResponse(
+        _stream_text_pages(pdf, result),
+        content_type='application/x-ndjson'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def search_text_ajax(request, pdf_id):
+    """
+    AJAX endpoint for searching one PDF, answered from its text index.
+    
+    Returns whole-word hits with their page and rect, plus every page that
+    contains the query as a substring.
+    """
+    from django.http import JsonResponse
+    from .text_index import get_text_index
+    
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'success': False, 'error': 'Empty query'})
+    
+    pdf = get_pdf_by_id(request, pdf_id)
+    if not pdf:
+        return JsonResponse({'success': False, 'error': 'PDF not found'})
+    
     try:
-        text = extract_text_from_pdf(pdf['path'])
-        
-        # Store in session for download
-        request.session['extracted_text'] = text
-        request.session['extracted_filename'] = pdf['name'].replace('.pdf', '_extracted.txt')
+        index = get_text_index(pdf['path'], pdf.get('sha256'))
+        hits = [
+            {'page': page + 1, 'rect': list(rect)}
+            for page, rect in index.find_words(query)
+        ]
+        pages = [page + 1 for page in index.candidate_pages(query)]
         
         return JsonResponse({
             'success': True,
-            'text': text,
-            'filename': pdf['name']
+            'query': query,
+            'hits': hits,
+            'pages': pages
         })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+def search_view(request):
+    """Full-text search across all PDFs uploaded in this session."""
+    from .search_index import search
+    
+    query = request.GET.get('q', '').strip()
+    uploaded_pdfs = get_uploaded_pdfs(request)
+    
+    # The index is shared per content hash; only this session's hashes are searched
+    pdfs_by_hash = {}
+    for pdf in uploaded_pdfs:
+        if pdf.get('sha256'):
+            pdfs_by_hash.setdefault(pdf['sha256'], pdf)
+    
+    results = []
+    if query:
+        for hit in search(query, pdfs_by_hash.keys()):
+            hit['pdf'] = pdfs_by_hash[hit['sha256']]
+            results.append(hit)
+    
+    context = {
+        'query': query,
+        'results': results,
+        'document_count': len({hit['sha256'] for hit in results}),
+        'uploaded_pdfs': uploaded_pdfs
+    }
+    return render(request, 'pdfeditor/search.html', context)
+
+
 def ocr_text_ajax(request, pdf_id):
     """AJAX endpoint for OCR text extraction from PDF."""
     from django.http import JsonResponse
@@ -890,12 +1394,33 @@ def ocr_text_ajax(request, pdf_id):
     if not pdf:
         return JsonResponse({'success': False, 'error': 'PDF not found'})
     
+    # Optional render resolution (higher = slower but more accurate)
     try:
-        text = ocr_pdf_to_text(pdf['path'])
+        dpi = min(max(int(request.POST.get('dpi', 300)), 72), 600)
+    except ValueError:
+        dpi = 300
+    
+    if _use_jobs():
+        # The page polls status_url; the text comes with the finished job
+        result = _queue_result(
+            request, 'text', 'ocr', {'pdf_path': pdf['path'], 'dpi': dpi, 'sha256': pdf.get('sha256')},
+            document=pdf, filename=pdf['name'].replace('.pdf', '_ocr.txt')
+        )
+        return JsonResponse({
+            'success': True,
+            'job_id': result.job_id,
+            'status_url': reverse('job_status', args=[result.job_id]),
+            'filename': pdf['name']
+        })
+    
+    try:
+        text = ocr_pdf_to_text(pdf['path'], dpi=dpi, sha256=pdf.get('sha256'))
         
-        # Store in session for download
-        request.session['extracted_text'] = text
-        request.session['extracted_filename'] = pdf['name'].replace('.pdf', '_ocr.txt')
+        # Keep a file for download (only its path is recorded)
+        result = _new_text_output(request, pdf, pdf['name'].replace('.pdf', '_ocr.txt'))
+        with open(result.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        _finish_text_output(result)
         
         return JsonResponse({
             'success': True,
@@ -907,31 +1432,37 @@ def ocr_text_ajax(request, pdf_id):
 
 
 def download_text_view(request):
-    """Download extracted text as .txt file."""
-    from django.http import HttpResponse
-    
-    text = request.session.get('extracted_text')
-    filename = request.session.get('extracted_filename', 'extracted.txt')
-    
-    if not text:
+    """Download extracted text as .txt file (streamed from disk)."""
+    result = _get_result(request, 'text')
+    response = _serve_result_file(
+        request, result,
+        filename=result.data.get('filename', os.path.basename(result.path)),
+        content_type='text/plain; charset=utf-8'
+    ) if result else None
+    
+    if not response:
         messages.error(request, 'No text found to download.')
         return redirect('dashboard')
     
-    response = HttpResponse(text, content_type='text/plain')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
     return response
 
 
 def delete_pdf_view(request, pdf_id):
-    """Delete PDF from session."""
-    uploaded_pdfs = request.session.get('uploaded_pdfs', [])
-    
-    # Find and remove PDF
-    updated_pdfs = [pdf for pdf in uploaded_pdfs if pdf['id'] != pdf_id]
-    
-    if len(updated_pdfs) < len(uploaded_pdfs):
-        request.session['uploaded_pdfs'] = updated_pdfs
+    """Delete an uploaded PDF of this session."""
+    owner = request.session.session_key
+    document = Document.objects.filter(pk=pdf_id, owner=owner).first() if owner else None
+    
+    if document:
+        # Release the store reference (blob is deleted with its last reference)
+        if document.sha256 and document.status == Document.STATUS_ACTIVE:
+            release_reference(document.sha256, document.id)
+        
+        # Drop its edit session (working copy and journal)
+        if document.edit_session_id:
+            from .edit_session import delete_session
+            delete_session(document.edit_session_id, owner=owner)
+        
+        document.delete()
         messages.success(request, 'PDF removed successfully.')
     else:
         messages.error(request, 'PDF not found.')
@@ -1005,8 +1536,7 @@ def rephrase_view(request):
                 if not success:
                     messages.error(request, f'AI Error: {error_message}')
                 else:
-                    # Import coordinate-based rephrase function
-                    from .pdf_processor import rephrase_with_coordinates
+                    from .edit_session import apply_edit
                     
                     # Build bounding box
                     bounding_box = {
@@ -1016,23 +1546,24 @@ def rephrase_view(request):
                         'y1': float(bbox_y1)
                     }
                     
-                    # Apply replacement using exact coordinates
-                    output_path, replacement_count, warnings = rephrase_with_coordinates(
-                        pdf_path=pdf_path,
-                        page_number=int(page_number),
-                        bounding_box=bounding_box,
-                        replace_text=rephrased_text,
-                        original_text=selected_text
-                    )
+                    # Apply replacement using exact coordinates, on the
+                    # working copy (incremental save, undoable)
+                    edit_session = _edit_session_for(request, selected_pdf)
+                    result = apply_edit(edit_session['session_id'], 'rephrase', {
+                        'page_number': int(page_number),
+                        'bounding_box': bounding_box,
+                        'replace_text': rephrased_text
+                    }, owner=_get_session_owner(request))
                     
-                    # Store result in session
-                    request.session['rephrased_pdf_path'] = output_path
-                    request.session['rephrase_original_text'] = selected_text
-                    request.session['rephrase_new_text'] = rephrased_text
-                    request.session['rephrase_count'] = replacement_count
-                    request.session['rephrase_warnings'] = warnings
-                    request.session['rephrase_style'] = rephrase_style
-                    request.session['rephrase_model'] = model
+                    _save_result(
+                        request, 'rephrase', edit_session['working_path'], document=selected_pdf,
+                        original_text=selected_text,
+                        new_text=rephrased_text,
+                        replacement_count=result['replacement_count'],
+                        warnings=result['warnings'],
+                        style=rephrase_style,
+                        model=model
+                    )
                     
                     return redirect('rephrase_result')
                     
@@ -1041,9 +1572,15 @@ def rephrase_view(request):
             except Exception as e:
                 messages.error(request, f'Error processing PDF: {str(e)}')
     
+    # Select on the current state, with earlier edits
+    edit_session = _edit_session_for(request, selected_pdf, create=False)
+    if edit_session:
+        pdf_path = edit_session['working_path']
+    
     context = {
         'pdf_name': pdf_name,
         'pdf_path_relative': os.path.relpath(pdf_path, settings.MEDIA_ROOT),
+        'pdf_version': edit_session['revision'] if edit_session else 0,
         'uploaded_pdfs': uploaded_pdfs,
         'selected_pdf': selected_pdf,
         'ollama_connected': ollama_connected,
@@ -1054,9 +1591,37 @@ def rephrase_view(request):
     return render(request, 'pdfeditor/rephrase.html', context)
 
 
+def _rephrase_event_stream(text, style, model):
+    """Server-sent events: one {"token"} event per generated fragment, then {"done"} or {"error"}."""
+    import json
+    from .ollama_service import stream_rephrase_text, clean_response, OllamaError
+    
+    tokens = []
+    try:
+        for token in stream_rephrase_text(text, style, model):
+            tokens.append(token)
+            yield f"data: {json.dumps({'token': token})}\n\n"
+    except OllamaError as e:
+        yield f"data: {json.dumps({'success': False, 'error': str(e)})}\n\n"
+        return
+    
+    rephrased = clean_response(''.join(tokens))
+    if rephrased:
+        event = {'success': True, 'done': True, 'original_text': text, 'rephrased_text': rephrased, 'model': model, 'style': style}
+    else:
+        event = {'success': False, 'error': 'Ollama returned empty response'}
+    yield f"data: {json.dumps(event)}\n\n"
+
+
 def rephrase_preview_ajax(request):
-    """AJAX endpoint for previewing rephrased text without applying to PDF."""
+    """
+    AJAX endpoint for previewing rephrased text without applying to PDF.
+    
+    With stream=1 the answer is sent as server-sent events while Ollama
+    generates it (see _rephrase_event_stream); otherwise as one JSON object.
+    """
     import json
+    from django.http import StreamingHttpResponse
     from .ollama_service import rephrase_text, check_ollama_connection, get_available_models
     
     if request.method != 'POST':
@@ -1097,6 +1662,15 @@ def rephrase_preview_ajax(request):
                 content_type='application/json'
             )
         
+        if request.POST.get('stream'):
+            response = StreamingHttpResponse(
+                _rephrase_event_stream(text, style, model),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        
         # Get rephrased text
         rephrased, success, error = rephrase_text(text, style, model)
         
@@ -1125,49 +1699,792 @@ def rephrase_preview_ajax(request):
         )
 
 
+def rephrase_batch_ajax(request):
+    """
+    AJAX endpoint rephrasing many paragraphs at once (JSON body).
+    
+    Body: {"texts": [...], "style": "formal", "model": "..."}. The texts are
+    sent to Ollama concurrently, at most OLLAMA_MAX_IN_FLIGHT at a time.
+    """
+    import json
+    from django.http import JsonResponse
+    from .ollama_service import rephrase_many, check_ollama_connection, get_available_models
+    
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Only POST allowed'})
+    
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'})
+    
+    texts = data.get('texts')
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) and text.strip() for text in texts):
+        return JsonResponse({'success': False, 'error': 'texts must be a list of non-empty strings'})
+    if len(texts) > 200:
+        return JsonResponse({'success': False, 'error': 'At most 200 texts per request'})
+    
+    connected, message = check_ollama_connection()
+    if not connected:
+        return JsonResponse({'success': False, 'error': message})
+    
+    model = data.get('model') or next(iter(get_available_models()), None)
+    if not model:
+        return JsonResponse({'success': False, 'error': 'No AI model available'})
+    
+    style = data.get('style', 'formal')
+    results = rephrase_many([text.strip() for text in texts], style, model)
+    
+    return JsonResponse({
+        'success': all(success for _, success, _ in results),
+        'model': model,
+        'style': style,
+        'results': [
+            {'rephrased_text': rephrased, 'success': success, 'error': error}
+            for rephrased, success, error in results
+        ]
+    })
+
+
+def rephrase_cache_stats_ajax(request):
+    """Size and hit/miss counters of the persistent rephrase cache."""
+    from django.http import JsonResponse
+    from .rephrase_cache import cache_stats
+    
+    return JsonResponse({'success': True, **cache_stats()})
+
+
+def metrics_view(request):
+    """Operation timings and cache sizes in the Prometheus text format."""
+    from django.http import HttpResponse
+    from .metrics import prometheus_text
+    
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def rephrase_result_view(request):
     """View for displaying rephrase result."""
-    rephrased_path = request.session.get('rephrased_pdf_path')
-    original_text = request.session.get('rephrase_original_text', '')
-    new_text = request.session.get('rephrase_new_text', '')
-    replacement_count = request.session.get('rephrase_count', 0)
-    warnings = request.session.get('rephrase_warnings', [])
-    style = request.session.get('rephrase_style', '')
-    model = request.session.get('rephrase_model', '')
-    
-    if not rephrased_path or not os.path.exists(rephrased_path):
+    result = _get_result(request, 'rephrase')
+    
+    if not result:
         messages.error(request, 'Rephrased PDF not found.')
         return redirect('dashboard')
     
+    warnings = result.data.get('warnings', [])
     context = {
-        'rephrased_filename': os.path.basename(rephrased_path),
-        'rephrased_size': os.path.getsize(rephrased_path),
-        'original_text': original_text,
-        'new_text': new_text,
-        'replacement_count': replacement_count,
+        'rephrased_filename': os.path.basename(result.path),
+        'rephrased_size': result.size,
+        'original_text': result.data.get('original_text', ''),
+        'new_text': result.data.get('new_text', ''),
+        'replacement_count': result.data.get('replacement_count', 0),
         'warnings': warnings,
         'has_warnings': len(warnings) > 0,
-        'style': style,
-        'model': model,
-        'pdf_path_relative': os.path.relpath(rephrased_path, settings.MEDIA_ROOT)
+        'style': result.data.get('style', ''),
+        'model': result.data.get('model', ''),
+        'pdf_path_relative': os.path.relpath(result.path, settings.MEDIA_ROOT),
+        **_edit_history_context(request, result.document_id)
     }
     return render(request, 'pdfeditor/rephrase_result.html', context)
 
 
 def download_rephrased_view(request):
     """Download the rephrased PDF file."""
-    rephrased_path = request.session.get('rephrased_pdf_path')
+    result = _get_result(request, 'rephrase')
     
-    if not rephrased_path or not os.path.exists(rephrased_path):
+    if not result:
         messages.error(request, 'File not found.')
         return redirect('dashboard')
     
+    rephrased_path = result.path
+    filename = os.path.basename(rephrased_path)
+    pdf = get_pdf_by_id(request, result.document_id)
+    if pdf:
+        rephrased_path = _export_edit_session(request, pdf) or rephrased_path
+        filename = f"{os.path.splitext(pdf['name'])[0]}_rephrased.pdf"
+    
+    response = _serve_result_file(request, result, path=rephrased_path, filename=filename)
+    if not response:
+        messages.error(request, 'File not found.')
+        return redirect('dashboard')
+    
+    return response
+
+
+# ==========================================
+# Chunked (resumable) Upload Views
+# ==========================================
+
+def chunked_upload_create_view(request):
+    """Start a resumable upload; returns the upload id and chunk size."""
+    from django.http import JsonResponse
+    from .chunked_upload import create_upload
+    
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
+    
     try:
-        return FileResponse(
-            open(rephrased_path, 'rb'),
-            as_attachment=True,
-            filename=os.path.basename(rephrased_path)
+        size = int(request.POST.get('size', 0))
+        upload = create_upload(request.POST.get('filename', ''), size, owner=_get_session_owner(request))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=getattr(e, 'status', 400))
+    
+    return JsonResponse({
+        'success': True,
+        'upload_id': upload['upload_id'],
+        'offset': upload['offset'],
+        'chunk_size': upload['chunk_size'],
+        'upload_url': reverse('chunked_upload_chunk', args=[upload['upload_id']])
+    })
+
+
+def chunked_upload_chunk_view(request, upload_id):
+    """
+    Resumable upload endpoint.
+    
+    GET/HEAD returns the current offset, PUT/PATCH/POST appends the raw
+    request body starting at the `Upload-Offset` header, DELETE aborts.
+    """
+    from django.http import JsonResponse
+    from .chunked_upload import get_upload, append_chunk, abort_upload, UploadError
+    
+    owner = _get_session_owner(request)
+    
+    try:
+        if request.method in ('GET', 'HEAD'):
+            upload = get_upload(upload_id, owner)
+            response = JsonResponse({'success': True, 'offset': upload['offset'], 'size': upload['size']})
+            response['Upload-Offset'] = str(upload['offset'])
+            return response
+        
+        if request.method == 'DELETE':
+            abort_upload(upload_id, owner)
+            return JsonResponse({'success': True})
+        
+        if request.method not in ('PUT', 'PATCH', 'POST'):
+            return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.GET.get('offset', '')))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Missing Upload-Offset header'}, status=400)
+        
+        # Read the raw body as a stream; Django's upload handlers are never involved
+        length = int(request.META.get('CONTENT_LENGTH') or 0) or None
+        upload = append_chunk(upload_id, offset, request, owner, length=length)
+        
+    except UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
+    
+    data = {'success': True, 'offset': upload['offset'], 'size': upload['size'], 'complete': upload['complete']}
+    
+    if upload['complete']:
+        pdf_data = _create_document(
+            request, upload['ref_id'], upload['sha256'], upload['path'],
+            upload['filename'], upload['size']
         )
-    except Exception as e:
-        messages.error(request, f'Error downloading file: {str(e)}')
+        data['pdf_id'] = pdf_data['id']
+    
+    response = JsonResponse(data)
+    response['Upload-Offset'] = str(upload['offset'])
+    return response
+
+
+# ==========================================
+# Background Job Views
+# ==========================================
+
+def _get_session_owner(request):
+    """Return the session key used as job owner, creating the session if needed."""
+    if not request.session.session_key:
+        request.session.save()
+    return request.session.session_key
+
+
+def _build_job_params(request, operation):
+    """
+    Validate POST data for a background job.
+
+    Uses the same forms as the synchronous views.
+
+    Returns:
+        Tuple (params: dict or None, error: str)
+    """
+    if operation == 'merge':
+        form = MergePDFForm(request.POST)
+        if not form.is_valid():
+            return None, form.errors.as_text()
+        pdf_paths = []
+        for pdf_id in form.cleaned_data['selected_pdfs']:
+            pdf = get_pdf_by_id(request, pdf_id)
+            if not pdf:
+                return None, f'PDF with ID {pdf_id} not found.'
+            pdf_paths.append(pdf['path'])
+        return {'pdf_paths': pdf_paths, 'output_name': form.cleaned_data.get('output_name')}, ''
+
+    if operation == 'batch':
+        pdfs, operations, error = _get_batch_input(request)
+        if pdfs is None:
+            return None, error
+        return {
+            'pdf_paths': [pdf['path'] for pdf in pdfs],
+            'names': [pdf['name'] for pdf in pdfs],
+            'operations': operations
+        }, ''
+
+    pdf = get_pdf_by_id(request, request.POST.get('pdf', ''))
+    if not pdf:
+        return None, 'PDF not found'
+    params = {'pdf_path': pdf['path']}
+
+    form_classes = {
+        'split': SplitPDFForm,
+        'compress': CompressPDFForm,
+        'watermark': WatermarkForm,
+        'rotate': RotatePagesForm,
+        'page_numbers': PageNumbersForm,
+        'find_replace': FindReplaceForm,
+    }
+    if operation in form_classes:
+        form = form_classes[operation](request.POST)
+        if not form.is_valid():
+            return None, form.errors.as_text()
+        data = form.cleaned_data
+
+    if operation == 'split':
+        params['ranges'] = data['ranges']
+    elif operation == 'compress':
+        params['quality'] = data['quality']
+    elif operation == 'watermark':
+        if data['watermark_type'] != 'text':
+            return None, 'Only text watermarks can run as background jobs.'
+        params.update({
+            'watermark_type': 'text',
+            'watermark_content': data['text_content'],
+            'options': {
+                'position': data['position'],
+                'opacity': data['opacity'],
+                'rotation': data['rotation'],
+                'font_size': data.get('font_size') or 48
+            }
+        })
+    elif operation == 'rotate':
+        params['rotation_angle'] = int(data['rotation_angle'])
+        params['page_range'] = data.get('page_range', '').strip() or None
+    elif operation == 'page_numbers':
+        params['options'] = {
+            'position': data['position'],
+            'format': data['format'],
+            'font_size': data['font_size'],
+            'start_page': data['start_page'],
+            'pages': data.get('pages', '').strip() or None
+        }
+    elif operation == 'find_replace':
+        params.update({
+            'search_text': data['search_text'],
+            'replace_text': data['replace_text'],
+            'case_sensitive': data['case_sensitive'],
+            'page_range': data.get('page_range', '').strip() or None,
+            'sha256': pdf.get('sha256')
+        })
+    elif operation == 'pipeline':
+        form = PipelineForm(request.POST)
+        if not form.is_valid():
+            return None, form.errors.as_text()
+        params['steps'] = form.cleaned_data['steps']
+    elif operation == 'ocr':
+        try:
+            params['dpi'] = min(max(int(request.POST.get('dpi', 300)), 72), 600)
+        except ValueError:
+            return None, 'Invalid DPI.'
+        params['sha256'] = pdf.get('sha256')
+    elif operation == 'rephrase':
+        try:
+            params.update({
+                'text': request.POST['selected_text'].strip(),
+                'style': request.POST.get('rephrase_style', 'formal'),
+                'model': request.POST.get('ai_model') or None,
+                'page_number': int(request.POST['page_number']),
+                'bounding_box': {
+                    key: float(request.POST[f'bbox_{key}']) for key in ('x0', 'y0', 'x1', 'y1')
+                }
+            })
+        except (KeyError, ValueError):
+            return None, 'Missing selection text or coordinates.'
+        if not params['text']:
+            return None, 'Please select text from the PDF first.'
+    elif operation == 'rephrase_document':
+        params.update({
+            'style': request.POST.get('rephrase_style', 'formal'),
+            'model': request.POST.get('ai_model') or None,
+            'page_range': request.POST.get('page_range', '').strip() or None,
+            'sha256': pdf.get('sha256')
+        })
+    elif operation == 'extract_text':
+        params['sha256'] = pdf.get('sha256')
+
+    return params, ''
+
+
+def job_submit_view(request, operation):
+    """Enqueue a pdf_processor operation and return its job id at once."""
+    from django.http import JsonResponse
+    from .jobs import OPERATIONS, submit_job
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid method'})
+
+    if operation not in OPERATIONS:
+        return JsonResponse({'success': False, 'error': f'Unknown operation: {operation}'})
+
+    params, error = _build_job_params(request, operation)
+    if params is None:
+        return JsonResponse({'success': False, 'error': error})
+
+    job_id = submit_job(operation, params, owner=_get_session_owner(request))
+
+    return JsonResponse({
+        'success': True,
+        'job_id': job_id,
+        'status_url': reverse('job_status', args=[job_id]),
+        'events_url': reverse('job_events', args=[job_id])
+    })
+
+
+def _job_public_fields(job):
+    """Job fields safe to return to the browser (no server paths)."""
+    result = job['result'] or {}
+    data = {
+        'job_id': job['id'],
+        'operation': job['operation'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'error': job['error']
+    }
+    if job['status'] == 'done':
+        data['result'] = {
+            key: value for key, value in result.items()
+            if key not in ('output_path', 'output_paths')
+        }
+        if job['operation'] == 'batch':
+            data['download_urls'] = [reverse('batch_download', args=[job['id']])]
+        elif 'output_path' in result:
+            data['download_urls'] = [reverse('job_download', args=[job['id']])]
+        elif 'output_paths' in result:
+            data['download_urls'] = [
+                f"{reverse('job_download', args=[job['id']])}?file={index}"
+                for index in range(len(result['output_paths']))
+            ]
+    return data
+
+
+def job_status_view(request, job_id):
+    """AJAX endpoint for polling a background job."""
+    from django.http import JsonResponse
+    from .jobs import get_job, FINISHED_STATUSES
+
+    job = get_job(job_id, owner=_get_session_owner(request))
+    if not job:
+        return JsonResponse({'success': False, 'error': 'Job not found'})
+
+    if job['status'] in FINISHED_STATUSES:
+        _finish_job_result(job)
+    return JsonResponse({'success': True, **_job_public_fields(job)})
+
+
+def job_wait_view(request, job_id):
+    """
+    Waiting page of a tool view whose work was queued (see _queue_result).
+    
+    The page reloads itself until the job is finished, then sends the user
+    to the result page, or back to the tool with the error.
+    """
+    from .jobs import get_job
+
+    job = get_job(job_id, owner=_get_session_owner(request))
+    result = _finish_job_result(job) if job else None
+    if not result or result.kind not in RESULT_VIEWS:
+        raise Http404('Job not found')
+
+    tool_view, result_view = RESULT_VIEWS[result.kind]
+    if result.status == ProcessedResult.STATUS_READY:
+        return redirect(result_view)
+    if job['status'] == 'failed' or result.status != ProcessedResult.STATUS_PENDING:
+        messages.error(request, f"Error: {job['error'] or 'the result has expired.'}")
+        url = reverse(tool_view)
+        return redirect(f"{url}?pdf={result.document_id}" if result.document_id else url)
+
+    return render(request, 'pdfeditor/job_wait.html', {
+        'job': job,
+        'operation': result.get_kind_display()
+    })
+
+
+def job_events_view(request, job_id):
+    """
+    Stream job progress as server-sent events.
+
+    Each response holds a server thread, so it is bounded: after
+    PDF_JOB_EVENTS_SECONDS (or once the job finishes) the stream ends with
+    a `retry:` line and EventSource reconnects on its own. Polling
+    job_status_view is the default path of the bundled pages.
+    """
+    import json
+    import time
+    from django.http import StreamingHttpResponse
+    from .jobs import get_job, FINISHED_STATUSES
+
+    owner = _get_session_owner(request)
+    if not get_job(job_id, owner=owner):
+        raise Http404('Job not found')
+
+    deadline = time.monotonic() + getattr(settings, 'PDF_JOB_EVENTS_SECONDS', 25)
+
+    def event_stream():
+        last_state = None
+        while True:
+            job = get_job(job_id, owner=owner)
+            if job is None:
+                return
+            state = (job['status'], job['progress'], job['message'])
+            if state != last_state:
+                last_state = state
+                yield f"data: {json.dumps(_job_public_fields(job))}\n\n"
+            if job['status'] in FINISHED_STATUSES:
+                return
+            if time.monotonic() >= deadline:
+                yield "retry: 1000\n\n"
+                return
+            time.sleep(0.5)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def job_download_view(request, job_id):
+    """Download the output file of a finished background job."""
+    from .jobs import get_job
+
+    job = get_job(job_id, owner=_get_session_owner(request))
+    if not job or job['status'] != 'done':
+        raise Http404('Job result not found')
+
+    result = job['result'] or {}
+    if 'output_paths' in result:
+        try:
+            file_path = result['output_paths'][int(request.GET.get('file', 0))]
+        except (ValueError, IndexError):
+            raise Http404('Invalid file index')
+    else:
+        file_path = result.get('output_path')
+
+    if not file_path:
+        raise Http404('File not found on disk')
+
+    response = serve_file(request, file_path)
+    touch(file_path)
+    return response
+
+
+# ==========================================
+# Batch Views
+# ==========================================
+
+def _get_batch_input(request):
+    """
+    Read the selected PDFs and the chain of operations of a batch request.
+
+    POST fields: selected_pdfs (comma-separated ids) and operations (JSON
+    list of steps, see pdf_processor.validate_operations).
+
+    Returns:
+        Tuple (pdfs: list or None, operations: list, error: str)
+    """
+    pdf_ids = [pid.strip() for pid in request.POST.get('selected_pdfs', '').split(',') if pid.strip()]
+    if not pdf_ids:
+        return None, [], 'Please select at least one PDF.'
+
+    pdfs = []
+    for pdf_id in pdf_ids:
+        pdf = get_pdf_by_id(request, pdf_id)
+        if not pdf:
+            return None, [], f'PDF with ID {pdf_id} not found.'
+        pdfs.append(pdf)
+
+    # Same step rules as the pipeline editor (text watermarks only)
+    form = PipelineForm({'steps': request.POST.get('operations', '')})
+    if not form.is_valid():
+        return None, [], ' '.join(form.errors.get('steps', ['Invalid operations.']))
+
+    return pdfs, form.cleaned_data['steps'], ''
+
+
+def batch_view(request):
+    """
+    Apply one chain of operations to several uploaded PDFs.
+
+    The batch runs as a background job (its process pool would otherwise
+    hold the request); the response carries the job id and the URL of the
+    ZIP archive, which batch_download_view streams once the job is done.
+    """
+    from django.http import JsonResponse
+    from .jobs import submit_job
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid method'})
+
+    params, error = _build_job_params(request, 'batch')
+    if params is None:
+        return JsonResponse({'success': False, 'error': error})
+
+    job_id = submit_job('batch', params, owner=_get_session_owner(request))
+
+    return JsonResponse({
+        'success': True,
+        'job_id': job_id,
+        'status_url': reverse('job_status', args=[job_id]),
+        'events_url': reverse('job_events', args=[job_id]),
+        'download_url': reverse('batch_download', args=[job_id])
+    })
+
+
+def batch_download_view(request, job_id):
+    """Stream the outputs of a finished batch job plus results.json as one ZIP."""
+    from django.http import StreamingHttpResponse
+    from .batch import iter_batch_job_archive
+    from .jobs import get_job
+
+    job = get_job(job_id, owner=_get_session_owner(request))
+    if not job or job['operation'] != 'batch' or job['status'] != 'done':
+        raise Http404('Batch result not found')
+
+    result = job['result']
+    if not all(os.path.exists(path) for path in result['output_paths']):
+        raise Http404('Batch result expired')
+
+    timestamp = datetime.fromtimestamp(job['created_at']).strftime('%Y%m%d_%H%M%S')
+    response = StreamingHttpResponse(iter_batch_job_archive(result), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="batch_{timestamp}.zip"'
+    if result['output_paths']:
+        touch(os.path.dirname(result['output_paths'][0]))  # The batch directory is indexed as a whole
+    return response
+
+
+# ==========================================
+# Pipeline Views
+# ==========================================
+
+def pipeline_view(request):
+    """
+    Build, save and run a pipeline (rotate → watermark → page numbers →
+    compress → split, in any order) on one PDF with a single save.
+    
+    Named pipelines are Pipeline rows of the session owner.
+    """
+    uploaded_pdfs = get_uploaded_pdfs(request)
+    
+    if not uploaded_pdfs:
+        messages.error(request, 'No PDF found. Please upload a PDF first.')
+        return redirect('dashboard')
+    
+    pdf_id = request.GET.get('pdf')
+    if pdf_id:
+        selected_pdf = get_pdf_by_id(request, pdf_id)
+        if not selected_pdf:
+            messages.error(request, 'Selected PDF not found.')
+            return redirect('dashboard')
+    else:
+        selected_pdf = uploaded_pdfs[0]
+    
+    owner = _get_session_owner(request)
+    
+    if request.method == 'POST':
+        action = request.POST.get('action', 'run')
+        
+        if action == 'delete':
+            name = request.POST.get('pipeline_name', '')
+            deleted, _ = Pipeline.objects.filter(owner=owner, name=name).delete()
+            if deleted:
+                messages.success(request, f'Pipeline "{name}" deleted.')
+            return redirect(f"{reverse('pipeline')}?pdf={selected_pdf['id']}")
+        
+        form = PipelineForm(request.POST)
+        if form.is_valid():
+            steps = form.cleaned_data['steps']
+            name = form.cleaned_data.get('pipeline_name', '').strip()
+            
+            if name:
+                Pipeline.objects.update_or_create(owner=owner, name=name, defaults={'steps': steps})
+            
+            if action == 'save':
+                if name:
+                    messages.success(request, f'Pipeline "{name}" saved.')
+                else:
+                    messages.error(request, 'Please enter a name to save the pipeline.')
+                return redirect(f"{reverse('pipeline')}?pdf={selected_pdf['id']}")
+            
+            try:
+                output_name = f"{os.path.splitext(selected_pdf['name'])[0]}_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                if _use_jobs():
+                    result = _queue_result(request, 'pipeline', 'pipeline', {
+                        'pdf_path': selected_pdf['path'], 'steps': steps, 'output_name': output_name
+                    }, document=selected_pdf, steps=[step['operation'] for step in steps])
+                    return redirect('job_wait', result.job_id)
+                
+                result = run_pipeline(selected_pdf['path'], steps, output_name)
+                
+                _save_result(
+                    request, 'pipeline', result['output_paths'], document=selected_pdf,
+                    steps=[step['operation'] for step in steps],
+                    original_size=result['original_size']
+                )
+                
+                messages.success(request, f'Pipeline with {len(steps)} steps applied successfully!')
+                return redirect('pipeline_result')
+                
+            except ValueError as e:
+                messages.error(request, f'Error: {str(e)}')
+            except Exception as e:
+                messages.error(request, f'Error running pipeline: {str(e)}')
+    else:
+        form = PipelineForm()
+    
+    context = {
+        'form': form,
+        'pdf_name': selected_pdf['name'],
+        'uploaded_pdfs': uploaded_pdfs,
+        'selected_pdf': selected_pdf,
+        'saved_pipelines': dict(Pipeline.objects.filter(owner=owner).values_list('name', 'steps'))
+    }
+    return render(request, 'pdfeditor/pipeline.html', context)
+
+
+def pipeline_result_view(request):
+    """View for displaying pipeline result."""
+    result = _get_result(request, 'pipeline')
+    
+    if not result:
+        messages.error(request, 'Pipeline result not found.')
         return redirect('dashboard')
+    
+    files_info = [
+        {
+            'index': index,
+            'filename': os.path.basename(path),
+            'size': size,
+            'path_relative': os.path.relpath(path, settings.MEDIA_ROOT)
+        }
+        for index, (path, size) in enumerate(zip(result.paths, result.sizes))
+    ]
+    
+    context = {
+        'files': files_info,
+        'steps': result.data.get('steps', []),
+        'original_size': result.data.get('original_size', 0),
+        'output_size': result.size
+    }
+    return render(request, 'pdfeditor/pipeline_result.html', context)
+
+
+def download_pipeline_view(request):
+    """Download a pipeline output file (?file=<index> when split produced several)."""
+    result = _get_result(request, 'pipeline')
+    if not result:
+        raise Http404('File not found')
+    
+    try:
+        file_index = int(request.GET.get('file', 0))
+    except ValueError:
+        raise Http404('File not found')
+    if not 0 <= file_index < len(result.paths):
+        raise Http404('File not found')
+    
+    response = _serve_result_file(request, result, file_index)
+    if not response:
+        raise Http404('File not found')
+    
+    return response
+
+
+# ==========================================
+# Page Preview Views (server-side rendering)
+# ==========================================
+
+def page_info_ajax(request, pdf_id):
+    """Page sizes and tile geometry for the server-rendered preview."""
+    from django.http import JsonResponse
+    from .page_render import page_sizes, TILE_SIZE, ZOOM_LEVELS, DEFAULT_ZOOM, THUMBNAIL_WIDTH
+    
+    pdf = get_pdf_by_id(request, pdf_id)
+    if not pdf or not pdf.get('sha256'):
+        return JsonResponse({'success': False, 'error': 'PDF not found'})
+    
+    try:
+        sizes = page_sizes(pdf['path'], pdf['sha256'])
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    
+    return JsonResponse({
+        'success': True,
+        'name': pdf['name'],
+        'page_count': len(sizes),
+        'pages': sizes,
+        'base_url': reverse('page_info', args=[pdf_id]),
+        'tile_size': TILE_SIZE,
+        'zoom_levels': ZOOM_LEVELS,
+        'default_zoom': DEFAULT_ZOOM,
+        'thumbnail_width': THUMBNAIL_WIDTH
+    })
+
+
+def _serve_page_image(request, pdf_id, page, zoom=None, tile=None):
+    """Render (or read from cache) one page image and send it."""
+    from .page_render import (
+        render_page_image, page_sizes, tile_grid, snap_zoom, IMAGE_FORMATS, RenderTimeout, RETRY_AFTER
+    )
+    
+    pdf = get_pdf_by_id(request, pdf_id)
+    if not pdf or not pdf.get('sha256'):
+        raise Http404('PDF not found')
+    
+    image_format = request.GET.get('format', 'webp')
+    if image_format not in IMAGE_FORMATS:
+        raise Http404('Unsupported image format')
+    
+    sizes = page_sizes(pdf['path'], pdf['sha256'])
+    if not 1 <= page <= len(sizes):
+        raise Http404('Page out of range')
+    
+    if tile is not None:
+        columns, rows = tile_grid(*sizes[page - 1], snap_zoom(zoom))
+        if not (0 <= tile[0] < columns and 0 <= tile[1] < rows):
+            raise Http404('Tile out of range')
+    
+    try:
+        image_path = render_page_image(pdf['path'], pdf['sha256'], page - 1, zoom, tile, image_format)
+    except RenderTimeout as e:
+        response = HttpResponse(str(e), status=503, content_type='text/plain')
+        response['Retry-After'] = str(RETRY_AFTER)
+        return response
+    
+    # Content-addressed: the image of a given URL never changes
+    return serve_file(request, image_path, as_attachment=False, content_type=IMAGE_FORMATS[image_format],
+                      cache_control='private, max-age=86400')
+
+
+def page_thumbnail_view(request, pdf_id, page):
+    """Thumbnail of one page (1-indexed)."""
+    return _serve_page_image(request, pdf_id, page)
+
+
+def page_tile_view(request, pdf_id, page):
+    """One tile of a page: ?zoom=1.5&x=<column>&y=<row>."""
+    try:
+        zoom = float(request.GET.get('zoom', 1.5))
+        tile = (int(request.GET.get('x', 0)), int(request.GET.get('y', 0)))
+    except ValueError:
+        raise Http404('Invalid tile')
+    
+    return _serve_page_image(request, pdf_id, page, zoom, tile)
@@ -0,0 +1,66 @@
+"""
+Zip Stream Module - build ZIP archives on the fly.
+
+The archive is written to a non-seekable buffer that is drained after
+every block, so a response can start sending bytes before the last file
+has been read and no temporary archive is ever written to disk.
+"""
+import zipfile
+from typing import Iterable, Iterator, Tuple, Union
+
+READ_SIZE = 256 * 1024
+
+
+class _DrainBuffer:
+    """Write-only file object; zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, Union[str, bytes]]],
+               compression: int = zipfile.ZIP_DEFLATED) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive chunk by chunk.
+
+    Args:
+        entries: Iterable of (arcname, source) where source is a file path
+                 or the file contents as bytes. It is consumed lazily, so
+                 entries can be produced while the archive is streamed.
+        compression: zipfile compression constant
+
+    Yields:
+        bytes: Consecutive pieces of the archive
+    """
+    buffer = _DrainBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=compression, allowZip64=True) as archive:
+        for arcname, source in entries:
+            if isinstance(source, bytes):
+                archive.writestr(arcname, source)
+            else:
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                info.compress_type = compression
+                with open(source, 'rb') as src, archive.open(info, 'w', force_zip64=True) as dst:
+                    for block in iter(lambda: src.read(READ_SIZE), b''):
+                        dst.write(block)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    data = buffer.drain()
+    if data:
+        yield data
@@ -0,0 +1,71 @@
+// Server-rendered page viewer: pages are shown as image tiles rendered by
+// the server (/pages/<id>/...), so only the pages being viewed are downloaded.
+class RenderedPageViewer {
+    constructor(container) {
+        this.container = container;
+        this.info = null;
+        this.pageNum = 1;
+        this.zoom = 1.5;
+    }
+
+    async load(pdfId) {
+        const response = await fetch(`/pages/${pdfId}/`);
+        const info = await response.json();
+        if (!info.success) throw new Error(info.error);
+
+        this.info = info;
+        this.pageNum = 1;
+        this.zoom = info.default_zoom;
+        return info;
+    }
+
+    get pageCount() {
+        return this.info ? this.info.page_count : 0;
+    }
+
+    showPage(num) {
+        const info = this.info;
+        this.pageNum = num;
+
+        const [width, height] = info.pages[num - 1];
+        const pageWidth = Math.round(width * this.zoom);
+        const pageHeight = Math.round(height * this.zoom);
+        const base = `${info.base_url}${num}`;
+
+        // The thumbnail stretched underneath shows something right away;
+        // tiles replace it as they arrive (lazy: only visible tiles load)
+        const page = document.createElement('div');
+        page.className = 'rendered-page';
+        page.style.cssText = `position: relative; width: ${pageWidth}px; height: ${pageHeight}px; ` +
+            `background: white url('${base}/thumb/') no-repeat 0 0 / 100% 100%; flex-shrink: 0;`;
+
+        const tile = info.tile_size;
+        for (let row = 0; row * tile < pageHeight; row++) {
+            for (let col = 0; col * tile < pageWidth; col++) {
+                const img = document.createElement('img');
+                img.loading = 'lazy';
+                img.alt = '';
+                img.src = `${base}/tile/?zoom=${this.zoom}&x=${col}&y=${row}`;
+                img.style.cssText = `position: absolute; left: ${col * tile}px; top: ${row * tile}px; ` +
+                    `width: ${Math.min(tile, pageWidth - col * tile)}px; height: ${Math.min(tile, pageHeight - row * tile)}px;`;
+                page.appendChild(img);
+            }
+        }
+
+        this.container.replaceChildren(page);
+    }
+
+    zoomIn() {
+        const levels = this.info.zoom_levels;
+        const next = levels.find(level => level > this.zoom);
+        if (next !== undefined) this.zoom = next;
+        this.showPage(this.pageNum);
+    }
+
+    zoomOut() {
+        const levels = this.info.zoom_levels;
+        const previous = [...levels].reverse().find(level => level < this.zoom);
+        if (previous !== undefined) this.zoom = previous;
+        this.showPage(this.pageNum);
+    }
+}
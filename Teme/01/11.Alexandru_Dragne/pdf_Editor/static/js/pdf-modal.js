@@ -9,6 +9,7 @@ class PDFPreviewModal {
         this.ctx = null;
         this.pageRendering = false;
         this.pageNumPending = null;
+        this.viewer = null;  // RenderedPageViewer when showing an uploaded PDF
         
         this.init();
     }
@@ -23,9 +24,10 @@ class PDFPreviewModal {
                         <button class="pdf-modal-close" onclick="pdfModal.close()">&times;</button>
                     </div>
                     <div class="pdf-modal-body">
-                        <div class="pdf-canvas-wrapper">
+                        <div class="pdf-canvas-wrapper" id="modal-canvas-wrapper">
                             <canvas id="modal-pdf-canvas"></canvas>
                         </div>
+                        <div class="pdf-tiles-wrapper" id="modal-tiles-wrapper" style="display: none;"></div>
                         <div class="pdf-modal-controls">
                             <button id="modal-prev-page" class="icon-btn">← Previous</button>
                             <span class="page-info">
@@ -65,12 +67,14 @@ class PDFPreviewModal {
         
         // Navigation buttons
         document.getElementById('modal-prev-page').addEventListener('click', () => {
+            if (this.viewer) return this.showRenderedPage(this.viewer.pageNum - 1);
             if (this.pageNum <= 1) return;
             this.pageNum--;
             this.queueRenderPage(this.pageNum);
         });
         
         document.getElementById('modal-next-page').addEventListener('click', () => {
+            if (this.viewer) return this.showRenderedPage(this.viewer.pageNum + 1);
             if (this.pageNum >= this.pdfDoc.numPages) return;
             this.pageNum++;
             this.queueRenderPage(this.pageNum);
@@ -78,12 +82,22 @@ class PDFPreviewModal {
         
         // Zoom buttons
         document.getElementById('modal-zoom-in').addEventListener('click', () => {
+            if (this.viewer) {
+                this.viewer.zoomIn();
+                document.getElementById('modal-zoom-level').textContent = Math.round(this.viewer.zoom * 100);
+                return;
+            }
             this.scale += 0.25;
             document.getElementById('modal-zoom-level').textContent = Math.round(this.scale * 100);
             this.queueRenderPage(this.pageNum);
         });
         
         document.getElementById('modal-zoom-out').addEventListener('click', () => {
+            if (this.viewer) {
+                this.viewer.zoomOut();
+                document.getElementById('modal-zoom-level').textContent = Math.round(this.viewer.zoom * 100);
+                return;
+            }
             if (this.scale > 0.5) {
                 this.scale -= 0.25;
                 document.getElementById('modal-zoom-level').textContent = Math.round(this.scale * 100);
@@ -101,6 +115,41 @@ class PDFPreviewModal {
         });
     }
     
+    // Preview an uploaded PDF from server-rendered tiles (no PDF download)
+    async openDocument(pdfId, page = 1) {
+        const wrapper = document.getElementById('modal-tiles-wrapper');
+        const viewer = new RenderedPageViewer(wrapper);
+        
+        try {
+            await viewer.load(pdfId);
+        } catch (error) {
+            console.error('Error loading PDF preview:', error);
+            alert('Error loading PDF preview: ' + error.message);
+            return;
+        }
+        
+        this.viewer = viewer;
+        document.getElementById('modal-canvas-wrapper').style.display = 'none';
+        wrapper.style.display = 'flex';
+        document.getElementById('modal-page-count').textContent = viewer.pageCount;
+        document.getElementById('modal-zoom-level').textContent = Math.round(viewer.zoom * 100);
+        
+        this.modal.classList.add('active');
+        document.body.style.overflow = 'hidden';
+        
+        this.showRenderedPage(page);
+    }
+    
+    showRenderedPage(num) {
+        if (num < 1 || num > this.viewer.pageCount) return;
+        
+        this.viewer.showPage(num);
+        document.getElementById('modal-tiles-wrapper').scrollTo(0, 0);
+        document.getElementById('modal-page-num').textContent = num;
+        document.getElementById('modal-prev-page').disabled = (num <= 1);
+        document.getElementById('modal-next-page').disabled = (num >= this.viewer.pageCount);
+    }
+    
     async open(pdfUrl) {
         // Check if PDF.js is loaded
         if (typeof pdfjsLib === 'undefined') {
@@ -126,6 +175,9 @@ class PDFPreviewModal {
 
             
             this.pdfDoc = await loadingTask.promise;
+            this.viewer = null;
+            document.getElementById('modal-tiles-wrapper').style.display = 'none';
+            document.getElementById('modal-canvas-wrapper').style.display = '';
             console.log('PDF loaded successfully, pages:', this.pdfDoc.numPages);
             
             // Reset state
@@ -154,6 +206,10 @@ class PDFPreviewModal {
         document.body.style.overflow = '';
         
         // Cleanup
+        if (this.viewer) {
+            document.getElementById('modal-tiles-wrapper').replaceChildren();
+            this.viewer = null;
+        }
         if (this.pdfDoc) {
             this.pdfDoc.destroy();
             this.pdfDoc = null;
@@ -218,8 +274,6 @@ document.addEventListener('DOMContentLoaded', () => {
     script.onload = () => {
         console.log('PDF.js loaded');
         pdfjsLib.GlobalWorkerOptions.workerSrc = 'https://unpkg.com/pdfjs-dist@3.4.120/build/pdf.worker.min.js';
-        pdfModal = new PDFPreviewModal();
-        console.log('PDF Modal initialized');
     };
     
     script.onerror = (e) => {
@@ -227,4 +281,8 @@ document.addEventListener('DOMContentLoaded', () => {
     };
     
     document.head.appendChild(script);
+    
+    // Server-rendered previews do not need PDF.js, so the modal is ready right away
+    pdfModal = new PDFPreviewModal();
+    console.log('PDF Modal initialized');
 });